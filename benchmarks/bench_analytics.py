@@ -0,0 +1,140 @@
+"""
+Consultas analíticas de `database.analytics` (columnas generadas e índices)
+contra la alternativa sin proyecciones: leer `consolidated_data` de todas
+las filas y filtrar en Python. Siembra jobs reproducibles (corpus con
+semilla fija, consolidados con `consolidate_job`) y muestra el plan de
+cada consulta.
+
+En Postgres el plan debe ser `Index Only Scan` (tras VACUUM ANALYZE, que
+llena el visibility map) para prima mínima, vehículo y tipo de documento,
+y `Bitmap Index Scan` sobre el GIN para las aseguradoras. SQLite no trata
+como "covering" un índice sobre columnas generadas: ahí se ve el uso del
+índice, no la lectura solo del índice.
+
+Uso:
+    python benchmarks/bench_analytics.py [--jobs 20000] [--url postgresql+asyncpg://...]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from corpus import make_corpus
+
+from insurance_models.database import analytics
+from insurance_models.database.models import Base, Job, JobFile, JobResult, LlmResult, User
+from insurance_models.database.partitioning import create_default_partition_sql
+from insurance_models.schemas import consolidate_job
+from insurance_models.schemas.ingestion import validate_many
+from tests.sqlite_schema import create_tables
+
+BATCH = 2_000
+
+async def seed(engine, jobs: int) -> None:
+    corpus = make_corpus(jobs)
+    outputs = validate_many(corpus, on_error="mark", post_process=True)
+    postgres = engine.dialect.name == "postgresql"
+    models = (User, Job, JobFile, JobResult, LlmResult)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all, tables=[model.__table__ for model in models])
+        await conn.run_sync(create_tables, *models)
+        if postgres:
+            await conn.execute(text(create_default_partition_sql("llm_results")))
+        await conn.execute(insert(User), [{"id": "u1", "email": "a@x.cl"}])
+        now = datetime.utcnow()
+        for start in range(0, jobs, BATCH):
+            ids = range(start + 1, min(start + BATCH, jobs) + 1)
+            await conn.execute(insert(Job), [{"id": i, "user_id": "u1"} for i in ids])
+            await conn.execute(insert(JobFile), [
+                {"id": i, "job_id": i, "filename": "a.pdf", "r2_object_key": "k"} for i in ids])
+            await conn.execute(insert(LlmResult), [
+                {"job_file_id": i, "raw_llm_data": corpus[i - 1], "created_at": now} for i in ids])
+            await conn.execute(insert(JobResult), [
+                {"job_id": i, "consolidated_data": consolidate_job([(i, outputs[i - 1])])} for i in ids])
+    if postgres:
+        async with engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("VACUUM ANALYZE job_results"))
+            await conn.execute(text("VACUUM ANALYZE llm_results"))
+
+async def explain(session: AsyncSession, query) -> str:
+    sql = query.compile(session.get_bind(), compile_kwargs={"literal_binds": True})
+    if session.get_bind().dialect.name == "postgresql":
+        rows = await session.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) {sql}"))
+        return "\n".join(f"    {row[0]}" for row in rows)
+    rows = await session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+    return "\n".join(f"    {row[-1]}" for row in rows)
+
+async def scan_all(session: AsyncSession, keep) -> int:
+    """La alternativa sin proyecciones: decodificar todos los consolidados."""
+    result = await session.execute(select(JobResult.job_id, JobResult.consolidated_data))
+    return sum(1 for _, data in result if data is not None and keep(data))
+
+async def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+async def run(args) -> None:
+    url = args.url or f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'analytics.db')}"
+    engine = create_async_engine(url)
+    start = time.perf_counter()
+    await seed(engine, args.jobs)
+    print(f"{args.jobs} jobs on {engine.dialect.name}, seeded in {time.perf_counter() - start:.1f}s\n")
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with sessions() as session:
+        postgres = engine.dialect.name == "postgresql"
+        cases = [
+            ("cheapest jobs <= 12 UF",
+             lambda: analytics.cheapest_jobs(session, limit=100, max_premium_uf=12),
+             lambda d: d["min_annual_premium_uf"] is not None and d["min_annual_premium_uf"] <= 12,
+             select(JobResult.job_id, JobResult.min_annual_premium_uf)
+             .where(JobResult.min_annual_premium_uf <= 12).order_by(JobResult.min_annual_premium_uf).limit(100)),
+            ("jobs by vehicle",
+             lambda: analytics.jobs_by_vehicle(session, "Kia", "Rio", 2020, limit=1000),
+             lambda d: d["vehicle_info"] == {"make": "Kia", "model": "Rio", "year": 2020},
+             select(JobResult.job_id).where(JobResult.vehicle_make == "Kia", JobResult.vehicle_model == "Rio",
+                                            JobResult.vehicle_year == 2020)),
+            ("vehicle counts",
+             lambda: analytics.vehicle_counts(session),
+             lambda d: d["vehicle_info"] is not None,
+             select(JobResult.vehicle_make, JobResult.vehicle_model, JobResult.vehicle_year, text("count(*)"))
+             .group_by(JobResult.vehicle_make, JobResult.vehicle_model, JobResult.vehicle_year)),
+            ("document type counts",
+             lambda: analytics.document_type_counts(session),
+             None,
+             select(LlmResult.document_type, text("count(*)")).group_by(LlmResult.document_type)),
+        ]
+        if postgres:
+            cases.append((
+                "cheapest by insurer (Mapfre)",
+                lambda: analytics.cheapest_by_insurer(session, ["Mapfre"]),
+                lambda d: "Mapfre" in d["insurer_names"],
+                select(JobResult.job_id).where(analytics._insurer_filter(["Mapfre"])),
+            ))
+
+        print(f"{'query':<30} {'projection ms':>14} {'full scan ms':>13}")
+        for name, query, keep, plan_query in cases:
+            indexed = await timed(query)
+            scanned = f"{await timed(lambda: scan_all(session, keep), repeat=2):>13.1f}" if keep else f"{'-':>13}"
+            print(f"{name:<30} {indexed:>14.1f} {scanned}")
+            print(await explain(session, plan_query))
+    await engine.dispose()
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=20_000)
+    parser.add_argument("--url", default=None, help="Base de prueba (se borran sus tablas); por defecto SQLite")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
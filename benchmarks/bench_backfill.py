@@ -0,0 +1,70 @@
+"""
+Backfill de `job_results.consolidated_data` sobre SQLite: en el proceso
+actual contra pools de 2, 4 y N procesos. Mide jobs por segundo de punta a
+punta (lectura en streaming, validación, post-procesamiento, consolidación
+y upsert).
+
+Uso:
+    python benchmarks/bench_backfill.py [--jobs 5000] [--files 3] [--workers 0 2 4]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from corpus import make_corpus
+
+from insurance_models.database.backfill import BackfillRunner, ConsolidationTask
+from insurance_models.database.models import Job, JobFile, JobResult, LlmResult, User
+from insurance_models.schemas import consolidate_job
+from tests.sqlite_schema import create_tables
+
+async def seed(engine, jobs: int, files: int) -> None:
+    corpus = make_corpus(jobs * files)
+    async with engine.begin() as conn:
+        await conn.run_sync(create_tables, User, Job, JobFile, JobResult, LlmResult)
+        await conn.execute(insert(User), [{"id": "u1", "email": "a@x.cl"}])
+        await conn.execute(insert(Job), [{"id": j + 1, "user_id": "u1"} for j in range(jobs)])
+        file_rows = [{"id": i + 1, "job_id": i // files + 1, "filename": "a.pdf", "r2_object_key": "k"}
+                     for i in range(jobs * files)]
+        await conn.execute(insert(JobFile), file_rows)
+        now = datetime.utcnow()
+        await conn.execute(insert(LlmResult), [
+            {"job_file_id": i + 1, "raw_llm_data": doc, "created_at": now} for i, doc in enumerate(corpus)
+        ])
+
+async def run(args) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'backfill.db')}")
+    await seed(engine, args.jobs, args.files)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    print(f"{args.jobs} jobs x {args.files} files, {os.cpu_count()} cores")
+    print(f"{'workers':>8} {'seconds':>9} {'jobs/s':>9}")
+    for workers in args.workers:
+        async with engine.begin() as conn:
+            await conn.execute(delete(JobResult))
+        runner = BackfillRunner(ConsolidationTask(consolidate_job), sessions, workers=workers,
+                                chunk_size=args.chunk_size, batch_size=args.batch_size)
+        start = time.perf_counter()
+        report = await runner.run()
+        elapsed = time.perf_counter() - start
+        assert report.written == args.jobs, report.as_dict()
+        print(f"{workers:>8} {elapsed:>9.2f} {args.jobs / elapsed:>9.0f}")
+    await engine.dispose()
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=5_000)
+    parser.add_argument("--files", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--chunk-size", type=int, default=1_000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
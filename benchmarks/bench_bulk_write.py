@@ -0,0 +1,109 @@
+"""
+Escritura de las tablas normalizadas: ORM objeto por objeto (relaciones y un
+flush por nivel) contra `write_extractions` (INSERT multi-fila por tabla).
+
+Uso:
+    python benchmarks/bench_bulk_write.py [--docs 500] [--url postgresql+asyncpg://...]
+
+La URL debe apuntar a una base desechable: se borran y recrean las tablas.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from corpus import make_corpus
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from insurance_models.database.bulk import InsurerCache, write_extractions
+from insurance_models.database.models import (
+    Base, DeductiblePremium, InsurancePlan, Insurer, Job, NewVehicleReplacementCoverage,
+    PolicyHolder, ReplacementCarCoverage, User, Vehicle, WorkshopCoverage,
+)
+from insurance_models.schemas import InsuranceExtractionOutput, post_process_many
+from tests.sqlite_schema import create_tables
+
+MODELS = (
+    User, Job, Insurer, PolicyHolder, Vehicle, InsurancePlan, DeductiblePremium,
+    WorkshopCoverage, ReplacementCarCoverage, NewVehicleReplacementCoverage,
+)
+
+async def write_orm(session: AsyncSession, extractions) -> None:
+    """Camino anterior: un objeto ORM por fila y un flush por nivel."""
+    insurers = {}
+    for job_id, output in extractions:
+        if output.policy_holder:
+            session.add(PolicyHolder(job_id=job_id, name=output.policy_holder.insured_name, rut=output.policy_holder.insured_rut))
+        if output.vehicle_info:
+            session.add(Vehicle(job_id=job_id, make=output.vehicle_info.make, model=output.vehicle_info.model, year=output.vehicle_info.year))
+        for plan in output.policy_analyses:
+            insurer = insurers.get(plan.insurer_name)
+            if insurer is None and plan.insurer_name:
+                insurer = (await session.execute(select(Insurer).where(Insurer.name == plan.insurer_name))).scalar_one_or_none()
+                if insurer is None:
+                    insurer = Insurer(name=plan.insurer_name)
+                    session.add(insurer)
+                    await session.flush()
+                insurers[plan.insurer_name] = insurer
+            db_plan = InsurancePlan(job_id=job_id, insurer=insurer, plan_name=plan.plan_name)
+            session.add(db_plan)
+            await session.flush()
+            for dp in plan.deductible_premiums:
+                session.add(DeductiblePremium(
+                    insurance_plan_id=db_plan.id, deductible_uf=dp.deductible_original_str,
+                    annual_premium_uf=dp.annual_premium_original_str, rc_coverage_uf=dp.rc_coverage_original_str,
+                    parsed_deductible=dp.deductible_uf, parsed_premium=dp.annual_premium_uf,
+                ))
+            if plan.workshop_info:
+                session.add(WorkshopCoverage(insurance_plan_id=db_plan.id, workshop_type=plan.workshop_info.workshop_type,
+                                             conditions=plan.workshop_info.conditions_observations))
+            if plan.replacement_car_info:
+                info = plan.replacement_car_info
+                session.add(ReplacementCarCoverage(insurance_plan_id=db_plan.id, has_coverage=info.has_coverage,
+                                                   days_limit=info.days_limit_str, copay_details=info.daily_copay_original_str,
+                                                   conditions=info.conditions_observations))
+            if plan.new_vehicle_replacement_info:
+                info = plan.new_vehicle_replacement_info
+                session.add(NewVehicleReplacementCoverage(insurance_plan_id=db_plan.id, has_coverage=info.has_coverage,
+                                                          conditions=info.conditions_observations))
+            await session.flush()
+
+async def reset(engine, jobs: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all, tables=[model.__table__ for model in MODELS])
+        await conn.run_sync(create_tables, *MODELS)
+    sessions = async_sessionmaker(engine, class_=AsyncSession)
+    async with sessions() as session:
+        session.add(User(id="bench", email="bench@example.com"))
+        session.add_all([Job(id=i, user_id="bench") for i in range(1, jobs + 1)])
+        await session.commit()
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--url", default=None)
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bulk.db')}"
+    engine = create_async_engine(url)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    outputs = post_process_many([InsuranceExtractionOutput.model_validate(d) for d in make_corpus(args.docs)])
+    extractions = list(enumerate(outputs, start=1))
+
+    for name, writer in (
+        ("ORM row by row", write_orm),
+        ("write_extractions", lambda s, e: write_extractions(s, e, insurer_cache=InsurerCache())),
+    ):
+        await reset(engine, args.docs)
+        async with sessions() as session:
+            start = time.perf_counter()
+            await writer(session, extractions)
+            await session.commit()
+            elapsed = time.perf_counter() - start
+        print(f"{name:<20} {elapsed * 1000:>9.1f} ms  {args.docs / elapsed:>8.0f} docs/s")
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+"""
+Compara el codec binario de las colas contra la ruta JSON actual
+(`JsonCodec`), con y sin un span activo que propagar.
+
+Uso:
+    python benchmarks/bench_codec.py [--n 200000]
+"""
+import argparse
+import json
+import time
+import timeit
+
+from insurance_models.redis.codec import JSON_CODEC, TRACED_ENVELOPE_VERSION, decode_message, encode_message
+from insurance_models.redis.queues import LlmQueueMessage
+from insurance_models.utils.tracing import get_tracer
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200_000)
+    args = parser.parse_args()
+
+    message = LlmQueueMessage(job_file_id=123_456_789)
+    json_payload = JSON_CODEC.encode(message).encode()
+    binary_payload = encode_message(message)
+    with get_tracer().span("bench"):
+        traced_json_payload = JSON_CODEC.encode(message).encode()
+        traced_binary_payload = encode_message(message, envelope_version=TRACED_ENVELOPE_VERSION)
+
+    # Equivalente JSON con los mismos metadatos que el envelope binario.
+    def json_envelope_encode():
+        return json.dumps({"t": 2, "v": 1, "ts": time.time(), "m": message.model_dump()}).encode()
+
+    def json_envelope_decode():
+        data = json.loads(json_envelope_payload)
+        return LlmQueueMessage.model_validate(data["m"]), data["ts"]
+
+    json_envelope_payload = json_envelope_encode()
+
+    cases = {
+        "json encode": lambda: JSON_CODEC.encode(message),
+        "json decode": lambda: JSON_CODEC.decode(json_payload, LlmQueueMessage),
+        "json decode (traced)": lambda: JSON_CODEC.decode(traced_json_payload, LlmQueueMessage),
+        "json+envelope encode": json_envelope_encode,
+        "json+envelope decode": json_envelope_decode,
+        "binary encode": lambda: encode_message(message),
+        "binary decode": lambda: decode_message(binary_payload),
+        "binary decode (v2 traced)": lambda: decode_message(traced_binary_payload),
+    }
+    print(f"payload size: json={len(json_payload)} B, json+envelope={len(json_envelope_payload)} B, "
+          f"binary={len(binary_payload)} B, traced json={len(traced_json_payload)} B")
+    print(f"{'case':<25} {'ns/op':>10}")
+    for name, fn in cases.items():
+        seconds = min(timeit.repeat(fn, number=args.n, repeat=3))
+        print(f"{name:<25} {seconds / args.n * 1e9:>10.0f}")
+
+if __name__ == "__main__":
+    main()
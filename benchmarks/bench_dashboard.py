@@ -0,0 +1,115 @@
+"""
+Dashboard de trabajos: paginación OFFSET + COUNT(*) contra keyset
+(`fetch_dashboard_page`) a distintas profundidades del historial de un usuario.
+
+Siembra `--jobs` trabajos repartidos en `--users` usuarios (el primero concentra
+la mitad) en una base nueva. Por defecto usa SQLite; para Postgres:
+
+    python benchmarks/bench_dashboard.py --url postgresql+asyncpg://... --jobs 2000000
+
+La URL debe apuntar a una base desechable: se borran y recrean `users` y `jobs`.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from insurance_models.database.models import Base, Job, JobStatus, User
+from insurance_models.database.queries import count_user_jobs, encode_cursor, fetch_dashboard_page
+
+HEAVY_USER = "user-0"
+SEED_BATCH = 20_000
+TABLES = [User.__table__, Job.__table__]
+
+async def seed(engine, jobs: int, users: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all, tables=TABLES)
+        await conn.run_sync(Base.metadata.create_all, tables=TABLES)
+        await conn.execute(insert(User), [{"id": f"user-{i}", "email": f"user{i}@example.com"} for i in range(users)])
+    rng = random.Random(7)
+    start = datetime(2020, 1, 1)
+    statuses = list(JobStatus)
+    for offset in range(0, jobs, SEED_BATCH):
+        rows = [
+            {
+                # Ids explícitos: SQLite no autoincrementa una PK BIGINT.
+                "id": offset + i + 1,
+                "user_id": HEAVY_USER if rng.random() < 0.5 else f"user-{rng.randrange(1, users)}",
+                "status": rng.choice(statuses),
+                "representative_policy_holder_name": "Juan Pérez",
+                "representative_vehicle_description": "Toyota Yaris 2022",
+                "created_at": start + timedelta(seconds=offset + i),
+            }
+            for i in range(min(SEED_BATCH, jobs - offset))
+        ]
+        async with engine.begin() as conn:
+            await conn.execute(insert(Job), rows)
+
+async def offset_page(session, user_id: str, page: int, limit: int):
+    total = (await session.execute(select(func.count()).select_from(Job).where(Job.user_id == user_id))).scalar_one()
+    rows = (await session.execute(
+        select(Job).where(Job.user_id == user_id)
+        .order_by(Job.created_at.desc(), Job.id.desc()).offset((page - 1) * limit).limit(limit)
+    )).scalars().all()
+    return total, rows
+
+async def cursor_for_page(session, user_id: str, page: int, limit: int):
+    # Cursor equivalente al que habría devuelto la página anterior (fuera de la medición).
+    if page == 1:
+        return None
+    last = (await session.execute(
+        select(Job.created_at, Job.id).where(Job.user_id == user_id)
+        .order_by(Job.created_at.desc(), Job.id.desc()).offset((page - 1) * limit - 1).limit(1)
+    )).one()
+    return encode_cursor(last.created_at, last.id)
+
+async def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--jobs", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'dashboard.db')}"
+    engine = create_async_engine(url)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    start = time.perf_counter()
+    await seed(engine, args.jobs, args.users)
+    print(f"Seeded {args.jobs} jobs in {time.perf_counter() - start:.1f}s ({url.split(':')[0]})")
+
+    async with sessions() as session:
+        heavy_jobs = (await session.execute(select(func.count()).select_from(Job).where(Job.user_id == HEAVY_USER))).scalar_one()
+        pages = heavy_jobs // args.limit
+        print(f"{HEAVY_USER}: {heavy_jobs} jobs, {pages} pages of {args.limit}")
+        print(f"{'page':>8} {'OFFSET+COUNT ms':>16} {'keyset ms':>10}")
+
+        for depth in sorted({1, 10, 100, pages // 10, pages // 2, pages - 1} - {0}):
+            cursor = await cursor_for_page(session, HEAVY_USER, depth, args.limit)
+            offset_ms = await timed(lambda: offset_page(session, HEAVY_USER, depth, args.limit), args.repeat)
+            keyset_ms = await timed(lambda: fetch_dashboard_page(session, HEAVY_USER, args.limit, cursor), args.repeat)
+            print(f"{depth:>8} {offset_ms:>16.2f} {keyset_ms:>10.2f}")
+
+        # El total del keyset se cuenta aparte, acotado y sin caché, una vez por visita.
+        count_ms = await timed(lambda: count_user_jobs(session, HEAVY_USER, cache=None), args.repeat)
+        print(f"capped count (10.000, uncached): {count_ms:.2f} ms")
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
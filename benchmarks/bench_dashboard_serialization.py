@@ -0,0 +1,103 @@
+"""
+Filas del dashboard a JSON: entidades `Job` hidratadas por el ORM +
+`from_attributes`, contra la proyección de las cinco columnas serializada
+directamente (`dump_paginated_dashboard`). Incluye la consulta.
+
+Uso:
+    python benchmarks/bench_dashboard_serialization.py [--rows 1000 10000 100000]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from insurance_models.database.models import Base, Job, JobStatus, User
+from insurance_models.database.queries import DASHBOARD_COLUMNS, dump_paginated_dashboard
+from insurance_models.database.schemas import JobDashboardItem, PaginatedJobDashboardResponse
+
+USER = "user-0"
+SEED_BATCH = 20_000
+TABLES = [User.__table__, Job.__table__]
+
+async def seed(engine, jobs: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all, tables=TABLES)
+        await conn.run_sync(Base.metadata.create_all, tables=TABLES)
+        await conn.execute(insert(User), [{"id": USER, "email": "user0@example.com"}])
+    statuses = list(JobStatus)
+    start = datetime(2020, 1, 1)
+    for offset in range(0, jobs, SEED_BATCH):
+        rows = [
+            {
+                # Ids explícitos: SQLite no autoincrementa una PK BIGINT.
+                "id": offset + i + 1,
+                "user_id": USER,
+                "status": statuses[(offset + i) % len(statuses)],
+                "representative_policy_holder_name": "Juan Pérez",
+                "representative_vehicle_description": "Toyota Yaris 2022",
+                "created_at": start + timedelta(seconds=offset + i),
+            }
+            for i in range(min(SEED_BATCH, jobs - offset))
+        ]
+        async with engine.begin() as conn:
+            await conn.execute(insert(Job), rows)
+
+def ordered(query, rows: int):
+    return query.where(Job.user_id == USER).order_by(Job.created_at.desc(), Job.id.desc()).limit(rows)
+
+async def orm_hydrated(session, rows: int) -> bytes:
+    """Camino anterior: entidades completas y validación por atributos."""
+    jobs = (await session.execute(ordered(select(Job), rows))).scalars().all()
+    items = [JobDashboardItem.model_validate(job) for job in jobs]
+    response = PaginatedJobDashboardResponse(jobs=items, total_jobs=rows, total_pages=1, current_page=1, limit=rows)
+    return response.model_dump_json().encode()
+
+async def projected_models(session, rows: int) -> bytes:
+    """Proyección de columnas, pero con un modelo por fila."""
+    result = (await session.execute(ordered(select(*DASHBOARD_COLUMNS), rows))).all()
+    items = [JobDashboardItem.model_validate(row, from_attributes=True) for row in result]
+    response = PaginatedJobDashboardResponse(jobs=items, total_jobs=rows, total_pages=1, current_page=1, limit=rows)
+    return response.model_dump_json().encode()
+
+async def projected_json(session, rows: int) -> bytes:
+    result = (await session.execute(ordered(select(*DASHBOARD_COLUMNS), rows))).all()
+    return dump_paginated_dashboard(result, rows, 1, rows)
+
+async def measure(sessions, fn, rows: int, repeat: int):
+    best, payload = float("inf"), b""
+    for _ in range(repeat):
+        async with sessions() as session:
+            start = time.perf_counter()
+            payload = await fn(session, rows)
+            best = min(best, time.perf_counter() - start)
+    return best, payload
+
+async def run(args) -> None:
+    url = args.url or f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'dashboard.db')}"
+    engine = create_async_engine(url)
+    await seed(engine, max(args.rows))
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    print(f"{'rows':>8} {'ORM + from_attributes':>22} {'projection + models':>20} {'projection + JSON':>18}")
+    for rows in args.rows:
+        repeat = 5 if rows <= 10_000 else 2
+        orm, expected = await measure(sessions, orm_hydrated, rows, repeat)
+        models, _ = await measure(sessions, projected_models, rows, repeat)
+        direct, payload = await measure(sessions, projected_json, rows, repeat)
+        assert payload == expected
+        print(f"{rows:>8} {orm * 1000:>19.1f} ms {models * 1000:>17.1f} ms {direct * 1000:>15.1f} ms")
+    await engine.dispose()
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--url", default=None)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
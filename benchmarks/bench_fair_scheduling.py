@@ -0,0 +1,65 @@
+"""
+Espera de los mensajes interactivos (en turnos de worker) detrás de un
+backfill encolado, con la cola FIFO actual (`ReliableQueue`) y con
+`FairQueue`. Cada turno un worker reclama un mensaje; cada `--every` turnos
+llega un mensaje interactivo de uno de 5 usuarios. Corre sobre fakeredis.
+
+Uso:
+    python benchmarks/bench_fair_scheduling.py [--backlogs 100 1000 10000] [--interactive 200]
+"""
+import argparse
+import asyncio
+import statistics
+
+import fakeredis
+
+from insurance_models.redis.queues import BATCH_PRIORITY, LLM_QUEUE, LlmQueueMessage
+from insurance_models.redis.reliable_queue import ReliableQueue
+from insurance_models.redis.scheduling import FairQueue
+
+INTERACTIVE_ID = 10**9
+
+async def simulate(fair: bool, backlog: int, interactive: int, every: int) -> list:
+    client = fakeredis.FakeAsyncRedis()
+    queue = (FairQueue if fair else ReliableQueue).for_queue(client, LLM_QUEUE)
+    batch = [LlmQueueMessage(job_file_id=i) for i in range(backlog)]
+    if fair:
+        await queue.enqueue_many(batch, tenant="backfill", priority=BATCH_PRIORITY)
+    else:
+        await queue.enqueue_many(batch)
+
+    arrived, waits, slot = {}, [], 0
+    while len(waits) < interactive:
+        sent = len(arrived)
+        if slot % every == 0 and sent < interactive:
+            message = LlmQueueMessage(job_file_id=INTERACTIVE_ID + sent)
+            if fair:
+                await queue.enqueue(message, tenant=f"user-{sent % 5}")
+            else:
+                await queue.enqueue(message)
+            arrived[message.job_file_id] = slot
+        for delivery in await queue.claim(1):
+            await queue.ack(delivery)
+            if delivery.message.job_file_id >= INTERACTIVE_ID:
+                waits.append(slot - arrived[delivery.message.job_file_id])
+        slot += 1
+    await client.aclose()
+    return waits
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backlogs", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--interactive", type=int, default=200)
+    parser.add_argument("--every", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'backlog':>8} {'queue':<6} {'p50':>8} {'p95':>8} {'max':>8}  (turnos)")
+    for backlog in args.backlogs:
+        for fair in (False, True):
+            waits = await simulate(fair, backlog, args.interactive, args.every)
+            p95 = statistics.quantiles(waits, n=20)[-1]
+            print(f"{backlog:>8} {'fair' if fair else 'fifo':<6} {statistics.median(waits):>8.0f} "
+                  f"{p95:>8.0f} {max(waits):>8}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+"""
+Benchmark del costo de importación (cold start) de los módulos de clientes.
+
+Cada medición corre en un intérprete nuevo para que no haya caché de módulos.
+Los módulos deben poder importarse sin variables de entorno: la construcción
+de engine / Redis / R2 ocurre recién en el primer `get_*()`.
+
+Uso:
+    python benchmarks/bench_import_time.py [--runs 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    "insurance_models.database.connection",
+    "insurance_models.redis.client",
+    "insurance_models.r2.client",
+]
+
+def _time_import(statement: str, runs: int) -> float:
+    code = (
+        "import time; t0 = time.perf_counter(); "
+        f"{statement}; "
+        "print(time.perf_counter() - t0)"
+    )
+    env = {k: v for k, v in os.environ.items()
+           if k not in ("DATABASE_URL", "REDIS_URL") and not k.startswith("R2_")}
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", code], env=env, check=True,
+            capture_output=True, text=True,
+        )
+        samples.append(float(out.stdout.strip()))
+    return statistics.median(samples)
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=15)
+    args = parser.parse_args()
+
+    print(f"{'module':<45} {'median import (ms)':>20}")
+    for module in MODULES:
+        elapsed = _time_import(f"import {module}", args.runs)
+        print(f"{module:<45} {elapsed * 1000:>20.1f}")
+    elapsed = _time_import("; ".join(f"import {m}" for m in MODULES), args.runs)
+    print(f"{'(all three)':<45} {elapsed * 1000:>20.1f}")
+    elapsed = _time_import("import boto3; boto3.client('s3', region_name='auto')", args.runs)
+    print(f"{'(reference: boto3 client construction)':<45} {elapsed * 1000:>20.1f}")
+
+if __name__ == "__main__":
+    main()
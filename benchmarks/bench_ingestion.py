@@ -0,0 +1,105 @@
+"""
+Ingesta de respuestas del LLM: `json.loads` + `model_validate` (ruta actual)
+contra la validación directa desde el JSON crudo y `validate_many`.
+
+También compara la validación de los planes con las definiciones
+anteriores (`BeforeValidator` en Python para `has_coverage` y
+`default_factory` con la clase del submodelo) contra las actuales (esquema
+en pydantic-core y factory que valida `{}` sin pasar por `__init__`), con
+los bloques opcionales omitidos y sin las primas, que dominan el tiempo y
+no cambian.
+
+Uso:
+    python benchmarks/bench_ingestion.py [--docs 2000]
+"""
+import argparse
+import gc
+import json
+import time
+from typing import Annotated, List, Optional
+
+from pydantic import BaseModel, BeforeValidator, Field, TypeAdapter
+
+from corpus import make_corpus, make_json_corpus
+
+from insurance_models.schemas import InsuranceExtractionOutput, validate_extraction_json, validate_many
+from insurance_models.schemas.llm_schemas import DeductiblePremiumInfo, RCPlanAnalysis, WorkshopDetail
+
+OPTIONAL_BLOCKS = ("workshop_info", "replacement_car_info", "new_vehicle_replacement_info", "smart_deductible_info")
+
+# --- Definiciones anteriores, para comparar ---
+
+LegacyFlag = Annotated[Optional[bool], BeforeValidator(lambda v: v if v is not None else False)]
+
+class LegacyReplacementCar(BaseModel):
+    has_coverage: LegacyFlag = Field(default=False)
+    daily_copay_original_str: Optional[str] = Field(default=None)
+    days_limit_str: Optional[str] = Field(default=None)
+    conditions_observations: Optional[str] = Field(default=None)
+
+class LegacyCoverage(BaseModel):
+    has_coverage: LegacyFlag = Field(default=False)
+    conditions_observations: Optional[str] = Field(default=None)
+
+class LegacyPlan(BaseModel):
+    insurer_name: Optional[str] = Field(default=None)
+    plan_name: Optional[str] = Field(default=None)
+    workshop_info: Optional[WorkshopDetail] = Field(default_factory=WorkshopDetail)
+    replacement_car_info: Optional[LegacyReplacementCar] = Field(default_factory=LegacyReplacementCar)
+    new_vehicle_replacement_info: Optional[LegacyCoverage] = Field(default_factory=LegacyCoverage)
+    smart_deductible_info: Optional[LegacyCoverage] = Field(default_factory=LegacyCoverage)
+    deductible_premiums: List[DeductiblePremiumInfo] = Field(default_factory=list)
+
+def plans_payload(docs: int) -> bytes:
+    """Planes del corpus sin primas ni los bloques que vienen en `null` (el LLM los omite)."""
+    plans = [
+        {key: value for key, value in plan.items()
+         if key != "deductible_premiums" and not (key in OPTIONAL_BLOCKS and value is None)}
+        for document in make_corpus(docs) for plan in document["policy_analyses"]
+    ]
+    return json.dumps(plans).encode()
+
+def compare_plans(docs: int, repeat: int) -> None:
+    payload = plans_payload(docs)
+    variants = {"legacy": TypeAdapter(List[LegacyPlan]), "core": TypeAdapter(List[RCPlanAnalysis])}
+    plans = len(variants["core"].validate_json(payload))
+    best = dict.fromkeys(variants, float("inf"))
+    gc.disable()
+    try:
+        # Variantes alternadas en cada repetición: el ruido afecta a ambas por igual.
+        for _ in range(repeat):
+            for name, adapter in variants.items():
+                start = time.perf_counter()
+                adapter.validate_json(payload)
+                best[name] = min(best[name], time.perf_counter() - start)
+    finally:
+        gc.enable()
+    print(f"\n{plans} plans without premiums, optional blocks omitted when null")
+    for name, seconds in best.items():
+        print(f"{name:<30} {seconds * 1000:>8.1f} ms  x{best['legacy'] / seconds:.2f}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    payloads = make_json_corpus(args.docs)
+    size_mb = sum(len(p) for p in payloads) / 1e6
+
+    variants = (
+        ("json.loads + model_validate", lambda: [InsuranceExtractionOutput.model_validate(json.loads(p)) for p in payloads]),
+        ("validate_extraction_json", lambda: [validate_extraction_json(p) for p in payloads]),
+        ("validate_many", lambda: validate_many(payloads)),
+    )
+    print(f"{args.docs} documents, {size_mb:.1f} MB of JSON")
+    for name, fn in variants:
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:<30} {best * 1000:>8.1f} ms  {args.docs / best:>8.0f} docs/s")
+    compare_plans(args.docs, args.repeat * 3)
+
+if __name__ == "__main__":
+    main()
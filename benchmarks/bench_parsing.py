@@ -0,0 +1,82 @@
+"""
+Parseo de valores UF: implementación anterior (regex sin compilar y búsqueda
+lineal de términos) contra el parser canónico con memo y la versión por lotes.
+
+Uso:
+    python benchmarks/bench_parsing.py [--n 200000]
+"""
+import argparse
+import random
+import re
+import time
+
+from insurance_models.utils.parsing import clear_parse_cache, parse_uf_value, parse_uf_values
+
+# Distribución parecida a la de las primas/deducibles de un lote de trabajos:
+# pocos strings distintos que se repiten mucho.
+SAMPLES = [
+    "UF 5", "UF 10", "UF 3", "Sin deducible", "0", "UF 20", "15,2", "12,75",
+    "1.234,56", "UF 0", "S/D", "UF 7,5", "21,3 UF", "No aplica", "18.9",
+]
+
+def legacy_parse(value_str):
+    if value_str is None:
+        return None
+    text = str(value_str).strip().lower()
+    if any(term in text for term in ["sin deducible", "sin copago", "gratis", "no aplica", "n/a", "s/d"]):
+        return 0.0
+    match = re.search(r'([\d.,]+)', text)
+    if not match:
+        return None
+    num_part = match.group(1)
+    if ',' in num_part and '.' in num_part:
+        cleaned = num_part.replace('.', '').replace(',', '.')
+    elif ',' in num_part:
+        cleaned = num_part.replace(',', '.')
+    elif '.' in num_part:
+        parts = num_part.split('.')
+        if len(parts) > 2 or (len(parts) == 2 and len(parts[1]) == 3 and len(num_part) > 4):
+            cleaned = num_part.replace('.', '')
+        else:
+            cleaned = num_part
+    else:
+        cleaned = num_part
+    try:
+        return float(cleaned)
+    except (ValueError, TypeError):
+        return None
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200_000)
+    args = parser.parse_args()
+    random.seed(0)
+    values = [random.choice(SAMPLES) for _ in range(args.n)]
+    # Variante con strings únicos: mide el parser sin ayuda del memo.
+    unique = [f"UF {i},{i % 100}" for i in range(args.n)]
+
+    clear_parse_cache()
+    cases = {
+        "legacy, repeated": lambda: [legacy_parse(v) for v in values],
+        "canonical, repeated": lambda: [parse_uf_value(v) for v in values],
+        "batch, repeated": lambda: parse_uf_values(values),
+        "batch numpy, repeated": lambda: parse_uf_values(values, as_array=True),
+        "legacy, unique": lambda: [legacy_parse(v) for v in unique],
+        "canonical, unique": lambda: [parse_uf_value(v) for v in unique],
+    }
+    print(f"{'case':<24} {'ns/value':>10}")
+    for name, fn in cases.items():
+        try:
+            seconds = _timed(fn)
+        except ImportError as e:
+            print(f"{name:<24} skipped ({e})")
+            continue
+        print(f"{name:<24} {seconds / args.n * 1e9:>10.0f}")
+
+if __name__ == "__main__":
+    main()
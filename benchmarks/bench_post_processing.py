@@ -0,0 +1,92 @@
+"""
+Post-procesamiento de extracciones: la versión original de
+`post_process_data` (tablas reconstruidas en cada llamada, parser sin memo),
+el método actual documento por documento y `post_process_many` sobre el lote.
+Se mide solo el post-procesamiento, no la validación de los modelos.
+
+Uso:
+    python benchmarks/bench_post_processing.py [--docs 2000]
+"""
+import argparse
+import gc
+import time
+from collections import defaultdict
+
+from corpus import make_corpus
+
+from insurance_models.schemas import InsuranceExtractionOutput, post_process_many
+from insurance_models.utils.parsing import _parse_uf_uncached, clear_parse_cache
+
+def legacy_post_process(output: InsuranceExtractionOutput) -> None:
+    """Copia de la implementación anterior, como línea base."""
+    if output.error:
+        return
+    INSURER_NORMALIZATION_MAP = {
+        'hdi seguros': 'HDI', 'hdi seguros s.a.': 'HDI', 'bci seguros': 'BCI Seguros',
+        'mapfre': 'MAPFRE', 'reale chile seguros generales s.a.': 'Reale Seguros',
+        'reale seguros': 'Reale Seguros', 'reale': 'Reale Seguros',
+        'fid chile seguros generales s.a.': 'FID Seguros', 'fid seguros': 'FID Seguros',
+        'zurich chile seguros generales s.a.': 'Zurich',
+    }
+    RC_ONLY_KEYWORDS = ['elemental', 'r. civil', 'responsabilidad civil', '(rc)', 'basic', 'rc)', 'solo rc']
+    for plan in output.policy_analyses:
+        if plan.insurer_name:
+            plan.insurer_name = INSURER_NORMALIZATION_MAP.get(plan.insurer_name.lower(), plan.insurer_name)
+        for dp in plan.deductible_premiums:
+            dp.deductible_uf = _parse_uf_uncached(dp.deductible_original_str) if dp.deductible_original_str is not None else None
+            dp.annual_premium_uf = _parse_uf_uncached(dp.annual_premium_original_str) if dp.annual_premium_original_str is not None else None
+        grouped_premiums = defaultdict(list)
+        for dp in plan.deductible_premiums:
+            if dp.annual_premium_uf is not None:
+                grouped_premiums[dp.deductible_uf].append(dp)
+        plan.deductible_premiums = [
+            min(dp_list, key=lambda x: x.annual_premium_uf or float('inf'))
+            for dp_list in grouped_premiums.values() if dp_list
+        ]
+        plan_name_lower = plan.plan_name.lower() if plan.plan_name else ""
+        if any(keyword in plan_name_lower for keyword in RC_ONLY_KEYWORDS):
+            plan.workshop_info = None
+            if plan.replacement_car_info:
+                plan.replacement_car_info.has_coverage = False
+            plan.new_vehicle_replacement_info = None
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args()
+    corpus = make_corpus(args.docs)
+
+    def legacy(outputs):
+        for output in outputs:
+            legacy_post_process(output)
+
+    def per_document(outputs):
+        for output in outputs:
+            output.post_process_data()
+
+    # Cada repetición parte de documentos recién validados (el post-proceso los
+    # modifica) y solo se cronometra el post-proceso, con el memo del parser
+    # vacío y sin GC (recolectar los modelos recién creados mete mucho ruido).
+    # Las variantes se alternan para que el ruido de la máquina las afecte por igual.
+    variants = {"legacy": legacy, "per document": per_document, "post_process_many": post_process_many}
+    results = dict.fromkeys(variants, float("inf"))
+    for _ in range(args.repeat):
+        for name, fn in variants.items():
+            outputs = [InsuranceExtractionOutput.model_validate(d) for d in corpus]
+            clear_parse_cache()
+            gc.collect()
+            gc.disable()
+            try:
+                start = time.perf_counter()
+                fn(outputs)
+                results[name] = min(results[name], time.perf_counter() - start)
+            finally:
+                gc.enable()
+
+    print(f"{args.docs} documents (post-processing only)")
+    for name, seconds in results.items():
+        print(f"{name:<20} {seconds * 1000:>8.1f} ms  {results['legacy'] / seconds:>5.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Latencia de prefirmado: botocore (una URL a la vez) contra la firma local
+SigV4 en lote, con y sin caché.
+
+Uso:
+    python benchmarks/bench_presign.py [--keys 5] [--rounds 2000]
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("R2_ACCESS_KEY_ID", "AKIDEXAMPLE")
+os.environ.setdefault("R2_SECRET_ACCESS_KEY", "secret")
+os.environ.setdefault("R2_BUCKET_NAME", "insurance-files")
+os.environ.setdefault("R2_ENDPOINT_URL", "https://account.r2.cloudflarestorage.com")
+
+from insurance_models.r2.client import R2Client  # noqa: E402
+
+def _per_url(fn, rounds: int, n_keys: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / (rounds * n_keys) * 1e6
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=5, help="URLs por lote (un JobCreateRequest admite 5)")
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    client = R2Client()
+    keys = [f"jobs/123/file_{i}.pdf" for i in range(args.keys)]
+
+    results = {
+        "botocore, one by one": lambda: [client.generate_presigned_upload_url(k) for k in keys],
+        "local SigV4 batch": lambda: client.generate_presigned_urls(keys, "put_object", use_cache=False),
+        "local SigV4 batch, cached": lambda: client.generate_presigned_urls(keys, "get_object"),
+    }
+    print(f"{'case':<28} {'us/url':>8}")
+    for name, fn in results.items():
+        print(f"{name:<28} {_per_url(fn, args.rounds, len(keys)):>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Costo por llamada de log con `job_id`: un INSERT por mensaje (camino
+anterior) contra `ProcessingLogHandler`, que solo encola y escribe en lotes.
+Ambos escriben en la misma base SQLite (o en `--url`).
+
+Uso:
+    python benchmarks/bench_processing_log.py [--messages 20000]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from insurance_models.database.models import Base, ProcessingLog
+from insurance_models.database.partitioning import PartitionPolicy, maintain_partitions_async
+from insurance_models.utils.logging import DatabaseLogSink, ProcessingLogHandler
+from tests.sqlite_schema import create_tables
+
+async def count_rows(engine) -> int:
+    async with engine.connect() as conn:
+        return (await conn.execute(select(func.count()).select_from(ProcessingLog))).scalar_one()
+
+async def per_message_inserts(engine, messages: int) -> float:
+    """Camino anterior: un INSERT (y una transacción) por mensaje."""
+    start = time.perf_counter()
+    for i in range(messages):
+        async with engine.begin() as conn:
+            await conn.execute(insert(ProcessingLog.__table__).values(
+                job_id=1, service_name="bench", level="INFO", message=f"mensaje {i}",
+            ))
+    return time.perf_counter() - start
+
+def handler_calls(url: str, messages: int, **kwargs):
+    handler = ProcessingLogHandler(
+        "bench", sink=DatabaseLogSink(lambda: create_async_engine(url)), capacity=messages, **kwargs
+    )
+    logger = logging.getLogger("bench-processing-log")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.handlers = [handler]
+    start = time.perf_counter()
+    for i in range(messages):
+        logger.info("mensaje %d", i, extra={"job_id": 1})
+    emit_time = time.perf_counter() - start
+    handler.close(timeout=60)
+    return emit_time, time.perf_counter() - start, handler.stats()
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--url", default=None)
+    args = parser.parse_args()
+    url = args.url or f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'logs.db')}"
+    engine = create_async_engine(url)
+
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all, tables=[ProcessingLog.__table__])
+            await conn.run_sync(create_tables, ProcessingLog)
+            if conn.dialect.name == "postgresql":
+                await maintain_partitions_async(
+                    conn, policies=[PartitionPolicy(table="processing_logs")], apply_retention=False
+                )
+
+    asyncio.run(reset())
+    elapsed = asyncio.run(per_message_inserts(engine, args.messages))
+    print(f"{'INSERT per message':<28} {elapsed / args.messages * 1e6:>8.1f} us/call")
+
+    asyncio.run(reset())
+    emit_time, total, stats = handler_calls(url, args.messages)
+    written = asyncio.run(count_rows(engine))
+    print(f"{'ProcessingLogHandler':<28} {emit_time / args.messages * 1e6:>8.1f} us/call "
+          f"(all {written} rows written after {total * 1000:.0f} ms, dropped {stats['dropped']})")
+    asyncio.run(engine.dispose())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Generador de payloads de extracción realistas (salida del LLM) para los
+benchmarks. Reproducible con una semilla fija.
+"""
+import json
+import random
+from typing import Dict, List
+
+INSURERS = [
+    "HDI Seguros", "hdi seguros s.a.", "BCI Seguros", "Mapfre", "Reale Chile Seguros Generales S.A.",
+    "FID Seguros", "Zurich Chile Seguros Generales S.A.", "Liberty", "SURA", "Renta Nacional",
+]
+PLAN_NAMES = [
+    "Full Cobertura", "Plan Elemental", "Responsabilidad Civil", "Todo Riesgo Plus", "Plan Basic (RC)",
+    "Auto Protegido", "Premium", "Solo RC", "Cobertura Total", "Plan Esencial",
+]
+DEDUCTIBLES = ["UF 0", "Sin deducible", "UF 3", "UF 5", "UF 10", "UF 15", "UF 20", "3", "5", "10", "S/D"]
+MAKES = [("Toyota", "Yaris"), ("Chevrolet", "Sail"), ("Hyundai", "Accent"), ("Kia", "Rio"), ("Suzuki", "Swift")]
+
+def _premium(rng: random.Random) -> str:
+    value = rng.uniform(8, 60)
+    return rng.choice([f"UF {value:.2f}".replace(".", ","), f"{value:.2f}", f"{value:.1f} UF".replace(".", ",")])
+
+def _coverage(rng: random.Random) -> Dict:
+    return {
+        "has_coverage": rng.choice([True, False, None]),
+        "conditions_observations": rng.choice([None, "Aplica solo en talleres de la red", "Con tope de 15 días"]),
+    }
+
+def make_document(rng: random.Random) -> Dict:
+    make, model = rng.choice(MAKES)
+    plans = []
+    for _ in range(rng.randint(2, 8)):
+        plans.append({
+            "insurer_name": rng.choice(INSURERS),
+            "plan_name": rng.choice(PLAN_NAMES),
+            "workshop_info": rng.choice([None, {"workshop_type": "TALLER_MARCA", "conditions_observations": None}]),
+            "replacement_car_info": rng.choice([None, {
+                **_coverage(rng), "daily_copay_original_str": "UF 0,5", "days_limit_str": "15 días",
+            }]),
+            "new_vehicle_replacement_info": rng.choice([None, _coverage(rng)]),
+            "smart_deductible_info": rng.choice([None, _coverage(rng)]),
+            "deductible_premiums": [
+                {
+                    "deductible_original_str": rng.choice(DEDUCTIBLES),
+                    "annual_premium_original_str": _premium(rng),
+                    "rc_coverage_original_str": rng.choice(["1000", "UF 1.000", None]),
+                }
+                for _ in range(rng.randint(1, 8))
+            ],
+        })
+    return {
+        "error": None,
+        "document_type": rng.choice(["cotizacion", "poliza", "comparativo"]),
+        "policy_holder": {"insured_name": "Juan Pérez", "insured_rut": "12.345.678-9"},
+        "vehicle_info": {"make": make, "model": model, "year": rng.randint(2012, 2025)},
+        "policy_analyses": plans,
+    }
+
+def make_corpus(n: int, seed: int = 42) -> List[Dict]:
+    rng = random.Random(seed)
+    return [make_document(rng) for _ in range(n)]
+
+def make_json_corpus(n: int, seed: int = 42) -> List[bytes]:
+    return [json.dumps(doc).encode() for doc in make_corpus(n, seed)]
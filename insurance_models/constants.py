@@ -2,3 +2,13 @@
 
 MAX_FILE_SIZE_BYTES = 10 * 1024 * 1024  # 10 MB
 ALLOWED_FILE_TYPES = [".pdf"]
+
+# Transferencias con R2
+R2_MULTIPART_THRESHOLD_BYTES = 8 * 1024 * 1024  # Sobre este tamaño: multipart / GETs por rangos en paralelo
+R2_MULTIPART_CHUNK_BYTES = 5 * 1024 * 1024  # Mínimo de S3/R2 para cada parte, salvo la última
+R2_STREAM_CHUNK_BYTES = 256 * 1024  # Lectura en streaming del cuerpo de un GET
+SPOOL_MAX_MEMORY_BYTES = 2 * 1024 * 1024  # Sobre este tamaño, los buffers pasan a disco
+
+# Blobs grandes (texto OCR, salida cruda del LLM) en R2
+BLOB_MIN_OFFLOAD_BYTES = 4 * 1024  # Bajo este tamaño se guardan inline: un GET cuesta más que leer la fila
+BLOB_CACHE_MAX_BYTES = 64 * 1024 * 1024  # LRU local de blobs ya descomprimidos
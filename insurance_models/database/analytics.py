@@ -0,0 +1,182 @@
+"""
+Consultas analíticas sobre los resultados sin decodificar el JSONB de cada
+fila: usan las columnas generadas de `JobResult` (prima mínima, vehículo) y
+`LlmResult` (tipo de documento) y sus índices, declarados en `models.py`.
+
+- `cheapest_jobs`, `jobs_by_vehicle`, `vehicle_counts` y
+  `document_type_counts` se resuelven con índices btree que cubren la
+  consulta: en Postgres, index-only scan sin leer la tabla.
+- `jobs_with_insurer` y `cheapest_by_insurer` filtran con `@>` sobre el
+  índice GIN `jsonb_path_ops` de las aseguradoras; son solo para Postgres.
+
+Los resultados con el JSON en R2 no tienen proyecciones y no aparecen.
+
+Para agregar columnas e índices a una base existente (Alembic):
+
+    from insurance_models.database.analytics import add_projections
+
+    def upgrade():
+        add_projections(op)
+"""
+from decimal import Decimal
+from typing import Iterable, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import Numeric, cast, column, distinct, func, literal_column, or_, select, text, true
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from .models import JobResult, LlmResult, json_field
+
+MAX_LIMIT = 1_000
+
+# Índices de las proyecciones (los crea `add_projections` en bases existentes).
+PROJECTION_INDEXES = (
+    "ix_job_results_min_premium",
+    "ix_job_results_vehicle",
+    "ix_job_results_insurer_names",
+    "ix_llm_results_document_type",
+)
+
+class JobPremium(NamedTuple):
+    job_id: int
+    min_annual_premium_uf: Decimal
+
+class VehicleCount(NamedTuple):
+    make: str
+    model: Optional[str]
+    year: Optional[int]
+    jobs: int
+
+class InsurerPremium(NamedTuple):
+    insurer_name: str
+    min_annual_premium_uf: Decimal
+    jobs: int
+
+class DocumentTypeCount(NamedTuple):
+    document_type: Optional[str]
+    results: int
+
+def _check_limit(limit: int) -> None:
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+
+def _require_postgres(session: AsyncSession) -> None:
+    dialect = session.get_bind().dialect.name
+    if dialect != "postgresql":
+        raise ValueError(f"Unsupported dialect '{dialect}' for JSONB containment queries")
+
+# --- Índices btree (cualquier dialecto) ---
+
+async def cheapest_jobs(session: AsyncSession, limit: int = 20,
+                        max_premium_uf: Optional[float] = None) -> List[JobPremium]:
+    """Los jobs con la prima anual mínima más baja (en UF), de menor a mayor."""
+    _check_limit(limit)
+    query = select(JobResult.job_id, JobResult.min_annual_premium_uf).where(
+        JobResult.min_annual_premium_uf.is_not(None))
+    if max_premium_uf is not None:
+        query = query.where(JobResult.min_annual_premium_uf <= max_premium_uf)
+    query = query.order_by(JobResult.min_annual_premium_uf, JobResult.job_id).limit(limit)
+    return [JobPremium(*row) for row in (await session.execute(query)).all()]
+
+async def jobs_by_vehicle(session: AsyncSession, make: str, model: Optional[str] = None,
+                          year: Optional[int] = None, limit: int = 100) -> List[int]:
+    """
+    Ids de los jobs de un vehículo. La marca y el modelo se comparan tal como
+    los dejó el post-procesamiento (sensible a mayúsculas).
+    """
+    _check_limit(limit)
+    conditions = [JobResult.vehicle_make == make]
+    if model is not None:
+        conditions.append(JobResult.vehicle_model == model)
+    if year is not None:
+        conditions.append(JobResult.vehicle_year == year)
+    query = select(JobResult.job_id).where(*conditions).order_by(JobResult.job_id).limit(limit)
+    return list((await session.execute(query)).scalars())
+
+async def vehicle_counts(session: AsyncSession, make: Optional[str] = None) -> List[VehicleCount]:
+    """Jobs por marca, modelo y año (de una marca o de todas), del más frecuente al menos."""
+    jobs = func.count().label("jobs")
+    columns = (JobResult.vehicle_make, JobResult.vehicle_model, JobResult.vehicle_year)
+    query = select(*columns, jobs).group_by(*columns)
+    query = query.where(JobResult.vehicle_make == make if make is not None else JobResult.vehicle_make.is_not(None))
+    query = query.order_by(jobs.desc(), *columns)
+    return [VehicleCount(*row) for row in (await session.execute(query)).all()]
+
+async def document_type_counts(session: AsyncSession) -> List[DocumentTypeCount]:
+    """Resultados del LLM por tipo de documento, del más frecuente al menos."""
+    results = func.count().label("results")
+    query = (
+        select(LlmResult.document_type, results)
+        .group_by(LlmResult.document_type)
+        .order_by(results.desc(), LlmResult.document_type.nulls_last())
+    )
+    return [DocumentTypeCount(*row) for row in (await session.execute(query)).all()]
+
+# --- Aseguradoras (GIN, solo Postgres) ---
+
+def _insurer_filter(insurer_names: Iterable[str]):
+    # Una condición `@>` por nombre: Postgres combina los accesos al GIN (BitmapOr).
+    insurer_names_field = json_field(JobResult.consolidated_data, "insurer_names")
+    return or_(*(insurer_names_field.contains([name]) for name in insurer_names))
+
+async def jobs_with_insurer(session: AsyncSession, insurer_name: str, limit: int = 100) -> List[int]:
+    """Ids de los jobs con algún plan de la aseguradora (nombre ya normalizado)."""
+    _require_postgres(session)
+    _check_limit(limit)
+    query = select(JobResult.job_id).where(_insurer_filter([insurer_name])).order_by(JobResult.job_id).limit(limit)
+    return list((await session.execute(query)).scalars())
+
+async def cheapest_by_insurer(session: AsyncSession,
+                              insurer_names: Optional[Sequence[str]] = None) -> List[InsurerPremium]:
+    """
+    Prima anual mínima (en UF) de cada aseguradora entre todos sus planes, y
+    en cuántos jobs aparece. Con `insurer_names` el índice GIN descarta los
+    jobs sin esas aseguradoras antes de recorrer sus planes; sin él se
+    recorren todos.
+    """
+    _require_postgres(session)
+    plan = func.jsonb_array_elements(json_field(JobResult.consolidated_data, "plans")).table_valued(
+        column("value", JSONB), name="plan")
+    insurer = plan.c.value.op("->>")(literal_column("'insurer_name'"))
+    premium = cast(plan.c.value.op("->>")(literal_column("'min_annual_premium_uf'")), Numeric)
+    min_premium = func.min(premium).label("min_premium")
+    query = (
+        select(insurer.label("insurer_name"), min_premium, func.count(distinct(JobResult.job_id)).label("jobs"))
+        .select_from(JobResult).join(plan, true())
+        .where(insurer.is_not(None), premium.is_not(None))
+        .group_by(insurer)
+        .order_by(min_premium, insurer)
+    )
+    if insurer_names is not None:
+        if not insurer_names:
+            return []
+        query = query.where(_insurer_filter(insurer_names), insurer.in_(insurer_names))
+    return [InsurerPremium(*row) for row in (await session.execute(query)).all()]
+
+# --- Migraciones ---
+
+def add_projections_sql() -> List[str]:
+    """
+    SQL (Postgres) para agregar las columnas generadas y sus índices a tablas
+    ya existentes. `ADD COLUMN ... STORED` reescribe la tabla con un lock
+    exclusivo: en tablas grandes, correrlo en una ventana de mantenimiento.
+    """
+    from sqlalchemy.dialects import postgresql
+
+    dialect = postgresql.dialect()
+    statements = []
+    for table in (JobResult.__table__, LlmResult.__table__):
+        for projected in table.columns:
+            if projected.computed is not None:
+                ddl = str(CreateColumn(projected).compile(dialect=dialect)).strip()
+                statements.append(f'ALTER TABLE "{table.name}" ADD COLUMN IF NOT EXISTS {ddl}')
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name in PROJECTION_INDEXES:
+                statements.append(str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect)))
+    return statements
+
+def add_projections(op) -> None:
+    """Helper para `upgrade()` de Alembic (ver `add_projections_sql`)."""
+    for sql in add_projections_sql():
+        op.execute(text(sql))
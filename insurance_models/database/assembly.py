@@ -0,0 +1,126 @@
+"""
+Ensamblaje incremental de jobs: cada worker del LLM mezcla la extracción de
+su archivo en el estado parcial del job (en Redis) apenas la obtiene, en
+lugar de esperar a que terminen todos los archivos y reconstruir el
+consolidado desde cero.
+
+La mezcla (`schemas.consolidation.merge_file`) es conmutativa e idempotente
+por `job_file_id`, así que da igual el orden en que terminen los archivos o
+si un mensaje se reprocesa. El estado guarda el consolidado ya armado:
+mostrarlo antes de tiempo (`partial`) o terminar el job (`finalize`) es una
+lectura.
+
+Uso en el worker del LLM:
+
+    output = validate_extraction_json(raw)
+    output.post_process_data()
+    await assembler.merge(job_id, job_file.id, output)
+
+Y en el de ensamblaje:
+
+    result = await assembler.finalize(session, job_id, expected_files=len(job.files))
+    await session.commit()
+    await assembler.discard(job_id)
+"""
+import json
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from redis.exceptions import WatchError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..schemas.consolidation import consolidate_job, empty_assembly_state, merge_file
+from ..schemas.llm_schemas import InsuranceExtractionOutput
+from .backfill import ConsolidationTask
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_RETRIES = 100
+
+
+async def assemble_full(session: AsyncSession, job_id: int, consolidate: Callable = consolidate_job,
+                        store=None) -> Dict[str, Any]:
+    """
+    Ensamblaje completo: lee la última `LlmResult` de cada archivo del job,
+    la valida y post-procesa, y la consolida. Es la referencia del
+    incremental y su respaldo si el estado parcial se perdió.
+    """
+    task = ConsolidationTask(consolidate=consolidate, store=store)
+    items = await task.read_chunk(session, job_id, job_id + 1, dry_run=False)
+    if not items:
+        return consolidate([])
+    ((_, result, _, error),) = task.process(items)
+    if error is not None:
+        raise ValueError(f"Could not assemble job {job_id}: {error}")
+    return result
+
+
+class IncrementalAssembler:
+    """
+    Estado parcial de ensamblaje por job en una clave de Redis
+    (`{prefix}:{job_id}`, JSON). Las escrituras concurrentes de varios
+    workers sobre el mismo job se serializan con WATCH/MULTI: si otro worker
+    escribió entre la lectura y la escritura, se reintenta la mezcla.
+    """
+
+    def __init__(self, redis_client, prefix: str = "assembly", ttl: int = DEFAULT_TTL_SECONDS,
+                 max_retries: int = DEFAULT_MAX_RETRIES):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.max_retries = max_retries
+
+    def key(self, job_id: int) -> str:
+        return f"{self.prefix}:{job_id}"
+
+    async def merge(self, job_id: int, job_file_id: int, output: InsuranceExtractionOutput) -> Dict[str, Any]:
+        """
+        Mezcla la extracción ya post-procesada de un archivo y devuelve el
+        consolidado parcial resultante.
+        """
+        key = self.key(job_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for _ in range(self.max_retries):
+                try:
+                    await pipe.watch(key)
+                    raw = await pipe.get(key)
+                    state = merge_file(json.loads(raw) if raw else empty_assembly_state(), job_file_id, output)
+                    pipe.multi()
+                    pipe.set(key, json.dumps(state, ensure_ascii=False, separators=(",", ":")), ex=self.ttl)
+                    await pipe.execute()
+                    return state["result"]
+                except WatchError:
+                    continue
+        raise RuntimeError(f"Too much contention merging job {job_id}")
+
+    async def state(self, job_id: int) -> Optional[Dict[str, Any]]:
+        raw = await self.redis.get(self.key(job_id))
+        return json.loads(raw) if raw else None
+
+    async def partial(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """El consolidado con los archivos mezclados hasta ahora, o None."""
+        state = await self.state(job_id)
+        return state["result"] if state else None
+
+    async def finalize(self, session: AsyncSession, job_id: int, expected_files: Optional[int] = None,
+                       store=None) -> Dict[str, Any]:
+        """
+        Escribe el consolidado en `job_results` (upsert; el commit queda a
+        cargo de quien llama) y lo devuelve. Si no hay estado parcial, o no
+        tiene `expected_files` archivos, ensambla desde la base. El estado
+        parcial solo sabe armar el layout de `consolidate_job`; para otro
+        layout, usar `assemble_full` directamente.
+        """
+        state = await self.state(job_id)
+        if state is not None and (expected_files is None or state["result"]["file_count"] == expected_files):
+            result = state["result"]
+        else:
+            logger.warning("Incomplete assembly state for job %d; rebuilding from llm_results", job_id)
+            result = await assemble_full(session, job_id, consolidate_job, store)
+        await ConsolidationTask(consolidate_job, store=store).write(session, [(job_id, result, [], None)])
+        return result
+
+    async def discard(self, job_id: int) -> None:
+        """Borra el estado parcial (después del commit de `finalize`)."""
+        await self.redis.delete(self.key(job_id))
@@ -0,0 +1,504 @@
+"""
+Reprocesamiento masivo (backfill) de resultados históricos, ej: reconstruir
+`job_results.consolidated_data` cuando cambian las reglas de parseo o
+`post_process_data`.
+
+El motor recorre la tabla en rangos de ids (`chunk_size`), lee cada rango
+en streaming (`session.stream` con `yield_per`), reparte la validación y el
+post-procesamiento en lotes a un pool de procesos y escribe los cambios con
+un upsert por rango. Mientras el pool procesa un rango se lee el siguiente;
+como mucho `max_pending_chunks` rangos están en memoria a la vez.
+
+Al terminar cada rango se guarda un checkpoint, así que un backfill
+interrumpido retoma donde quedó. Con `dry_run=True` no se escribe nada y el
+reporte trae las diferencias contra lo que hay en la base.
+
+Uso:
+
+    from insurance_models.schemas import consolidate_job
+
+    task = ConsolidationTask(consolidate_job)
+    runner = BackfillRunner(task, workers=8, checkpoint=FileCheckpoint("backfill.json"))
+    report = await runner.run()
+    print(report.as_dict())
+
+    # Solo ver qué cambiaría en los primeros 10.000 jobs
+    report = await BackfillRunner(task, dry_run=True).run(end_id=10_000)
+    for diff in report.diffs:
+        print(diff.id, diff.changes[:3])
+"""
+import abc
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, func, null, select, update
+
+from ..schemas.ingestion import validate_many
+from .bulk import _upsert_insert
+from .models import JobFile, JobResult, LlmResult, OcrResult
+
+logger = logging.getLogger(__name__)
+
+# Resultado de procesar un elemento: (id, valor nuevo, cambios, error).
+# `changes` vacío significa que el valor no cambió y no hay que escribirlo.
+Outcome = Tuple[int, Any, List[Tuple[str, Any, Any]], Optional[str]]
+
+
+class BackfillDiff(NamedTuple):
+    id: int
+    # (ruta JSON, antes, después)
+    changes: List[Tuple[str, Any, Any]]
+
+
+def diff_json(before: Any, after: Any, path: str = "$", limit: int = 50) -> List[Tuple[str, Any, Any]]:
+    """Diferencias entre dos documentos JSON como `(ruta, antes, después)`, hasta `limit`."""
+    changes: List[Tuple[str, Any, Any]] = []
+
+    def walk(a, b, p):
+        if len(changes) >= limit:
+            return
+        if isinstance(a, dict) and isinstance(b, dict):
+            for key in list(a) + [k for k in b if k not in a]:
+                walk(a.get(key), b.get(key), f"{p}.{key}")
+        elif isinstance(a, list) and isinstance(b, list) and len(a) == len(b):
+            for i, (x, y) in enumerate(zip(a, b)):
+                walk(x, y, f"{p}[{i}]")
+        elif a != b or type(a) is not type(b):
+            changes.append((p, a, b))
+
+    walk(before, after, path)
+    return changes
+
+def _canonical_sha256(value: Any) -> str:
+    # Misma serialización que `JobResult.set_consolidated`, así coincide con `consolidated_blob_sha256`.
+    return hashlib.sha256(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+# --- Checkpoints ---
+
+class FileCheckpoint:
+    """
+    Checkpoints en un archivo JSON: por tarea, el próximo id a procesar y
+    los contadores acumulados de todas las corridas (el runner suma los
+    guardados al retomar). Se reescribe completo y de forma atómica.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def load(self, task: str) -> Optional[Dict[str, Any]]:
+        return self._read().get(task)
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    def save(self, task: str, next_id: int, stats: Dict[str, int]) -> None:
+        data = self._read()
+        data[task] = {"next_id": next_id, "stats": stats, "updated_at": time.time()}
+        self._write(data)
+
+    def clear(self, task: str) -> None:
+        data = self._read()
+        if data.pop(task, None) is not None:
+            self._write(data)
+
+
+# --- Tareas ---
+
+class BackfillTask(abc.ABC):
+    """
+    Una tarea define qué rango de ids recorrer, cómo leer un rango, la
+    función de CPU que corre en el pool (`process`, debe poder serializarse
+    con pickle: una función de módulo o un `functools.partial` de una) y cómo
+    escribir los resultados.
+    """
+    name = "backfill"
+
+    @abc.abstractmethod
+    async def id_bounds(self, session) -> Tuple[Optional[int], Optional[int]]:
+        ...
+
+    @abc.abstractmethod
+    async def read_chunk(self, session, start: int, end: int, dry_run: bool) -> List[Any]:
+        """Elementos con id en `[start, end)`, listos para `process`."""
+
+    @property
+    @abc.abstractmethod
+    def process(self) -> Callable[[Sequence[Any]], List[Outcome]]:
+        ...
+
+    @abc.abstractmethod
+    async def write(self, session, outcomes: List[Outcome]) -> int:
+        ...
+
+    async def after_commit(self, outcomes: List[Outcome]) -> None:
+        pass
+
+
+def _consolidate_jobs(items, consolidate: Callable) -> List[Outcome]:
+    """Corre en el pool: valida, post-procesa y consolida cada job, y lo compara con el consolidado actual."""
+    outcomes: List[Outcome] = []
+    for job_id, files, before in items:
+        try:
+            outputs = validate_many([payload for _, payload in files], on_error="mark", post_process=True)
+            after = consolidate([(file_id, output) for (file_id, _), output in zip(files, outputs)])
+        except Exception as e:
+            outcomes.append((job_id, None, [], repr(e)))
+            continue
+        if isinstance(before, tuple):
+            # Consolidado en R2 fuera de dry-run: basta comparar el hash.
+            changes = [] if before[1] == _canonical_sha256(after) else [("$", "<r2 blob>", "<changed>")]
+        else:
+            changes = diff_json(before, after)
+        outcomes.append((job_id, after, changes, None))
+    return outcomes
+
+
+class ConsolidationTask(BackfillTask):
+    """
+    Reconstruye `job_results.consolidated_data` de cada job desde la última
+    `LlmResult` de cada uno de sus archivos. `consolidate` recibe los pares
+    `(job_file_id, extracción post-procesada)` y devuelve el JSON a guardar.
+    Es obligatoria: el layout lo decide quien ensambla los jobs en
+    producción. `consolidate_job` arma el de `schemas.ConsolidatedJob`, que
+    es el que leen el ensamblaje incremental y las columnas generadas.
+
+    Los jobs cuyo consolidado no cambia no se escriben. `response_cache`
+    (opcional) se invalida para los jobs escritos: el upsert no pasa por los
+    hooks del ORM.
+    """
+    name = "consolidation"
+
+    def __init__(self, consolidate: Callable, store=None, response_cache=None,
+                 yield_per: int = 500, blob_concurrency: int = 16):
+        self.consolidate = consolidate
+        self.store = store
+        self.response_cache = response_cache
+        self.yield_per = yield_per
+        self.blob_concurrency = blob_concurrency
+
+    @property
+    def process(self):
+        return functools.partial(_consolidate_jobs, consolidate=self.consolidate)
+
+    def _store(self):
+        if self.store is None:
+            from ..r2.blob_store import get_blob_store
+            self.store = get_blob_store()
+        return self.store
+
+    async def id_bounds(self, session):
+        return (await session.execute(select(func.min(JobFile.job_id), func.max(JobFile.job_id)))).one()
+
+    async def read_chunk(self, session, start, end, dry_run):
+        stmt = (
+            select(JobFile.job_id, LlmResult.job_file_id, LlmResult.raw_llm_data,
+                   LlmResult.raw_blob_key, LlmResult.raw_blob_sha256)
+            .join(LlmResult, LlmResult.job_file_id == JobFile.id)
+            .where(JobFile.job_id >= start, JobFile.job_id < end)
+            # Por created_at: si un archivo tiene varias salidas, gana la última.
+            .order_by(JobFile.job_id, LlmResult.job_file_id, LlmResult.created_at)
+            .execution_options(yield_per=self.yield_per)
+        )
+        jobs: Dict[int, Dict[int, Any]] = defaultdict(dict)
+        blobs: List[Tuple[Dict[int, Any], int, str, Optional[str]]] = []
+        async for job_id, file_id, raw, blob_key, blob_sha256 in await session.stream(stmt):
+            jobs[job_id][file_id] = raw
+            if blob_key is not None:
+                blobs.append((jobs[job_id], file_id, blob_key, blob_sha256))
+
+        before: Dict[int, Any] = {}
+        result_stmt = (
+            select(JobResult.job_id, JobResult.consolidated_data,
+                   JobResult.consolidated_blob_key, JobResult.consolidated_blob_sha256)
+            .where(JobResult.job_id >= start, JobResult.job_id < end)
+            .execution_options(yield_per=self.yield_per)
+        )
+        async for job_id, data, blob_key, blob_sha256 in await session.stream(result_stmt):
+            if blob_key is None:
+                before[job_id] = data
+            elif dry_run:
+                blobs.append((before, job_id, blob_key, blob_sha256))
+            else:
+                before[job_id] = (blob_key, blob_sha256)
+
+        # Los blobs en R2 llegan como bytes JSON: el worker los valida sin `json.loads`.
+        if blobs:
+            semaphore = asyncio.Semaphore(self.blob_concurrency)
+
+            async def fetch(target, key, blob_key, blob_sha256):
+                async with semaphore:
+                    data = await self._store().get_async(blob_key, blob_sha256)
+                target[key] = data if target is not before else json.loads(data)
+
+            await asyncio.gather(*(fetch(*blob) for blob in blobs))
+
+        return [(job_id, sorted(files.items()), before.get(job_id)) for job_id, files in sorted(jobs.items())]
+
+    def _rows(self, outcomes: List[Outcome]) -> List[Dict[str, Any]]:
+        rows = []
+        for job_id, after, _, _ in outcomes:
+            result = JobResult(job_id=job_id)
+            result.set_consolidated(after, store=self.store)
+            rows.append({
+                "job_id": job_id,
+                "consolidated_data": result.consolidated_data if result.consolidated_data is not None else null(),
+                "consolidated_blob_key": result.consolidated_blob_key,
+                "consolidated_blob_size": result.consolidated_blob_size,
+                "consolidated_blob_sha256": result.consolidated_blob_sha256,
+            })
+        return rows
+
+    async def write(self, session, outcomes):
+        if not outcomes:
+            return 0
+        # `set_consolidated` puede subir el JSON a R2 (boto3 es bloqueante).
+        rows = await asyncio.to_thread(self._rows, outcomes)
+        stmt = _upsert_insert(session, JobResult).values(rows)
+        columns = ("consolidated_data", "consolidated_blob_key", "consolidated_blob_size", "consolidated_blob_sha256")
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=["job_id"], set_={name: stmt.excluded[name] for name in columns},
+        ))
+        return len(rows)
+
+    async def after_commit(self, outcomes):
+        if self.response_cache is not None:
+            for job_id, *_ in outcomes:
+                await self.response_cache.invalidate_job(job_id)
+
+
+def _hash_texts(items) -> List[Outcome]:
+    """Corre en el pool: SHA-256 de los textos OCR."""
+    outcomes: List[Outcome] = []
+    for ocr_id, created_at, text, blob_sha256 in items:
+        sha = blob_sha256 or hashlib.sha256(text.encode("utf-8")).hexdigest()
+        # La PK de la tabla particionada es (id, created_at).
+        outcomes.append(((ocr_id, created_at), sha, [("$.text_sha256", None, sha)], None))
+    return outcomes
+
+
+class OcrTextHashTask(BackfillTask):
+    """
+    Completa `ocr_results.text_sha256` (la clave de `result_cache` para el
+    LLM) en las filas anteriores a esa columna. En las filas con el texto en
+    R2 el hash es el del blob y no hace falta descargarlo.
+    """
+    name = "ocr_text_sha256"
+
+    def __init__(self, yield_per: int = 1000):
+        self.yield_per = yield_per
+
+    @property
+    def process(self):
+        return _hash_texts
+
+    async def id_bounds(self, session):
+        return (await session.execute(select(func.min(OcrResult.id), func.max(OcrResult.id)))).one()
+
+    async def read_chunk(self, session, start, end, dry_run):
+        stmt = (
+            select(OcrResult.id, OcrResult.created_at, OcrResult.text_content, OcrResult.text_blob_sha256)
+            .where(OcrResult.id >= start, OcrResult.id < end, OcrResult.text_sha256.is_(None),
+                   (OcrResult.text_content.is_not(None)) | (OcrResult.text_blob_sha256.is_not(None)))
+            .execution_options(yield_per=self.yield_per)
+        )
+        return [tuple(row) async for row in await session.stream(stmt)]
+
+    async def write(self, session, outcomes):
+        if not outcomes:
+            return 0
+        table = OcrResult.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"), table.c.created_at == bindparam("b_created_at"))
+            .values(text_sha256=bindparam("b_sha"))
+        )
+        params = [{"b_id": key[0], "b_created_at": key[1], "b_sha": sha} for key, sha, _, _ in outcomes]
+        await session.execute(stmt, params)
+        return len(params)
+
+
+# --- Motor ---
+
+@dataclass
+class BackfillReport:
+    task: str
+    dry_run: bool
+    start_id: Optional[int] = None
+    next_id: Optional[int] = None
+    resumed: bool = False
+    # Contadores de las corridas anteriores (del checkpoint) al retomar.
+    previous_stats: Dict[str, int] = field(default_factory=dict)
+    chunks: int = 0
+    processed: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    written: int = 0
+    failed: Dict[Any, str] = field(default_factory=dict)
+    diffs: List[BackfillDiff] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "chunks": self.chunks, "processed": self.processed, "changed": self.changed,
+            "unchanged": self.unchanged, "written": self.written, "failed": len(self.failed),
+        }
+
+    @property
+    def cumulative_stats(self) -> Dict[str, int]:
+        """`stats` más los de las corridas anteriores: lo que se guarda en el checkpoint."""
+        return {name: value + self.previous_stats.get(name, 0) for name, value in self.stats.items()}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"task": self.task, "dry_run": self.dry_run, "start_id": self.start_id, "next_id": self.next_id,
+                "resumed": self.resumed, **self.stats, "elapsed": round(self.elapsed, 3)}
+
+
+class BackfillRunner:
+    """
+    Ejecuta una `BackfillTask` por rangos de ids.
+
+    Args:
+        task: Qué reprocesar.
+        session_factory: Fábrica de sesiones async; por defecto la compartida.
+        workers: Procesos del pool (por defecto, uno por core; ninguno si
+            hay un solo core); 0 procesa en el proceso actual.
+        chunk_size: Ancho de cada rango de ids; acota la memoria junto con
+            `max_pending_chunks`.
+        batch_size: Elementos por tarea enviada al pool.
+        checkpoint: Dónde guardar el avance (ej: `FileCheckpoint`). En
+            dry-run no se lee ni se escribe.
+        dry_run: No escribe; el reporte trae hasta `max_diffs` diferencias.
+        executor: Pool propio (se usa en lugar de crear uno).
+    """
+
+    def __init__(self, task: BackfillTask, session_factory=None, workers: Optional[int] = None,
+                 chunk_size: int = 1000, batch_size: int = 50, max_pending_chunks: int = 2,
+                 checkpoint: Optional[FileCheckpoint] = None, dry_run: bool = False, max_diffs: int = 100,
+                 executor: Optional[Executor] = None, mp_start_method: str = "spawn"):
+        if chunk_size < 1 or batch_size < 1 or max_pending_chunks < 1:
+            raise ValueError("chunk_size, batch_size and max_pending_chunks must be positive")
+        self.task = task
+        self.session_factory = session_factory
+        if workers is None:
+            # Con un solo core el pool solo agrega el costo de serializar los lotes.
+            workers = os.cpu_count() or 1
+            workers = workers if workers > 1 else 0
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.max_pending_chunks = max_pending_chunks
+        self.checkpoint = checkpoint
+        self.dry_run = dry_run
+        self.max_diffs = max_diffs
+        self.executor = executor
+        self.mp_start_method = mp_start_method
+
+    def _sessions(self):
+        if self.session_factory is None:
+            from .connection import get_session_factory
+            self.session_factory = get_session_factory()
+        return self.session_factory
+
+    async def run(self, start_id: Optional[int] = None, end_id: Optional[int] = None,
+                  resume: bool = True) -> BackfillReport:
+        """
+        Procesa los ids en `[start_id, end_id]` (por defecto, toda la tabla).
+        Con `resume`, empieza desde el checkpoint si está más adelante.
+        """
+        started = time.perf_counter()
+        report = BackfillReport(self.task.name, self.dry_run)
+        async with self._sessions()() as session:
+            low, high = await self.task.id_bounds(session)
+        if low is None:
+            return report
+        low = max(low, start_id) if start_id is not None else low
+        high = min(high, end_id) if end_id is not None else high
+
+        saved = self.checkpoint.load(self.task.name) if self.checkpoint and resume and not self.dry_run else None
+        if saved is not None and saved["next_id"] > low:
+            low, report.resumed = saved["next_id"], True
+            report.previous_stats = dict(saved.get("stats", {}))
+        report.start_id = report.next_id = low
+
+        executor, owned = self.executor, False
+        if executor is None and self.workers > 0:
+            executor = ProcessPoolExecutor(self.workers, mp_context=get_context(self.mp_start_method))
+            owned = True
+        pending = deque()
+        try:
+            for chunk_start in range(low, high + 1, self.chunk_size):
+                chunk_end = min(chunk_start + self.chunk_size, high + 1)
+                async with self._sessions()() as session:
+                    items = await self.task.read_chunk(session, chunk_start, chunk_end, self.dry_run)
+                batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+                pending.append((chunk_end, [self._submit(executor, batch) for batch in batches]))
+                if len(pending) >= self.max_pending_chunks:
+                    await self._finish(*pending.popleft(), report)
+            while pending:
+                await self._finish(*pending.popleft(), report)
+        finally:
+            # Si algo falló, se cancelan los lotes pendientes antes de cerrar el pool.
+            for _, futures in pending:
+                for future in futures:
+                    future.cancel()
+            if owned:
+                executor.shutdown(cancel_futures=True)
+            report.elapsed = time.perf_counter() - started
+        return report
+
+    def _submit(self, executor: Optional[Executor], batch: List[Any]) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        if executor is None:
+            future = loop.create_future()
+            future.set_result(self.task.process(batch))
+            return future
+        return loop.run_in_executor(executor, self.task.process, batch)
+
+    async def _finish(self, chunk_end: int, futures: List[asyncio.Future], report: BackfillReport) -> None:
+        changed: List[Outcome] = []
+        for outcomes in await asyncio.gather(*futures):
+            for outcome in outcomes:
+                item_id, _, changes, error = outcome
+                report.processed += 1
+                if error is not None:
+                    report.failed[item_id] = error
+                elif changes:
+                    changed.append(outcome)
+                    if len(report.diffs) < self.max_diffs:
+                        report.diffs.append(BackfillDiff(item_id, changes))
+                else:
+                    report.unchanged += 1
+        report.changed += len(changed)
+        report.chunks += 1
+
+        if not self.dry_run:
+            async with self._sessions()() as session:
+                report.written += await self.task.write(session, changed)
+                await session.commit()
+            await self.task.after_commit(changed)
+            if self.checkpoint is not None:
+                self.checkpoint.save(self.task.name, chunk_end, report.cumulative_stats)
+        report.next_id = chunk_end
+        logger.info("Backfill %s: ids < %d done (%s)", self.task.name, chunk_end, report.stats)
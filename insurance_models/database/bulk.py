@@ -0,0 +1,188 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..schemas.llm_schemas import InsuranceExtractionOutput
+from .models import (
+    DeductiblePremium, InsurancePlan, Insurer, NewVehicleReplacementCoverage,
+    PolicyHolder, ReplacementCarCoverage, Vehicle, WorkshopCoverage,
+)
+
+def _upsert_insert(session: AsyncSession, table):
+    """`INSERT ... ON CONFLICT` del dialecto de la sesión (Postgres o SQLite)."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise ValueError(f"Unsupported dialect '{dialect}' for bulk upserts")
+    return dialect_insert(table)
+
+
+class InsurerCache:
+    """
+    Caché en memoria nombre -> `Insurer.id`. Las aseguradoras son pocas y casi
+    nunca cambian, así que tras el primer lote todas las resoluciones son
+    locales. Los nombres nuevos se insertan con `ON CONFLICT DO NOTHING`, que es
+    seguro con varios workers escribiendo a la vez.
+
+    Si la transacción que creó una aseguradora se revierte, su id ya no es
+    válido: `write_extractions` lo olvida si falla, y quien haga rollback por
+    otra razón debe llamar a `clear()`.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    async def resolve(self, session: AsyncSession, names: Iterable[str]) -> Tuple[Dict[str, int], List[str]]:
+        """
+        Devuelve `(ids por nombre, nombres creados en esta llamada)` para los
+        nombres dados, creando los que no existan.
+        """
+        names = {name for name in names if name}
+        missing = [name for name in names if name not in self._ids]
+        created: List[str] = []
+        if missing:
+            known = await self._select(session, missing)
+            new_names = [name for name in missing if name not in known]
+            if new_names:
+                stmt = _upsert_insert(session, Insurer).values([{"name": name} for name in new_names])
+                await session.execute(stmt.on_conflict_do_nothing(index_elements=["name"]))
+                inserted = await self._select(session, new_names)
+                known.update(inserted)
+                created = list(inserted)
+            with self._lock:
+                self._ids.update(known)
+        return {name: self._ids[name] for name in names}, created
+
+    async def _select(self, session: AsyncSession, names: Sequence[str]) -> Dict[str, int]:
+        rows = await session.execute(select(Insurer.name, Insurer.id).where(Insurer.name.in_(names)))
+        return {name: insurer_id for name, insurer_id in rows}
+
+    def forget(self, names: Iterable[str]) -> None:
+        with self._lock:
+            for name in names:
+                self._ids.pop(name, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids.clear()
+
+
+INSURER_CACHE = InsurerCache()
+
+async def _insert_rows(session: AsyncSession, model, rows: List[Dict]) -> None:
+    # INSERT de Core sobre la tabla: el bulk insert del ORM parte el lote cada vez
+    # que cambia el conjunto de columnas en None, y termina fila por fila.
+    if rows:
+        await session.execute(insert(model.__table__), rows)
+
+async def write_extractions(
+    session: AsyncSession,
+    extractions: Iterable[Tuple[int, InsuranceExtractionOutput]],
+    insurer_cache: Optional[InsurerCache] = INSURER_CACHE,
+) -> Dict[str, int]:
+    """
+    Vuelca extracciones ya post-procesadas (`post_process_data` o
+    `post_process_many`) a las tablas normalizadas: `policy_holders`,
+    `vehicles`, `insurance_plans`, `deductible_premiums` y las coberturas.
+
+    En lugar de un INSERT por objeto y un flush por nivel (ORM), hace un
+    INSERT multi-fila por tabla para todo el lote. Los ids de los planes se
+    obtienen con `INSERT ... RETURNING` en el orden de los parámetros, y los
+    de las aseguradoras desde `insurer_cache`.
+
+    Args:
+        session: Sesión async; el commit queda a cargo de quien llama.
+        extractions: Pares `(job_id, extracción)`. Las extracciones con
+            `error` se ignoran.
+        insurer_cache: Caché de aseguradoras; None la desactiva (una consulta por lote).
+
+    Returns:
+        Filas insertadas por tabla.
+    """
+    extractions = [(job_id, output) for job_id, output in extractions if not output.error]
+    cache = insurer_cache if insurer_cache is not None else InsurerCache()
+
+    holders, vehicles, plan_rows, plans = [], [], [], []
+    for job_id, output in extractions:
+        if output.policy_holder:
+            holders.append({"job_id": job_id, "name": output.policy_holder.insured_name, "rut": output.policy_holder.insured_rut})
+        if output.vehicle_info:
+            vehicle = output.vehicle_info
+            vehicles.append({"job_id": job_id, "make": vehicle.make, "model": vehicle.model, "year": vehicle.year})
+        for plan in output.policy_analyses:
+            plans.append(plan)
+            plan_rows.append({"job_id": job_id, "insurer_name": plan.insurer_name, "plan_name": plan.plan_name})
+
+    insurer_ids, created = await cache.resolve(session, (row["insurer_name"] for row in plan_rows))
+    try:
+        await _insert_rows(session, PolicyHolder, holders)
+        await _insert_rows(session, Vehicle, vehicles)
+
+        plan_ids: List[int] = []
+        if plan_rows:
+            for row in plan_rows:
+                row["insurer_id"] = insurer_ids.get(row.pop("insurer_name"))
+            table = InsurancePlan.__table__
+            stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+            plan_ids = list((await session.execute(stmt, plan_rows)).scalars())
+
+        premiums, workshops, replacement_cars, new_vehicles = [], [], [], []
+        for plan_id, plan in zip(plan_ids, plans):
+            for dp in plan.deductible_premiums:
+                premiums.append({
+                    "insurance_plan_id": plan_id,
+                    "deductible_uf": dp.deductible_original_str,
+                    "annual_premium_uf": dp.annual_premium_original_str,
+                    "rc_coverage_uf": dp.rc_coverage_original_str,
+                    "parsed_deductible": dp.deductible_uf,
+                    "parsed_premium": dp.annual_premium_uf,
+                })
+            if plan.workshop_info:
+                workshops.append({
+                    "insurance_plan_id": plan_id,
+                    "workshop_type": plan.workshop_info.workshop_type,
+                    "conditions": plan.workshop_info.conditions_observations,
+                })
+            if plan.replacement_car_info:
+                info = plan.replacement_car_info
+                replacement_cars.append({
+                    "insurance_plan_id": plan_id,
+                    "has_coverage": info.has_coverage,
+                    "days_limit": info.days_limit_str,
+                    "copay_details": info.daily_copay_original_str,
+                    "conditions": info.conditions_observations,
+                })
+            if plan.new_vehicle_replacement_info:
+                info = plan.new_vehicle_replacement_info
+                new_vehicles.append({
+                    "insurance_plan_id": plan_id,
+                    "has_coverage": info.has_coverage,
+                    "conditions": info.conditions_observations,
+                })
+
+        await _insert_rows(session, DeductiblePremium, premiums)
+        await _insert_rows(session, WorkshopCoverage, workshops)
+        await _insert_rows(session, ReplacementCarCoverage, replacement_cars)
+        await _insert_rows(session, NewVehicleReplacementCoverage, new_vehicles)
+    except Exception:
+        cache.forget(created)
+        raise
+
+    return {
+        "policy_holders": len(holders),
+        "vehicles": len(vehicles),
+        "insurance_plans": len(plan_ids),
+        "deductible_premiums": len(premiums),
+        "workshop_coverages": len(workshops),
+        "replacement_car_coverages": len(replacement_cars),
+        "new_vehicle_replacement_coverages": len(new_vehicles),
+    }
@@ -1,9 +1,9 @@
 import os
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
 
-load_dotenv()
+from ..utils.lazy import LazyProvider, load_env
+from .pool import PoolMetrics, PoolSettings
 
 def get_async_database_url(database_url: str) -> str:
     """
@@ -31,19 +31,86 @@ def get_async_database_url(database_url: str) -> str:
     
     return database_url
 
-DATABASE_URL = get_async_database_url(os.getenv("DATABASE_URL", ""))
+def get_database_url() -> str:
+    """Lee DATABASE_URL del entorno (cargando .env si hace falta) en formato asyncpg."""
+    load_env()
+    return get_async_database_url(os.getenv("DATABASE_URL", ""))
 
-engine = create_async_engine(DATABASE_URL, echo=False, future=True)
+# Configuración explícita del pool; si es None se lee de DB_POOL_* al crear el engine.
+_pool_settings: PoolSettings | None = None
 
-AsyncSessionFactory = sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False
-)
+def configure_pool(settings: PoolSettings) -> None:
+    """
+    Fija la configuración del pool antes del primer uso del engine, ej:
+    `configure_pool(PoolSettings.for_service("worker"))` al arrancar un worker.
+    """
+    global _pool_settings
+    if _engine_provider.is_initialized:
+        raise RuntimeError("The engine is already initialized; call reset_engine() first")
+    _pool_settings = settings
+
+def get_pool_settings() -> PoolSettings:
+    load_env()
+    return _pool_settings or PoolSettings.from_env()
+
+def _build_engine() -> AsyncEngine:
+    return create_async_engine(
+        get_database_url(),
+        echo=False,
+        future=True,
+        **get_pool_settings().engine_kwargs()
+    )
+
+def _build_session_factory() -> sessionmaker:
+    engine = get_engine()
+    factory = sessionmaker(
+        engine,
+        class_=AsyncSession,
+        expire_on_commit=False
+    )
+    # Expone las métricas del pool junto a la fábrica: AsyncSessionFactory.pool_metrics
+    factory.pool_metrics = engine.sync_engine.pool.metrics
+    return factory
+
+_engine_provider = LazyProvider(_build_engine, name="engine")
+_session_factory_provider = LazyProvider(_build_session_factory, name="AsyncSessionFactory")
+
+def get_engine() -> AsyncEngine:
+    """Devuelve el engine compartido, creándolo en el primer uso."""
+    return _engine_provider.get()
+
+def get_session_factory() -> sessionmaker:
+    """Devuelve la fábrica de sesiones compartida, creándola en el primer uso."""
+    return _session_factory_provider.get()
+
+def get_pool_metrics() -> PoolMetrics:
+    """Métricas del pool del engine compartido (latencia, espera, conexiones en uso)."""
+    return get_engine().sync_engine.pool.metrics
+
+async def reset_engine() -> None:
+    """
+    Cierra el pool del engine actual y olvida engine y fábrica de sesiones.
+    La próxima llamada a `get_engine()` vuelve a leer la configuración.
+    """
+    _session_factory_provider.reset()
+    engine = _engine_provider.reset()
+    if engine is not None:
+        await engine.dispose()
+
+def __getattr__(name: str):
+    # Compatibilidad con `from .connection import engine, AsyncSessionFactory`:
+    # los atributos se resuelven de forma perezosa en lugar de al importar.
+    if name == "engine":
+        return get_engine()
+    if name == "AsyncSessionFactory":
+        return get_session_factory()
+    if name == "DATABASE_URL":
+        return get_database_url()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 async def get_db_session() -> AsyncSession:
     """Dependency to get a DB session."""
-    async with AsyncSessionFactory() as session:
+    async with get_session_factory()() as session:
         yield session
 
 async def init_db():
@@ -51,6 +118,10 @@ async def init_db():
     # This is generally handled by Alembic migrations in a real application,
     # but can be useful for testing or simple setups.
     from .models import Base
-    async with engine.begin() as conn:
+    from .partitioning import maintain_partitions_async
+    async with get_engine().begin() as conn:
         # await conn.run_sync(Base.metadata.drop_all) # Use with caution
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(Base.metadata.create_all)
+        # Las tablas particionadas no aceptan filas hasta tener particiones.
+        if conn.dialect.name == "postgresql":
+            await maintain_partitions_async(conn, apply_retention=False)
\ No newline at end of file
@@ -1,14 +1,88 @@
 from sqlalchemy import (
     Column, String, Integer, DateTime, Boolean, Text,
-    DECIMAL, Enum, ForeignKey, BigInteger
+    DECIMAL, Enum, ForeignKey, BigInteger, Index, Computed, UniqueConstraint, and_, func, literal_column, select
 )
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.orm import relationship, declarative_base, synonym
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 from datetime import datetime
 import enum
+import hashlib
+import json
 
 Base = declarative_base()
 
+# Tablas de crecimiento continuo (logs y resultados crudos) particionadas por mes
+# en Postgres. La clave de partición debe ser parte de la PK, por eso su PK es
+# (id, created_at). Las particiones las administra `database.partitioning`.
+PARTITION_BY_CREATED_AT = {"postgresql_partition_by": "RANGE (created_at)"}
+
+# Blobs grandes (texto OCR, JSON crudo y consolidado): con BLOB_STORAGE_MODE=r2
+# el contenido va comprimido a R2 y la fila solo guarda clave, tamaño y hash.
+# `r2.blob_store` se importa al usarlo: trae boto3, que es caro de importar.
+
+# Proyecciones de los JSONB para analítica: columnas generadas (STORED) que
+# Postgres recalcula en cada escritura, indexables y legibles sin decodificar
+# el JSON. Las expresiones (`->`, `->>`, CAST) valen igual en Postgres y en
+# SQLite. Si el JSON está en R2 la columna JSONB es NULL y la proyección también.
+
+def _projection(expression: str) -> Computed:
+    return Computed(expression, persisted=True)
+
+def json_field(column, key: str):
+    """
+    `column -> 'key'` con el operador explícito (no el subíndice `column['key']`
+    de Postgres 14): un índice de expresión solo sirve si la consulta usa la
+    misma expresión.
+    """
+    return column.op("->", return_type=JSONB)(literal_column(f"'{key}'"))
+
+class utc_now(FunctionElement):
+    """
+    Hora actual en UTC sin zona, como `datetime.utcnow` (default de servidor
+    para filas insertadas fuera del ORM). En Postgres `now()` sigue la zona de
+    la sesión; en SQLite CURRENT_TIMESTAMP ya es UTC.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+@compiles(utc_now)
+def _utc_now_default(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+@compiles(utc_now, "postgresql")
+def _utc_now_postgresql(element, compiler, **kw):
+    return "timezone('utc', now())"
+
+def _blob_store(store=None):
+    if store is not None:
+        return store
+    from ..r2.blob_store import get_blob_store
+    return get_blob_store()
+
+def _offload(data: bytes, kind: str, store=None):
+    """Sube `data` a R2 si corresponde; devuelve su `BlobRef` o None si va inline. Bloqueante."""
+    from ..r2.blob_store import should_offload
+    if not should_offload(len(data)):
+        return None
+    return _blob_store(store).put(data, kind)
+
+async def _offload_async(data: bytes, kind: str, store=None):
+    """Como `_offload`, con la compresión y la subida fuera del event loop."""
+    from ..r2.blob_store import should_offload
+    if not should_offload(len(data)):
+        return None
+    return await _blob_store(store).put_async(data, kind)
+
+def _json_bytes(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _offloaded_error(what: str, loader: str) -> ValueError:
+    # Los accesos síncronos no descargan de R2: bloquearían el event loop.
+    return ValueError(f"{what} is stored in R2; use 'await {loader}()'")
+
 # --- Enums ---
 
 class JobStatus(enum.Enum):
@@ -57,9 +131,17 @@ class Job(Base):
     status = Column(Enum(JobStatus), default=JobStatus.PENDING_UPLOAD, index=True)
     representative_policy_holder_name = Column(String(500), comment="Nombre representativo para mostrar en UI")
     representative_vehicle_description = Column(String(200), comment="Descripción del vehículo para mostrar en UI")
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    # NOT NULL: es la clave del cursor del dashboard (ver `queries.require_job_created_at`).
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, server_default=utc_now(), index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Índices del dashboard: el listado por usuario se pagina por (created_at, id)
+    # descendente (keyset) y el filtro por estado va siempre acotado a un usuario.
+    __table_args__ = (
+        Index("ix_jobs_user_created_id", user_id, created_at.desc(), id.desc()),
+        Index("ix_jobs_user_status", user_id, status),
+    )
+
     user = relationship("User", back_populates="jobs")
     files = relationship("JobFile", back_populates="job", cascade="all, delete-orphan")
     results = relationship("JobResult", back_populates="job", cascade="all, delete-orphan", uselist=False)
@@ -76,13 +158,21 @@ class JobFile(Base):
     job_id = Column(BigInteger, ForeignKey("jobs.id"), nullable=False, index=True)
     filename = Column(String(500), nullable=False)
     r2_object_key = Column(String(1000), nullable=False)
+    # SHA-256 del PDF: clave de `result_cache` para reusar OCR/LLM de una copia ya procesada.
+    content_sha256 = Column(String(64), index=True)
     status = Column(Enum(JobStatus), default=JobStatus.PENDING_UPLOAD, index=True)
 
     job = relationship("Job", back_populates="files")
-    ocr_results = relationship("OcrResult", back_populates="file", cascade="all, delete-orphan", uselist=False)
-    
+    # Las tablas de resultados están particionadas y no pueden exigir UNIQUE(job_file_id):
+    # un archivo reprocesado acumula filas. `*_history` tiene todas (y es la que se
+    # escribe); `latest_ocr_result` y `latest_llm_result` son la última, de solo
+    # lectura, y `ocr_results` / `llm_result` sus nombres de siempre (ver abajo).
+    ocr_history = relationship("OcrResult", back_populates="file", cascade="all, delete-orphan",
+                               order_by="OcrResult.created_at")
+
     # --- CAMBIO CLAVE: Relación con la nueva tabla LlmResult ---
-    llm_result = relationship("LlmResult", back_populates="file", cascade="all, delete-orphan", uselist=False)
+    llm_history = relationship("LlmResult", back_populates="file", cascade="all, delete-orphan",
+                               order_by="LlmResult.created_at")
 
 class Insurer(Base):
     __tablename__ = "insurers"
@@ -95,21 +185,135 @@ class Insurer(Base):
 class LlmResult(Base):
     __tablename__ = "llm_results"
     id = Column(BigInteger, primary_key=True, autoincrement=True)
-    job_file_id = Column(BigInteger, ForeignKey("job_files.id"), nullable=False, unique=True, index=True)
-    raw_llm_data = Column(JSONB, nullable=False, comment="La salida JSON cruda del modelo LLM, sin procesar.")
-    created_at = Column(DateTime, default=datetime.utcnow)
-
-    file = relationship("JobFile", back_populates="llm_result")
+    # Sin UNIQUE propio: en una tabla particionada solo se puede exigir junto a created_at.
+    job_file_id = Column(BigInteger, ForeignKey("job_files.id"), nullable=False)
+    raw_llm_data = Column(JSONB, comment="La salida JSON cruda del modelo LLM, sin procesar. None si está en R2.")
+    raw_blob_key = Column(String(255))
+    raw_blob_size = Column(BigInteger)
+    raw_blob_sha256 = Column(String(64))
+    # Clave de `result_cache`: mismo texto OCR + mismo prompt + mismo modelo -> misma salida.
+    text_sha256 = Column(String(64))
+    prompt_version = Column(String(50))
+    model_version = Column(String(100))
+    created_at = Column(DateTime, default=datetime.utcnow, primary_key=True)
+    document_type = Column(String, _projection("raw_llm_data ->> 'document_type'"))
+
+    __table_args__ = (
+        Index("ix_llm_results_cache_key", text_sha256, prompt_version, model_version),
+        Index("ix_llm_results_document_type", document_type),
+        UniqueConstraint(job_file_id, created_at, name="uq_llm_results_job_file_created"),
+        PARTITION_BY_CREATED_AT,
+    )
+
+    file = relationship("JobFile", back_populates="llm_history")
+
+    @property
+    def raw_data(self):
+        """La salida cruda inline. Si está en R2 lanza ValueError: usar `load_raw_data`."""
+        if self.raw_blob_key is None:
+            return self.raw_llm_data
+        raise _offloaded_error("Raw LLM data", "load_raw_data")
+
+    async def load_raw_data(self, store=None):
+        """La salida cruda, esté inline o en R2, sin bloquear el event loop."""
+        if self.raw_blob_key is None:
+            return self.raw_llm_data
+        data = await _blob_store(store).get_async(self.raw_blob_key, self.raw_blob_sha256)
+        return json.loads(data)
+
+    async def store_raw_data(self, value, store=None) -> None:
+        """Guarda `value` inline o en R2 según BLOB_STORAGE_MODE y BLOB_MIN_OFFLOAD_BYTES."""
+        self._apply_raw_data(value, await _offload_async(_json_bytes(value), "llm", store))
+
+    def set_raw_data(self, value, store=None) -> None:
+        """Como `store_raw_data`, bloqueante: para scripts e hilos, no para el event loop."""
+        self._apply_raw_data(value, _offload(_json_bytes(value), "llm", store))
+
+    def _apply_raw_data(self, value, ref) -> None:
+        self.raw_llm_data = None if ref else value
+        self.raw_blob_key, self.raw_blob_size, self.raw_blob_sha256 = ref or (None, None, None)
 
 
 class OcrResult(Base):
     __tablename__ = "ocr_results"
     id = Column(BigInteger, primary_key=True, autoincrement=True)
-    job_file_id = Column(BigInteger, ForeignKey("job_files.id"), nullable=False, unique=True)
-    text_content = Column(Text, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-
-    file = relationship("JobFile", back_populates="ocr_results")
+    # Sin UNIQUE propio: en una tabla particionada solo se puede exigir junto a created_at.
+    job_file_id = Column(BigInteger, ForeignKey("job_files.id"), nullable=False)
+    text_content = Column(Text, comment="None si el texto está en R2 (text_blob_key).")
+    text_blob_key = Column(String(255))
+    text_blob_size = Column(BigInteger)
+    text_blob_sha256 = Column(String(64))
+    # Clave de `result_cache` (hash del PDF + versión del OCR) y hash del texto, que es la del LLM.
+    content_sha256 = Column(String(64))
+    ocr_version = Column(String(50))
+    text_sha256 = Column(String(64))
+    created_at = Column(DateTime, default=datetime.utcnow, primary_key=True)
+
+    __table_args__ = (
+        Index("ix_ocr_results_cache_key", content_sha256, ocr_version),
+        UniqueConstraint(job_file_id, created_at, name="uq_ocr_results_job_file_created"),
+        PARTITION_BY_CREATED_AT,
+    )
+
+    file = relationship("JobFile", back_populates="ocr_history")
+
+    @property
+    def text(self):
+        """El texto OCR inline. Si está en R2 lanza ValueError: usar `load_text`."""
+        if self.text_blob_key is None:
+            return self.text_content
+        raise _offloaded_error("OCR text", "load_text")
+
+    async def load_text(self, store=None):
+        if self.text_blob_key is None:
+            return self.text_content
+        data = await _blob_store(store).get_async(self.text_blob_key, self.text_blob_sha256)
+        return data.decode("utf-8")
+
+    async def store_text(self, text: str, store=None) -> None:
+        data = text.encode("utf-8")
+        self._apply_text(text, data, await _offload_async(data, "ocr", store))
+
+    def set_text(self, text: str, store=None) -> None:
+        """Como `store_text`, bloqueante: para scripts e hilos, no para el event loop."""
+        data = text.encode("utf-8")
+        self._apply_text(text, data, _offload(data, "ocr", store))
+
+    def _apply_text(self, text: str, data: bytes, ref) -> None:
+        self.text_content = None if ref else text
+        self.text_sha256 = ref.sha256 if ref else hashlib.sha256(data).hexdigest()
+        self.text_blob_key, self.text_blob_size, self.text_blob_sha256 = ref or (None, None, None)
+
+def _latest_result(model):
+    """
+    Relación de solo lectura con el resultado más reciente de un archivo. El
+    UNIQUE (job_file_id, created_at) garantiza que haya a lo sumo uno.
+    """
+    newer = model.__table__.alias()
+    latest = select(func.max(newer.c.created_at)).where(newer.c.job_file_id == model.job_file_id).scalar_subquery()
+    return relationship(
+        model, primaryjoin=and_(model.job_file_id == JobFile.id, model.created_at == latest),
+        viewonly=True, uselist=False,
+    )
+
+def _latest_synonym(latest: str, history: str):
+    """
+    Nombre compatible con la relación 1:1 de la versión 1.x: se lee como
+    `latest`; asignar agrega el resultado a `history` (no reemplaza ni borra
+    los anteriores) y lo deja como el último.
+    """
+    def set_latest(file, result):
+        if result is None:
+            raise ValueError(f"Cannot unset {latest}: delete the row from {history} instead")
+        getattr(file, history).append(result)
+        set_committed_value(file, latest, result)
+
+    return synonym(latest, descriptor=property(lambda file: getattr(file, latest), set_latest))
+
+JobFile.latest_ocr_result = _latest_result(OcrResult)
+JobFile.latest_llm_result = _latest_result(LlmResult)
+JobFile.ocr_results = _latest_synonym("latest_ocr_result", "ocr_history")
+JobFile.llm_result = _latest_synonym("latest_llm_result", "llm_history")
 
 # --- Las siguientes tablas ahora son secundarias al flujo principal ---
 # --- Se mantienen por si se quieren usar para análisis posteriores o features adicionales ---
@@ -205,10 +409,54 @@ class JobResult(Base):
     id = Column(BigInteger, primary_key=True, autoincrement=True)
     job_id = Column(BigInteger, ForeignKey("jobs.id"), nullable=False, unique=True)
     consolidated_data = Column(JSONB)
+    consolidated_blob_key = Column(String(255))
+    consolidated_blob_size = Column(BigInteger)
+    consolidated_blob_sha256 = Column(String(64))
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    min_annual_premium_uf = Column(
+        DECIMAL, _projection("CAST(consolidated_data ->> 'min_annual_premium_uf' AS NUMERIC)"))
+    vehicle_make = Column(String, _projection("consolidated_data -> 'vehicle_info' ->> 'make'"))
+    vehicle_model = Column(String, _projection("consolidated_data -> 'vehicle_info' ->> 'model'"))
+    vehicle_year = Column(Integer, _projection("CAST(consolidated_data -> 'vehicle_info' ->> 'year' AS INTEGER)"))
+
+    # Los índices btree incluyen job_id para que las consultas de `analytics`
+    # salgan del índice sin leer la fila (index-only scan). Las aseguradoras son
+    # una lista: GIN jsonb_path_ops sobre la expresión, para filtrar con `@>`.
+    __table_args__ = (
+        Index("ix_job_results_min_premium", min_annual_premium_uf, job_id),
+        Index("ix_job_results_vehicle", vehicle_make, vehicle_model, vehicle_year, job_id),
+        Index(
+            "ix_job_results_insurer_names", json_field(consolidated_data, "insurer_names").label("insurer_names"),
+            postgresql_using="gin", postgresql_ops={"insurer_names": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
     job = relationship("Job", back_populates="results")
 
+    @property
+    def consolidated(self):
+        if self.consolidated_blob_key is None:
+            return self.consolidated_data
+        raise _offloaded_error("Consolidated result", "load_consolidated")
+
+    async def load_consolidated(self, store=None):
+        if self.consolidated_blob_key is None:
+            return self.consolidated_data
+        data = await _blob_store(store).get_async(self.consolidated_blob_key, self.consolidated_blob_sha256)
+        return json.loads(data)
+
+    async def store_consolidated(self, value, store=None) -> None:
+        self._apply_consolidated(value, await _offload_async(_json_bytes(value), "result", store))
+
+    def set_consolidated(self, value, store=None) -> None:
+        """Como `store_consolidated`, bloqueante: para scripts e hilos, no para el event loop."""
+        self._apply_consolidated(value, _offload(_json_bytes(value), "result", store))
+
+    def _apply_consolidated(self, value, ref) -> None:
+        self.consolidated_data = None if ref else value
+        self.consolidated_blob_key, self.consolidated_blob_size, self.consolidated_blob_sha256 = ref or (None, None, None)
+
 class ProcessingLog(Base):
     __tablename__ = "processing_logs"
     id = Column(BigInteger, primary_key=True, autoincrement=True)
@@ -216,6 +464,8 @@ class ProcessingLog(Base):
     service_name = Column(String(100), index=True)
     message = Column(Text)
     level = Column(Enum(LogLevel), default=LogLevel.INFO)
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, primary_key=True)
+
+    __table_args__ = PARTITION_BY_CREATED_AT
 
     job = relationship("Job", back_populates="logs")
\ No newline at end of file
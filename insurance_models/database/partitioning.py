@@ -0,0 +1,297 @@
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import List, Literal, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+from sqlalchemy import Table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+logger = logging.getLogger(__name__)
+
+# Tablas declaradas con `PARTITION_BY_CREATED_AT` en `models.py`.
+PARTITIONED_TABLES = ("processing_logs", "ocr_results", "llm_results")
+
+ARCHIVE_SCHEMA = "archive"
+
+RetentionAction = Literal["drop", "detach"]
+
+class PartitionPolicy(BaseModel):
+    """
+    Política de particiones mensuales de una tabla.
+
+    - `premake`: meses futuros que deben existir siempre (además del actual).
+    - `retention_months`: meses completos que se conservan; None conserva todo.
+    - `retention_action`: "drop" borra la partición vencida; "detach" la separa
+      de la tabla y la mueve al schema `archive`, sin copiar datos, para
+      exportarla o borrarla después.
+    """
+    table: str
+    premake: int = Field(default=3, ge=1)
+    retention_months: Optional[int] = Field(default=None, ge=1)
+    retention_action: RetentionAction = "drop"
+
+DEFAULT_POLICIES: Tuple[PartitionPolicy, ...] = (
+    PartitionPolicy(table="processing_logs", retention_months=3, retention_action="drop"),
+    PartitionPolicy(table="ocr_results", retention_months=12, retention_action="detach"),
+    PartitionPolicy(table="llm_results", retention_months=12, retention_action="detach"),
+)
+
+# --- Nombres y rangos ---
+
+_PARTITION_RE = re.compile(r"^(?P<table>.+)_p(?P<year>\d{4})(?P<month>\d{2})$")
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month.year:04d}{month.month:02d}"
+
+def parse_partition_name(name: str) -> Optional[Tuple[str, date]]:
+    """Devuelve `(tabla, mes)` para un nombre como `processing_logs_p202405`."""
+    match = _PARTITION_RE.match(name)
+    if not match:
+        return None
+    return match["table"], date(int(match["year"]), int(match["month"]), 1)
+
+def create_partition_sql(table: str, month: date) -> str:
+    return (
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(table, month)}" PARTITION OF "{table}" '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+def create_default_partition_sql(table: str) -> str:
+    # Recibe las filas fuera de todo rango (ej: created_at muy antiguo en un backfill)
+    # en lugar de que el INSERT falle.
+    return f'CREATE TABLE IF NOT EXISTS "{table}_default" PARTITION OF "{table}" DEFAULT'
+
+def planned_months(policy: PartitionPolicy, today: date) -> List[date]:
+    """Meses que deben existir: el actual y los `premake` siguientes."""
+    current = month_start(today)
+    return [add_months(current, i) for i in range(policy.premake + 1)]
+
+def expired_partitions(policy: PartitionPolicy, existing: Sequence[str], today: date) -> List[str]:
+    """Particiones cuyo mes completo quedó fuera de la retención."""
+    if policy.retention_months is None:
+        return []
+    cutoff = add_months(month_start(today), -policy.retention_months)
+    expired = []
+    for name in existing:
+        parsed = parse_partition_name(name)
+        if parsed and parsed[0] == policy.table and parsed[1] < cutoff:
+            expired.append(name)
+    return sorted(expired)
+
+# --- Mantenimiento ---
+
+@dataclass
+class MaintenanceReport:
+    created: List[str] = field(default_factory=list)
+    dropped: List[str] = field(default_factory=list)
+    detached: List[str] = field(default_factory=list)
+    statements: List[str] = field(default_factory=list)
+
+def table_columns(conn: Connection, table: str) -> List[str]:
+    """Columnas no generadas de una tabla según `information_schema`, en orden."""
+    rows = conn.execute(text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = :table AND is_generated = 'NEVER' "
+        "ORDER BY ordinal_position"
+    ), {"table": table})
+    return [row[0] for row in rows]
+
+def move_out_of_default_sql(conn: Connection, table: str, month: date) -> List[str]:
+    """
+    SQL para sacar de `{table}_default` las filas del mes antes de crear su
+    partición: Postgres no la crea si la DEFAULT tiene filas de ese rango.
+    Las filas pasan por una tabla temporal y vuelven a entrar por la tabla
+    padre, ya con la partición creada. Sin filas en el rango, no hay SQL.
+    """
+    default = f"{table}_default"
+    in_month = f"created_at >= '{month.isoformat()}' AND created_at < '{add_months(month, 1).isoformat()}'"
+    if not conn.execute(text(f'SELECT EXISTS (SELECT 1 FROM "{default}" WHERE {in_month})')).scalar():
+        return []
+    moved = f"{partition_name(table, month)}_moved"
+    columns = ", ".join(f'"{name}"' for name in table_columns(conn, table))
+    return [
+        f'CREATE TEMPORARY TABLE "{moved}" ON COMMIT DROP AS SELECT {columns} FROM "{default}" WHERE {in_month}',
+        f'DELETE FROM "{default}" WHERE {in_month}',
+        create_partition_sql(table, month),
+        f'INSERT INTO "{table}" ({columns}) SELECT {columns} FROM "{moved}"',
+    ]
+
+def list_partitions(conn: Connection, table: str) -> List[str]:
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"
+    ), {"table": table})
+    return [row[0] for row in rows]
+
+def maintain_partitions(
+    conn: Connection,
+    policies: Sequence[PartitionPolicy] = DEFAULT_POLICIES,
+    today: Optional[date] = None,
+    apply_retention: bool = True,
+    dry_run: bool = False,
+) -> MaintenanceReport:
+    """
+    Crea las particiones faltantes (mes actual + `premake`, y la DEFAULT) y
+    aplica la retención. Idempotente: se puede correr a diario desde un cron
+    o al arrancar un servicio. Con `dry_run=True` solo devuelve el SQL.
+
+    Si la DEFAULT ya recibió filas de un mes que todavía no tenía partición
+    (ej: el mantenimiento no corrió a tiempo), esas filas se mueven a la
+    partición nueva en la misma transacción (`move_out_of_default_sql`);
+    la tabla queda bloqueada mientras tanto.
+
+    Funciona sobre una conexión síncrona (Alembic); desde código async usar
+    `maintain_partitions_async`.
+    """
+    today = today or datetime.utcnow().date()
+    report = MaintenanceReport()
+
+    def run(sql: str) -> None:
+        report.statements.append(sql)
+        if not dry_run:
+            conn.execute(text(sql))
+
+    for policy in policies:
+        existing = set(list_partitions(conn, policy.table))
+        has_default = f"{policy.table}_default" in existing
+        for month in planned_months(policy, today):
+            name = partition_name(policy.table, month)
+            if name not in existing:
+                moves = move_out_of_default_sql(conn, policy.table, month) if has_default else []
+                for sql in moves or [create_partition_sql(policy.table, month)]:
+                    run(sql)
+                report.created.append(name)
+        if not has_default:
+            run(create_default_partition_sql(policy.table))
+            report.created.append(f"{policy.table}_default")
+
+        if not apply_retention:
+            continue
+        for name in expired_partitions(policy, sorted(existing), today):
+            if policy.retention_action == "drop":
+                run(f'DROP TABLE IF EXISTS "{name}"')
+                report.dropped.append(name)
+            else:
+                run(f'CREATE SCHEMA IF NOT EXISTS "{ARCHIVE_SCHEMA}"')
+                run(f'ALTER TABLE "{policy.table}" DETACH PARTITION "{name}"')
+                run(f'ALTER TABLE "{name}" SET SCHEMA "{ARCHIVE_SCHEMA}"')
+                report.detached.append(name)
+
+    if report.created or report.dropped or report.detached:
+        logger.info(
+            "Partition maintenance: created=%s dropped=%s detached=%s",
+            report.created, report.dropped, report.detached,
+        )
+    return report
+
+async def maintain_partitions_async(async_conn, **kwargs) -> MaintenanceReport:
+    """`maintain_partitions` sobre una `AsyncConnection`."""
+    return await async_conn.run_sync(lambda conn: maintain_partitions(conn, **kwargs))
+
+# --- Migraciones (Alembic) ---
+
+def _table(table_name: str):
+    from .models import Base
+    return Base.metadata.tables[table_name]
+
+def convert_to_partitioned_sql(conn: Connection, table_name: str, premake: int = 3,
+                               today: Optional[date] = None, table: Optional[Table] = None) -> List[str]:
+    """
+    SQL para convertir una tabla existente (sin particionar) en su versión
+    particionada, conservando los datos:
+
+    1. Renombra la tabla, sus índices y su secuencia con sufijo `_old`.
+    2. Crea la tabla particionada y sus índices desde `table`.
+    3. Crea una partición por mes desde el dato más antiguo hasta `premake`
+       meses adelante, más la DEFAULT.
+    4. Copia las columnas que existen en ambas tablas (según
+       `information_schema`), ajusta la secuencia y borra la tabla vieja.
+
+    `table` es la definición de la tabla nueva; por defecto la de
+    `models.py`, que cambia con cada versión del paquete. Para que una
+    revisión de Alembic genere siempre el mismo DDL, declarar en la revisión
+    una copia de la tabla tal como era en ese momento y pasarla aquí.
+
+    Necesita una conexión para leer el rango de fechas y las columnas existentes.
+    """
+    from sqlalchemy.dialects import postgresql
+
+    dialect = postgresql.dialect()
+    table = table if table is not None else _table(table_name)
+    old = f"{table_name}_old"
+    today = today or datetime.utcnow().date()
+    oldest = conn.execute(text(f'SELECT min(created_at) FROM "{table_name}"')).scalar()
+    existing_columns = set(table_columns(conn, table_name))
+    first = month_start(oldest.date() if oldest else today)
+    last = add_months(month_start(today), premake)
+
+    statements = [
+        f'ALTER TABLE "{table_name}" RENAME TO "{old}"',
+        # Los nombres de índices y constraints son únicos por schema: se liberan para la tabla nueva.
+        "DO $$ DECLARE r record; BEGIN "
+        f"FOR r IN SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        f"WHERE i.indrelid = '\"{old}\"'::regclass LOOP "
+        "EXECUTE format('ALTER INDEX %I RENAME TO %I', r.relname, left(r.relname, 59) || '_old'); "
+        "END LOOP; END $$",
+        f'ALTER SEQUENCE IF EXISTS "{table_name}_id_seq" RENAME TO "{old}_id_seq"',
+        str(CreateTable(table).compile(dialect=dialect)).strip(),
+    ]
+    statements += [str(CreateIndex(index).compile(dialect=dialect)) for index in table.indexes]
+    month = first
+    while month <= last:
+        statements.append(create_partition_sql(table_name, month))
+        month = add_months(month, 1)
+    statements.append(create_default_partition_sql(table_name))
+
+    # Las columnas generadas se recalculan solas y las que la tabla vieja no
+    # tenía quedan con su default: no se copian.
+    copied = [column.name for column in table.columns
+              if column.computed is None and column.name in existing_columns]
+    # `created_at` pasa a ser parte de la PK; en tablas viejas podía ser NULL.
+    values = ", ".join(f'COALESCE("{name}", timezone(\'utc\', now()))' if name == "created_at" else f'"{name}"'
+                       for name in copied)
+    columns = ", ".join(f'"{name}"' for name in copied)
+    statements += [
+        f'INSERT INTO "{table_name}" ({columns}) SELECT {values} FROM "{old}"',
+        f"SELECT setval(pg_get_serial_sequence('\"{table_name}\"', 'id'), "
+        f'COALESCE((SELECT max(id) FROM "{table_name}"), 0) + 1, false)',
+        f'DROP TABLE "{old}"',
+    ]
+    return statements
+
+def convert_to_partitioned(op, table_name: str, premake: int = 3, table: Optional[Table] = None) -> None:
+    """
+    Helper para `upgrade()` de Alembic:
+
+        from insurance_models.database.partitioning import convert_to_partitioned
+
+        def upgrade():
+            for table in ("processing_logs", "ocr_results", "llm_results"):
+                convert_to_partitioned(op, table)
+
+    Con `table` la revisión no depende de los modelos instalados (ver
+    `convert_to_partitioned_sql`). Bloquea la tabla mientras copia: para
+    tablas grandes, correrlo en una ventana de mantenimiento. No tiene
+    `downgrade` automático.
+    """
+    for sql in convert_to_partitioned_sql(op.get_bind(), table_name, premake=premake, table=table):
+        op.execute(text(sql))
+
+def create_future_partitions(op, table_name: str, months: int = 3, start: Optional[date] = None) -> None:
+    """Helper de Alembic para crear particiones por adelantado (ej: al crear una tabla nueva)."""
+    month = month_start(start or datetime.utcnow().date())
+    for i in range(months + 1):
+        op.execute(text(create_partition_sql(table_name, add_months(month, i))))
+    op.execute(text(create_default_partition_sql(table_name)))
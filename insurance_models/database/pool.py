@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# --- Configuración del pool ---
+
+ServiceProfile = Literal["api", "worker", "batch"]
+
+class PoolSettings(BaseModel):
+    """
+    Configuración tipada del pool de conexiones asyncpg.
+
+    Se puede construir explícitamente, desde un preset por tipo de servicio
+    (`PoolSettings.for_service("worker")`) o desde variables de entorno
+    `DB_POOL_*` (`PoolSettings.from_env()`).
+    """
+    pool_size: int = Field(default=5, ge=1)
+    max_overflow: int = Field(default=10, ge=0)
+    pool_timeout: float = Field(default=30.0, gt=0, description="Segundos de espera máxima por una conexión.")
+    pool_recycle: int = Field(default=1800, description="Segundos antes de reciclar una conexión; -1 lo desactiva.")
+    pool_pre_ping: bool = Field(default=True)
+    pool_use_lifo: bool = Field(default=True, description="LIFO deja enfriar las conexiones sobrantes para que expiren.")
+    statement_cache_size: int = Field(default=100, ge=0, description="Caché de statements de asyncpg por conexión.")
+    prepared_statement_cache_size: int = Field(default=100, ge=0, description="Caché de prepared statements del dialecto.")
+    server_side_prepared_statements: bool = Field(
+        default=True,
+        description="Desactivar al usar PgBouncer en modo transaction: pone ambas cachés en 0.",
+    )
+
+    @classmethod
+    def for_service(cls, profile: ServiceProfile, **overrides: Any) -> "PoolSettings":
+        """Devuelve el preset para el tipo de servicio, con overrides opcionales."""
+        try:
+            base = POOL_PRESETS[profile]
+        except KeyError:
+            raise ValueError(f"Unknown pool profile '{profile}'. Expected one of {sorted(POOL_PRESETS)}")
+        return base.model_copy(update=overrides)
+
+    @classmethod
+    def from_env(cls, prefix: str = "DB_POOL_") -> "PoolSettings":
+        """
+        Lee la configuración del entorno. `DB_POOL_PROFILE` elige el preset base
+        y cualquier `DB_POOL_<CAMPO>` (ej: `DB_POOL_POOL_SIZE`) lo sobrescribe.
+        """
+        profile = os.getenv(f"{prefix}PROFILE")
+        base = cls.for_service(profile) if profile else cls()
+        overrides = {}
+        for name in cls.model_fields:
+            raw = os.getenv(f"{prefix}{name.upper()}")
+            if raw is not None:
+                overrides[name] = raw
+        if not overrides:
+            return base
+        return cls.model_validate({**base.model_dump(), **overrides})
+
+    def engine_kwargs(self) -> Dict[str, Any]:
+        """Argumentos para `create_async_engine`."""
+        statement_cache_size = self.statement_cache_size
+        prepared_statement_cache_size = self.prepared_statement_cache_size
+        if not self.server_side_prepared_statements:
+            statement_cache_size = 0
+            prepared_statement_cache_size = 0
+        return {
+            "poolclass": InstrumentedAsyncQueuePool,
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": self.pool_pre_ping,
+            "pool_use_lifo": self.pool_use_lifo,
+            "connect_args": {
+                "statement_cache_size": statement_cache_size,
+                "prepared_statement_cache_size": prepared_statement_cache_size,
+            },
+        }
+
+# La API atiende muchas peticiones cortas; los workers mantienen pocas
+# conexiones largas; los batch (backfills) usan pocas, sin overflow y sin reciclar.
+POOL_PRESETS: Dict[str, PoolSettings] = {
+    "api": PoolSettings(pool_size=10, max_overflow=20, pool_timeout=10.0, pool_recycle=1800),
+    "worker": PoolSettings(pool_size=4, max_overflow=4, pool_timeout=30.0, pool_recycle=3600),
+    "batch": PoolSettings(pool_size=2, max_overflow=0, pool_timeout=120.0, pool_recycle=-1, pool_pre_ping=False),
+}
+
+# --- Métricas del pool ---
+
+CheckoutHook = Callable[[float], None]
+
+class PoolMetrics:
+    """
+    Métricas del pool: latencia de checkout, profundidad de la cola de espera
+    y conexiones en uso. `waiting` cuenta solo los checkouts que encontraron
+    el pool agotado (`pool_size + max_overflow` conexiones en uso), no todos.
+    Los hooks registrados con `add_checkout_hook` reciben la latencia (en
+    segundos) de cada checkout, para enviarla a un histograma.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hooks: List[CheckoutHook] = []
+        self._pool: Optional["InstrumentedAsyncQueuePool"] = None
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.checkout_seconds_total = 0.0
+        self.checkout_seconds_max = 0.0
+        self.waiting = 0
+        self.waiting_max = 0
+
+    def add_checkout_hook(self, hook: CheckoutHook) -> None:
+        self._hooks.append(hook)
+
+    def _start_wait(self) -> None:
+        with self._lock:
+            self.waiting += 1
+            self.waiting_max = max(self.waiting_max, self.waiting)
+
+    def _end_wait(self, elapsed: float, outcome: str, waited: bool = True) -> None:
+        with self._lock:
+            if waited:
+                self.waiting -= 1
+            if outcome == "timeout":
+                self.checkout_timeouts += 1
+            if outcome != "ok":
+                return
+            self.checkouts += 1
+            self.checkout_seconds_total += elapsed
+            self.checkout_seconds_max = max(self.checkout_seconds_max, elapsed)
+        for hook in self._hooks:
+            hook(elapsed)
+
+    @property
+    def in_use(self) -> int:
+        return self._pool.checkedout() if self._pool is not None else 0
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            avg = self.checkout_seconds_total / self.checkouts if self.checkouts else 0.0
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "checkout_seconds_avg": avg,
+                "checkout_seconds_max": self.checkout_seconds_max,
+                "waiting": self.waiting,
+                "waiting_max": self.waiting_max,
+                "in_use": self.in_use,
+                "pool_size": self._pool.size() if self._pool is not None else 0,
+                "overflow": self._pool.overflow() if self._pool is not None else 0,
+            }
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """`AsyncAdaptedQueuePool` que mide cuánto espera cada checkout."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+        self.metrics._pool = self
+
+    def recreate(self) -> "InstrumentedAsyncQueuePool":
+        pool = super().recreate()
+        # Conserva las métricas (y sus hooks) al recrear el pool tras un error.
+        pool.metrics = self.metrics
+        self.metrics._pool = pool
+        return pool
+
+    def exhausted(self) -> bool:
+        """True si no queda conexión libre ni overflow: el próximo checkout espera."""
+        return self._max_overflow > -1 and self.checkedout() >= self.size() + self._max_overflow
+
+    def connect(self):
+        # Se instrumenta `connect()` y no `_do_get()` porque este último es
+        # recursivo cuando compite por el overflow; la medición incluye pre-ping.
+        waited = self.exhausted()
+        if waited:
+            self.metrics._start_wait()
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics._end_wait(time.perf_counter() - start, outcome="timeout", waited=waited)
+            raise
+        except BaseException:
+            self.metrics._end_wait(time.perf_counter() - start, outcome="error", waited=waited)
+            raise
+        self.metrics._end_wait(time.perf_counter() - start, outcome="ok", waited=waited)
+        return connection
@@ -0,0 +1,300 @@
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pydantic import TypeAdapter
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing_extensions import TypedDict
+
+from .models import Job, JobStatus
+from .schemas import CursorJobDashboardResponse, JobDashboardItem
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Por encima de este número el dashboard muestra "10.000+" en lugar de contar todo.
+DEFAULT_COUNT_CAP = 10_000
+
+# Solo las columnas que expone `JobDashboardItem`; el orden coincide con el índice
+# ix_jobs_user_created_id, así que la página sale del índice sin ordenar en memoria.
+DASHBOARD_COLUMNS = (
+    Job.id, Job.status, Job.representative_policy_holder_name,
+    Job.representative_vehicle_description, Job.created_at,
+)
+DASHBOARD_FIELDS = tuple(column.key for column in DASHBOARD_COLUMNS)
+
+# --- Cursor ---
+
+def encode_cursor(created_at: datetime, job_id: int) -> str:
+    """Cursor opaco con la posición (created_at, id) del último trabajo de la página."""
+    raw = json.dumps([created_at.isoformat(), job_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, job_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(job_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid pagination cursor")
+
+# --- Conteo ---
+
+class CountCache:
+    """
+    Caché en memoria (por proceso) de conteos del dashboard con TTL. El total
+    es informativo, así que unos segundos de desfase son aceptables y evitan
+    un COUNT por cada página.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple, Tuple[float, int, bool]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[Tuple[int, bool]]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1], entry[2]
+
+    def put(self, key: Tuple, count: int, capped: bool) -> None:
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time.monotonic()
+                self._entries = {k: v for k, v in self._entries.items() if v[0] >= now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[key] = (time.monotonic() + self.ttl, count, capped)
+
+    def invalidate(self, user_id: str) -> None:
+        """Olvida los conteos de un usuario (ej: al crear o borrar un trabajo)."""
+        with self._lock:
+            self._entries = {k: v for k, v in self._entries.items() if k[0] != user_id}
+
+
+DASHBOARD_COUNT_CACHE = CountCache()
+
+def _user_filter(user_id: str, status: Optional[JobStatus]):
+    conditions = [Job.user_id == user_id]
+    if status is not None:
+        conditions.append(Job.status == status)
+    return conditions
+
+async def count_user_jobs(
+    session: AsyncSession,
+    user_id: str,
+    status: Optional[JobStatus] = None,
+    cap: Optional[int] = DEFAULT_COUNT_CAP,
+    cache: Optional[CountCache] = DASHBOARD_COUNT_CACHE,
+) -> Tuple[int, bool]:
+    """
+    Cuenta los trabajos del usuario, deteniéndose en `cap`. Devuelve
+    `(conteo, acotado)`; si `acotado` es True hay al menos `conteo` trabajos.
+    El conteo recorre solo el índice (user_id, ...) y nunca más de `cap + 1` filas.
+    """
+    key = (user_id, status, cap)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    inner = select(Job.id).where(*_user_filter(user_id, status))
+    if cap is not None:
+        inner = inner.limit(cap + 1)
+    count = (await session.execute(select(func.count()).select_from(inner.subquery()))).scalar_one()
+    capped = cap is not None and count > cap
+    result = (cap if capped else count, capped)
+
+    if cache is not None:
+        cache.put(key, *result)
+    return result
+
+# --- Serialización directa a JSON ---
+
+# Mismos campos que `JobDashboardItem`, `PaginatedJobDashboardResponse` y
+# `CursorJobDashboardResponse`, como TypedDict: pydantic-core serializa los
+# dicts de cada fila sin crear un modelo por fila ni validar. El JSON es
+# idéntico al de `model_dump_json()` de los modelos (lo verifica un test).
+
+class _DashboardRow(TypedDict):
+    id: int
+    status: JobStatus
+    representative_policy_holder_name: Optional[str]
+    representative_vehicle_description: Optional[str]
+    created_at: datetime
+
+class _PaginatedDashboard(TypedDict):
+    jobs: List[_DashboardRow]
+    total_jobs: int
+    total_pages: int
+    current_page: int
+    limit: int
+
+class _CursorDashboard(TypedDict):
+    jobs: List[_DashboardRow]
+    next_cursor: Optional[str]
+    has_more: bool
+    limit: int
+    total_jobs: Optional[int]
+    total_is_estimate: bool
+
+_PAGINATED_SERIALIZER = TypeAdapter(_PaginatedDashboard)
+_CURSOR_SERIALIZER = TypeAdapter(_CursorDashboard)
+
+def _row_dicts(rows: Sequence[Sequence]) -> List[Dict]:
+    return [dict(zip(DASHBOARD_FIELDS, row)) for row in rows]
+
+def dump_paginated_dashboard(rows: Sequence[Sequence], total_jobs: int, current_page: int, limit: int) -> bytes:
+    """JSON de `PaginatedJobDashboardResponse` a partir de filas en el orden de `DASHBOARD_FIELDS`."""
+    return _PAGINATED_SERIALIZER.dump_json({
+        "jobs": _row_dicts(rows),
+        "total_jobs": total_jobs,
+        "total_pages": -(-total_jobs // limit) if limit else 0,
+        "current_page": current_page,
+        "limit": limit,
+    })
+
+def dump_cursor_dashboard(rows: Sequence[Sequence], next_cursor: Optional[str], has_more: bool, limit: int,
+                          total_jobs: Optional[int] = None, total_is_estimate: bool = False) -> bytes:
+    """JSON de `CursorJobDashboardResponse` a partir de filas en el orden de `DASHBOARD_FIELDS`."""
+    return _CURSOR_SERIALIZER.dump_json({
+        "jobs": _row_dicts(rows),
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+        "limit": limit,
+        "total_jobs": total_jobs,
+        "total_is_estimate": total_is_estimate,
+    })
+
+# --- Página ---
+
+async def _fetch_page_rows(session: AsyncSession, user_id: str, limit: int, cursor: Optional[str],
+                           status: Optional[JobStatus]) -> Tuple[list, bool, Optional[str]]:
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    query = select(*DASHBOARD_COLUMNS).where(*_user_filter(user_id, status))
+    if cursor is not None:
+        created_at, job_id = decode_cursor(cursor)
+        query = query.where(tuple_(Job.created_at, Job.id) < tuple_(created_at, job_id))
+    # Se pide una fila extra para saber si hay página siguiente sin contar.
+    query = query.order_by(Job.created_at.desc(), Job.id.desc()).limit(limit + 1)
+
+    rows = (await session.execute(query)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+    return rows, has_more, next_cursor
+
+async def fetch_dashboard_page(
+    session: AsyncSession,
+    user_id: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    status: Optional[JobStatus] = None,
+    include_total: bool = False,
+    count_cap: Optional[int] = DEFAULT_COUNT_CAP,
+) -> CursorJobDashboardResponse:
+    """
+    Devuelve una página del dashboard del usuario, del trabajo más reciente al
+    más antiguo, usando paginación keyset sobre (created_at, id):
+
+        WHERE user_id = :u AND (created_at, id) < (:c, :i)
+        ORDER BY created_at DESC, id DESC LIMIT :n
+
+    A diferencia de OFFSET, el costo no crece con la profundidad de la página.
+
+    Args:
+        session: Sesión async.
+        user_id: Dueño de los trabajos.
+        limit: Tamaño de página (1 a `MAX_PAGE_SIZE`).
+        cursor: `next_cursor` de la página anterior, o None para la primera.
+        status: Filtro opcional por estado.
+        include_total: Si es True, agrega el conteo (acotado y cacheado).
+        count_cap: Tope del conteo; None cuenta todo.
+    """
+    rows, has_more, next_cursor = await _fetch_page_rows(session, user_id, limit, cursor, status)
+    validate = JobDashboardItem.__pydantic_validator__.validate_python
+    response = CursorJobDashboardResponse(
+        jobs=[validate(row) for row in _row_dicts(rows)],
+        has_more=has_more,
+        next_cursor=next_cursor,
+        limit=limit,
+    )
+    if include_total:
+        response.total_jobs, response.total_is_estimate = await count_user_jobs(
+            session, user_id, status, cap=count_cap
+        )
+    return response
+
+async def fetch_dashboard_page_json(
+    session: AsyncSession,
+    user_id: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    status: Optional[JobStatus] = None,
+    include_total: bool = False,
+    count_cap: Optional[int] = DEFAULT_COUNT_CAP,
+) -> bytes:
+    """
+    Como `fetch_dashboard_page`, pero devuelve directamente el JSON de la
+    respuesta: las filas proyectadas pasan a bytes sin modelos intermedios.
+    Para devolverlo tal cual desde la API (`Response(content, media_type="application/json")`).
+    """
+    rows, has_more, next_cursor = await _fetch_page_rows(session, user_id, limit, cursor, status)
+    total, capped = None, False
+    if include_total:
+        total, capped = await count_user_jobs(session, user_id, status, cap=count_cap)
+    return dump_cursor_dashboard(rows, next_cursor, has_more, limit, total, capped)
+
+async def fetch_paginated_dashboard_json(
+    session: AsyncSession,
+    user_id: str,
+    page: int = 1,
+    limit: int = DEFAULT_PAGE_SIZE,
+    status: Optional[JobStatus] = None,
+) -> bytes:
+    """
+    JSON de `PaginatedJobDashboardResponse` (paginación por número de página)
+    con la misma proyección de columnas. Usa OFFSET y un conteo exacto
+    (cacheado): para historiales largos preferir `fetch_dashboard_page_json`.
+    """
+    if page < 1:
+        raise ValueError("page must be >= 1")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    query = (
+        select(*DASHBOARD_COLUMNS).where(*_user_filter(user_id, status))
+        .order_by(Job.created_at.desc(), Job.id.desc())
+        .offset((page - 1) * limit).limit(limit)
+    )
+    rows = (await session.execute(query)).all()
+    total, _ = await count_user_jobs(session, user_id, status, cap=None)
+    return dump_paginated_dashboard(rows, total, page, limit)
+
+# --- Migraciones ---
+
+def require_job_created_at_sql() -> List[str]:
+    """
+    SQL (Postgres) para bases donde `jobs.created_at` aún admite NULL: el
+    cursor del dashboard no puede codificar NULL y la comparación por
+    (created_at, id) las descartaría. Rellena los NULL con `updated_at` (o la
+    hora actual), agrega el default de servidor y la restricción. `SET NOT
+    NULL` recorre la tabla con un lock exclusivo.
+    """
+    return [
+        "UPDATE jobs SET created_at = COALESCE(updated_at, timezone('utc', now())) WHERE created_at IS NULL",
+        "ALTER TABLE jobs ALTER COLUMN created_at SET DEFAULT timezone('utc', now())",
+        "ALTER TABLE jobs ALTER COLUMN created_at SET NOT NULL",
+    ]
+
+def require_job_created_at(op) -> None:
+    """Helper para `upgrade()` de Alembic (ver `require_job_created_at_sql`)."""
+    for sql in require_job_created_at_sql():
+        op.execute(text(sql))
@@ -0,0 +1,294 @@
+import asyncio
+import logging
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Set, Union
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .models import Job, JobResult, JobStatus
+from .queries import DEFAULT_PAGE_SIZE, fetch_dashboard_page_json
+from .schemas import CursorJobDashboardResponse, JobDetailResponse
+from .state_machine import TERMINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Los TTL son una red de seguridad: la frescura la dan las invalidaciones.
+ACTIVE_DETAIL_TTL = 60
+TERMINAL_DETAIL_TTL = 3600
+DASHBOARD_TTL = 60
+
+# Contador de invalidaciones por clave; basta con que dure más que una carga.
+VERSION_TTL = 24 * 3600
+
+LOCK_TTL_MS = 5_000
+LOCK_WAIT_SECONDS = 2.0
+LOCK_POLL_SECONDS = 0.02
+
+# Escribe la entrada solo si nadie invalidó la clave desde que se leyó su
+# versión: así un loader lento no vuelve a guardar un estado viejo.
+_SET_IF_VERSION_SCRIPT = """
+local current = redis.call('GET', KEYS[2]) or '0'
+if current ~= ARGV[1] then return 0 end
+if ARGV[4] == '' then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+else
+    redis.call('HSET', KEYS[1], ARGV[4], ARGV[2])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return 1
+"""
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+Entry = Union[bytes, str]
+
+def _as_bytes(value: Entry) -> bytes:
+    return value.encode() if isinstance(value, str) else value
+
+
+class ResponseCache:
+    """
+    Caché read-through en Redis de las respuestas que el frontend consulta
+    en bucle: el detalle de un trabajo (`JobDetailResponse`) y las páginas del
+    dashboard (`CursorJobDashboardResponse`).
+
+    - Las entradas son el JSON final de la respuesta: un acierto se devuelve
+      sin tocar Postgres ni volver a serializar (`*_json`).
+    - Detalle: `resp:job:{id}`. Dashboard: un hash `resp:dash:{user_id}` con
+      una entrada por página, para invalidar todas las páginas con un DEL.
+    - Single-flight: ante un fallo, una sola corrutina por proceso y un solo
+      proceso (lock `SET NX` en Redis) consulta la base; los demás esperan a
+      que aparezca la entrada, hasta `lock_wait` segundos.
+    - `invalidate_job` / `invalidate_dashboard` se llaman en cada cambio de
+      `Job.status` y escritura de `JobResult`; `install_invalidation_hooks`
+      lo hace automáticamente para los cambios hechos con el ORM.
+    """
+
+    def __init__(self, redis_client, prefix: str = "resp", lock_wait: float = LOCK_WAIT_SECONDS):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.lock_wait = lock_wait
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._set_if_version = redis_client.register_script(_SET_IF_VERSION_SCRIPT)
+        self._release_lock = redis_client.register_script(_RELEASE_LOCK_SCRIPT)
+        self.hits = 0
+        self.misses = 0
+
+    def job_key(self, job_id: int) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    def dashboard_key(self, user_id: str) -> str:
+        return f"{self.prefix}:dash:{user_id}"
+
+    # --- Detalle del trabajo ---
+
+    async def job_detail_json(self, session: AsyncSession, job_id: int, user_id: Optional[str] = None) -> Optional[bytes]:
+        """
+        JSON de `JobDetailResponse`, o None si el trabajo no existe o no es de
+        `user_id` (si se da). La entrada guarda el dueño delante del JSON
+        (`{user_id}\\n{json}`) para validar el acceso sin ir a la base.
+        """
+        async def load():
+            row = (await session.execute(
+                select(Job.user_id, Job.status, JobResult)
+                .outerjoin(JobResult, JobResult.job_id == Job.id)
+                .where(Job.id == job_id)
+            )).first()
+            if row is None:
+                return None
+            owner, status, result = row
+            detail = JobDetailResponse(status=status, result=await result.load_consolidated() if result else None)
+            ttl = TERMINAL_DETAIL_TTL if status in TERMINAL_STATUSES else ACTIVE_DETAIL_TTL
+            return owner.encode() + b"\n" + detail.model_dump_json().encode(), ttl
+
+        entry = await self._read_through(self.job_key(job_id), None, load)
+        if entry is None:
+            return None
+        owner, _, payload = entry.partition(b"\n")
+        if user_id is not None and owner.decode() != user_id:
+            return None
+        return payload
+
+    async def job_detail(self, session: AsyncSession, job_id: int, user_id: Optional[str] = None) -> Optional[JobDetailResponse]:
+        payload = await self.job_detail_json(session, job_id, user_id)
+        return JobDetailResponse.model_validate_json(payload) if payload is not None else None
+
+    # --- Dashboard ---
+
+    async def dashboard_page_json(
+        self,
+        session: AsyncSession,
+        user_id: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        status: Optional[JobStatus] = None,
+        include_total: bool = False,
+    ) -> bytes:
+        """JSON de `fetch_dashboard_page_json` con los mismos argumentos."""
+        page = f"{limit}:{cursor or ''}:{status.name if status else ''}:{int(include_total)}"
+
+        async def load():
+            payload = await fetch_dashboard_page_json(
+                session, user_id, limit=limit, cursor=cursor, status=status, include_total=include_total
+            )
+            return payload, DASHBOARD_TTL
+
+        return await self._read_through(self.dashboard_key(user_id), page, load)
+
+    async def dashboard_page(self, session: AsyncSession, user_id: str, **kwargs) -> CursorJobDashboardResponse:
+        return CursorJobDashboardResponse.model_validate_json(await self.dashboard_page_json(session, user_id, **kwargs))
+
+    # --- Invalidación ---
+
+    async def invalidate_job(self, job_id: int) -> None:
+        await self._invalidate(self.job_key(job_id))
+
+    async def invalidate_dashboard(self, user_id: str) -> None:
+        await self._invalidate(self.dashboard_key(user_id))
+
+    async def _invalidate(self, key: str) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.incr(f"{key}:ver")
+            pipe.expire(f"{key}:ver", VERSION_TTL)
+            await pipe.execute()
+
+    # --- Read-through con single-flight ---
+
+    async def _read(self, key: str, field: Optional[str]) -> Optional[bytes]:
+        value = await (self.redis.hget(key, field) if field is not None else self.redis.get(key))
+        return _as_bytes(value) if value is not None else None
+
+    async def _read_through(self, key: str, field: Optional[str],
+                            load: Callable[[], Awaitable[Optional[tuple]]]) -> Optional[bytes]:
+        cached = await self._read(key, field)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        # Una sola carga por proceso: las demás corrutinas esperan su resultado.
+        flight_key = f"{key}|{field or ''}"
+        inflight = self._inflight.get(flight_key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[flight_key] = future
+        try:
+            value = await self._load_once(key, field, load)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Si nadie más esperaba, se marca como recuperada para no avisar "never retrieved".
+            future.exception()
+            raise
+        finally:
+            del self._inflight[flight_key]
+
+    async def _load_once(self, key: str, field: Optional[str],
+                         load: Callable[[], Awaitable[Optional[tuple]]]) -> Optional[bytes]:
+        lock_key = f"{key}:lock:{field or ''}"
+        token = uuid.uuid4().hex
+        if not await self.redis.set(lock_key, token, nx=True, px=LOCK_TTL_MS):
+            # Otro proceso está cargando: esperar su entrada antes de ir a la base.
+            deadline = asyncio.get_running_loop().time() + self.lock_wait
+            while asyncio.get_running_loop().time() < deadline:
+                await asyncio.sleep(LOCK_POLL_SECONDS)
+                cached = await self._read(key, field)
+                if cached is not None:
+                    return cached
+            token = None
+        try:
+            version = await self.redis.get(f"{key}:ver")
+            loaded = await load()
+            if loaded is None:
+                return None
+            value, ttl = loaded
+            await self._set_if_version(
+                keys=[key, f"{key}:ver"],
+                args=[_as_bytes(version).decode() if version is not None else "0", value, ttl, field or ""],
+            )
+            return value
+        finally:
+            if token is not None:
+                await self._release_lock(keys=[lock_key], args=[token])
+
+
+# --- Hooks del ORM ---
+
+_PENDING_KEY = "response_cache_invalidations"
+_background_tasks: Set[asyncio.Task] = set()
+
+def install_invalidation_hooks(cache: ResponseCache, session_class=Session) -> Callable[[], None]:
+    """
+    Invalida la caché al hacer commit de una sesión que creó, modificó o
+    borró un `Job` (detalle y dashboard del dueño) o un `JobResult` (detalle).
+    Sirve también para `AsyncSession`, que usa un `Session` por debajo.
+
+    Los UPDATE hechos con Core (`update(Job)...`) no pasan por el ORM: quien
+    los haga debe llamar a `invalidate_job` / `invalidate_dashboard`.
+
+    Devuelve una función que quita los hooks.
+    """
+    def after_flush(session, flush_context):
+        pending = session.info.setdefault(_PENDING_KEY, (set(), set()))
+        job_ids, user_ids = pending
+        dirty = [obj for obj in session.dirty if session.is_modified(obj)]
+        for obj in (*session.new, *dirty, *session.deleted):
+            if isinstance(obj, Job):
+                job_ids.add(obj.id)
+                user_ids.add(obj.user_id)
+            elif isinstance(obj, JobResult):
+                job_ids.add(obj.job_id)
+
+    def after_commit(session):
+        pending = session.info.pop(_PENDING_KEY, None)
+        if not pending:
+            return
+        job_ids, user_ids = pending
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.warning("Response cache: commit outside an event loop, invalidation skipped")
+            return
+
+        async def invalidate():
+            try:
+                for job_id in job_ids:
+                    if job_id is not None:
+                        await cache.invalidate_job(job_id)
+                for user_id in user_ids:
+                    if user_id is not None:
+                        await cache.invalidate_dashboard(user_id)
+            except Exception as e:
+                logger.warning("Response cache invalidation failed: %r", e)
+
+        task = loop.create_task(invalidate())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    def after_rollback(session):
+        session.info.pop(_PENDING_KEY, None)
+
+    hooks = (("after_flush", after_flush), ("after_commit", after_commit), ("after_rollback", after_rollback))
+    for name, fn in hooks:
+        event.listen(session_class, name, fn)
+
+    def remove() -> None:
+        for name, fn in hooks:
+            event.remove(session_class, name, fn)
+    return remove
+
+async def wait_for_invalidations() -> None:
+    """Espera las invalidaciones lanzadas por los hooks (útil en tests y al apagar)."""
+    if _background_tasks:
+        await asyncio.gather(*list(_background_tasks), return_exceptions=True)
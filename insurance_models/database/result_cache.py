@@ -0,0 +1,229 @@
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import LlmResult, OcrResult
+
+logger = logging.getLogger(__name__)
+
+OCR_STAGE = "ocr"
+LLM_STAGE = "llm"
+
+# Columnas que se copian del resultado cacheado a la fila nueva. Con los blobs
+# en R2 la copia es solo la referencia: el contenido no se vuelve a subir.
+OCR_COPY_COLUMNS = ("text_content", "text_blob_key", "text_blob_size", "text_blob_sha256", "text_sha256")
+LLM_COPY_COLUMNS = ("raw_llm_data", "raw_blob_key", "raw_blob_size", "raw_blob_sha256")
+
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+# Valores más grandes (texto OCR inline) no se guardan en Redis; se leen de Postgres.
+DEFAULT_MAX_VALUE_BYTES = 256 * 1024
+
+STATS_KEY = "result_cache:stats"
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def ocr_cache_key(content_sha256: str, ocr_version: str) -> str:
+    return f"result_cache:{OCR_STAGE}:{ocr_version}:{content_sha256}"
+
+def llm_cache_key(text_sha256: str, prompt_version: str, model_version: str) -> str:
+    return f"result_cache:{LLM_STAGE}:{prompt_version}:{model_version}:{text_sha256}"
+
+
+@dataclass
+class CacheStats:
+    """Contadores del proceso; `ResultCache.shared_stats()` da los de todos los workers."""
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, stage: str, outcome: str) -> None:
+        name = f"{stage}:{outcome}"
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def hit_rate(self, stage: str) -> float:
+        return _hit_rate(self.counts, stage)
+
+def _hit_rate(counts: Dict[str, int], stage: str) -> float:
+    hits = counts.get(f"{stage}:hit_redis", 0) + counts.get(f"{stage}:hit_db", 0)
+    total = hits + counts.get(f"{stage}:miss", 0)
+    return hits / total if total else 0.0
+
+
+class ResultCache:
+    """
+    Caché de resultados OCR/LLM direccionada por contenido. Un PDF que ya se
+    procesó (en otro trabajo o de otro usuario) no vuelve a pasar por OCR ni
+    por el LLM: se crea una fila nueva para el `JobFile` copiando el resultado.
+
+    - OCR: clave `(hash del PDF, ocr_version)`.
+    - LLM: clave `(hash del texto OCR, prompt_version, model_version)`; cambiar
+      el prompt o el modelo invalida la caché sin borrar nada.
+
+    Busca primero en Redis y, si no está (o Redis falla), en Postgres por los
+    índices `ix_ocr_results_cache_key` / `ix_llm_results_cache_key`; un
+    acierto en Postgres se vuelve a escribir en Redis. Sin `redis_client`
+    funciona solo con Postgres.
+
+    Uso en el worker de OCR:
+
+        cached = await cache.reuse_ocr(session, job_file, ocr_version="tesseract-5.3")
+        if cached is None:
+            ocr = OcrResult(job_file_id=job_file.id, content_sha256=job_file.content_sha256,
+                            ocr_version="tesseract-5.3")
+            await ocr.store_text(run_ocr(pdf))
+            session.add(ocr)
+            await session.flush()
+            await cache.remember_ocr(ocr)
+    """
+
+    def __init__(self, redis_client=None, ttl: int = DEFAULT_TTL_SECONDS,
+                 max_value_bytes: int = DEFAULT_MAX_VALUE_BYTES):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.max_value_bytes = max_value_bytes
+        self.stats = CacheStats()
+        # Contadores aún no enviados a `STATS_KEY`: viajan en el pipeline del
+        # próximo GET/SET, sin un round trip propio por búsqueda.
+        self._pending_counts: Dict[str, int] = {}
+
+    # --- OCR ---
+
+    async def lookup_ocr(self, session: AsyncSession, content_sha256: str, ocr_version: str) -> Optional[Dict]:
+        """Columnas de un resultado OCR previo para ese PDF, o None."""
+        stmt = (
+            select(*(getattr(OcrResult, c) for c in OCR_COPY_COLUMNS))
+            .where(OcrResult.content_sha256 == content_sha256, OcrResult.ocr_version == ocr_version)
+            .order_by(OcrResult.created_at.desc())
+            .limit(1)
+        )
+        return await self._lookup(session, OCR_STAGE, ocr_cache_key(content_sha256, ocr_version), stmt)
+
+    async def reuse_ocr(self, session: AsyncSession, job_file, ocr_version: str) -> Optional[OcrResult]:
+        """
+        Si hay un resultado para el PDF de `job_file` (`content_sha256`), agrega
+        a la sesión un `OcrResult` nuevo con el mismo texto y lo devuelve.
+        """
+        if not job_file.content_sha256:
+            return None
+        values = await self.lookup_ocr(session, job_file.content_sha256, ocr_version)
+        if values is None:
+            return None
+        result = OcrResult(job_file_id=job_file.id, content_sha256=job_file.content_sha256,
+                           ocr_version=ocr_version, **values)
+        session.add(result)
+        return result
+
+    async def remember_ocr(self, result: OcrResult) -> None:
+        """Publica en Redis un resultado recién calculado (Postgres ya lo tiene)."""
+        if result.content_sha256 and result.ocr_version:
+            await self._store(ocr_cache_key(result.content_sha256, result.ocr_version),
+                              {c: getattr(result, c) for c in OCR_COPY_COLUMNS})
+
+    # --- LLM ---
+
+    async def lookup_llm(self, session: AsyncSession, text_sha256: str,
+                         prompt_version: str, model_version: str) -> Optional[Dict]:
+        stmt = (
+            select(*(getattr(LlmResult, c) for c in LLM_COPY_COLUMNS))
+            .where(
+                LlmResult.text_sha256 == text_sha256,
+                LlmResult.prompt_version == prompt_version,
+                LlmResult.model_version == model_version,
+            )
+            .order_by(LlmResult.created_at.desc())
+            .limit(1)
+        )
+        key = llm_cache_key(text_sha256, prompt_version, model_version)
+        return await self._lookup(session, LLM_STAGE, key, stmt)
+
+    async def reuse_llm(self, session: AsyncSession, ocr_result: OcrResult,
+                        prompt_version: str, model_version: str) -> Optional[LlmResult]:
+        """Como `reuse_ocr`, para la salida del LLM sobre el texto de `ocr_result`."""
+        if not ocr_result.text_sha256:
+            return None
+        values = await self.lookup_llm(session, ocr_result.text_sha256, prompt_version, model_version)
+        if values is None:
+            return None
+        result = LlmResult(job_file_id=ocr_result.job_file_id, text_sha256=ocr_result.text_sha256,
+                           prompt_version=prompt_version, model_version=model_version, **values)
+        session.add(result)
+        return result
+
+    async def remember_llm(self, result: LlmResult) -> None:
+        if result.text_sha256 and result.prompt_version and result.model_version:
+            key = llm_cache_key(result.text_sha256, result.prompt_version, result.model_version)
+            await self._store(key, {c: getattr(result, c) for c in LLM_COPY_COLUMNS})
+
+    # --- Redis ---
+
+    async def _lookup(self, session: AsyncSession, stage: str, key: str, stmt) -> Optional[Dict]:
+        values = await self._redis_get(key)
+        if values is not None:
+            self._count(stage, "hit_redis")
+            return values
+        row = (await session.execute(stmt)).mappings().first()
+        if row is None:
+            self._count(stage, "miss")
+            return None
+        values = dict(row)
+        self._count(stage, "hit_db")
+        await self._store(key, values)
+        return values
+
+    async def _redis_get(self, key: str) -> Optional[Dict]:
+        if self.redis is None:
+            return None
+        try:
+            raw = (await self._execute(lambda pipe: pipe.get(key)))[-1]
+        except Exception as e:
+            # Redis es solo un atajo: si falla, se sigue con Postgres.
+            logger.warning("Result cache: Redis GET failed, using Postgres: %r", e)
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    async def _store(self, key: str, values: Dict) -> None:
+        if self.redis is None:
+            return
+        payload = json.dumps(values, ensure_ascii=False, separators=(",", ":"))
+        if len(payload) > self.max_value_bytes:
+            return
+        try:
+            await self._execute(lambda pipe: pipe.set(key, payload, ex=self.ttl))
+        except Exception as e:
+            logger.warning("Result cache: Redis SET failed: %r", e)
+
+    async def _execute(self, command):
+        """Ejecuta `command(pipe)` en un pipeline junto con los contadores pendientes."""
+        counts, self._pending_counts = self._pending_counts, {}
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for name, amount in counts.items():
+                pipe.hincrby(STATS_KEY, name, amount)
+            command(pipe)
+            return await pipe.execute()
+        except Exception:
+            # Los contadores se reintentan con el próximo comando.
+            for name, amount in counts.items():
+                self._pending_counts[name] = self._pending_counts.get(name, 0) + amount
+            raise
+
+    def _count(self, stage: str, outcome: str) -> None:
+        self.stats.add(stage, outcome)
+        if self.redis is not None:
+            name = f"{stage}:{outcome}"
+            self._pending_counts[name] = self._pending_counts.get(name, 0) + 1
+
+    async def shared_stats(self) -> Dict[str, float]:
+        """Contadores acumulados de todos los workers (hash `result_cache:stats`) y tasa de aciertos por etapa."""
+        counts = dict(self.stats.counts)
+        if self.redis is not None:
+            raw = (await self._execute(lambda pipe: pipe.hgetall(STATS_KEY)))[-1]
+            counts = {(k.decode() if isinstance(k, bytes) else k): int(v) for k, v in raw.items()}
+        stats: Dict[str, float] = dict(counts)
+        for stage in (OCR_STAGE, LLM_STAGE):
+            stats[f"{stage}:hit_rate"] = _hit_rate(counts, stage)
+        return stats
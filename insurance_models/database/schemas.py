@@ -66,6 +66,22 @@ class PaginatedJobDashboardResponse(BaseModel):
     limit: int
 
 
+class CursorJobDashboardResponse(BaseModel):
+    """
+    Respuesta del dashboard paginada por cursor (keyset). Cada página cuesta
+    lo mismo sin importar cuán atrás esté en el historial, a diferencia de
+    OFFSET. `next_cursor` se pasa tal cual para pedir la página siguiente.
+    El total es opcional y puede estar acotado: si `total_is_estimate` es
+    True, hay al menos `total_jobs` trabajos.
+    """
+    jobs: List[JobDashboardItem]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+    limit: int
+    total_jobs: Optional[int] = None
+    total_is_estimate: bool = False
+
+
 class JobDetailResponse(BaseModel):
     """Representa la vista detallada de un trabajo con sus resultados."""
     status: JobStatus
@@ -73,15 +89,6 @@ class JobDetailResponse(BaseModel):
 
 
 # --- Schemas para la comunicación interna (Redis Queues) ---
-
-class OcrQueueMessage(BaseModel):
-    """Mensaje para encolar un archivo para procesamiento OCR."""
-    job_file_id: int
-
-class LlmQueueMessage(BaseModel):
-    """Mensaje para encolar un resultado de OCR para procesamiento con LLM."""
-    job_file_id: int
-
-class AssemblyQueueMessage(BaseModel):
-    """Mensaje para encolar un trabajo para el ensamblaje final de resultados."""
-    job_id: int
\ No newline at end of file
+# Se definen una sola vez en `insurance_models.redis.queues` y se reexportan
+# aquí por compatibilidad con los servicios que los importan desde este módulo.
+from ..redis.queues import OcrQueueMessage, LlmQueueMessage, AssemblyQueueMessage  # noqa: F401, E402
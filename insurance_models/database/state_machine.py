@@ -0,0 +1,340 @@
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Dict, FrozenSet, Iterable, Mapping, Optional, Union
+
+from pydantic import BaseModel
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..redis.queues import ASSEMBLY_QUEUE, AssemblyQueueMessage
+from .models import Job, JobFile, JobStatus
+
+logger = logging.getLogger(__name__)
+
+S = JobStatus
+Transitions = Mapping[JobStatus, FrozenSet[JobStatus]]
+
+# --- Transiciones legales ---
+
+# Un archivo pasa por OCR y LLM; los estados *_FAILED admiten reintento.
+FILE_TRANSITIONS: Transitions = {
+    S.PENDING_UPLOAD: frozenset({S.PENDING, S.OCR_IN_PROGRESS, S.FAILED, S.CANCELLED}),
+    S.PENDING: frozenset({S.OCR_IN_PROGRESS, S.FAILED, S.CANCELLED}),
+    S.OCR_IN_PROGRESS: frozenset({S.OCR_COMPLETED, S.OCR_FAILED, S.CANCELLED}),
+    S.OCR_COMPLETED: frozenset({S.LLM_PROCESSING, S.CANCELLED}),
+    S.OCR_FAILED: frozenset({S.OCR_IN_PROGRESS, S.FAILED, S.CANCELLED}),
+    S.LLM_PROCESSING: frozenset({S.LLM_COMPLETED, S.LLM_FAILED, S.CANCELLED}),
+    S.LLM_FAILED: frozenset({S.LLM_PROCESSING, S.FAILED, S.CANCELLED}),
+    S.LLM_COMPLETED: frozenset(),
+    S.FAILED: frozenset(),
+    S.CANCELLED: frozenset(),
+}
+
+# El trabajo avanza con el archivo más atrasado y termina con el ensamblaje.
+JOB_TRANSITIONS: Transitions = {
+    S.PENDING_UPLOAD: frozenset({S.PENDING, S.OCR_IN_PROGRESS, S.FAILED, S.CANCELLED}),
+    S.PENDING: frozenset({S.OCR_IN_PROGRESS, S.FAILED, S.CANCELLED}),
+    S.OCR_IN_PROGRESS: frozenset({S.OCR_COMPLETED, S.LLM_PROCESSING, S.ASSEMBLING, S.FAILED, S.CANCELLED}),
+    S.OCR_COMPLETED: frozenset({S.LLM_PROCESSING, S.ASSEMBLING, S.FAILED, S.CANCELLED}),
+    S.LLM_PROCESSING: frozenset({S.LLM_COMPLETED, S.ASSEMBLING, S.FAILED, S.CANCELLED}),
+    S.LLM_COMPLETED: frozenset({S.ASSEMBLING, S.CANCELLED}),
+    S.ASSEMBLING: frozenset({S.COMPLETED, S.ASSEMBLY_FAILED, S.CANCELLED}),
+    S.ASSEMBLY_FAILED: frozenset({S.ASSEMBLING, S.FAILED, S.CANCELLED}),
+    S.OCR_FAILED: frozenset({S.FAILED, S.CANCELLED}),
+    S.LLM_FAILED: frozenset({S.FAILED, S.CANCELLED}),
+    S.COMPLETED: frozenset(),
+    S.FAILED: frozenset(),
+    S.CANCELLED: frozenset(),
+}
+
+TERMINAL_STATUSES = frozenset(status for status, targets in JOB_TRANSITIONS.items() if not targets)
+
+# Estados finales de un archivo para el contador de completitud.
+FILE_SUCCEEDED = frozenset({S.LLM_COMPLETED})
+FILE_FAILED = frozenset({S.FAILED, S.CANCELLED})
+
+# Estados del trabajo en los que el ensamblaje ya se encoló.
+ASSEMBLY_STARTED = frozenset({S.ASSEMBLING, S.ASSEMBLY_FAILED, S.COMPLETED, S.FAILED, S.CANCELLED})
+
+
+class TransitionError(ValueError):
+    """La transición pedida no es legal desde ninguno de los estados esperados."""
+
+
+def can_transition(current: JobStatus, target: JobStatus, transitions: Transitions = JOB_TRANSITIONS) -> bool:
+    return target in transitions.get(current, frozenset())
+
+def allowed_sources(target: JobStatus, transitions: Transitions = JOB_TRANSITIONS) -> FrozenSet[JobStatus]:
+    """Estados desde los que se puede llegar a `target`."""
+    return frozenset(source for source, targets in transitions.items() if target in targets)
+
+def _sources(target: JobStatus, expected, transitions: Transitions) -> FrozenSet[JobStatus]:
+    sources = allowed_sources(target, transitions)
+    if expected is not None:
+        expected = {expected} if isinstance(expected, JobStatus) else set(expected)
+        sources = sources & expected
+    if not sources:
+        raise TransitionError(f"No legal transition to {target.name} from {expected or 'any status'}")
+    return sources
+
+
+class JobStatusEvent(BaseModel):
+    """Cambio de estado publicado por pub/sub; `previous` solo si se conoce."""
+    job_id: int
+    user_id: str
+    status: JobStatus
+    previous: Optional[JobStatus] = None
+    at: datetime
+
+
+class FileStatusChange(BaseModel):
+    job_file_id: int
+    job_id: int
+    status: JobStatus
+    previous: Optional[JobStatus] = None
+
+
+# --- Transiciones atómicas en Postgres ---
+
+Expected = Union[JobStatus, Iterable[JobStatus], None]
+
+async def transition_job(session: AsyncSession, job_id: int, target: JobStatus,
+                         expected: Expected = None) -> Optional[JobStatusEvent]:
+    """
+    Cambia el estado del trabajo con un solo `UPDATE ... WHERE status IN
+    (...) RETURNING`, sin leerlo antes. Solo se aplica si el estado actual
+    es uno desde el que `target` es legal (y está en `expected`, si se da).
+
+    Devuelve el evento, o None si no se aplicó: el trabajo no existe u otro
+    proceso ya lo movió. El commit y `notify_transition` quedan a cargo de
+    quien llama, para no publicar un estado que después se revierte.
+
+    Raises:
+        TransitionError: si `target` no es alcanzable desde `expected`.
+    """
+    sources = _sources(target, expected, JOB_TRANSITIONS)
+    now = datetime.utcnow()
+    stmt = (
+        update(Job)
+        .where(Job.id == job_id, Job.status.in_(sources))
+        .values(status=target, updated_at=now)
+        .returning(Job.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    user_id = (await session.execute(stmt)).scalar_one_or_none()
+    if user_id is None:
+        return None
+    previous = next(iter(sources)) if len(sources) == 1 else None
+    return JobStatusEvent(job_id=job_id, user_id=user_id, status=target, previous=previous, at=now)
+
+async def transition_file(session: AsyncSession, job_file_id: int, target: JobStatus,
+                          expected: Expected = None) -> Optional[FileStatusChange]:
+    """Como `transition_job`, para `JobFile.status` con `FILE_TRANSITIONS`."""
+    sources = _sources(target, expected, FILE_TRANSITIONS)
+    stmt = (
+        update(JobFile)
+        .where(JobFile.id == job_file_id, JobFile.status.in_(sources))
+        .values(status=target)
+        .returning(JobFile.job_id)
+        .execution_options(synchronize_session=False)
+    )
+    job_id = (await session.execute(stmt)).scalar_one_or_none()
+    if job_id is None:
+        return None
+    previous = next(iter(sources)) if len(sources) == 1 else None
+    return FileStatusChange(job_file_id=job_file_id, job_id=job_id, status=target, previous=previous)
+
+
+# --- Notificaciones ---
+
+def job_channel(job_id: int) -> str:
+    return f"job_status:job:{job_id}"
+
+def user_channel(user_id: str) -> str:
+    return f"job_status:user:{user_id}"
+
+async def notify_transition(client, event: JobStatusEvent, response_cache=None) -> None:
+    """
+    Publica el evento en el canal del trabajo y en el del usuario (para el
+    dashboard), en un solo round-trip. Llamar después del commit.
+
+    Si se da `response_cache` (`ResponseCache`), invalida además el detalle y
+    el dashboard: `transition_job` usa un UPDATE de Core, que no dispara los
+    hooks del ORM.
+    """
+    # Primero se invalida: un cliente que reacciona al evento ya lee el estado nuevo.
+    if response_cache is not None:
+        await response_cache.invalidate_job(event.job_id)
+        await response_cache.invalidate_dashboard(event.user_id)
+    payload = event.model_dump_json()
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.publish(job_channel(event.job_id), payload)
+        pipe.publish(user_channel(event.user_id), payload)
+        await pipe.execute()
+
+async def listen_transitions(client, job_id: Optional[int] = None,
+                             user_id: Optional[str] = None) -> AsyncIterator[JobStatusEvent]:
+    """
+    Itera los cambios de estado de un trabajo o de todos los de un usuario
+    (ej: para un endpoint SSE/WebSocket que reemplace el polling). Usa su
+    propia conexión de pub/sub, que se cierra al terminar la iteración.
+    """
+    channels = [job_channel(job_id)] if job_id is not None else []
+    if user_id is not None:
+        channels.append(user_channel(user_id))
+    if not channels:
+        raise ValueError("listen_transitions needs a job_id or a user_id")
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(*channels)
+    try:
+        async for message in pubsub.listen():
+            if message["type"] == "message":
+                yield JobStatusEvent.model_validate_json(message["data"])
+    finally:
+        await pubsub.unsubscribe(*channels)
+        await pubsub.aclose()
+
+
+# --- Contador de completitud ---
+
+# Marca un archivo como terminado (una sola vez por archivo, aunque se
+# reintente) y, cuando terminan todos, encola el ensamblaje exactamente una vez.
+# Devuelve -1 si no hay contador, 1 si encoló y 0 en otro caso.
+_FILE_FINISHED_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return -1 end
+if redis.call('SADD', KEYS[2], ARGV[1]) == 0 then return 0 end
+redis.call('EXPIRE', KEYS[2], ARGV[6])
+redis.call('HINCRBY', KEYS[1], ARGV[2], 1)
+local total = tonumber(redis.call('HGET', KEYS[1], 'total'))
+if redis.call('SCARD', KEYS[2]) >= total and redis.call('HSETNX', KEYS[1], 'enqueued', 1) == 1 then
+    if ARGV[3] == 'stream' then
+        redis.call('XADD', KEYS[3], '*', ARGV[5], ARGV[4])
+    else
+        redis.call('LPUSH', KEYS[3], ARGV[4])
+    end
+    return 1
+end
+return 0
+"""
+
+# Reconstrucción del contador: solo si no existe. Si otro worker ya lo
+# reconstruyó (y quizás encoló), reescribirlo borraría `enqueued`.
+_REBUILD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+redis.call('HSET', KEYS[1], 'total', ARGV[1], 'done', ARGV[2], 'failed', ARGV[3])
+if ARGV[4] == '1' then redis.call('HSET', KEYS[1], 'enqueued', 1) end
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('DEL', KEYS[2])
+for i = 6, #ARGV, 1000 do
+    redis.call('SADD', KEYS[2], unpack(ARGV, i, math.min(i + 999, #ARGV)))
+end
+if #ARGV >= 6 then redis.call('EXPIRE', KEYS[2], ARGV[5]) end
+return 1
+"""
+
+DEFAULT_PROGRESS_TTL = 7 * 24 * 3600
+
+
+class CompletionTracker:
+    """
+    Contador por trabajo en Redis (`job_progress:{id}`: total, done, failed)
+    que reemplaza el "¿ya terminaron todos los archivos?" consultando
+    `job_files` en cada archivo.
+
+    - `start(job_id, n)` al crear los archivos del trabajo.
+    - `file_finished(job_id, job_file_id, failed)` cuando un archivo llega a
+      un estado final. El script que lo cuenta también encola el
+      `AssemblyQueueMessage` cuando termina el último, así que el encolado
+      ocurre exactamente una vez aunque varios workers terminen a la vez o un
+      mensaje se reprocese.
+
+    El ensamblaje se encola aunque haya archivos fallidos: decide el ensamblador.
+    """
+
+    def __init__(self, client, assembly_queue=None, ttl: int = DEFAULT_PROGRESS_TTL):
+        from ..redis.streams import PAYLOAD_FIELD, StreamQueue
+        from ..redis.transport import open_queue
+
+        self.client = client
+        self.queue = assembly_queue or open_queue(client, ASSEMBLY_QUEUE)
+        self.ttl = ttl
+        if isinstance(self.queue, StreamQueue):
+            self._mode, self._queue_key = "stream", self.queue.stream_name
+        else:
+            self._mode, self._queue_key = "list", self.queue.queue_name
+        self._stream_field = PAYLOAD_FIELD
+        self._finished = client.register_script(_FILE_FINISHED_SCRIPT)
+        self._rebuild = client.register_script(_REBUILD_SCRIPT)
+
+    def progress_key(self, job_id: int) -> str:
+        return f"job_progress:{job_id}"
+
+    def files_key(self, job_id: int) -> str:
+        return f"job_progress:{job_id}:files"
+
+    async def start(self, job_id: int, file_count: int) -> None:
+        if file_count < 1:
+            raise ValueError("A job needs at least one file")
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(self.progress_key(job_id), self.files_key(job_id))
+            pipe.hset(self.progress_key(job_id), mapping={"total": file_count, "done": 0, "failed": 0})
+            pipe.expire(self.progress_key(job_id), self.ttl)
+            await pipe.execute()
+
+    async def file_finished(self, job_id: int, job_file_id: int, failed: bool = False,
+                            session: Optional[AsyncSession] = None) -> bool:
+        """
+        Cuenta el archivo como terminado. Devuelve True si esta llamada encoló
+        el ensamblaje. Si el contador no existe (expiró o Redis se vació) y se
+        da `session`, se reconstruye una vez desde `job_files`.
+        """
+        result = await self._mark(job_id, job_file_id, failed)
+        if result == -1 and session is not None:
+            # Este archivo queda fuera de la reconstrucción aunque la sesión ya lo
+            # muestre terminado: lo cuenta `_mark`, que es quien encola.
+            await self.rebuild(session, job_id, pending_file_id=job_file_id)
+            result = await self._mark(job_id, job_file_id, failed)
+        if result == -1:
+            logger.warning("No completion counter for job %s; assembly not enqueued", job_id)
+        return result == 1
+
+    async def _mark(self, job_id: int, job_file_id: int, failed: bool) -> int:
+        payload = self.queue.encode(AssemblyQueueMessage(job_id=job_id))
+        return int(await self._finished(
+            keys=[self.progress_key(job_id), self.files_key(job_id), self._queue_key],
+            args=[job_file_id, "failed" if failed else "done", self._mode, payload, self._stream_field, self.ttl],
+        ))
+
+    async def rebuild(self, session: AsyncSession, job_id: int, pending_file_id: Optional[int] = None) -> bool:
+        """
+        Reconstruye el contador desde `job_files` (una consulta agregada).
+        `pending_file_id` se cuenta como no terminado, sea cual sea su estado.
+        Si el contador ya existe no lo toca (otro worker lo reconstruyó antes)
+        y devuelve False.
+        """
+        rows = (await session.execute(
+            select(JobFile.id, JobFile.status).where(JobFile.job_id == job_id)
+        )).all()
+        finished = [
+            (file_id, status) for file_id, status in rows
+            if status in FILE_SUCCEEDED | FILE_FAILED and file_id != pending_file_id
+        ]
+        job_status = (await session.execute(select(Job.status).where(Job.id == job_id))).scalar_one_or_none()
+        return bool(await self._rebuild(
+            keys=[self.progress_key(job_id), self.files_key(job_id)],
+            args=[
+                len(rows),
+                sum(status in FILE_SUCCEEDED for _, status in finished),
+                sum(status in FILE_FAILED for _, status in finished),
+                # Si el trabajo ya pasó al ensamblaje, no volver a encolarlo.
+                int(job_status in ASSEMBLY_STARTED),
+                self.ttl,
+                *(file_id for file_id, _ in finished),
+            ],
+        ))
+
+    async def progress(self, job_id: int) -> Optional[Dict[str, int]]:
+        raw = await self.client.hgetall(self.progress_key(job_id))
+        if not raw:
+            return None
+        return {(k.decode() if isinstance(k, bytes) else k): int(v) for k, v in raw.items()}
@@ -0,0 +1,134 @@
+import asyncio
+import functools
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Any, Callable, Dict, Iterable, List, Optional, TypeVar, Union
+
+from ..utils.lazy import LazyProvider
+from .client import R2Client
+
+T = TypeVar("T")
+
+# DeleteObjects acepta como máximo 1000 claves por llamada.
+DELETE_BATCH_SIZE = 1000
+
+
+class AsyncR2Client:
+    """
+    Cliente R2 para código asyncio (FastAPI, workers). Envuelve un `R2Client`
+    (boto3 síncrono) y ejecuta cada llamada en un `ThreadPoolExecutor`, así
+    las descargas y subidas no bloquean el event loop.
+
+    El executor tiene tantos hilos como conexiones el pool HTTP de botocore
+    (`R2_MAX_POOL_CONNECTIONS`), para que ningún hilo espere por un socket.
+    Se recomienda una sola instancia por proceso: `get_async_r2_client()`.
+    """
+
+    def __init__(self, client: Optional[R2Client] = None, max_workers: Optional[int] = None):
+        self.client = client or R2Client()
+        self.bucket_name = self.client.bucket_name
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or self.client.max_pool_connections,
+            thread_name_prefix="r2",
+        )
+
+    async def _run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    # --- Objetos ---
+
+    async def get_object(self, object_key: str) -> bytes:
+        """Descarga el objeto completo. El cuerpo se lee dentro del hilo del executor."""
+        def _get() -> bytes:
+            body = self.client.s3_client.get_object(Bucket=self.bucket_name, Key=object_key)["Body"]
+            try:
+                return body.read()
+            finally:
+                body.close()
+        return await self._run(_get)
+
+    async def put_object(self, object_key: str, body: bytes, content_type: Optional[str] = None) -> Dict[str, Any]:
+        """Sube `body` a `object_key`."""
+        params = {"Bucket": self.bucket_name, "Key": object_key, "Body": body}
+        if content_type:
+            params["ContentType"] = content_type
+        return await self._run(self.client.s3_client.put_object, **params)
+
+    async def head_object(self, object_key: str) -> Optional[Dict[str, Any]]:
+        """Devuelve los metadatos del objeto, o None si no existe."""
+        from botocore.exceptions import ClientError
+
+        try:
+            return await self._run(self.client.s3_client.head_object, Bucket=self.bucket_name, Key=object_key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    async def delete_objects(self, object_keys: Iterable[str]) -> List[str]:
+        """
+        Borra las claves en lotes de 1000 (en paralelo). Devuelve las claves
+        que no se pudieron borrar.
+        """
+        keys = list(object_keys)
+        batches = [keys[i:i + DELETE_BATCH_SIZE] for i in range(0, len(keys), DELETE_BATCH_SIZE)]
+
+        def _delete(batch: List[str]) -> List[str]:
+            response = self.client.s3_client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+            return [error["Key"] for error in response.get("Errors", [])]
+
+        results = await asyncio.gather(*(self._run(_delete, batch) for batch in batches))
+        return [key for failed in results for key in failed]
+
+    # --- Transferencias en streaming ---
+    # El TransferManager usa sus propios hilos para las partes; aquí solo se
+    # saca del event loop la llamada que las coordina.
+
+    async def download_to_file(self, object_key: str, fileobj: IO[bytes], max_concurrency: Optional[int] = None) -> None:
+        await self._run(self.client.download_to_file, object_key, fileobj, max_concurrency)
+
+    async def download_into(self, object_key: str, buffer: Union[bytearray, memoryview]) -> int:
+        return await self._run(self.client.download_into, object_key, buffer)
+
+    async def download_spooled(self, object_key: str, **kwargs: Any) -> tempfile.SpooledTemporaryFile:
+        return await self._run(self.client.download_spooled, object_key, **kwargs)
+
+    async def upload_file(self, object_key: str, fileobj: IO[bytes], content_type: Optional[str] = None,
+                          max_concurrency: Optional[int] = None) -> None:
+        await self._run(self.client.upload_file, object_key, fileobj, content_type, max_concurrency)
+
+    # --- URLs prefirmadas ---
+
+    async def generate_presigned_upload_url(self, object_key: str, expiration: int = 3600) -> str:
+        """Generate a presigned URL for uploading a file to R2."""
+        return await self._run(self.client.generate_presigned_upload_url, object_key, expiration)
+
+    async def generate_presigned_download_url(self, object_key: str, expiration: int = 3600) -> str:
+        """Generate a presigned URL for downloading a file from R2."""
+        return await self._run(self.client.generate_presigned_download_url, object_key, expiration)
+
+    async def generate_presigned_urls(self, object_keys: Iterable[str], op: str = "get_object",
+                                      expiration: int = 3600) -> Dict[str, str]:
+        """Firma local y en memoria: no necesita el executor."""
+        return self.client.generate_presigned_urls(object_keys, op, expiration)
+
+    def close(self, wait: bool = True) -> None:
+        """Detiene el executor. Las conexiones HTTP se liberan con el cliente boto3."""
+        self._executor.shutdown(wait=wait)
+
+
+# Un cliente (y un pool de conexiones) por proceso, construido en el primer uso.
+_async_r2_provider = LazyProvider(AsyncR2Client, name="async_r2_client")
+
+def get_async_r2_client() -> AsyncR2Client:
+    return _async_r2_provider.get()
+
+def reset_async_r2_client() -> None:
+    """Cierra el cliente actual; el siguiente acceso vuelve a leer el entorno."""
+    client = _async_r2_provider.reset()
+    if client is not None:
+        client.close(wait=False)
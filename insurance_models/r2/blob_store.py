@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional, Tuple
+
+from ..constants import BLOB_CACHE_MAX_BYTES, BLOB_MIN_OFFLOAD_BYTES
+from ..utils.lazy import LazyProvider, load_env
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depende del entorno
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Modos de almacenamiento de los blobs (texto OCR, salida cruda del LLM, resultado consolidado).
+INLINE_MODE = "inline"
+R2_MODE = "r2"
+
+# Extensión de la clave -> códec. La clave dice cómo descomprimir, sin metadatos extra.
+ZSTD_EXT = "zst"
+ZLIB_EXT = "zz"
+CODECS = {"zstd": ZSTD_EXT, "zlib": ZLIB_EXT}
+
+_warned_zlib_fallback = False
+
+def get_blob_storage_mode() -> str:
+    """BLOB_STORAGE_MODE: "inline" (por defecto) o "r2"."""
+    load_env()
+    mode = os.getenv("BLOB_STORAGE_MODE", INLINE_MODE).lower()
+    if mode not in (INLINE_MODE, R2_MODE):
+        raise ValueError(f"Unknown BLOB_STORAGE_MODE '{mode}'")
+    return mode
+
+def get_blob_codec() -> str:
+    """
+    BLOB_CODEC: "zstd" o "zlib". Define la extensión de las claves, así que
+    todos los servicios que comparten el bucket deben usar el mismo para que
+    la deduplicación funcione. Sin configurar se usa zstd si está instalado,
+    y si no zlib, avisando una vez por proceso.
+    """
+    global _warned_zlib_fallback
+    load_env()
+    codec = os.getenv("BLOB_CODEC", "").lower()
+    if not codec:
+        if zstandard is not None:
+            return "zstd"
+        if not _warned_zlib_fallback:
+            _warned_zlib_fallback = True
+            logger.warning("zstandard is not installed: blobs are stored with zlib (.%s keys), which does not "
+                           "deduplicate against zstd deployments; set BLOB_CODEC or install "
+                           "insurance-models[zstd]", ZLIB_EXT)
+        return "zlib"
+    if codec not in CODECS:
+        raise ValueError(f"Unknown BLOB_CODEC '{codec}'")
+    if codec == "zstd" and zstandard is None:
+        raise ImportError("BLOB_CODEC=zstd requires zstandard: pip install insurance-models[zstd]")
+    return codec
+
+def get_min_offload_bytes() -> int:
+    load_env()
+    return int(os.getenv("BLOB_MIN_OFFLOAD_BYTES", BLOB_MIN_OFFLOAD_BYTES))
+
+
+class BlobRef(NamedTuple):
+    """Lo que queda en Postgres de un blob guardado en R2."""
+    key: str
+    size: int
+    sha256: str
+
+
+def _compress(data: bytes, level: int, ext: str) -> bytes:
+    if ext == ZSTD_EXT:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    # zlib de la stdlib: más lento y menos compacto que zstd.
+    return zlib.compress(data, min(level, 9))
+
+def _decompress(data: bytes, ext: str) -> bytes:
+    if ext == ZSTD_EXT:
+        if zstandard is None:
+            raise ImportError("Reading zstd blobs requires zstandard: pip install insurance-models[zstd]")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if ext == ZLIB_EXT:
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown blob encoding '{ext}'")
+
+
+class BlobCache:
+    """LRU en memoria acotado por bytes (no por número de entradas)."""
+
+    def __init__(self, max_bytes: int = BLOB_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous)
+            self._entries[key] = data
+            self.current_bytes += len(data)
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+class BlobStore:
+    """
+    Guarda blobs grandes en R2, comprimidos (`codec`, ver `get_blob_codec`) y
+    direccionados por contenido: la clave es el SHA-256 del contenido sin
+    comprimir, así que el mismo texto se sube una sola vez aunque lo
+    referencien varios registros, y un blob nunca cambia bajo su clave.
+
+    Las lecturas pasan por un LRU local; como los blobs son inmutables, la
+    caché nunca queda desactualizada.
+    """
+
+    def __init__(self, client=None, prefix: str = "blobs", level: int = 3,
+                 cache: Optional[BlobCache] = None, codec: Optional[str] = None):
+        if codec is not None and codec not in CODECS:
+            raise ValueError(f"Unknown blob codec '{codec}'")
+        if client is None:
+            from .client import get_r2_client
+            client = get_r2_client()
+        self.client = client
+        self.prefix = prefix.strip("/")
+        self.level = level
+        self.codec = codec or get_blob_codec()
+        self.cache = cache if cache is not None else BlobCache()
+
+    def key_for(self, sha256: str, kind: str, ext: str) -> str:
+        return f"{self.prefix}/{kind}/{sha256[:2]}/{sha256}.{ext}"
+
+    # --- Escritura ---
+
+    def put(self, data: bytes, kind: str) -> BlobRef:
+        """Sube `data` (si no existe ya) y devuelve su referencia."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        ext = CODECS[self.codec]
+        key = self.key_for(sha256, kind, ext)
+        # Comprimir cuesta más que el HEAD: solo si hay que subirlo.
+        if not self._exists(key):
+            self.client.s3_client.put_object(
+                Bucket=self.client.bucket_name, Key=key, Body=_compress(data, self.level, ext),
+                Metadata={"sha256": sha256, "size": str(len(data))},
+            )
+        self.cache.put(key, data)
+        return BlobRef(key, len(data), sha256)
+
+    async def put_async(self, data: bytes, kind: str) -> BlobRef:
+        """Como `put`, con la compresión y la subida en el executor."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.put, data, kind)
+
+    def put_text(self, text: str, kind: str) -> BlobRef:
+        return self.put(text.encode("utf-8"), kind)
+
+    def put_json(self, value: Any, kind: str) -> BlobRef:
+        return self.put(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), kind)
+
+    def _exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.s3_client.head_object(Bucket=self.client.bucket_name, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    # --- Lectura ---
+
+    def get(self, key: str, sha256: Optional[str] = None) -> bytes:
+        """
+        Devuelve el contenido descomprimido. Si se da `sha256`, se verifica
+        contra el contenido descargado.
+        """
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+        body = self.client.s3_client.get_object(Bucket=self.client.bucket_name, Key=key)["Body"]
+        try:
+            compressed = body.read()
+        finally:
+            body.close()
+        data = _decompress(compressed, key.rsplit(".", 1)[-1])
+        if sha256 is not None and hashlib.sha256(data).hexdigest() != sha256:
+            raise ValueError(f"Blob '{key}' does not match its sha256")
+        self.cache.put(key, data)
+        return data
+
+    def get_text(self, key: str, sha256: Optional[str] = None) -> str:
+        return self.get(key, sha256).decode("utf-8")
+
+    def get_json(self, key: str, sha256: Optional[str] = None) -> Any:
+        return json.loads(self.get(key, sha256))
+
+    async def get_async(self, key: str, sha256: Optional[str] = None) -> bytes:
+        """Como `get`, pero la descarga corre fuera del event loop; los aciertos de caché no."""
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, key, sha256)
+
+
+_blob_store_provider = LazyProvider(BlobStore, name="blob_store")
+
+def get_blob_store() -> BlobStore:
+    return _blob_store_provider.get()
+
+def reset_blob_store() -> None:
+    _blob_store_provider.reset()
+
+def should_offload(size: int) -> bool:
+    """True si el modo es "r2" y el blob supera `BLOB_MIN_OFFLOAD_BYTES`."""
+    return get_blob_storage_mode() == R2_MODE and size >= get_min_offload_bytes()
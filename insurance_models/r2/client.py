@@ -1,13 +1,25 @@
 import os
-import boto3
-from botocore.client import Config
-from botocore.exceptions import ClientError
-from dotenv import load_dotenv
+import tempfile
+from typing import IO, Dict, Iterable, Iterator, Optional, Union
 
-load_dotenv()
+from ..constants import (
+    R2_MULTIPART_CHUNK_BYTES, R2_MULTIPART_THRESHOLD_BYTES,
+    R2_STREAM_CHUNK_BYTES, SPOOL_MAX_MEMORY_BYTES,
+)
+from ..utils.lazy import LazyProvider, load_env
+from .presign import PresignedUrlCache, SigV4Presigner, presign_many
+
+# Conexiones HTTP por cliente (pool de urllib3 de botocore); su valor por defecto es 10.
+DEFAULT_MAX_POOL_CONNECTIONS = 10
+
+def get_max_pool_connections() -> int:
+    """Tamaño del pool de conexiones a R2 por proceso (R2_MAX_POOL_CONNECTIONS)."""
+    load_env()
+    return int(os.getenv("R2_MAX_POOL_CONNECTIONS", DEFAULT_MAX_POOL_CONNECTIONS))
 
 class R2Client:
-    def __init__(self):
+    def __init__(self, max_pool_connections: int | None = None):
+        load_env()
         self.access_key_id = os.getenv("R2_ACCESS_KEY_ID")
         self.secret_access_key = os.getenv("R2_SECRET_ACCESS_KEY")
         self.bucket_name = os.getenv("R2_BUCKET_NAME")
@@ -15,17 +27,32 @@ class R2Client:
         
         if not all([self.access_key_id, self.secret_access_key, self.bucket_name, self.endpoint_url]):
             raise ValueError("One or more R2 environment variables are not set.")
+        self.max_pool_connections = max_pool_connections or get_max_pool_connections()
+
+        # boto3 se importa aquí: crear su sesión es lo más caro del arranque.
+        import boto3
+        from botocore.client import Config
 
         self.s3_client = boto3.client(
             's3',
             endpoint_url=self.endpoint_url,
             aws_access_key_id=self.access_key_id,
             aws_secret_access_key=self.secret_access_key,
-            config=Config(signature_version='s3v4')
+            config=Config(signature_version='s3v4', max_pool_connections=self.max_pool_connections)
         )
+        self.presigner = SigV4Presigner(
+            self.access_key_id,
+            self.secret_access_key,
+            self.endpoint_url,
+            self.bucket_name,
+            region=self.s3_client.meta.region_name,
+        )
+        self.presigned_url_cache = PresignedUrlCache()
 
     def generate_presigned_upload_url(self, object_key: str, expiration: int = 3600) -> str:
         """Generate a presigned URL for uploading a file to R2."""
+        from botocore.exceptions import ClientError
+
         try:
             response = self.s3_client.generate_presigned_url(
                 'put_object',
@@ -39,6 +66,8 @@ class R2Client:
 
     def generate_presigned_download_url(self, object_key: str, expiration: int = 3600) -> str:
         """Generate a presigned URL for downloading a file from R2."""
+        from botocore.exceptions import ClientError
+
         try:
             response = self.s3_client.generate_presigned_url(
                 'get_object',
@@ -50,8 +79,113 @@ class R2Client:
             print(f"Error generating presigned download URL: {e}")
             return None
 
-# Singleton instance
-r2_client = R2Client()
+    def generate_presigned_urls(self, object_keys: Iterable[str], op: str = 'get_object',
+                                expiration: int = 3600, use_cache: bool = True) -> Dict[str, str]:
+        """
+        Genera URLs prefirmadas para un lote de claves (ej: los archivos de un
+        `JobCreateRequest`), firmando localmente con la clave SigV4 precalculada.
+        Con `use_cache`, reutiliza las URLs que aún tienen al menos la mitad de
+        su validez, útil para los links de descarga del dashboard.
+        """
+        cache = self.presigned_url_cache if use_cache else None
+        return presign_many(self.presigner, object_keys, op, expiration, cache)
+
+    # --- Transferencias en streaming ---
+    # Ningún método carga el objeto completo en memoria: el uso de memoria
+    # queda acotado por el tamaño de chunk y la concurrencia, no por el archivo.
+
+    def transfer_config(self, max_concurrency: Optional[int] = None):
+        """
+        Configuración del TransferManager de boto3: sobre el umbral, las subidas
+        usan multipart con partes concurrentes y las descargas GETs por rangos
+        en paralelo. La concurrencia nunca supera el pool de conexiones.
+        """
+        from boto3.s3.transfer import TransferConfig
+
+        concurrency = min(max_concurrency or self.max_pool_connections, self.max_pool_connections)
+        return TransferConfig(
+            multipart_threshold=R2_MULTIPART_THRESHOLD_BYTES,
+            multipart_chunksize=R2_MULTIPART_CHUNK_BYTES,
+            max_concurrency=concurrency,
+            use_threads=concurrency > 1,
+        )
+
+    def iter_object_chunks(self, object_key: str, chunk_size: int = R2_STREAM_CHUNK_BYTES,
+                           byte_range: Optional[tuple] = None) -> Iterator[bytes]:
+        """
+        Itera el cuerpo del objeto en chunks. `byte_range=(inicio, fin)` (fin
+        inclusive) descarga solo ese rango, para descargas por partes.
+        """
+        params = {'Bucket': self.bucket_name, 'Key': object_key}
+        if byte_range is not None:
+            params['Range'] = f"bytes={byte_range[0]}-{byte_range[1]}"
+        body = self.s3_client.get_object(**params)['Body']
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def download_to_file(self, object_key: str, fileobj: IO[bytes], max_concurrency: Optional[int] = None) -> None:
+        """Descarga el objeto en `fileobj` (debe admitir seek si el objeto supera el umbral)."""
+        self.s3_client.download_fileobj(
+            self.bucket_name, object_key, fileobj, Config=self.transfer_config(max_concurrency)
+        )
+
+    def download_into(self, object_key: str, buffer: Union[bytearray, memoryview]) -> int:
+        """
+        Escribe el objeto en un buffer preasignado (ej: `bytearray(size)` o un
+        memoryview sobre memoria compartida) y devuelve los bytes escritos.
+        """
+        view = memoryview(buffer).cast("B")
+        offset = 0
+        for chunk in self.iter_object_chunks(object_key):
+            end = offset + len(chunk)
+            if end > len(view):
+                raise ValueError(f"Buffer of {len(view)} bytes is too small for '{object_key}'")
+            view[offset:end] = chunk
+            offset = end
+        return offset
+
+    def download_spooled(self, object_key: str, max_memory: int = SPOOL_MAX_MEMORY_BYTES,
+                         max_concurrency: Optional[int] = None) -> tempfile.SpooledTemporaryFile:
+        """
+        Descarga en un `SpooledTemporaryFile`: en memoria hasta `max_memory` y en
+        disco por encima. Devuelve el archivo posicionado al inicio; cerrarlo
+        (o usarlo como context manager) libera el espacio.
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        try:
+            self.download_to_file(object_key, spool, max_concurrency)
+        except BaseException:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool
+
+    def upload_file(self, object_key: str, fileobj: IO[bytes], content_type: Optional[str] = None,
+                    max_concurrency: Optional[int] = None) -> None:
+        """
+        Sube `fileobj` leyéndolo por partes. Sobre el umbral usa multipart con
+        partes concurrentes; se leen a lo más `max_concurrency` partes a la vez.
+        """
+        extra_args = {'ContentType': content_type} if content_type else None
+        self.s3_client.upload_fileobj(
+            fileobj, self.bucket_name, object_key,
+            ExtraArgs=extra_args, Config=self.transfer_config(max_concurrency)
+        )
+
+# Singleton perezoso: se construye en la primera llamada a get_r2_client().
+_r2_provider = LazyProvider(R2Client, name="r2_client")
 
 def get_r2_client() -> R2Client:
-    return r2_client
+    return _r2_provider.get()
+
+def reset_r2_client() -> None:
+    """Olvida el cliente actual; el siguiente acceso vuelve a leer el entorno."""
+    _r2_provider.reset()
+
+def __getattr__(name: str):
+    # Compatibilidad con `from .client import r2_client`.
+    if name == "r2_client":
+        return get_r2_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,152 @@
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+ALGORITHM = "AWS4-HMAC-SHA256"
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+# Operación de boto3 -> método HTTP
+OPERATION_METHODS = {
+    "get_object": "GET",
+    "put_object": "PUT",
+    "head_object": "HEAD",
+    "delete_object": "DELETE",
+}
+
+# SigV4 permite como máximo 7 días de validez.
+MAX_EXPIRATION_SECONDS = 7 * 24 * 3600
+
+
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode(), hashlib.sha256).digest()
+
+
+class SigV4Presigner:
+    """
+    Genera URLs prefirmadas SigV4 (query string, path-style) sin pasar por la
+    maquinaria de botocore. Produce las mismas URLs que
+    `s3_client.generate_presigned_url` para un mismo instante.
+
+    La clave de firma depende solo de la fecha, región y servicio, así que se
+    deriva una vez al día; cada URL cuesta luego un solo HMAC.
+    """
+
+    def __init__(self, access_key_id: str, secret_access_key: str, endpoint_url: str,
+                 bucket_name: str, region: str = "us-east-1", service: str = "s3"):
+        self.access_key_id = access_key_id
+        self._secret = ("AWS4" + secret_access_key).encode()
+        parts = urlsplit(endpoint_url)
+        self._scheme = parts.scheme
+        # Igual que botocore, el header host omite el puerto por defecto del esquema.
+        default_port = {"https": 443, "http": 80}.get(parts.scheme)
+        self._host = parts.hostname if parts.port == default_port else parts.netloc
+        self._base_path = parts.path.rstrip("/")
+        self.bucket_name = bucket_name
+        self.region = region
+        self.service = service
+        self._lock = threading.Lock()
+        self._signing_key: Tuple[str, bytes] = ("", b"")
+
+    def _key_for(self, datestamp: str) -> bytes:
+        cached_date, key = self._signing_key
+        if cached_date == datestamp:
+            return key
+        key = _hmac(_hmac(_hmac(_hmac(self._secret, datestamp), self.region), self.service), "aws4_request")
+        with self._lock:
+            self._signing_key = (datestamp, key)
+        return key
+
+    def presign(self, object_key: str, method: str = "GET", expiration: int = 3600,
+                now: Optional[datetime] = None) -> str:
+        """Devuelve la URL prefirmada para `object_key`."""
+        if not 0 < expiration <= MAX_EXPIRATION_SECONDS:
+            raise ValueError(f"Expiration must be between 1 and {MAX_EXPIRATION_SECONDS} seconds")
+        now = now or datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        datestamp = amz_date[:8]
+        scope = f"{datestamp}/{self.region}/{self.service}/aws4_request"
+
+        path = quote(f"{self._base_path}/{self.bucket_name}/{object_key}", safe="/~")
+        query = {
+            "X-Amz-Algorithm": ALGORITHM,
+            "X-Amz-Credential": f"{self.access_key_id}/{scope}",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(expiration),
+            "X-Amz-SignedHeaders": "host",
+        }
+        canonical_query = "&".join(
+            f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(query.items())
+        )
+        canonical_request = "\n".join([
+            method, path, canonical_query, f"host:{self._host}", "", "host", UNSIGNED_PAYLOAD,
+        ])
+        string_to_sign = "\n".join([
+            ALGORITHM, amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ])
+        signature = hmac.new(self._key_for(datestamp), string_to_sign.encode(), hashlib.sha256).hexdigest()
+        return f"{self._scheme}://{self._host}{path}?{canonical_query}&X-Amz-Signature={signature}"
+
+
+class PresignedUrlCache:
+    """
+    Caché LRU de URLs prefirmadas. Una URL se reutiliza mientras le quede al
+    menos `min_remaining_fraction` de la validez pedida; así un link del
+    dashboard no se vuelve a firmar en cada vista, pero nunca se entrega uno
+    a punto de expirar.
+    """
+
+    def __init__(self, max_entries: int = 10_000, min_remaining_fraction: float = 0.5):
+        self.max_entries = max_entries
+        self.min_remaining_fraction = min_remaining_fraction
+        self._entries: "OrderedDict[Tuple[str, str, int], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, method: str, object_key: str, expiration: int, now: Optional[float] = None) -> Optional[str]:
+        now = now if now is not None else time.time()
+        cache_key = (method, object_key, expiration)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[1] - now >= expiration * self.min_remaining_fraction:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, method: str, object_key: str, expiration: int, url: str, signed_at: float) -> None:
+        with self._lock:
+            self._entries[(method, object_key, expiration)] = (url, signed_at + expiration)
+            self._entries.move_to_end((method, object_key, expiration))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def presign_many(presigner: SigV4Presigner, object_keys: Iterable[str], operation: str, expiration: int,
+                 cache: Optional[PresignedUrlCache] = None) -> Dict[str, str]:
+    """Firma un lote de claves con un mismo instante, usando la caché si se da."""
+    try:
+        method = OPERATION_METHODS[operation]
+    except KeyError:
+        raise ValueError(f"Unsupported presign operation '{operation}'")
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    timestamp = now.timestamp()
+    urls = {}
+    for object_key in object_keys:
+        url = cache.get(method, object_key, expiration, timestamp) if cache is not None else None
+        if url is None:
+            url = presigner.presign(object_key, method, expiration, now)
+            if cache is not None:
+                cache.put(method, object_key, expiration, url, timestamp)
+        urls[object_key] = url
+    return urls
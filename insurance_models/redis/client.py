@@ -1,16 +1,51 @@
 import os
 import redis.asyncio as redis
-from dotenv import load_dotenv
 
-load_dotenv()
+from ..utils.lazy import LazyProvider, load_env
 
-REDIS_URL = os.getenv("REDIS_URL")
+def get_redis_url() -> str:
+    """Lee REDIS_URL del entorno, cargando .env si hace falta."""
+    load_env()
+    redis_url = os.getenv("REDIS_URL")
+    if not redis_url:
+        raise ValueError("REDIS_URL environment variable is not set")
+    return redis_url
 
-if not REDIS_URL:
-    raise ValueError("REDIS_URL environment variable is not set")
+def _build_redis_client() -> redis.Redis:
+    return redis.from_url(get_redis_url(), decode_responses=True)
 
-redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+def _build_redis_bytes_client() -> redis.Redis:
+    return redis.from_url(get_redis_url(), decode_responses=False)
+
+_redis_provider = LazyProvider(_build_redis_client, name="redis_client")
+_redis_bytes_provider = LazyProvider(_build_redis_bytes_client, name="redis_bytes_client")
+
+def get_redis() -> redis.Redis:
+    """Devuelve el cliente Redis compartido, creándolo en el primer uso."""
+    return _redis_provider.get()
+
+def get_redis_bytes() -> redis.Redis:
+    """
+    Cliente en modo bytes (`decode_responses=False`) para payloads binarios,
+    ej: colas con `BinaryCodec`. Las respuestas no se decodifican a str.
+    """
+    return _redis_bytes_provider.get()
+
+async def reset_redis_client() -> None:
+    """Cierra los clientes actuales; el siguiente acceso crea uno nuevo."""
+    for provider in (_redis_provider, _redis_bytes_provider):
+        client = provider.reset()
+        if client is not None:
+            await client.aclose()
+
+def __getattr__(name: str):
+    # Compatibilidad con `from .client import redis_client` sin construir al importar.
+    if name == "redis_client":
+        return get_redis()
+    if name == "REDIS_URL":
+        return get_redis_url()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 async def get_redis_client() -> redis.Redis:
     """Dependency to get a Redis client."""
-    return redis_client
+    return get_redis()
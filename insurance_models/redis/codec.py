@@ -0,0 +1,242 @@
+import struct
+import time
+from dataclasses import dataclass
+from typing import Dict, Generic, NamedTuple, Optional, Sequence, Tuple, Type, TypeVar, Union
+
+from pydantic import BaseModel
+
+from ..utils.tracing import SpanContext, current_traceparent
+from .queues import AssemblyQueueMessage, LlmQueueMessage, OcrQueueMessage
+
+M = TypeVar("M", bound=BaseModel)
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+# --- Envelope binario ---
+# v1: magic (2s) | versión del envelope (B) | tag del tipo (B) | versión del schema (H) | enqueued_at (d)
+# v2: v1 + trace_id (16s) | span_id (8s) | trace flags (B); ids en cero = sin traza
+# Se escribe v1 por defecto: los consumidores anteriores no leen v2. La traza
+# en el envelope es opt-in (`BinaryCodec(envelope_version=TRACED_ENVELOPE_VERSION)`)
+# una vez desplegados todos los consumidores; ambas versiones se decodifican siempre.
+MAGIC = b"IM"
+ENVELOPE_VERSION = 1
+TRACED_ENVELOPE_VERSION = 2
+_HEADERS = {1: struct.Struct(">2sBBHd"), 2: struct.Struct(">2sBBHd16s8sB")}
+HEADER_SIZE = _HEADERS[ENVELOPE_VERSION].size
+_NO_TRACE = (bytes(16), bytes(8), 0)
+
+# Metadatos que viajan en el header binario y no en el payload.
+_ENVELOPE_FIELDS = {"trace_context", "enqueued_at"}
+
+# Tipos sin layout fijo se serializan como JSON después del header.
+_JSON_LAYOUT = None
+
+
+@dataclass(frozen=True)
+class MessageSpec:
+    """Describe cómo se empaqueta un tipo de mensaje en una versión de schema."""
+    tag: int
+    model: Type[BaseModel]
+    version: int
+    fields: Tuple[str, ...] = ()
+    layout: Optional[struct.Struct] = _JSON_LAYOUT
+
+
+class Envelope(NamedTuple, Generic[M]):
+    """
+    Mensaje decodificado junto con los metadatos del envelope. Es una tupla
+    (no un dataclass) porque se construye una vez por mensaje en la ruta caliente.
+    """
+    message: M
+    schema_version: int
+    enqueued_at: Optional[float] = None
+    trace_context: Optional[str] = None
+
+    def queue_latency(self, now: Optional[float] = None) -> Optional[float]:
+        """Segundos transcurridos desde que el mensaje se encoló (None si se desconoce)."""
+        if self.enqueued_at is None:
+            return None
+        return (now if now is not None else time.time()) - self.enqueued_at
+
+
+class MessageRegistry:
+    """
+    Registro canónico de los mensajes de las colas: asigna a cada modelo un
+    tag de tipo y una versión de schema, y guarda todas las versiones
+    registradas para poder decodificar mensajes antiguos.
+    """
+
+    def __init__(self):
+        self._by_tag: Dict[Tuple[int, int], MessageSpec] = {}
+        self._latest: Dict[Type[BaseModel], MessageSpec] = {}
+
+    def register(
+        self,
+        tag: int,
+        model: Type[BaseModel],
+        version: int = 1,
+        fields: Sequence[str] = (),
+        fmt: Optional[str] = None,
+    ) -> MessageSpec:
+        """
+        Registra `model` con su `tag`. Si se da `fmt` (formato de `struct`),
+        los `fields` se empaquetan en binario; si no, el payload es JSON.
+        """
+        if not 0 < tag < 256:
+            raise ValueError("Message tags must fit in one byte (1-255)")
+        if (tag, version) in self._by_tag:
+            raise ValueError(f"Tag {tag} version {version} is already registered")
+        layout = struct.Struct(fmt) if fmt else _JSON_LAYOUT
+        if layout is not None and len(layout.unpack(bytes(layout.size))) != len(fields):
+            raise ValueError(f"Format '{fmt}' does not match fields {tuple(fields)}")
+        spec = MessageSpec(tag, model, version, tuple(fields), layout)
+        self._by_tag[(tag, version)] = spec
+        current = self._latest.get(model)
+        if current is None or current.version < version:
+            self._latest[model] = spec
+        return spec
+
+    def spec_for(self, model: Type[BaseModel]) -> MessageSpec:
+        try:
+            return self._latest[model]
+        except KeyError:
+            raise ValueError(f"{model.__name__} is not a registered queue message")
+
+    def spec_for_tag(self, tag: int, version: int) -> MessageSpec:
+        try:
+            return self._by_tag[(tag, version)]
+        except KeyError:
+            raise ValueError(f"Unknown message tag {tag} version {version}")
+
+
+MESSAGE_REGISTRY = MessageRegistry()
+MESSAGE_REGISTRY.register(1, OcrQueueMessage, fields=("job_file_id",), fmt=">q")
+MESSAGE_REGISTRY.register(2, LlmQueueMessage, fields=("job_file_id",), fmt=">q")
+MESSAGE_REGISTRY.register(3, AssemblyQueueMessage, fields=("job_id",), fmt=">q")
+
+
+def encode_message(message: BaseModel, enqueued_at: Optional[float] = None,
+                   registry: MessageRegistry = MESSAGE_REGISTRY,
+                   envelope_version: int = ENVELOPE_VERSION) -> bytes:
+    """
+    Empaqueta el mensaje en el envelope binario compacto (v1 por defecto).
+    En v2 el header lleva el contexto de traza del mensaje o, si no tiene, el
+    del span activo.
+    """
+    spec = registry.spec_for(type(message))
+    if enqueued_at is None:
+        enqueued_at = getattr(message, "enqueued_at", None) or time.time()
+    if envelope_version == 2:
+        context = SpanContext.from_traceparent(getattr(message, "trace_context", None) or current_traceparent())
+        header = _HEADERS[2].pack(MAGIC, 2, spec.tag, spec.version, enqueued_at,
+                              *(context.to_bytes() if context is not None else _NO_TRACE))
+    elif envelope_version == 1:
+        header = _HEADERS[1].pack(MAGIC, 1, spec.tag, spec.version, enqueued_at)
+    else:
+        raise ValueError(f"Unsupported envelope version {envelope_version}")
+    if spec.layout is None:
+        return header + message.model_dump_json(exclude=_ENVELOPE_FIELDS).encode()
+    return header + spec.layout.pack(*(getattr(message, name) for name in spec.fields))
+
+
+def decode_message(data: Buffer, registry: MessageRegistry = MESSAGE_REGISTRY) -> Envelope:
+    """
+    Decodifica un envelope binario (v1 o v2). Lee directamente del buffer con
+    `unpack_from`, sin copiar el payload en los tipos con layout fijo.
+    """
+    try:
+        envelope_version = data[2]
+        header = _HEADERS[envelope_version]
+        magic, _, tag, version, enqueued_at, *trace = header.unpack_from(data, 0)
+    except KeyError:
+        raise ValueError(f"Unsupported envelope version {envelope_version}")
+    except (IndexError, struct.error):
+        raise ValueError("Truncated queue message header")
+    if magic != MAGIC:
+        raise ValueError("Not a binary queue message")
+    trace_context = None
+    if trace and trace[0] != _NO_TRACE[0]:
+        # Equivale a `SpanContext.from_bytes(...).traceparent`, sin el objeto intermedio.
+        trace_context = f"00-{trace[0].hex()}-{trace[1].hex()}-{trace[2] & 1:02x}"
+    spec = registry.spec_for_tag(tag, version)
+    if spec.layout is None:
+        message = spec.model.model_validate_json(bytes(memoryview(data)[header.size:]))
+        if trace_context is not None and "trace_context" in spec.model.model_fields:
+            message.trace_context = trace_context
+    else:
+        try:
+            values = spec.layout.unpack_from(data, header.size)
+        except struct.error:
+            raise ValueError(f"Truncated payload for {spec.model.__name__}")
+        fields = dict(zip(spec.fields, values))
+        if trace_context is not None and "trace_context" in spec.model.model_fields:
+            fields["trace_context"] = trace_context
+        # Validar con el validador del core es más rápido que `model_construct`.
+        message = spec.model.__pydantic_validator__.validate_python(fields)
+    return Envelope(message, version, enqueued_at, trace_context)
+
+
+def is_binary_message(data: Buffer) -> bool:
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:2]) == MAGIC
+
+
+# --- Codecs para las colas ---
+
+class JsonCodec:
+    """Codec por defecto: JSON en texto, compatible con clientes `decode_responses=True`."""
+
+    def encode(self, message: BaseModel) -> str:
+        message = _with_envelope_fields(message)
+        # Sin traza activa no se escribe `"trace_context": null` en cada mensaje.
+        exclude = {"trace_context"} if getattr(message, "trace_context", "") is None else None
+        return message.model_dump_json(exclude=exclude)
+
+    def decode(self, raw, model: Type[M]) -> Envelope[M]:
+        return _json_envelope(model.model_validate_json(raw))
+
+
+def _with_envelope_fields(message: BaseModel) -> BaseModel:
+    """Completa `enqueued_at` y `trace_context` (del span activo) si el mensaje los admite y no los trae."""
+    fields = type(message).model_fields
+    update = {}
+    if "enqueued_at" in fields and message.enqueued_at is None:
+        update["enqueued_at"] = time.time()
+    if "trace_context" in fields and message.trace_context is None:
+        traceparent = current_traceparent()
+        if traceparent is not None:
+            update["trace_context"] = traceparent
+    return message.model_copy(update=update) if update else message
+
+def _json_envelope(message: BaseModel) -> Envelope:
+    return Envelope(message, 0, getattr(message, "enqueued_at", None), getattr(message, "trace_context", None))
+
+
+class BinaryCodec:
+    """
+    Codec binario con envelope versionado. Requiere un cliente Redis en modo
+    bytes (`get_redis_bytes()`). Acepta también mensajes JSON antiguos, para
+    poder cambiar de codec con colas que aún tienen mensajes en JSON.
+    """
+
+    def __init__(self, registry: MessageRegistry = MESSAGE_REGISTRY, envelope_version: int = ENVELOPE_VERSION):
+        # v1 por defecto; `envelope_version=2` agrega la traza al header cuando
+        # ya no quedan consumidores que solo leen v1. Ambos se decodifican siempre.
+        if envelope_version not in _HEADERS:
+            raise ValueError(f"Unsupported envelope version {envelope_version}")
+        self.registry = registry
+        self.envelope_version = envelope_version
+
+    def encode(self, message: BaseModel) -> bytes:
+        return encode_message(message, registry=self.registry, envelope_version=self.envelope_version)
+
+    def decode(self, raw, model: Type[M]) -> Envelope[M]:
+        if not is_binary_message(raw):
+            return _json_envelope(model.model_validate_json(raw))
+        envelope = decode_message(raw, registry=self.registry)
+        if not isinstance(envelope.message, model):
+            raise ValueError(f"Expected {model.__name__}, got {type(envelope.message).__name__}")
+        return envelope
+
+
+JSON_CODEC = JsonCodec()
+BINARY_CODEC = BinaryCodec()
@@ -1,3 +1,6 @@
+import os
+from typing import Dict, Optional, Type
+
 from pydantic import BaseModel
 
 # Define queue names as constants to avoid typos
@@ -13,12 +16,96 @@ ASSEMBLY_PROCESSING_QUEUE = "assembly_processing_queue"
 # Pydantic models for message payloads
 # Using integers for IDs now
 
-class OcrQueueMessage(BaseModel):
+# Estas son las definiciones canónicas; `database.schemas` las reexporta y
+# `codec.MESSAGE_REGISTRY` les asigna su tag y versión de schema.
+
+class QueueMessage(BaseModel):
+    """
+    Base de los mensajes de las colas. `trace_context` (header W3C
+    `traceparent`) y `enqueued_at` los completa el codec al encolar, para
+    medir la espera en cola y continuar la traza en el consumidor
+    (ver `utils.tracing`). Los consumidores antiguos los ignoran.
+    """
+    trace_context: Optional[str] = None
+    enqueued_at: Optional[float] = None
+
+class OcrQueueMessage(QueueMessage):
+    """Mensaje para encolar un archivo para procesamiento OCR."""
     job_file_id: int
 
-class LlmQueueMessage(BaseModel):
+class LlmQueueMessage(QueueMessage):
+    """Mensaje para encolar un resultado de OCR para procesamiento con LLM."""
     job_file_id: int
 
-class AssemblyQueueMessage(BaseModel):
+class AssemblyQueueMessage(QueueMessage):
+    """Mensaje para encolar un trabajo para el ensamblaje final de resultados."""
     # CORRECCIÓN: 'ints' cambiado a 'int'
-    job_id: int
\ No newline at end of file
+    job_id: int
+
+# Cola de trabajo -> cola de procesamiento asociada
+PROCESSING_QUEUES: Dict[str, str] = {
+    OCR_QUEUE: OCR_PROCESSING_QUEUE,
+    LLM_QUEUE: LLM_PROCESSING_QUEUE,
+    ASSEMBLY_QUEUE: ASSEMBLY_PROCESSING_QUEUE,
+}
+
+# Cola de trabajo -> modelo de su mensaje
+QUEUE_MESSAGE_MODELS: Dict[str, Type[BaseModel]] = {
+    OCR_QUEUE: OcrQueueMessage,
+    LLM_QUEUE: LlmQueueMessage,
+    ASSEMBLY_QUEUE: AssemblyQueueMessage,
+}
+
+# Transportes disponibles: listas (patrón BRPOPLPUSH) o Redis Streams con consumer groups
+LIST_TRANSPORT = "list"
+STREAM_TRANSPORT = "stream"
+
+# Transporte por defecto de cada cola; se puede cambiar por cola con la
+# variable de entorno QUEUE_TRANSPORT_<NOMBRE>, ej: QUEUE_TRANSPORT_LLM_QUEUE=stream
+QUEUE_TRANSPORTS: Dict[str, str] = {
+    OCR_QUEUE: LIST_TRANSPORT,
+    LLM_QUEUE: LIST_TRANSPORT,
+    ASSEMBLY_QUEUE: LIST_TRANSPORT,
+}
+
+def get_queue_transport(queue_name: str) -> str:
+    """Devuelve el transporte configurado para la cola."""
+    transport = os.getenv(f"QUEUE_TRANSPORT_{queue_name.upper()}", QUEUE_TRANSPORTS.get(queue_name, LIST_TRANSPORT))
+    if transport not in (LIST_TRANSPORT, STREAM_TRANSPORT):
+        raise ValueError(f"Unknown queue transport '{transport}' for '{queue_name}'")
+    return transport
+
+def stream_key(queue_name: str) -> str:
+    """Nombre del stream que reemplaza a la lista `queue_name`."""
+    return f"{queue_name}:stream"
+
+# --- Planificación justa (ver `scheduling.FairQueue`) ---
+
+# Clases de prioridad: cuando ambas tienen mensajes, por cada `weight`
+# mensajes interactivos se entrega uno batch (nunca se detiene del todo).
+INTERACTIVE_PRIORITY = "interactive"
+BATCH_PRIORITY = "batch"
+PRIORITY_WEIGHTS: Dict[str, int] = {
+    INTERACTIVE_PRIORITY: 8,
+    BATCH_PRIORITY: 1,
+}
+
+# Límite global de llamadas al LLM en curso (todas las réplicas del worker);
+# se puede cambiar con LLM_MAX_CONCURRENCY.
+LLM_CONCURRENCY_LIMITER = "llm_concurrency"
+DEFAULT_LLM_MAX_CONCURRENCY = 16
+
+def get_llm_max_concurrency() -> int:
+    value = int(os.getenv("LLM_MAX_CONCURRENCY", DEFAULT_LLM_MAX_CONCURRENCY))
+    if value < 1:
+        raise ValueError("LLM_MAX_CONCURRENCY must be at least 1")
+    return value
+
+def fair_queue_key(queue_name: str, *parts: str) -> str:
+    """
+    Claves de la cola justa de `queue_name`, ej: `{ocr_queue}:fair:batch:q:user-1`.
+    El hash tag `{ocr_queue}` deja todas las claves de la cola en el mismo
+    slot de Redis Cluster: los scripts de `FairQueue` arman nombres de
+    sub-colas dentro de Lua y necesitan que caigan en el nodo del script.
+    """
+    return ":".join((f"{{{queue_name}}}", "fair") + parts)
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Generic, Iterable, List, Optional, Tuple, Type, TypeVar, Union
+
+import redis.asyncio as redis
+from pydantic import BaseModel
+
+from .codec import JSON_CODEC, BinaryCodec, JsonCodec
+from .queues import PROCESSING_QUEUES, QUEUE_MESSAGE_MODELS
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+# Tamaño máximo de un LPUSH; los lotes más grandes se parten dentro del mismo pipeline.
+ENQUEUE_CHUNK_SIZE = 1000
+
+# Mueve hasta N mensajes de la cola a la de procesamiento y registra su
+# deadline de visibilidad, todo en un solo round-trip.
+_CLAIM_SCRIPT = """
+local now = redis.call('TIME')
+local deadline = tonumber(now[1]) + tonumber(now[2]) / 1000000 + tonumber(ARGV[2])
+local claimed = {}
+for i = 1, tonumber(ARGV[1]) do
+    local payload = redis.call('LMOVE', KEYS[1], KEYS[2], 'RIGHT', 'LEFT')
+    if not payload then break end
+    redis.call('ZADD', KEYS[3], deadline, payload)
+    claimed[#claimed + 1] = payload
+end
+return claimed
+"""
+
+# Registra el deadline de un mensaje ya movido por BLMOVE.
+_TOUCH_SCRIPT = """
+local now = redis.call('TIME')
+local deadline = tonumber(now[1]) + tonumber(now[2]) / 1000000 + tonumber(ARGV[2])
+return redis.call('ZADD', KEYS[1], ARGV[3], 'CH', deadline, ARGV[1])
+"""
+
+# Quita el mensaje de procesamiento y, si se pide, lo devuelve al frente de
+# la cola (se reintenta primero) o lo manda a la cola de mensajes muertos.
+_NACK_SCRIPT = """
+redis.call('ZREM', KEYS[3], ARGV[1])
+local removed = redis.call('LREM', KEYS[2], 1, ARGV[1])
+if removed == 0 then return 0 end
+if ARGV[2] == '1' then
+    redis.call('RPUSH', KEYS[1], ARGV[1])
+else
+    redis.call('LPUSH', KEYS[4], ARGV[1])
+end
+return 1
+"""
+
+# Devuelve a la cola los mensajes cuyo deadline venció. Los mensajes en
+# procesamiento sin deadline (ej: un consumidor murió entre BLMOVE y ZADD)
+# reciben uno nuevo, para que se recuperen en la siguiente pasada. Se buscan
+# entre los `limit` más antiguos: los que están delante se van resolviendo
+# (ack o vencimiento), así que todo huérfano llega a esa ventana.
+_REAP_SCRIPT = """
+local now = redis.call('TIME')
+local now_s = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local requeued = 0
+local expired = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now_s, 'LIMIT', 0, tonumber(ARGV[1]))
+for _, payload in ipairs(expired) do
+    redis.call('ZREM', KEYS[3], payload)
+    if redis.call('LREM', KEYS[2], 1, payload) > 0 then
+        redis.call('RPUSH', KEYS[1], payload)
+        requeued = requeued + 1
+    end
+end
+-- Desde la cola de la lista: los reclamos nuevos entran por la cabeza y los
+-- huérfanos, los más antiguos, quedan al final.
+local in_flight = redis.call('LRANGE', KEYS[2], -tonumber(ARGV[1]), -1)
+for _, payload in ipairs(in_flight) do
+    if not redis.call('ZSCORE', KEYS[3], payload) then
+        redis.call('ZADD', KEYS[3], now_s + tonumber(ARGV[2]), payload)
+    end
+end
+return requeued
+"""
+
+
+@dataclass(frozen=True)
+class Delivery(Generic[M]):
+    """
+    Un mensaje reclamado: el modelo validado y el payload crudo usado para ack/nack.
+    En el transporte de Streams, `id` es el ID de la entrada y `delivery_count`
+    cuántas veces se ha entregado. `enqueued_at` falta solo en mensajes JSON de
+    productores anteriores al campo.
+    """
+    message: M
+    raw: Union[str, bytes]
+    id: Optional[str] = None
+    delivery_count: int = 1
+    enqueued_at: Optional[float] = None
+
+
+class ReliableQueue(Generic[M]):
+    """
+    Cola confiable sobre listas de Redis (patrón BRPOPLPUSH), con operaciones
+    por lotes para que el throughput dependa del tamaño del lote y no del RTT.
+
+    - `enqueue_many` envía todo el lote en un pipeline.
+    - `claim(n)` mueve hasta n mensajes a la cola de procesamiento con un script Lua.
+    - `ack` / `nack` confirman o devuelven mensajes.
+    - `requeue_stale` (el "reaper") devuelve a la cola los mensajes cuyo
+      timeout de visibilidad venció sin ack.
+
+    Ejemplo:
+        queue = ReliableQueue.for_queue(get_redis(), OCR_QUEUE)
+        for delivery in await queue.claim(10, block_timeout=5):
+            await process(delivery.message.job_file_id)
+            await queue.ack(delivery)
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        queue_name: str,
+        processing_queue_name: str,
+        message_model: Type[M],
+        visibility_timeout: float = 300.0,
+        dead_letter_queue_name: Optional[str] = None,
+        codec: Union[JsonCodec, BinaryCodec] = JSON_CODEC,
+    ):
+        self.client = client
+        self.codec = codec
+        self.queue_name = queue_name
+        self.processing_queue_name = processing_queue_name
+        self.deadlines_key = f"{processing_queue_name}:deadlines"
+        self.dead_letter_queue_name = dead_letter_queue_name or f"{queue_name}:dead"
+        self.message_model = message_model
+        self.visibility_timeout = visibility_timeout
+        self._claim = client.register_script(_CLAIM_SCRIPT)
+        self._touch = client.register_script(_TOUCH_SCRIPT)
+        self._nack = client.register_script(_NACK_SCRIPT)
+        self._reap = client.register_script(_REAP_SCRIPT)
+
+    @classmethod
+    def for_queue(cls, client: redis.Redis, queue_name: str, **kwargs) -> "ReliableQueue":
+        """Construye la cola para uno de los nombres definidos en `queues.py`."""
+        if queue_name not in PROCESSING_QUEUES:
+            raise ValueError(f"Unknown queue '{queue_name}'")
+        return cls(
+            client,
+            queue_name,
+            PROCESSING_QUEUES[queue_name],
+            QUEUE_MESSAGE_MODELS[queue_name],
+            **kwargs,
+        )
+
+    # --- Serialización ---
+
+    def encode(self, message: M) -> Union[str, bytes]:
+        return self.codec.encode(message)
+
+    def _delivery(self, raw, **kwargs) -> Delivery[M]:
+        envelope = self.codec.decode(raw, self.message_model)
+        return Delivery(envelope.message, raw, enqueued_at=envelope.enqueued_at, **kwargs)
+
+    # --- Productor ---
+
+    async def enqueue(self, message: M) -> None:
+        await self.client.lpush(self.queue_name, self.encode(message))
+
+    async def enqueue_many(self, messages: Iterable[M]) -> int:
+        """Encola un lote en un solo round-trip. Devuelve la cantidad encolada."""
+        payloads = [self.encode(m) for m in messages]
+        if not payloads:
+            return 0
+        async with self.client.pipeline(transaction=False) as pipe:
+            for start in range(0, len(payloads), ENQUEUE_CHUNK_SIZE):
+                pipe.lpush(self.queue_name, *payloads[start:start + ENQUEUE_CHUNK_SIZE])
+            await pipe.execute()
+        return len(payloads)
+
+    # --- Consumidor ---
+
+    async def claim(self, count: int = 1, block_timeout: float = 0) -> List[Delivery[M]]:
+        """
+        Reclama hasta `count` mensajes. Si la cola está vacía y `block_timeout`
+        es mayor que 0, espera hasta ese tiempo (BLMOVE) por el primero.
+        """
+        keys = [self.queue_name, self.processing_queue_name, self.deadlines_key]
+        raws = await self._claim(keys=keys, args=[count, self.visibility_timeout])
+        if not raws and block_timeout > 0:
+            first = await self.client.blmove(
+                self.queue_name, self.processing_queue_name, block_timeout, "RIGHT", "LEFT"
+            )
+            if first is None:
+                return []
+            await self._touch(keys=[self.deadlines_key], args=[first, self.visibility_timeout, "NX"])
+            raws = [first]
+            if count > 1:
+                raws += await self._claim(keys=keys, args=[count - 1, self.visibility_timeout])
+        deliveries = []
+        for raw in raws:
+            try:
+                deliveries.append(self._delivery(raw))
+            except ValueError:
+                logger.error("Discarding malformed message on %s: %r", self.queue_name, raw)
+                await self._nack(keys=keys + [self.dead_letter_queue_name], args=[raw, "0"])
+        return deliveries
+
+    async def ack(self, delivery: Delivery[M]) -> None:
+        await self.ack_many([delivery])
+
+    async def ack_many(self, deliveries: Iterable[Delivery[M]]) -> None:
+        """Confirma un lote de mensajes en un solo round-trip."""
+        async with self.client.pipeline(transaction=False) as pipe:
+            for delivery in deliveries:
+                pipe.lrem(self.processing_queue_name, 1, delivery.raw)
+                pipe.zrem(self.deadlines_key, delivery.raw)
+            await pipe.execute()
+
+    async def nack(self, delivery: Delivery[M], requeue: bool = True) -> bool:
+        """
+        Devuelve el mensaje al frente de la cola (`requeue=True`) o lo envía a la
+        cola de mensajes muertos. Devuelve False si el mensaje ya no estaba en
+        procesamiento (ej: el reaper lo había recuperado).
+        """
+        keys = [self.queue_name, self.processing_queue_name, self.deadlines_key, self.dead_letter_queue_name]
+        return bool(await self._nack(keys=keys, args=[delivery.raw, "1" if requeue else "0"]))
+
+    async def extend(self, delivery: Delivery[M], visibility_timeout: Optional[float] = None) -> bool:
+        """Extiende el timeout de visibilidad de un mensaje en curso (heartbeat)."""
+        timeout = visibility_timeout if visibility_timeout is not None else self.visibility_timeout
+        return bool(await self._touch(keys=[self.deadlines_key], args=[delivery.raw, timeout, "XX"]))
+
+    # --- Mantenimiento ---
+
+    async def requeue_stale(self, limit: int = 100) -> int:
+        """Devuelve a la cola hasta `limit` mensajes con el timeout vencido."""
+        keys = [self.queue_name, self.processing_queue_name, self.deadlines_key]
+        return int(await self._reap(keys=keys, args=[limit, self.visibility_timeout]))
+
+    async def run_reaper(self, interval: float = 30.0, stop: Optional[asyncio.Event] = None) -> None:
+        """Ejecuta `requeue_stale` periódicamente hasta que se active `stop`."""
+        stop = stop or asyncio.Event()
+        while not stop.is_set():
+            try:
+                requeued = await self.requeue_stale()
+                if requeued:
+                    logger.warning("Requeued %d stale messages on %s", requeued, self.queue_name)
+            except redis.RedisError as e:
+                logger.error("Reaper error on %s: %s", self.queue_name, e)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def depth(self) -> Tuple[int, int]:
+        """Devuelve (mensajes pendientes, mensajes en procesamiento)."""
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.llen(self.queue_name)
+            pipe.llen(self.processing_queue_name)
+            pending, processing = await pipe.execute()
+        return pending, processing
@@ -0,0 +1,424 @@
+"""
+Planificación justa de las colas del pipeline y límite de concurrencia
+distribuido.
+
+`FairQueue` reemplaza la lista FIFO de una cola por una sub-cola por
+usuario (tenant) y clase de prioridad:
+
+- Entre clases, round-robin ponderado (`PRIORITY_WEIGHTS`): con las dos
+  clases con mensajes, por cada 8 interactivos se entrega 1 batch. Una
+  clase vacía cede su turno.
+- Dentro de una clase, deficit round-robin entre los usuarios con
+  mensajes, con un peso opcional por usuario (`set_tenant_weight`). Un
+  usuario con 10.000 mensajes encolados recibe el mismo turno que uno con 1.
+
+La elección y el paso a procesamiento se hacen en un solo script Lua, así
+que varios consumidores pueden reclamar a la vez. El resto del ciclo (ack,
+nack, timeout de visibilidad, reaper) es el de `ReliableQueue`.
+
+Todas las claves de una cola, incluida la de muertos, llevan el hash tag
+`{cola}` (`fair_queue_key`): los scripts calculan en Lua el nombre de la
+sub-cola de cada usuario, y en Redis Cluster eso solo funciona si esas
+claves están en el mismo slot que las que recibe el script.
+
+Uso:
+
+    queue = FairQueue.for_queue(get_redis(), LLM_QUEUE)
+    await queue.enqueue(LlmQueueMessage(job_file_id=1), tenant=user_id)                  # interactivo
+    await queue.enqueue_many(messages, tenant="backfill", priority=BATCH_PRIORITY)
+
+    limiter = ConcurrencyLimiter.for_llm(get_redis())
+    for delivery in await queue.claim(4, block_timeout=5):
+        async with limiter.lease():
+            await call_llm(delivery.message.job_file_id)
+        await queue.ack(delivery)
+"""
+import asyncio
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Type, Union
+
+import redis.asyncio as redis
+from pydantic import BaseModel
+
+from .codec import JSON_CODEC, BinaryCodec, JsonCodec
+from .queues import (
+    INTERACTIVE_PRIORITY, LLM_CONCURRENCY_LIMITER, PRIORITY_WEIGHTS, QUEUE_MESSAGE_MODELS,
+    fair_queue_key, get_llm_max_concurrency,
+)
+from .reliable_queue import ENQUEUE_CHUNK_SIZE, Delivery, M, ReliableQueue
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = "default"
+
+# Claves por clase (todas bajo `{cola}:fair`, mismo slot de Redis Cluster):
+#   {clase}:q:{tenant}  sub-cola del usuario (LPUSH al encolar, RPOP al reclamar)
+#   {clase}:ring        usuarios con mensajes, en orden de turno
+# y compartidas: processing, processing:deadlines, origin (payload -> clase y
+# tenant, para devolverlo a su sub-cola), credits (clase), deficits, weights,
+# dead. Los scripts arman `{prefix}:{clase}:...` a partir de ARGV: dependen
+# de que `prefix` lleve el mismo hash tag que sus KEYS.
+
+# Encola payloads de un usuario; si su sub-cola estaba vacía entra al anillo.
+_ENQUEUE_SCRIPT = """
+local n = redis.call('LPUSH', KEYS[1], unpack(ARGV, 2))
+if n == #ARGV - 1 then
+    redis.call('RPUSH', KEYS[2], ARGV[1])
+end
+return n
+"""
+
+# Devuelve un payload a su sub-cola de origen, al frente (se reintenta primero).
+_REQUEUE_FUNCTION = """
+local function requeue(prefix, origin, payload)
+    local sep = string.find(origin, '\\n', 1, true)
+    local class, tenant = string.sub(origin, 1, sep - 1), string.sub(origin, sep + 1)
+    if redis.call('RPUSH', prefix .. ':' .. class .. ':q:' .. tenant, payload) == 1 then
+        redis.call('RPUSH', prefix .. ':' .. class .. ':ring', tenant)
+    end
+end
+"""
+
+_CLAIM_SCRIPT = """
+local now = redis.call('TIME')
+local deadline = tonumber(now[1]) + tonumber(now[2]) / 1000000 + tonumber(ARGV[3])
+local prefix = ARGV[1]
+local classes, weights = {}, {}
+for i = 4, #ARGV, 2 do
+    classes[#classes + 1] = ARGV[i]
+    weights[#weights + 1] = tonumber(ARGV[i + 1])
+end
+
+-- Deficit round-robin entre los usuarios de una clase (costo 1 por mensaje).
+local function pop_tenant(class)
+    local ring = prefix .. ':' .. class .. ':ring'
+    while true do
+        local tenant = redis.call('LINDEX', ring, 0)
+        if not tenant then return nil end
+        local sub = prefix .. ':' .. class .. ':q:' .. tenant
+        local field = class .. ':' .. tenant
+        local deficit = tonumber(redis.call('HGET', KEYS[5], field) or '0')
+        if deficit < 1 then
+            deficit = deficit + tonumber(redis.call('HGET', KEYS[6], tenant) or '1')
+        end
+        local payload = nil
+        if deficit >= 1 then payload = redis.call('RPOP', sub) end
+        if payload then deficit = deficit - 1 end
+        if redis.call('LLEN', sub) == 0 then
+            -- Sin mensajes: sale del anillo y pierde el saldo.
+            redis.call('LPOP', ring)
+            redis.call('HDEL', KEYS[5], field)
+        elseif deficit < 1 then
+            -- Turno agotado: al final del anillo, conservando el saldo fraccionario.
+            redis.call('LMOVE', ring, ring, 'LEFT', 'RIGHT')
+            redis.call('HSET', KEYS[5], field, deficit)
+        else
+            redis.call('HSET', KEYS[5], field, deficit)
+        end
+        if payload then return payload, tenant end
+    end
+end
+
+-- Round-robin ponderado entre clases: cada una gasta un crédito por mensaje;
+-- cuando ninguna clase con mensajes tiene crédito, empieza otra ronda.
+local function pick()
+    for pass = 1, 2 do
+        for i, class in ipairs(classes) do
+            if tonumber(redis.call('HGET', KEYS[4], class) or '0') > 0 then
+                local payload, tenant = pop_tenant(class)
+                if payload then
+                    redis.call('HINCRBY', KEYS[4], class, -1)
+                    return payload, class, tenant
+                end
+            end
+        end
+        for i, class in ipairs(classes) do
+            redis.call('HSET', KEYS[4], class, weights[i])
+        end
+    end
+    return nil
+end
+
+local claimed = {}
+for i = 1, tonumber(ARGV[2]) do
+    local payload, class, tenant = pick()
+    if not payload then break end
+    redis.call('LPUSH', KEYS[1], payload)
+    redis.call('ZADD', KEYS[2], deadline, payload)
+    redis.call('HSET', KEYS[3], payload, class .. '\\n' .. tenant)
+    claimed[#claimed + 1] = payload
+end
+return claimed
+"""
+
+_NACK_SCRIPT = _REQUEUE_FUNCTION + """
+redis.call('ZREM', KEYS[2], ARGV[1])
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then return 0 end
+local origin = redis.call('HGET', KEYS[3], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+if ARGV[2] == '1' and origin then
+    requeue(ARGV[3], origin, ARGV[1])
+else
+    redis.call('LPUSH', KEYS[4], ARGV[1])
+end
+return 1
+"""
+
+# Como el reaper de `ReliableQueue`, pero devolviendo cada mensaje a su sub-cola.
+_REAP_SCRIPT = _REQUEUE_FUNCTION + """
+local now = redis.call('TIME')
+local now_s = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local requeued = 0
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now_s, 'LIMIT', 0, tonumber(ARGV[1]))
+for _, payload in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], payload)
+    if redis.call('LREM', KEYS[1], 1, payload) > 0 then
+        local origin = redis.call('HGET', KEYS[3], payload)
+        redis.call('HDEL', KEYS[3], payload)
+        if origin then
+            requeue(ARGV[3], origin, payload)
+        else
+            redis.call('LPUSH', KEYS[4], payload)
+        end
+        requeued = requeued + 1
+    end
+end
+-- Desde la cola de la lista: los reclamos nuevos entran por la cabeza y los
+-- huérfanos, los más antiguos, quedan al final.
+local in_flight = redis.call('LRANGE', KEYS[1], -tonumber(ARGV[1]), -1)
+for _, payload in ipairs(in_flight) do
+    if not redis.call('ZSCORE', KEYS[2], payload) then
+        redis.call('ZADD', KEYS[2], now_s + tonumber(ARGV[2]), payload)
+    end
+end
+return requeued
+"""
+
+
+class FairQueue(ReliableQueue[M]):
+    """
+    Cola con sub-colas por usuario y clase de prioridad (ver el módulo).
+    Comparte la API de `ReliableQueue`; `enqueue` recibe además el tenant y
+    la prioridad. Como no hay un BLMOVE sobre varias listas, `claim` con
+    `block_timeout` consulta cada `poll_interval` segundos.
+
+    Los payloads en curso se identifican por su contenido, igual que en
+    `ReliableQueue`; los codecs agregan `enqueued_at`, así que dos mensajes
+    iguales no colisionan. Por defecto la cola de muertos es
+    `{cola}:fair:dead`; una propia debe empezar con el hash tag `{cola}`.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        queue_name: str,
+        message_model: Type[M],
+        priorities: Optional[Dict[str, int]] = None,
+        visibility_timeout: float = 300.0,
+        dead_letter_queue_name: Optional[str] = None,
+        codec: Union[JsonCodec, BinaryCodec] = JSON_CODEC,
+        poll_interval: float = 0.05,
+    ):
+        tag = f"{{{queue_name}}}"
+        if dead_letter_queue_name is not None and not dead_letter_queue_name.startswith(tag):
+            raise ValueError(f"Dead letter queue for {queue_name} must start with the hash tag '{tag}'")
+        super().__init__(
+            client, queue_name, fair_queue_key(queue_name, "processing"), message_model,
+            visibility_timeout=visibility_timeout,
+            dead_letter_queue_name=dead_letter_queue_name or fair_queue_key(queue_name, "dead"), codec=codec,
+        )
+        self.priorities = dict(priorities or PRIORITY_WEIGHTS)
+        if not self.priorities or any(int(w) != w or w < 1 for w in self.priorities.values()):
+            raise ValueError("Priority weights must be positive integers")
+        self.prefix = fair_queue_key(queue_name)
+        self.origin_key = fair_queue_key(queue_name, "origin")
+        self.credits_key = fair_queue_key(queue_name, "credits")
+        self.deficits_key = fair_queue_key(queue_name, "deficits")
+        self.weights_key = fair_queue_key(queue_name, "weights")
+        self.poll_interval = poll_interval
+        self._enqueue = client.register_script(_ENQUEUE_SCRIPT)
+        self._claim = client.register_script(_CLAIM_SCRIPT)
+        self._nack = client.register_script(_NACK_SCRIPT)
+        self._reap = client.register_script(_REAP_SCRIPT)
+
+    @classmethod
+    def for_queue(cls, client: redis.Redis, queue_name: str, **kwargs) -> "FairQueue":
+        if queue_name not in QUEUE_MESSAGE_MODELS:
+            raise ValueError(f"Unknown queue '{queue_name}'")
+        return cls(client, queue_name, QUEUE_MESSAGE_MODELS[queue_name], **kwargs)
+
+    def _class_keys(self, priority: str, tenant: str) -> List[str]:
+        if priority not in self.priorities:
+            raise ValueError(f"Unknown priority '{priority}' for {self.queue_name}")
+        return [fair_queue_key(self.queue_name, priority, "q", tenant), fair_queue_key(self.queue_name, priority, "ring")]
+
+    # --- Productor ---
+
+    async def enqueue(self, message: M, tenant: str = DEFAULT_TENANT, priority: str = INTERACTIVE_PRIORITY) -> None:
+        await self._enqueue(keys=self._class_keys(priority, tenant), args=[tenant, self.encode(message)])
+
+    async def enqueue_many(self, messages: Iterable[M], tenant: str = DEFAULT_TENANT,
+                           priority: str = INTERACTIVE_PRIORITY) -> int:
+        keys = self._class_keys(priority, tenant)
+        payloads = [self.encode(m) for m in messages]
+        if not payloads:
+            return 0
+        async with self.client.pipeline(transaction=False) as pipe:
+            for start in range(0, len(payloads), ENQUEUE_CHUNK_SIZE):
+                await self._enqueue(keys=keys, args=[tenant, *payloads[start:start + ENQUEUE_CHUNK_SIZE]], client=pipe)
+            await pipe.execute()
+        return len(payloads)
+
+    async def set_tenant_weight(self, tenant: str, weight: float) -> None:
+        """Peso del usuario en el deficit round-robin (1 por defecto; 0.5 = medio turno)."""
+        if weight <= 0:
+            raise ValueError("Tenant weights must be positive")
+        await self.client.hset(self.weights_key, tenant, weight)
+
+    # --- Consumidor ---
+
+    async def claim(self, count: int = 1, block_timeout: float = 0) -> List[Delivery[M]]:
+        keys = [self.processing_queue_name, self.deadlines_key, self.origin_key,
+                self.credits_key, self.deficits_key, self.weights_key]
+        args = [self.prefix, count, self.visibility_timeout]
+        for priority, weight in self.priorities.items():
+            args += [priority, weight]
+        loop = asyncio.get_running_loop()
+        give_up = loop.time() + block_timeout
+        raws = await self._claim(keys=keys, args=args)
+        while not raws and loop.time() < give_up:
+            await asyncio.sleep(min(self.poll_interval, max(0.0, give_up - loop.time())))
+            raws = await self._claim(keys=keys, args=args)
+        deliveries = []
+        for raw in raws:
+            try:
+                deliveries.append(self._delivery(raw))
+            except ValueError:
+                logger.error("Discarding malformed message on %s: %r", self.queue_name, raw)
+                await self._nack_raw(raw, requeue=False)
+        return deliveries
+
+    async def ack_many(self, deliveries: Iterable[Delivery[M]]) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for delivery in deliveries:
+                pipe.lrem(self.processing_queue_name, 1, delivery.raw)
+                pipe.zrem(self.deadlines_key, delivery.raw)
+                pipe.hdel(self.origin_key, delivery.raw)
+            await pipe.execute()
+
+    async def _nack_raw(self, raw, requeue: bool) -> bool:
+        keys = [self.processing_queue_name, self.deadlines_key, self.origin_key, self.dead_letter_queue_name]
+        return bool(await self._nack(keys=keys, args=[raw, "1" if requeue else "0", self.prefix]))
+
+    async def nack(self, delivery: Delivery[M], requeue: bool = True) -> bool:
+        """Devuelve el mensaje al frente de la sub-cola de su usuario, o a la cola de muertos."""
+        return await self._nack_raw(delivery.raw, requeue)
+
+    # --- Mantenimiento ---
+
+    async def requeue_stale(self, limit: int = 100) -> int:
+        keys = [self.processing_queue_name, self.deadlines_key, self.origin_key, self.dead_letter_queue_name]
+        return int(await self._reap(keys=keys, args=[limit, self.visibility_timeout, self.prefix]))
+
+    async def pending(self, priority: str, tenant: str) -> int:
+        return await self.client.llen(self._class_keys(priority, tenant)[0])
+
+    async def depth(self):
+        """Devuelve (mensajes pendientes en todas las sub-colas, mensajes en procesamiento)."""
+        pending = 0
+        for priority in self.priorities:
+            ring = fair_queue_key(self.queue_name, priority, "ring")
+            for tenant in await self.client.lrange(ring, 0, -1):
+                tenant = tenant.decode() if isinstance(tenant, bytes) else tenant
+                pending += await self.pending(priority, tenant)
+        return pending, await self.client.llen(self.processing_queue_name)
+
+
+# --- Límite de concurrencia distribuido ---
+
+# Leases en un ZSET (miembro = id del lease, score = vencimiento). Los leases
+# de procesos que murieron sin liberar vencen solos.
+_ACQUIRE_SCRIPT = """
+local now = redis.call('TIME')
+local now_s = tonumber(now[1]) + tonumber(now[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now_s)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then return 0 end
+redis.call('ZADD', KEYS[1], now_s + tonumber(ARGV[2]), ARGV[3])
+redis.call('PEXPIRE', KEYS[1], math.ceil(tonumber(ARGV[2]) * 1000))
+return 1
+"""
+
+_EXTEND_SCRIPT = """
+local now = redis.call('TIME')
+local now_s = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local extended = redis.call('ZADD', KEYS[1], 'XX', 'CH', now_s + tonumber(ARGV[2]), ARGV[1])
+redis.call('PEXPIRE', KEYS[1], math.ceil(tonumber(ARGV[2]) * 1000))
+return extended
+"""
+
+
+class ConcurrencyLimiter:
+    """
+    Semáforo distribuido: como mucho `limit` leases vigentes entre todos los
+    procesos que usan el mismo `name`. Un lease vence a los `lease_timeout`
+    segundos si no se libera ni se extiende.
+    """
+
+    def __init__(self, client: redis.Redis, name: str, limit: int, lease_timeout: float = 300.0,
+                 poll_interval: float = 0.05, max_poll_interval: float = 1.0):
+        if limit < 1:
+            raise ValueError("Concurrency limit must be at least 1")
+        self.client = client
+        self.key = f"limiter:{name}"
+        self.limit = limit
+        self.lease_timeout = lease_timeout
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._acquire = client.register_script(_ACQUIRE_SCRIPT)
+        self._extend = client.register_script(_EXTEND_SCRIPT)
+
+    @classmethod
+    def for_llm(cls, client: redis.Redis, **kwargs) -> "ConcurrencyLimiter":
+        """Límite de llamadas al LLM en curso, de LLM_MAX_CONCURRENCY."""
+        return cls(client, LLM_CONCURRENCY_LIMITER, get_llm_max_concurrency(), **kwargs)
+
+    async def try_acquire(self) -> Optional[str]:
+        """Toma un lease si hay cupo; devuelve su id o None."""
+        lease = uuid.uuid4().hex
+        acquired = await self._acquire(keys=[self.key], args=[self.limit, self.lease_timeout, lease])
+        return lease if acquired else None
+
+    async def acquire(self, timeout: Optional[float] = None) -> str:
+        """Espera un lease (hasta `timeout` segundos; None = sin límite)."""
+        loop = asyncio.get_running_loop()
+        give_up = None if timeout is None else loop.time() + timeout
+        delay = self.poll_interval
+        while True:
+            lease = await self.try_acquire()
+            if lease is not None:
+                return lease
+            if give_up is not None and loop.time() >= give_up:
+                raise TimeoutError(f"No free slot in {self.key} after {timeout}s")
+            wait = delay if give_up is None else min(delay, max(0.0, give_up - loop.time()))
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, self.max_poll_interval)
+
+    async def release(self, lease: str) -> None:
+        await self.client.zrem(self.key, lease)
+
+    async def extend(self, lease: str) -> bool:
+        """Renueva el lease (heartbeat de una llamada larga). False si ya venció."""
+        return bool(await self._extend(keys=[self.key], args=[lease, self.lease_timeout]))
+
+    async def in_flight(self) -> int:
+        return await self.client.zcard(self.key)
+
+    @asynccontextmanager
+    async def lease(self, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        lease = await self.acquire(timeout)
+        try:
+            yield lease
+        finally:
+            await self.release(lease)
@@ -0,0 +1,307 @@
+import asyncio
+import logging
+import os
+import socket
+from typing import Dict, Generic, Iterable, List, Optional, Tuple, Type, Union
+
+import redis.asyncio as redis
+
+from .codec import JSON_CODEC, BinaryCodec, JsonCodec
+from .queues import QUEUE_MESSAGE_MODELS, stream_key
+from .reliable_queue import Delivery, M
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GROUP = "workers"
+PAYLOAD_FIELD = "payload"
+# Entregas previas de un mensaje devuelto con `nack`: el XADD nuevo empieza
+# con `times_delivered` en 0 y este campo conserva el presupuesto gastado.
+ATTEMPTS_FIELD = "attempts"
+
+def _text(value) -> str:
+    # Con un cliente en modo bytes, IDs y nombres llegan como bytes.
+    return value.decode() if isinstance(value, bytes) else value
+
+def _field(fields: Dict, name: str):
+    value = fields.get(name)
+    return value if value is not None else fields.get(name.encode())
+
+def _payload(fields: Dict):
+    return _field(fields, PAYLOAD_FIELD)
+
+def _prior_attempts(fields: Dict) -> int:
+    return int(_field(fields, ATTEMPTS_FIELD) or 0)
+
+def default_consumer_name() -> str:
+    """Nombre único por proceso, para que XPENDING muestre quién tiene cada mensaje."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class StreamQueue(Generic[M]):
+    """
+    Transporte alternativo sobre Redis Streams con consumer groups, con la
+    misma API que `ReliableQueue` (enqueue_many, claim, ack, nack, extend,
+    requeue_stale, depth).
+
+    - Cada grupo recibe todos los mensajes (fan-out); dentro de un grupo, cada
+      mensaje va a un solo consumidor.
+    - Entrega at-least-once: `claim` primero recupera con XAUTOCLAIM los
+      mensajes de otros consumidores que superaron el timeout de visibilidad.
+    - `delivery_count` viene del contador de entregas del PEL de Redis, más
+      las entregas previas a un `nack` (campo `attempts` de la entrada).
+    - `lag()` expone lag y pendientes por grupo a partir de XINFO GROUPS.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        queue_name: str,
+        message_model: Type[M],
+        group: str = DEFAULT_GROUP,
+        consumer: Optional[str] = None,
+        visibility_timeout: float = 300.0,
+        max_deliveries: int = 5,
+        maxlen: Optional[int] = None,
+        dead_letter_queue_name: Optional[str] = None,
+        codec: Union[JsonCodec, BinaryCodec] = JSON_CODEC,
+    ):
+        self.client = client
+        self.codec = codec
+        self.queue_name = queue_name
+        self.stream_name = stream_key(queue_name)
+        self.message_model = message_model
+        self.group = group
+        self.consumer = consumer or default_consumer_name()
+        self.visibility_timeout = visibility_timeout
+        self.max_deliveries = max_deliveries
+        self.maxlen = maxlen
+        self.dead_letter_queue_name = dead_letter_queue_name or f"{queue_name}:dead"
+        self._group_ready = False
+
+    @classmethod
+    def for_queue(cls, client: redis.Redis, queue_name: str, **kwargs) -> "StreamQueue":
+        """Construye el stream para uno de los nombres definidos en `queues.py`."""
+        if queue_name not in QUEUE_MESSAGE_MODELS:
+            raise ValueError(f"Unknown queue '{queue_name}'")
+        return cls(client, queue_name, QUEUE_MESSAGE_MODELS[queue_name], **kwargs)
+
+    def _exhausted(self, deliveries: int) -> bool:
+        """
+        True si `deliveries` entregas (contando la que se va a hacer) exceden
+        `max_deliveries`: un mensaje se entrega como mucho `max_deliveries`
+        veces, lo vea `claim` o el reaper.
+        """
+        return deliveries > self.max_deliveries
+
+    @property
+    def _idle_ms(self) -> int:
+        return int(self.visibility_timeout * 1000)
+
+    async def ensure_group(self) -> None:
+        """Crea el stream y el consumer group si no existen (idempotente)."""
+        if self._group_ready:
+            return
+        try:
+            await self.client.xgroup_create(self.stream_name, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    # --- Serialización ---
+
+    def encode(self, message: M) -> Union[str, bytes]:
+        return self.codec.encode(message)
+
+    def _xadd_kwargs(self) -> Dict:
+        if self.maxlen is None:
+            return {}
+        return {"maxlen": self.maxlen, "approximate": True}
+
+    # --- Productor ---
+
+    async def enqueue(self, message: M) -> str:
+        return await self.client.xadd(self.stream_name, {PAYLOAD_FIELD: self.encode(message)}, **self._xadd_kwargs())
+
+    async def enqueue_many(self, messages: Iterable[M]) -> int:
+        """Encola un lote con un pipeline de XADD en un solo round-trip."""
+        payloads = [self.encode(m) for m in messages]
+        if not payloads:
+            return 0
+        kwargs = self._xadd_kwargs()
+        async with self.client.pipeline(transaction=False) as pipe:
+            for payload in payloads:
+                pipe.xadd(self.stream_name, {PAYLOAD_FIELD: payload}, **kwargs)
+            await pipe.execute()
+        return len(payloads)
+
+    # --- Consumidor ---
+
+    async def claim(self, count: int = 1, block_timeout: float = 0) -> List[Delivery[M]]:
+        """
+        Reclama hasta `count` mensajes: primero los abandonados por otros
+        consumidores (XAUTOCLAIM) y luego mensajes nuevos (XREADGROUP).
+        """
+        await self.ensure_group()
+        deliveries = await self._autoclaim(count)
+        remaining = count - len(deliveries)
+        if remaining <= 0:
+            return deliveries
+        block = int(block_timeout * 1000) if block_timeout > 0 and not deliveries else None
+        response = await self.client.xreadgroup(
+            self.group, self.consumer, {self.stream_name: ">"}, count=remaining, block=block
+        )
+        for _, entries in response or []:
+            for entry_id, fields in entries:
+                delivery = await self._to_delivery(entry_id, fields, delivery_count=1 + _prior_attempts(fields))
+                if delivery is not None:
+                    deliveries.append(delivery)
+        return deliveries
+
+    async def _autoclaim(self, count: int) -> List[Delivery[M]]:
+        result = await self.client.xautoclaim(
+            self.stream_name, self.group, self.consumer, min_idle_time=self._idle_ms, count=count
+        )
+        entries = result[1] if result else []
+        if not entries:
+            return []
+        counts = await self._delivery_counts(_text(entry_id) for entry_id, _ in entries)
+        deliveries = []
+        for entry_id, fields in entries:
+            entry_id = _text(entry_id)
+            if fields is None:
+                # La entrada fue recortada del stream; solo queda en el PEL.
+                await self.client.xack(self.stream_name, self.group, entry_id)
+                continue
+            delivery_count = counts.get(entry_id, 1) + _prior_attempts(fields)
+            if self._exhausted(delivery_count):
+                await self._dead_letter(entry_id, _payload(fields))
+                continue
+            delivery = await self._to_delivery(entry_id, fields, delivery_count)
+            if delivery is not None:
+                deliveries.append(delivery)
+        return deliveries
+
+    async def _delivery_counts(self, entry_ids: Iterable[str]) -> Dict[str, int]:
+        # Una consulta exacta por id: un rango podría incluir otras pendientes
+        # del consumidor y dejar fuera de `count` alguna de las reclamadas.
+        async with self.client.pipeline(transaction=False) as pipe:
+            for entry_id in entry_ids:
+                pipe.xpending_range(self.stream_name, self.group, min=entry_id, max=entry_id, count=1)
+            results = await pipe.execute()
+        return {_text(p["message_id"]): p["times_delivered"] for pending in results for p in pending}
+
+    async def _to_delivery(self, entry_id, fields: Dict, delivery_count: int) -> Optional[Delivery[M]]:
+        entry_id = _text(entry_id)
+        raw = _payload(fields)
+        try:
+            envelope = self.codec.decode(raw, self.message_model)
+            return Delivery(
+                envelope.message, raw, id=entry_id,
+                delivery_count=delivery_count, enqueued_at=envelope.enqueued_at,
+            )
+        except ValueError:
+            logger.error("Discarding malformed message %s on %s: %r", entry_id, self.stream_name, raw)
+            await self._dead_letter(entry_id, raw)
+            return None
+
+    async def _dead_letter(self, entry_id: str, raw) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            if raw is not None:
+                pipe.lpush(self.dead_letter_queue_name, raw)
+            pipe.xack(self.stream_name, self.group, entry_id)
+            await pipe.execute()
+
+    async def ack(self, delivery: Delivery[M]) -> None:
+        await self.client.xack(self.stream_name, self.group, delivery.id)
+
+    async def ack_many(self, deliveries: Iterable[Delivery[M]]) -> None:
+        """Confirma un lote con un solo XACK."""
+        ids = [d.id for d in deliveries]
+        if ids:
+            await self.client.xack(self.stream_name, self.group, *ids)
+
+    async def nack(self, delivery: Delivery[M], requeue: bool = True) -> bool:
+        """
+        Con `requeue=True` vuelve a publicar el mensaje al final del stream
+        (con las entregas ya hechas en `attempts`) y confirma la entrada
+        original; si no, o si ya agotó `max_deliveries`, lo manda a la cola de
+        mensajes muertos.
+        """
+        requeue = requeue and not self._exhausted(delivery.delivery_count + 1)
+        async with self.client.pipeline(transaction=True) as pipe:
+            if requeue:
+                fields = {PAYLOAD_FIELD: delivery.raw, ATTEMPTS_FIELD: delivery.delivery_count}
+                pipe.xadd(self.stream_name, fields, **self._xadd_kwargs())
+            else:
+                pipe.lpush(self.dead_letter_queue_name, delivery.raw)
+            pipe.xack(self.stream_name, self.group, delivery.id)
+            result = await pipe.execute()
+        return bool(result[-1])
+
+    async def extend(self, delivery: Delivery[M], visibility_timeout: Optional[float] = None) -> bool:
+        """Reinicia el tiempo de inactividad de la entrada (heartbeat) con XCLAIM."""
+        claimed = await self.client.xclaim(
+            self.stream_name, self.group, self.consumer, min_idle_time=0,
+            message_ids=[delivery.id], justid=True,
+        )
+        return bool(claimed)
+
+    # --- Mantenimiento ---
+
+    async def requeue_stale(self, limit: int = 100) -> int:
+        """
+        En Streams los mensajes vencidos no vuelven a una cola: los recupera el
+        siguiente `claim` vía XAUTOCLAIM. Aquí solo se mueven a la cola de
+        mensajes muertos los que superaron `max_deliveries`. Devuelve cuántos.
+        """
+        await self.ensure_group()
+        pending = await self.client.xpending_range(
+            self.stream_name, self.group, min="-", max="+", count=limit, idle=self._idle_ms
+        )
+        if not pending:
+            return 0
+        async with self.client.pipeline(transaction=False) as pipe:
+            for p in pending:
+                pipe.xrange(self.stream_name, min=p["message_id"], max=p["message_id"])
+            entries = await pipe.execute()
+        exhausted = 0
+        for p, entry in zip(pending, entries):
+            fields = entry[0][1] if entry else {}
+            # `times_delivered` no incluye la próxima entrega (la del siguiente XAUTOCLAIM).
+            if self._exhausted(p["times_delivered"] + 1 + _prior_attempts(fields)):
+                await self._dead_letter(_text(p["message_id"]), _payload(fields))
+                exhausted += 1
+        return exhausted
+
+    async def run_reaper(self, interval: float = 30.0, stop: Optional[asyncio.Event] = None) -> None:
+        """Ejecuta `requeue_stale` periódicamente hasta que se active `stop`."""
+        stop = stop or asyncio.Event()
+        while not stop.is_set():
+            try:
+                dead = await self.requeue_stale()
+                if dead:
+                    logger.warning("Dead-lettered %d messages on %s", dead, self.stream_name)
+            except redis.RedisError as e:
+                logger.error("Reaper error on %s: %s", self.stream_name, e)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def lag(self) -> Dict[str, Dict[str, int]]:
+        """
+        Métricas por grupo con un solo XINFO GROUPS: `lag` (entradas aún no
+        entregadas al grupo) y `pending` (entregadas sin ack).
+        """
+        await self.ensure_group()
+        groups = await self.client.xinfo_groups(self.stream_name)
+        return {
+            _text(g["name"]): {"lag": g.get("lag") or 0, "pending": g.get("pending") or 0, "consumers": g.get("consumers") or 0}
+            for g in groups
+        }
+
+    async def depth(self) -> Tuple[int, int]:
+        """Devuelve (mensajes sin entregar, mensajes en procesamiento) del grupo."""
+        stats = (await self.lag()).get(self.group, {})
+        return stats.get("lag", 0), stats.get("pending", 0)
@@ -0,0 +1,66 @@
+from typing import Optional, Union
+
+import redis.asyncio as redis
+
+from .queues import (
+    PROCESSING_QUEUES, QUEUE_MESSAGE_MODELS, STREAM_TRANSPORT,
+    get_queue_transport, stream_key,
+)
+from .reliable_queue import ReliableQueue
+from .streams import PAYLOAD_FIELD, StreamQueue
+
+Queue = Union[ReliableQueue, StreamQueue]
+
+# Mueve hasta N mensajes del extremo consumidor de la lista al stream,
+# preservando el orden FIFO. Cada lote es atómico.
+_DRAIN_SCRIPT = """
+local moved = 0
+for i = 1, tonumber(ARGV[1]) do
+    local payload = redis.call('RPOP', KEYS[1])
+    if not payload then break end
+    redis.call('XADD', KEYS[2], '*', ARGV[2], payload)
+    moved = moved + 1
+end
+return moved
+"""
+
+def open_queue(client: redis.Redis, queue_name: str, transport: Optional[str] = None, **kwargs) -> Queue:
+    """
+    Devuelve la cola con el transporte configurado para `queue_name`
+    (ver `queues.get_queue_transport`). Ambos transportes comparten la API.
+    """
+    transport = transport or get_queue_transport(queue_name)
+    if transport == STREAM_TRANSPORT:
+        return StreamQueue.for_queue(client, queue_name, **kwargs)
+    return ReliableQueue.for_queue(client, queue_name, **kwargs)
+
+async def migrate_list_to_stream(
+    client: redis.Redis,
+    queue_name: str,
+    include_processing: bool = False,
+    batch_size: int = 500,
+) -> int:
+    """
+    Vacía la lista `queue_name` en su stream, en orden FIFO. Es seguro
+    ejecutarlo mientras los productores ya escriben al stream.
+
+    `include_processing=True` también mueve la lista de procesamiento; usarlo
+    solo cuando ya no quedan consumidores del transporte de listas, porque esos
+    mensajes podrían estar en curso. Devuelve la cantidad de mensajes movidos.
+    """
+    if queue_name not in QUEUE_MESSAGE_MODELS:
+        raise ValueError(f"Unknown queue '{queue_name}'")
+    drain = client.register_script(_DRAIN_SCRIPT)
+    sources = [queue_name]
+    if include_processing:
+        sources.insert(0, PROCESSING_QUEUES[queue_name])
+    total = 0
+    for source in sources:
+        while True:
+            moved = int(await drain(keys=[source, stream_key(queue_name)], args=[batch_size, PAYLOAD_FIELD]))
+            total += moved
+            if moved < batch_size:
+                break
+    if include_processing:
+        await client.delete(f"{PROCESSING_QUEUES[queue_name]}:deadlines")
+    return total
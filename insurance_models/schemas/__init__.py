@@ -1,4 +1,10 @@
 # insurance_models/schemas/__init__.py
 from .llm_schemas import InsuranceExtractionOutput
+from .post_processing import post_process_many
+from .ingestion import validate_extraction_json, validate_many
+from .consolidation import ConsolidatedJob, consolidate_job
 
-__all__ = ["InsuranceExtractionOutput"]
+__all__ = [
+    "InsuranceExtractionOutput", "post_process_many", "validate_extraction_json", "validate_many",
+    "ConsolidatedJob", "consolidate_job",
+]
@@ -0,0 +1,126 @@
+from bisect import insort
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from .llm_schemas import (
+    DeductiblePremiumInfo, InsuranceExtractionOutput, PolicyHolderInfo, RCPlanAnalysis, VehicleInfo,
+    premium_sort_key,
+)
+
+# --- Layout del consolidado ---
+# Contrato de `JobResult.consolidated_data` tal como lo arma `consolidate_job`
+# (y el ensamblaje incremental). Las columnas generadas de `JobResult` leen
+# `min_annual_premium_uf`, `vehicle_info` e `insurer_names`: cambiar estos
+# campos exige una migración.
+
+class ConsolidatedPremium(DeductiblePremiumInfo):
+    # En el consolidado los valores UF sí se guardan (en la extracción se excluyen).
+    deductible_uf: Optional[float] = None
+    annual_premium_uf: Optional[float] = None
+
+class ConsolidatedPlan(RCPlanAnalysis):
+    deductible_premiums: List[ConsolidatedPremium] = Field(default_factory=list)
+    job_file_id: int
+    position: int = Field(description="Posición del plan dentro de la extracción de su archivo")
+    min_annual_premium_uf: Optional[float] = None
+
+class ConsolidatedJob(BaseModel):
+    file_count: int
+    failed_file_ids: List[int]
+    policy_holder: Optional[PolicyHolderInfo] = None
+    vehicle_info: Optional[VehicleInfo] = None
+    insurer_names: List[str]
+    min_annual_premium_uf: Optional[float] = None
+    plans: List[ConsolidatedPlan] = Field(description="Ordenados por prima mínima, archivo y posición")
+
+def _plan_min_premium(plan: RCPlanAnalysis) -> Optional[float]:
+    premiums = [dp.annual_premium_uf for dp in plan.deductible_premiums if dp.annual_premium_uf is not None]
+    return min(premiums, key=premium_sort_key) if premiums else None
+
+def plan_entry(job_file_id: int, position: int, plan: RCPlanAnalysis) -> Dict[str, Any]:
+    """Un plan del consolidado: el dump del modelo más los valores UF ya parseados."""
+    entry = plan.model_dump(mode="json")
+    for dumped, dp in zip(entry["deductible_premiums"], plan.deductible_premiums):
+        dumped["deductible_uf"] = dp.deductible_uf
+        dumped["annual_premium_uf"] = dp.annual_premium_uf
+    entry["job_file_id"] = job_file_id
+    entry["position"] = position
+    entry["min_annual_premium_uf"] = _plan_min_premium(plan)
+    return entry
+
+def plan_order(entry: Dict[str, Any]) -> Tuple[float, int, int]:
+    """Orden de los planes: prima mínima, luego archivo y posición dentro del archivo."""
+    return premium_sort_key(entry["min_annual_premium_uf"]), entry["job_file_id"], entry["position"]
+
+def file_summary(output: InsuranceExtractionOutput) -> Dict[str, Any]:
+    """Lo que un archivo aporta al consolidado fuera de sus planes."""
+    if output.error:
+        return {"error": True, "policy_holder": None, "vehicle_info": None}
+    holder, vehicle = output.policy_holder, output.vehicle_info
+    return {
+        "error": False,
+        "policy_holder": holder.model_dump(mode="json") if holder and holder.insured_name else None,
+        "vehicle_info": vehicle.model_dump(mode="json") if vehicle and vehicle.is_valid() else None,
+    }
+
+def file_plans(job_file_id: int, output: InsuranceExtractionOutput) -> List[Dict[str, Any]]:
+    if output.error:
+        return []
+    return [plan_entry(job_file_id, i, plan) for i, plan in enumerate(output.policy_analyses)]
+
+def _first(summaries: Dict[int, Dict[str, Any]], key: str) -> Optional[Dict[str, Any]]:
+    # El dato sale del archivo de menor id que lo trae.
+    return next((summaries[file_id][key] for file_id in sorted(summaries) if summaries[file_id][key]), None)
+
+def _build(summaries: Dict[int, Dict[str, Any]], plans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Arma el consolidado a partir de los resúmenes por archivo y los planes ya ordenados."""
+    premiums = [plan["min_annual_premium_uf"] for plan in plans if plan["min_annual_premium_uf"] is not None]
+    return {
+        "file_count": len(summaries),
+        "failed_file_ids": sorted(file_id for file_id, summary in summaries.items() if summary["error"]),
+        "policy_holder": _first(summaries, "policy_holder"),
+        "vehicle_info": _first(summaries, "vehicle_info"),
+        "insurer_names": sorted({plan["insurer_name"] for plan in plans if plan["insurer_name"]}),
+        "min_annual_premium_uf": min(premiums, key=premium_sort_key) if premiums else None,
+        "plans": plans,
+    }
+
+def consolidate_job(documents: Iterable[Tuple[int, InsuranceExtractionOutput]]) -> Dict[str, Any]:
+    """
+    Arma el `JobResult.consolidated_data` de un job (layout `ConsolidatedJob`,
+    ya como JSON) a partir de las extracciones post-procesadas de sus
+    archivos, como pares `(job_file_id, extracción)`.
+
+    El resultado depende solo del conjunto de archivos (no del orden en que
+    llegan) y un `job_file_id` repetido cuenta una vez, con su última
+    extracción. Los datos del asegurado y del vehículo salen del archivo de
+    menor id que los trae.
+    """
+    by_file: Dict[int, InsuranceExtractionOutput] = dict(documents)
+    plans = [entry for file_id, output in by_file.items() for entry in file_plans(file_id, output)]
+    plans.sort(key=plan_order)
+    return _build({file_id: file_summary(output) for file_id, output in by_file.items()}, plans)
+
+
+# --- Consolidación incremental ---
+# El estado parcial es JSON puro (se guarda en Redis): los resúmenes por
+# archivo y el consolidado ya armado, así que terminar el job es leerlo.
+
+def empty_assembly_state() -> Dict[str, Any]:
+    return {"files": {}, "result": _build({}, [])}
+
+def merge_file(state: Dict[str, Any], job_file_id: int, output: InsuranceExtractionOutput) -> Dict[str, Any]:
+    """
+    Incorpora la extracción (post-procesada) de un archivo al estado parcial
+    y lo devuelve. Conmutativa e idempotente por `job_file_id`: volver a
+    mezclar un archivo reemplaza su aporte anterior, y `state["result"]` es
+    siempre igual a `consolidate_job` sobre los archivos mezclados.
+    """
+    files = state["files"]
+    plans = [plan for plan in state["result"]["plans"] if plan["job_file_id"] != job_file_id]
+    for entry in file_plans(job_file_id, output):
+        insort(plans, entry, key=plan_order)
+    files[str(job_file_id)] = file_summary(output)
+    state["result"] = _build({int(file_id): summary for file_id, summary in files.items()}, plans)
+    return state
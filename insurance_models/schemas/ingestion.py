@@ -0,0 +1,77 @@
+from functools import lru_cache
+from typing import Any, Iterable, List, Literal, Type, TypeVar, Union
+
+from pydantic import TypeAdapter, ValidationError
+
+from .llm_schemas import InsuranceExtractionOutput
+from .post_processing import post_process_many
+
+T = TypeVar("T")
+
+RawJson = Union[str, bytes, bytearray]
+
+@lru_cache(maxsize=None)
+def get_type_adapter(tp: Type[T]) -> TypeAdapter:
+    """
+    Devuelve un `TypeAdapter` por tipo, construido una sola vez por proceso:
+    construir el adapter compila el schema, que es lo caro.
+    """
+    return TypeAdapter(tp)
+
+def validate_extraction_json(raw: RawJson) -> InsuranceExtractionOutput:
+    """
+    Valida la respuesta cruda del LLM directamente desde el JSON, sin pasar
+    por `json.loads` ni por un dict intermedio: el parseo y la validación se
+    hacen en una sola pasada dentro de pydantic-core.
+    """
+    return InsuranceExtractionOutput.model_validate_json(raw)
+
+def validate_extraction_array(raw: RawJson) -> List[InsuranceExtractionOutput]:
+    """Valida un array JSON de extracciones (ej: una respuesta batch del LLM)."""
+    return get_type_adapter(List[InsuranceExtractionOutput]).validate_json(raw)
+
+def _validate_one(payload: Any) -> InsuranceExtractionOutput:
+    if isinstance(payload, (str, bytes, bytearray)):
+        return validate_extraction_json(payload)
+    return InsuranceExtractionOutput.model_validate(payload)
+
+def _error_output(error: ValidationError) -> InsuranceExtractionOutput:
+    first = error.errors(include_url=False, include_input=False)[0]
+    location = ".".join(str(part) for part in first["loc"]) or "<root>"
+    return InsuranceExtractionOutput(
+        error=(f"Invalid extraction payload: {error.error_count()} validation errors; "
+               f"first at {location}: {first['msg']}"),
+        policy_analyses=[],
+    )
+
+def validate_many(
+    payloads: Iterable[Union[RawJson, dict]],
+    on_error: Literal["raise", "mark"] = "raise",
+    post_process: bool = False,
+) -> List[InsuranceExtractionOutput]:
+    """
+    Valida un lote de documentos (JSON crudo o dicts ya parseados). Los JSON
+    se validan sin parseo previo en Python.
+
+    Args:
+        payloads: Documentos como `str`/`bytes` JSON o `dict`.
+        on_error: "raise" propaga el `ValidationError` del primer documento
+            inválido; "mark" devuelve en su lugar un documento con `error` y
+            sin planes, igual que cuando el LLM no puede extraer datos.
+        post_process: Si es True, aplica `post_process_many` al lote.
+    """
+    if on_error not in ("raise", "mark"):
+        raise ValueError(f"Unsupported on_error '{on_error}'")
+
+    outputs: List[InsuranceExtractionOutput] = []
+    for payload in payloads:
+        try:
+            outputs.append(_validate_one(payload))
+        except ValidationError as e:
+            if on_error == "raise":
+                raise
+            outputs.append(_error_output(e))
+
+    if post_process:
+        post_process_many(outputs)
+    return outputs
@@ -1,24 +1,44 @@
 import re
-from typing import List, Optional
-from pydantic import BaseModel, Field, field_validator
+from functools import partial
+from typing import Annotated, List, Optional, Type
+from pydantic import BaseModel, Field
+from pydantic_core import core_schema
 from collections import defaultdict
 
+from ..utils.parsing import parse_uf_value
+
 # --- Helper Functions ---
-# Esta función no requiere cambios.
-def parse_uf_value_from_string(value_str: Optional[str]) -> Optional[float]:
-    if value_str is None: return None
-    text = str(value_str).strip().lower()
-    if any(term in text for term in ["sin copago", "sin deducible", "gratis", "s/d", "sd", "no aplica", "n/a"]) or text == "0": return 0.0
-    match = re.search(r'([\d.,]+)', text)
-    if not match: return None
-    num_part = match.group(1)
-    if ',' in num_part: cleaned_num_str = num_part.replace('.', '').replace(',', '.')
-    elif '.' in num_part:
-        if len(num_part.split('.')[-1]) == 3 and len(num_part) > 4 : cleaned_num_str = num_part.replace('.', '')
-        else: cleaned_num_str = num_part
-    else: cleaned_num_str = num_part
-    try: return float(cleaned_num_str)
-    except (ValueError, TypeError): return None
+# Se mantiene el nombre por compatibilidad; las reglas viven en `utils.parsing`.
+parse_uf_value_from_string = parse_uf_value
+
+# --- Tablas de normalización ---
+# Se definen una vez a nivel de módulo; las usan `post_process_data` y el
+# post-procesamiento por lotes de `schemas.post_processing`.
+
+INSURER_NORMALIZATION_MAP = {
+    'hdi seguros': 'HDI', 'hdi seguros s.a.': 'HDI', 'bci seguros': 'BCI Seguros',
+    'mapfre': 'MAPFRE', 'reale chile seguros generales s.a.': 'Reale Seguros',
+    'reale seguros': 'Reale Seguros', 'reale': 'Reale Seguros',
+    'fid chile seguros generales s.a.': 'FID Seguros', 'fid seguros': 'FID Seguros',
+    'zurich chile seguros generales s.a.': 'Zurich',
+}
+
+RC_ONLY_KEYWORDS = ['elemental', 'r. civil', 'responsabilidad civil', '(rc)', 'basic', 'rc)', 'solo rc']
+
+# Una sola pasada de regex en lugar de un `in` por palabra clave.
+RC_ONLY_PATTERN = re.compile("|".join(re.escape(keyword) for keyword in RC_ONLY_KEYWORDS))
+
+def normalize_insurer_name(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return name
+    return INSURER_NORMALIZATION_MAP.get(name.lower(), name)
+
+def is_rc_only_plan(plan_name: Optional[str]) -> bool:
+    return bool(plan_name) and RC_ONLY_PATTERN.search(plan_name.lower()) is not None
+
+def premium_sort_key(annual_premium_uf: Optional[float]) -> float:
+    # Replica `x.annual_premium_uf or float('inf')`: una prima 0.0 cuenta como infinita.
+    return annual_premium_uf or float('inf')
 
 # --- Pydantic Models for LLM Output Validation ---
 
@@ -41,43 +61,43 @@ class WorkshopDetail(BaseModel):
 
 # --- INICIO DE LA SECCIÓN MODIFICADA ---
 
+class _NoneAsFalse:
+    """
+    Esquema de `CoverageFlag`, resuelto en pydantic-core sin llamar a Python:
+    un booleano, o `None` (que al fallar como booleano estricto toma el
+    default `False`). Cualquier otro valor sigue siendo un error.
+    """
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler):
+        null_as_false = core_schema.chain_schema([
+            core_schema.none_schema(),
+            core_schema.with_default_schema(core_schema.bool_schema(strict=True), default=False, on_error="default"),
+        ])
+        return core_schema.union_schema([core_schema.bool_schema(), null_as_false])
+
+# Flag de cobertura: el LLM a veces devuelve 'null'; se guarda siempre como booleano.
+# Un solo tipo compartido en lugar de un `field_validator` por modelo.
+CoverageFlag = Annotated[bool, _NoneAsFalse]
+
 # --- NUEVO MODELO PARA DEDUCIBLE INTELIGENTE ---
 class SmartDeductibleInfo(BaseModel):
     """Representa la información sobre la cobertura de Deducible Inteligente."""
-    has_coverage: Optional[bool] = Field(default=False)
+    has_coverage: CoverageFlag = Field(default=False)
     conditions_observations: Optional[str] = Field(default=None)
 
-    @field_validator('has_coverage', mode='before')
-    @classmethod
-    def validate_has_coverage(cls, v):
-        """Asegura que 'has_coverage' sea siempre booleano, convirtiendo None a False."""
-        return v if v is not None else False
-
 class NewVehicleReplacementInfo(BaseModel):
-    # El campo ahora es opcional para aceptar 'null' del LLM.
-    has_coverage: Optional[bool] = Field(default=False)
+    # El campo acepta 'null' del LLM y lo convierte a False.
+    has_coverage: CoverageFlag = Field(default=False)
     conditions_observations: Optional[str] = Field(default=None)
 
-    # Este validador se asegura de que, después de la validación, el campo sea siempre
-    # un booleano, convirtiendo 'None' a 'False'.
-    @field_validator('has_coverage', mode='before')
-    @classmethod
-    def validate_has_coverage(cls, v):
-        return v if v is not None else False
-
 class ReplacementCarCoverage(BaseModel):
-    # El campo ahora es opcional para aceptar 'null' del LLM.
-    has_coverage: Optional[bool] = Field(default=False)
+    # El campo acepta 'null' del LLM y lo convierte a False.
+    has_coverage: CoverageFlag = Field(default=False)
     daily_copay_original_str: Optional[str] = Field(default=None)
     days_limit_str: Optional[str] = Field(default=None)
     conditions_observations: Optional[str] = Field(default=None)
 
-    # Validador para convertir 'None' a 'False'
-    @field_validator('has_coverage', mode='before')
-    @classmethod
-    def validate_has_coverage(cls, v):
-        return v if v is not None else False
-        
 # --- FIN DE LA SECCIÓN MODIFICADA ---
 
 
@@ -92,6 +112,13 @@ class DeductiblePremiumInfo(BaseModel):
         self.deductible_uf = parse_uf_value_from_string(self.deductible_original_str)
         self.annual_premium_uf = parse_uf_value_from_string(self.annual_premium_original_str)
 
+def _empty(model: Type[BaseModel]):
+    """
+    Factory del submodelo vacío: valida `{}` directo en pydantic-core, sin
+    pasar por el `__init__` de Python. Devuelve una instancia de `model`.
+    """
+    return partial(model.__pydantic_validator__.validate_python, {})
+
 class RCPlanAnalysis(BaseModel):
     insurer_name: Optional[str] = Field(default=None)
     plan_name: Optional[str] = Field(default=None)
@@ -99,10 +126,10 @@ class RCPlanAnalysis(BaseModel):
     # --- MODIFICADO: Usar default_factory para crear objetos por defecto ---
     # Si el LLM omite el bloque 'workshop_info', Pydantic creará uno vacío
     # en lugar de lanzar un error.
-    workshop_info: Optional[WorkshopDetail] = Field(default_factory=WorkshopDetail)
-    replacement_car_info: Optional[ReplacementCarCoverage] = Field(default_factory=ReplacementCarCoverage)
-    new_vehicle_replacement_info: Optional[NewVehicleReplacementInfo] = Field(default_factory=NewVehicleReplacementInfo)
-    smart_deductible_info: Optional[SmartDeductibleInfo] = Field(default_factory=SmartDeductibleInfo) # <-- NUEVA LÍNEA
+    workshop_info: Optional[WorkshopDetail] = Field(default_factory=_empty(WorkshopDetail))
+    replacement_car_info: Optional[ReplacementCarCoverage] = Field(default_factory=_empty(ReplacementCarCoverage))
+    new_vehicle_replacement_info: Optional[NewVehicleReplacementInfo] = Field(default_factory=_empty(NewVehicleReplacementInfo))
+    smart_deductible_info: Optional[SmartDeductibleInfo] = Field(default_factory=_empty(SmartDeductibleInfo)) # <-- NUEVA LÍNEA
     # --- FIN MODIFICADO ---
 
     deductible_premiums: List[DeductiblePremiumInfo] = Field(default_factory=list)
@@ -135,19 +162,9 @@ class InsuranceExtractionOutput(BaseModel):
         if self.error:
             return
 
-        INSURER_NORMALIZATION_MAP = {
-            'hdi seguros': 'HDI', 'hdi seguros s.a.': 'HDI', 'bci seguros': 'BCI Seguros',
-            'mapfre': 'MAPFRE', 'reale chile seguros generales s.a.': 'Reale Seguros',
-            'reale seguros': 'Reale Seguros', 'reale': 'Reale Seguros',
-            'fid chile seguros generales s.a.': 'FID Seguros', 'fid seguros': 'FID Seguros',
-            'zurich chile seguros generales s.a.': 'Zurich',
-        }
-        
-        RC_ONLY_KEYWORDS = ['elemental', 'r. civil', 'responsabilidad civil', '(rc)', 'basic', 'rc)', 'solo rc']
-
         for plan in self.policy_analyses:
             if plan.insurer_name:
-                plan.insurer_name = INSURER_NORMALIZATION_MAP.get(plan.insurer_name.lower(), plan.insurer_name)
+                plan.insurer_name = normalize_insurer_name(plan.insurer_name)
 
             for dp in plan.deductible_premiums:
                 dp.process_and_convert_values()
@@ -158,15 +175,12 @@ class InsuranceExtractionOutput(BaseModel):
                 grouped_premiums[dp.deductible_uf].append(dp)
             
             plan.deductible_premiums = [
-                min(dp_list, key=lambda x: x.annual_premium_uf or float('inf')) 
+                min(dp_list, key=lambda x: premium_sort_key(x.annual_premium_uf))
                 for dp_list in grouped_premiums.values() if dp_list
             ]
-            
-            plan_name_lower = plan.plan_name.lower() if plan.plan_name else ""
-            is_rc_only = any(keyword in plan_name_lower for keyword in RC_ONLY_KEYWORDS)
 
-            if is_rc_only:
+            if is_rc_only_plan(plan.plan_name):
                 plan.workshop_info = None
                 if plan.replacement_car_info:
                     plan.replacement_car_info.has_coverage = False
-                plan.new_vehicle_replacement_info = None
\ No newline at end of file
+                plan.new_vehicle_replacement_info = None
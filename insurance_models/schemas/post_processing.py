@@ -0,0 +1,89 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from ..utils.parsing import parse_uf_values
+from .llm_schemas import (
+    DeductiblePremiumInfo, InsuranceExtractionOutput, RCPlanAnalysis,
+    is_rc_only_plan, normalize_insurer_name, premium_sort_key,
+)
+
+# Modelos que `post_process_many` escribe sin pasar por `BaseModel.__setattr__`.
+# Ninguno puede tener `validate_assignment` ni `frozen` (lo verifica un test).
+ASSIGNED_MODELS = (DeductiblePremiumInfo, RCPlanAnalysis)
+
+def _assign(model: BaseModel, **values) -> None:
+    # Lo mismo que hace `setattr` en un modelo sin validate_assignment, en una
+    # sola actualización de `__dict__`: `__setattr__` es lo más caro del lote.
+    model.__dict__.update(values)
+    model.__pydantic_fields_set__.update(values)
+
+def _parse_column(values: Sequence[Optional[str]]) -> List[Optional[float]]:
+    """Parsea una columna de strings, una vez por valor distinto."""
+    distinct = dict.fromkeys(values)
+    parsed = dict(zip(distinct, parse_uf_values(distinct)))
+    return [parsed[value] for value in values]
+
+def post_process_many(outputs: Iterable[InsuranceExtractionOutput]) -> List[InsuranceExtractionOutput]:
+    """
+    Aplica `InsuranceExtractionOutput.post_process_data` a muchos documentos a
+    la vez (ej: todos los `LlmResult` de un job o un backfill), con resultados
+    idénticos a llamar el método documento por documento.
+
+    En lugar de recorrer cada plan por separado:
+    - Se aplanan los deducibles/primas de todos los planes en dos columnas y
+      se parsea una vez cada string distinto de cada columna.
+    - La agrupación por deducible y la elección de la prima más barata se hace
+      en una sola pasada sobre un diccionario indexado por (plan, deducible).
+    - Los resultados se escriben directo en `__dict__` de cada modelo (ver
+      `_assign`), sin el `__setattr__` de Pydantic por campo.
+
+    Modifica los documentos in place y devuelve la misma lista.
+    """
+    outputs = list(outputs)
+    plans: List[RCPlanAnalysis] = [
+        plan for output in outputs if not output.error for plan in output.policy_analyses
+    ]
+
+    premiums_flat: List[DeductiblePremiumInfo] = []
+    owners: List[int] = []
+    for plan_index, plan in enumerate(plans):
+        if plan.insurer_name:
+            _assign(plan, insurer_name=normalize_insurer_name(plan.insurer_name))
+        plan_premiums = plan.deductible_premiums
+        premiums_flat += plan_premiums
+        owners += [plan_index] * len(plan_premiums)
+
+    deductibles = _parse_column([dp.deductible_original_str for dp in premiums_flat])
+    annual_premiums = _parse_column([dp.annual_premium_original_str for dp in premiums_flat])
+
+    # (plan, deducible) -> (clave de orden, índice de la prima elegida). El orden
+    # de inserción del diccionario reproduce el orden de los grupos de `defaultdict`.
+    cheapest: Dict[Tuple[int, Optional[float]], Tuple[float, int]] = {}
+    for index, (plan_index, deductible, premium) in enumerate(zip(owners, deductibles, annual_premiums)):
+        if premium is None:
+            continue
+        group = (plan_index, deductible)
+        sort_key = premium_sort_key(premium)
+        current = cheapest.get(group)
+        # `min()` conserva el primero en caso de empate: solo se reemplaza si es estrictamente menor.
+        if current is None or sort_key < current[0]:
+            cheapest[group] = (sort_key, index)
+
+    # Solo las primas que sobreviven quedan accesibles, así que solo a ellas se
+    # les asignan los valores parseados.
+    kept: List[List[DeductiblePremiumInfo]] = [[] for _ in plans]
+    for (plan_index, _), (_, index) in cheapest.items():
+        dp = premiums_flat[index]
+        _assign(dp, deductible_uf=deductibles[index], annual_premium_uf=annual_premiums[index])
+        kept[plan_index].append(dp)
+
+    for plan, plan_premiums in zip(plans, kept):
+        if is_rc_only_plan(plan.plan_name):
+            _assign(plan, deductible_premiums=plan_premiums, workshop_info=None, new_vehicle_replacement_info=None)
+            if plan.replacement_car_info:
+                plan.replacement_car_info.has_coverage = False
+        else:
+            _assign(plan, deductible_premiums=plan_premiums)
+
+    return outputs
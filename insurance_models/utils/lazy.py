@@ -0,0 +1,72 @@
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+_env_lock = threading.Lock()
+_env_loaded = False
+
+
+def load_env() -> None:
+    """
+    Carga el archivo .env una sola vez por proceso.
+
+    Reemplaza las llamadas a `load_dotenv()` a nivel de módulo: solo se ejecuta
+    cuando algún cliente se construye por primera vez.
+    """
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _env_lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _env_loaded = True
+
+
+class LazyProvider(Generic[T]):
+    """
+    Construye un recurso compartido (engine, cliente Redis, cliente R2) en el
+    primer uso y lo reutiliza en las llamadas siguientes.
+
+    Es seguro entre hilos (double-checked locking) y dentro de asyncio: la
+    fábrica es síncrona y no cede el control al event loop, por lo que dos
+    corrutinas nunca observan una construcción a medias.
+    """
+
+    def __init__(self, factory: Callable[[], T], name: Optional[str] = None):
+        self._factory = factory
+        self._name = name or getattr(factory, "__name__", "resource")
+        self._lock = threading.Lock()
+        self._instance: Optional[T] = None
+
+    def get(self) -> T:
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                self._instance = self._factory()
+            return self._instance
+
+    def set(self, instance: T) -> None:
+        """Inyecta una instancia ya construida (útil en tests)."""
+        with self._lock:
+            self._instance = instance
+
+    def reset(self) -> Optional[T]:
+        """
+        Olvida la instancia actual y la devuelve para que el llamador pueda
+        cerrarla. La siguiente llamada a `get()` construirá una nueva.
+        """
+        with self._lock:
+            instance, self._instance = self._instance, None
+            return instance
+
+    @property
+    def is_initialized(self) -> bool:
+        return self._instance is not None
+
+    def __repr__(self) -> str:
+        state = "initialized" if self.is_initialized else "pending"
+        return f"<LazyProvider {self._name} ({state})>"
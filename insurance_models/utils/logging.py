@@ -1,11 +1,295 @@
+import asyncio
 import logging
+import queue
+import random
 import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Literal, Optional
 
-def setup_logging(level=logging.INFO):
-    """Sets up basic logging configuration."""
+def setup_logging(level=logging.INFO, processing_log_service: Optional[str] = None, **handler_kwargs):
+    """
+    Sets up basic logging configuration.
+
+    Si se da `processing_log_service`, agrega además un `ProcessingLogHandler`
+    al logger raíz, que guarda en `processing_logs` los registros con `job_id`.
+    """
     logging.basicConfig(
         level=level,
         format="[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S",
         stream=sys.stdout
     )
+    if processing_log_service:
+        handler = ProcessingLogHandler(processing_log_service, **handler_kwargs)
+        logging.getLogger().addHandler(handler)
+        return handler
+    return None
+
+
+# --- Escritura en lote de ProcessingLog ---
+
+OverflowPolicy = Literal["drop", "block", "sample"]
+
+class DatabaseLogSink:
+    """
+    Destino por defecto de `ProcessingLogHandler`: un INSERT multi-fila por
+    lote en `processing_logs`. Usa su propio engine de una conexión, creado en
+    el hilo del handler, para no competir por el pool de la aplicación.
+
+    Si el lote viola una restricción (ej: un `job_id` que no existe), se
+    reintenta por job, cada uno en su transacción: solo se pierden las filas
+    de los jobs rechazados. `write` devuelve cuántas filas se escribieron.
+    """
+
+    def __init__(self, engine_factory: Optional[Callable] = None):
+        self._engine_factory = engine_factory or _default_log_engine
+        self._engine = None
+        self._table = None
+
+    async def write(self, rows: List[Dict]) -> int:
+        from sqlalchemy.exc import IntegrityError
+        if self._engine is None:
+            from ..database.models import ProcessingLog
+            self._engine = self._engine_factory()
+            self._table = ProcessingLog.__table__
+        try:
+            await self._insert(rows)
+            return len(rows)
+        except IntegrityError:
+            pass
+        by_job: Dict[int, List[Dict]] = {}
+        for row in rows:
+            by_job.setdefault(row["job_id"], []).append(row)
+        written = 0
+        for job_rows in by_job.values():
+            try:
+                await self._insert(job_rows)
+                written += len(job_rows)
+            except IntegrityError:
+                continue
+        return written
+
+    async def _insert(self, rows: List[Dict]) -> None:
+        from sqlalchemy import insert
+        async with self._engine.begin() as conn:
+            await conn.execute(insert(self._table), rows)
+
+    async def close(self) -> None:
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+
+def _default_log_engine():
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from ..database.connection import get_database_url, get_pool_settings
+    settings = get_pool_settings().model_copy(update={"pool_size": 1, "max_overflow": 0})
+    return create_async_engine(get_database_url(), **settings.engine_kwargs())
+
+
+class ProcessingLogHandler(logging.Handler):
+    """
+    Handler de `logging` que guarda en `processing_logs` los registros que
+    traen `job_id` (`logger.info("...", extra={"job_id": job.id})`), sin hacer
+    un INSERT por mensaje.
+
+    - `emit` solo encola la fila en una cola acotada: no toca la base.
+    - Un hilo propio junta los registros y los escribe en lotes de hasta
+      `batch_size` o cada `flush_interval` segundos, lo que ocurra primero.
+    - Con la cola llena aplica `overflow`: "drop" descarta el registro nuevo,
+      "block" espera hasta `block_timeout` (backpressure) y luego descarta, y
+      "sample" empieza a muestrear los INFO desde la mitad de la capacidad
+      (WARNING o superior solo se pierden con la cola llena).
+    - `flush()` espera a que se escriba lo encolado; `close()`, que
+      `logging.shutdown()` llama al salir, hace flush y detiene el hilo.
+    """
+
+    def __init__(
+        self,
+        service_name: str,
+        sink=None,
+        capacity: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        overflow: OverflowPolicy = "drop",
+        block_timeout: float = 0.1,
+        level: int = logging.INFO,
+    ):
+        super().__init__(level)
+        if overflow not in ("drop", "block", "sample"):
+            raise ValueError(f"Unsupported overflow policy '{overflow}'")
+        if batch_size < 1 or capacity < batch_size:
+            raise ValueError("capacity must be >= batch_size >= 1")
+        self.service_name = service_name
+        self.sink = sink or DatabaseLogSink()
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=capacity)
+        self._flush_requested = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        # Los contadores los actualizan los hilos de la aplicación y el del handler.
+        self._stats_lock = threading.Lock()
+        self.enqueued = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.written = 0
+        self.failed = 0
+
+    # --- Productor (hilos de la aplicación) ---
+
+    def emit(self, record: logging.LogRecord) -> None:
+        job_id = getattr(record, "job_id", None)
+        if job_id is None or self._stopping.is_set():
+            return
+        thread = self._thread
+        if thread is None:
+            self._start()
+        elif thread.ident == threading.get_ident():
+            # Los logs que genera el propio writer (ej: del driver) no se reencolan.
+            return
+        if self.overflow == "sample" and record.levelno < logging.WARNING and not self._keep_sample():
+            self._count("sampled_out")
+            return
+        try:
+            row = {
+                "job_id": job_id,
+                "service_name": self.service_name,
+                "level": _log_level(record.levelno),
+                "message": record.getMessage(),
+                # UTC sin zona, como el resto de las columnas DateTime.
+                "created_at": datetime.fromtimestamp(record.created, timezone.utc).replace(tzinfo=None),
+            }
+            if self.overflow == "block":
+                self._queue.put(row, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(row)
+            self._count("enqueued")
+        except queue.Full:
+            self._count("dropped")
+        except Exception:
+            self.handleError(record)
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def _keep_sample(self) -> bool:
+        # Probabilidad de conservar: 1 hasta la mitad de la cola, luego baja linealmente a 0.
+        fill = self._queue.qsize() / self.capacity
+        return fill < 0.5 or random.random() < 2 * (1 - fill)
+
+    # --- Consumidor (hilo del handler) ---
+
+    def _start(self) -> None:
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"processing-log-{self.service_name}", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        loop = asyncio.new_event_loop()
+        try:
+            while not (self._stopping.is_set() and self._queue.empty()):
+                batch = self._collect()
+                if batch:
+                    self._write(loop, batch)
+                elif self._flush_requested.is_set() and self._queue.empty():
+                    self._flush_requested.clear()
+            loop.run_until_complete(self.sink.close())
+        finally:
+            loop.close()
+
+    def _collect(self) -> List[Dict]:
+        batch: List[Dict] = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            if self._flush_requested.is_set() or self._stopping.is_set():
+                timeout = 0.0
+            elif deadline is None:
+                timeout = self.flush_interval
+            else:
+                timeout = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                if not batch and timeout == 0.0:
+                    # Nada que escribir y hay un flush o un cierre pendiente: no girar en vacío.
+                    time.sleep(0.001)
+                break
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch
+
+    def _write(self, loop: asyncio.AbstractEventLoop, batch: List[Dict]) -> None:
+        try:
+            # Un sink puede devolver cuántas filas escribió (None = todas).
+            written = loop.run_until_complete(self.sink.write(batch))
+            written = len(batch) if written is None else written
+            self._count("written", written)
+            if written < len(batch):
+                self._report_failure(len(batch) - written)
+        except Exception:
+            self._report_failure(len(batch))
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _report_failure(self, records: int) -> None:
+        self._count("failed", records)
+        # Ruta de error de `logging` (stderr si `logging.raiseExceptions`), no un
+        # logger: este handler podría estar en el logger raíz.
+        self.handleError(logging.makeLogRecord({
+            "name": __name__, "levelno": logging.ERROR, "levelname": "ERROR",
+            "msg": "ProcessingLogHandler failed to write %d records", "args": (records,),
+        }))
+
+    # --- Ciclo de vida ---
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Espera a que se escriban los registros encolados. Devuelve False si vence el timeout."""
+        if self._thread is None:
+            return True
+        self._flush_requested.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 5.0) -> None:
+        if not self._stopping.is_set():
+            self.flush(timeout)
+            self._stopping.set()
+            if self._thread is not None:
+                self._thread.join(timeout)
+        super().close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return {
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "sampled_out": self.sampled_out,
+                "written": self.written,
+                "failed": self.failed,
+                "queued": self._queue.qsize(),
+            }
+
+def _log_level(levelno: int) -> str:
+    # Nombre del miembro de `LogLevel`; la columna Enum acepta el nombre.
+    if levelno >= logging.CRITICAL:
+        return "CRITICAL"
+    if levelno >= logging.ERROR:
+        return "ERROR"
+    if levelno >= logging.WARNING:
+        return "WARNING"
+    return "INFO"
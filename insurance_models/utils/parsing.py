@@ -1,41 +1,35 @@
 import re
+from functools import lru_cache
+from typing import Iterable, List, Optional
 
-def parse_uf_value(value_str: str | None) -> float | None:
-    """
-    Parsea un string que contiene un valor (posiblemente en UF) a un float.
+# Términos textuales que equivalen a valor cero. "sd" solo cuenta como palabra
+# completa, para no confundirlo con "USD".
+ZERO_VALUE_TERMS = ("sin deducible", "sin copago", "gratis", "no aplica", "n/a", "s/d", "sd")
 
-    Esta función es la "fuente de la verdad" para convertir valores monetarios
-    o de unidades en todo el sistema. Maneja:
-    - Términos textuales para el valor cero (ej: "Sin Deducible", "Gratis", "No Aplica").
-    - Separadores de miles chilenos (puntos).
-    - Separadores decimales (comas y puntos).
-    - Extrae solo la parte numérica de un string más largo (ej: "UF 5.5").
+_ZERO_TERMS_RE = re.compile(
+    "|".join(r"\bsd\b" if term == "sd" else re.escape(term) for term in ZERO_VALUE_TERMS)
+)
+_NUMBER_RE = re.compile(r"[\d.,]+")
 
-    Args:
-        value_str: El string a parsear.
+# Tamaño del memo: los strings de primas y deducibles se repiten mucho
+# ("UF 5", "Sin deducible", "0", ...).
+PARSE_CACHE_SIZE = 8192
+
+def _parse_uf_uncached(raw: str) -> float | None:
+    text = raw.strip().lower()
 
-    Returns:
-        Un float si la conversión es exitosa, 0.0 para términos de gratuidad,
-        o None si no se puede parsear.
-    """
-    if value_str is None:
-        return None
-    
-    text = str(value_str).strip().lower()
-    
     # 1. Comprobar términos textuales para el valor cero.
-    if any(term in text for term in ["sin deducible", "sin copago", "gratis", "no aplica", "n/a", "s/d"]):
+    if _ZERO_TERMS_RE.search(text):
         return 0.0
-        
+
     # 2. Extraer la parte numérica del string.
-    match = re.search(r'([\d.,]+)', text)
+    match = _NUMBER_RE.search(text)
     if not match:
         return None
-        
-    num_part = match.group(1)
-    
+
+    num_part = match.group(0)
+
     # 3. Limpiar el número para manejar el formato chileno (punto como miles, coma como decimal).
-    cleaned_num_str = ""
     if ',' in num_part and '.' in num_part:
         # Asume formato como "1.234,56" -> "1234.56"
         cleaned_num_str = num_part.replace('.', '').replace(',', '.')
@@ -57,5 +51,63 @@ def parse_uf_value(value_str: str | None) -> float | None:
     # 4. Intentar la conversión final a float.
     try:
         return float(cleaned_num_str)
-    except (ValueError, TypeError):
-        return None
\ No newline at end of file
+    except ValueError:
+        return None
+
+_parse_uf_cached = lru_cache(maxsize=PARSE_CACHE_SIZE)(_parse_uf_uncached)
+
+def parse_uf_value(value_str: str | None) -> float | None:
+    """
+    Parsea un string que contiene un valor (posiblemente en UF) a un float.
+
+    Esta función es la "fuente de la verdad" para convertir valores monetarios
+    o de unidades en todo el sistema. Maneja:
+    - Términos textuales para el valor cero (ej: "Sin Deducible", "Gratis", "No Aplica", "SD").
+    - Separadores de miles chilenos (puntos).
+    - Separadores decimales (comas y puntos).
+    - Extrae solo la parte numérica de un string más largo (ej: "UF 5.5").
+
+    Las expresiones regulares están precompiladas y los resultados se
+    memorizan por string de entrada.
+
+    Args:
+        value_str: El string a parsear.
+
+    Returns:
+        Un float si la conversión es exitosa, 0.0 para términos de gratuidad,
+        o None si no se puede parsear.
+    """
+    if value_str is None:
+        return None
+    return _parse_uf_cached(value_str if type(value_str) is str else str(value_str))
+
+def parse_uf_values(values: Iterable[str | None], as_array: bool = False):
+    """
+    Parsea un lote de valores con las mismas reglas que `parse_uf_value`.
+
+    Args:
+        values: Strings (o None) a parsear.
+        as_array: Si es True, devuelve una tupla `(valores, mascara)` de NumPy:
+            un array float64 con NaN donde no se pudo parsear y un array booleano
+            que es True en esas posiciones. Requiere `numpy`.
+
+    Returns:
+        Una lista de `float | None`, o la tupla de arrays si `as_array=True`.
+    """
+    parse = _parse_uf_cached
+    parsed: List[Optional[float]] = [
+        None if v is None else parse(v if type(v) is str else str(v)) for v in values
+    ]
+    if not as_array:
+        return parsed
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("parse_uf_values(as_array=True) requires numpy: pip install insurance-models[numpy]")
+    # NumPy convierte None a NaN al construir un array float64.
+    array = np.array(parsed, dtype=np.float64)
+    return array, np.isnan(array)
+
+def clear_parse_cache() -> None:
+    """Vacía el memo de `parse_uf_value` (ej: entre tests o tras cambiar reglas)."""
+    _parse_uf_cached.cache_clear()
@@ -0,0 +1,556 @@
+"""
+Instrumentación liviana de los servicios: spans compatibles con
+OpenTelemetry (contexto W3C `traceparent`, exportación OTLP/JSON) e
+histogramas con salida en formato de texto de Prometheus.
+
+No depende de los SDK de OpenTelemetry ni de `prometheus_client`: los
+spans se propagan por las colas dentro de los mensajes (`trace_context`),
+y cada servicio decide a dónde exportarlos (`InMemorySpanExporter` en
+tests, `OtlpHttpExporter` hacia un collector).
+
+Uso en un worker:
+
+    queue = open_queue(get_redis(), OCR_QUEUE)
+    for delivery in await queue.claim(10, block_timeout=5):
+        with stage_span("ocr", delivery=delivery, queue=OCR_QUEUE):
+            await process(delivery.message.job_file_id)   # los mensajes encolados aquí heredan la traza
+        await queue.ack(delivery)
+
+    # Endpoint /metrics
+    REGISTRY.render()
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# --- Contexto de traza (W3C Trace Context) ---
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    trace_id: str
+    span_id: str
+    sampled: bool = True
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def from_traceparent(cls, value: Optional[str]) -> Optional["SpanContext"]:
+        """Parsea un header `traceparent`; None si falta o es inválido."""
+        match = _TRACEPARENT_RE.match(value or "")
+        if not match or match[1] == "0" * 32 or match[2] == "0" * 16:
+            return None
+        return cls(match[1], match[2], int(match[3], 16) & 1 == 1)
+
+    @classmethod
+    def from_bytes(cls, trace_id: bytes, span_id: bytes, flags: int) -> Optional["SpanContext"]:
+        """Inverso de `to_bytes`; los ids en cero significan "sin traza"."""
+        if not any(trace_id):
+            return None
+        return cls(trace_id.hex(), span_id.hex(), flags & 1 == 1)
+
+    def to_bytes(self) -> Tuple[bytes, bytes, int]:
+        return bytes.fromhex(self.trace_id), bytes.fromhex(self.span_id), 1 if self.sampled else 0
+
+
+@dataclass
+class Span:
+    name: str
+    context: SpanContext
+    parent_span_id: Optional[str] = None
+    kind: str = "INTERNAL"
+    start_ns: int = 0
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "UNSET"
+    status_message: Optional[str] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """El span en el formato JSON de OTLP (`resourceSpans[].scopeSpans[].spans[]`)."""
+        span = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": f"SPAN_KIND_{self.kind}",
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": f"STATUS_CODE_{self.status}"},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("insurance_models_current_span", default=None)
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def current_traceparent() -> Optional[str]:
+    """`traceparent` del span activo, para propagarlo (ej: al encolar un mensaje)."""
+    span = _current_span.get()
+    return span.context.traceparent if span is not None else None
+
+
+# --- Exportadores ---
+
+class InMemorySpanExporter:
+    """Guarda los spans terminados en memoria (tests y diagnóstico)."""
+
+    def __init__(self):
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[Span]) -> None:
+        with self._lock:
+            self._spans.extend(spans)
+
+    def get_finished_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+    def shutdown(self) -> None:
+        pass
+
+
+class OtlpHttpExporter:
+    """
+    Envía los spans a un collector de OpenTelemetry por OTLP/HTTP con JSON
+    (`{endpoint}/v1/traces`). Los spans se encolan y un hilo propio los manda
+    en lotes, así que terminar un span no hace I/O. Si la cola se llena, los
+    spans nuevos se descartan.
+    """
+
+    def __init__(self, endpoint: Optional[str] = None, service_name: Optional[str] = None,
+                 batch_size: int = 512, flush_interval: float = 5.0, capacity: int = 10_000,
+                 timeout: float = 10.0):
+        endpoint = endpoint or os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+        if not endpoint:
+            raise ValueError("OtlpHttpExporter needs an endpoint or OTEL_EXPORTER_OTLP_ENDPOINT")
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name or os.getenv("OTEL_SERVICE_NAME", "insurance-models")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        # `export` corre en los hilos que terminan spans.
+        self._dropped_lock = threading.Lock()
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=capacity)
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, spans: Sequence[Span]) -> None:
+        for span in spans:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                with self._dropped_lock:
+                    self.dropped += 1
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: List[Span] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stopping = True
+                    break
+                batch.append(span)
+            if batch:
+                self._post(batch)
+
+    def _post(self, spans: List[Span]) -> None:
+        import urllib.request
+        body = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "insurance_models"}, "spans": [s.to_otlp() for s in spans]}],
+        }]}).encode()
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except Exception as e:
+            logger.warning("Failed to export %d spans to %s: %r", len(spans), self.url, e)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+# --- Tracer ---
+
+class Tracer:
+    """
+    Crea spans y los entrega a los exportadores al terminar. Sin
+    exportadores, un span cuesta un par de microsegundos y se descarta.
+    """
+
+    def __init__(self, exporters: Sequence = ()):
+        self.exporters = list(exporters)
+
+    def add_exporter(self, exporter) -> None:
+        self.exporters.append(exporter)
+
+    def start_span(self, name: str, parent: Any = None, kind: str = "INTERNAL",
+                   attributes: Optional[Dict[str, Any]] = None) -> Span:
+        """
+        Abre un span sin activarlo. `parent` puede ser un `Span`, un
+        `SpanContext` o un `traceparent`; por defecto es el span activo.
+        """
+        if parent is None:
+            parent = _current_span.get()
+        if isinstance(parent, Span):
+            parent = parent.context
+        elif isinstance(parent, str):
+            parent = SpanContext.from_traceparent(parent)
+        trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        return Span(
+            name=name,
+            context=SpanContext(trace_id, secrets.token_hex(8)),
+            parent_span_id=parent.span_id if parent is not None else None,
+            kind=kind,
+            start_ns=time.time_ns(),
+            attributes=dict(attributes or {}),
+        )
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None) -> None:
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.status = "ERROR"
+            span.status_message = repr(error)
+        elif span.status == "UNSET":
+            span.status = "OK"
+        for exporter in self.exporters:
+            try:
+                exporter.export([span])
+            except Exception as e:
+                logger.warning("Span exporter %r failed: %r", exporter, e)
+
+    @contextmanager
+    def span(self, name: str, parent: Any = None, kind: str = "INTERNAL", **attributes) -> Iterator[Span]:
+        """Abre un span y lo deja activo (vía contextvars, sirve en código async) mientras dura el bloque."""
+        span = self.start_span(name, parent, kind, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, e)
+            raise
+        else:
+            self.end_span(span)
+        finally:
+            _current_span.reset(token)
+
+
+_tracer = Tracer()
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+def set_tracer(tracer: Tracer) -> None:
+    global _tracer
+    _tracer = tracer
+
+
+# --- Histogramas ---
+
+# Segundos: de 5 ms a 10 minutos, para esperas en cola y tiempos de servicio.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+class Histogram:
+    """
+    Histograma acumulativo estilo Prometheus, con una serie por combinación
+    de etiquetas. `quantile` estima percentiles interpolando dentro del
+    bucket, igual que `histogram_quantile` de PromQL.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [conteos por bucket (+Inf al final), suma, total]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            return series[2] if series else 0
+
+    def _snapshot(self) -> Dict[Tuple[str, ...], Tuple[List[int], float, int]]:
+        """Copia de las series, para leerlas fuera del lock mientras otros hilos observan."""
+        with self._lock:
+            return {key: (list(v[0]), v[1], v[2]) for key, v in self._series.items()}
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Percentil `q` (0-1) estimado de la serie; None si no hay observaciones."""
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            counts, total = (list(series[0]), series[2]) if series else (None, 0)
+        return self._quantile(q, counts, total)
+
+    def _quantile(self, q: float, counts: Optional[List[int]], total: int) -> Optional[float]:
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for i, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def percentiles(self, qs: Sequence[float] = (0.5, 0.9, 0.99)) -> Dict[Tuple[str, ...], Dict[str, float]]:
+        """Percentiles de todas las series: `{etiquetas: {"p50": ..., ...}}`."""
+        return {
+            key: {f"p{round(q * 100):g}": self._quantile(q, counts, total) for q in qs}
+            for key, (counts, _, total) in self._snapshot().items()
+        }
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total_sum, total) in sorted(self._snapshot().items()):
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % (bound if bound == "+Inf" else repr(float(bound)))
+                lines.append(f"{self.name}_bucket{{{','.join(labels + [le])}}} {cumulative}")
+            suffix = f"{{{','.join(labels)}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total_sum}")
+            lines.append(f"{self.name}_count{suffix} {total}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Devuelve el histograma `name`, creándolo si no existe."""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Histogram(name, documentation, labelnames, buckets)
+            return metric
+
+    def render(self) -> str:
+        """Todas las métricas en el formato de texto de Prometheus (para un endpoint `/metrics`)."""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+REGISTRY = MetricsRegistry()
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "queue_wait_seconds", "Time a message waited in the queue before being claimed.", ("queue",))
+STAGE_DURATION_SECONDS = REGISTRY.histogram(
+    "stage_duration_seconds", "Service time of a pipeline stage handler.", ("stage", "outcome"))
+DB_SESSION_SECONDS = REGISTRY.histogram(
+    "db_session_seconds", "Lifetime of a database session.", ("outcome",))
+R2_CALL_SECONDS = REGISTRY.histogram(
+    "r2_call_seconds", "Duration of an R2 (S3 API) call.", ("operation", "outcome"))
+
+
+# --- Instrumentación de etapas, sesiones y R2 ---
+
+def _outcome(error: Optional[BaseException]) -> str:
+    return "ok" if error is None else "error"
+
+@contextmanager
+def stage_span(stage: str, delivery=None, queue: Optional[str] = None, **attributes) -> Iterator[Span]:
+    """
+    Mide una etapa del pipeline. Con `delivery` (de `claim`), el span
+    continúa la traza del productor y se registra la espera en cola
+    (`queue_wait_seconds{queue}`) usando la hora de encolado del mensaje.
+    """
+    parent = None
+    if delivery is not None:
+        message = delivery.message
+        parent = getattr(message, "trace_context", None)
+        enqueued_at = delivery.enqueued_at or getattr(message, "enqueued_at", None)
+        if enqueued_at is not None:
+            wait = max(0.0, time.time() - enqueued_at)
+            QUEUE_WAIT_SECONDS.observe(wait, queue=queue or stage)
+            attributes["messaging.queue_wait_seconds"] = wait
+        if queue is not None:
+            attributes["messaging.destination.name"] = queue
+    kind = "CONSUMER" if delivery is not None else "INTERNAL"
+    start = time.perf_counter()
+    error = None
+    try:
+        with get_tracer().span(f"stage {stage}", parent=parent, kind=kind, **attributes) as span:
+            yield span
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        STAGE_DURATION_SECONDS.observe(time.perf_counter() - start, stage=stage, outcome=_outcome(error))
+
+def trace_stage(stage: str) -> Callable:
+    """Decorador de `stage_span` para handlers (sync o async) que reciben el `Delivery` como primer argumento, si lo hay."""
+    def decorator(fn: Callable) -> Callable:
+        def _delivery(args):
+            return args[0] if args and hasattr(args[0], "message") else None
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage_span(stage, delivery=_delivery(args)):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_span(stage, delivery=_delivery(args)):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@asynccontextmanager
+async def traced_db_session(session_factory=None):
+    """
+    Como `get_db_session`, con un span `db.session` y `db_session_seconds`:
+
+        async with traced_db_session() as session:
+            ...
+    """
+    if session_factory is None:
+        from ..database.connection import get_session_factory
+        session_factory = get_session_factory()
+    start = time.perf_counter()
+    error = None
+    try:
+        with get_tracer().span("db.session", kind="CLIENT"):
+            async with session_factory() as session:
+                yield session
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        DB_SESSION_SECONDS.observe(time.perf_counter() - start, outcome=_outcome(error))
+
+def instrument_r2_client(r2_client) -> None:
+    """
+    Mide todas las llamadas del cliente boto3 de un `R2Client` (también las
+    que hace `AsyncR2Client` a través de él) con los eventos de botocore: un
+    span `r2.<Operación>` y `r2_call_seconds{operation}`. Idempotente.
+    """
+    s3 = r2_client.s3_client
+    if getattr(s3, "_insurance_models_instrumented", False):
+        return
+    tracer_ref = get_tracer
+
+    def before_call(model, context, **kwargs):
+        context["_im_span"] = tracer_ref().start_span(f"r2.{model.name}", kind="CLIENT",
+                                                      attributes={"rpc.method": model.name})
+        context["_im_start"] = time.perf_counter()
+
+    def after_call(model, context, http_response=None, **kwargs):
+        span = context.pop("_im_span", None)
+        start = context.pop("_im_start", None)
+        if span is None:
+            return
+        status = getattr(http_response, "status_code", None)
+        error = None if status is None or status < 400 else RuntimeError(f"HTTP {status}")
+        if status is not None:
+            span.set_attribute("http.response.status_code", status)
+        R2_CALL_SECONDS.observe(time.perf_counter() - start, operation=model.name, outcome=_outcome(error))
+        tracer_ref().end_span(span, error)
+
+    def after_call_error(model, context, exception=None, **kwargs):
+        span = context.pop("_im_span", None)
+        start = context.pop("_im_start", None)
+        if span is None:
+            return
+        R2_CALL_SECONDS.observe(time.perf_counter() - start, operation=model.name, outcome="error")
+        tracer_ref().end_span(span, exception or RuntimeError("R2 call failed"))
+
+    events = s3.meta.events
+    events.register("before-call.s3", before_call)
+    events.register("after-call.s3", after_call)
+    events.register("after-call-error.s3", after_call_error)
+    s3._insurance_models_instrumented = True
@@ -2,7 +2,7 @@ from setuptools import setup, find_packages
 
 setup(
     name="insurance-models",
-    version="1.0.0",
+    version="2.0.0",
     packages=find_packages(),
     install_requires=[
         "sqlalchemy>=2.0.0",
@@ -13,5 +13,9 @@ setup(
         "asyncpg>=0.28.0",
         "alembic>=1.12.0"
     ],
+    extras_require={
+        "numpy": ["numpy>=1.24"],
+        "zstd": ["zstandard>=0.22"],
+    },
     python_requires=">=3.11",
 )
@@ -0,0 +1,51 @@
+"""
+Esquema de `Base.metadata` en SQLite, para los tests y los benchmarks.
+
+En Postgres las tablas particionadas tienen PK (id, created_at), y SQLite
+solo autoincrementa un INTEGER PRIMARY KEY simple: ahí `id` queda como la
+PK (con AUTOINCREMENT) y `created_at` como NOT NULL. BIGINT se compila como
+INTEGER (el único tipo que autoincrementa) y JSONB como JSON. El resto de la
+tabla (columnas generadas, índices, UNIQUE) sale del modelo.
+
+Uso:
+
+    async with engine.begin() as conn:
+        await conn.run_sync(create_tables, Job, JobFile, LlmResult)
+"""
+from sqlalchemy import BigInteger, PrimaryKeyConstraint
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateColumn
+
+from insurance_models.database.models import Base
+
+
+@compiles(BigInteger, "sqlite")
+def _bigint_as_integer(type_, compiler, **kw):
+    return "INTEGER"
+
+@compiles(JSONB, "sqlite")
+def _jsonb_as_json(type_, compiler, **kw):
+    return "JSON"
+
+def _is_partition_id(column) -> bool:
+    """El `id` autoincremental de una PK compuesta con la clave de partición."""
+    return column.primary_key and column.autoincrement is True and len(column.table.primary_key.columns) > 1
+
+@compiles(CreateColumn, "sqlite")
+def _partition_id_as_rowid(create, compiler, **kw):
+    column = create.element
+    if not _is_partition_id(column):
+        return compiler.visit_create_column(create, **kw)
+    return f"{compiler.preparer.format_column(column)} INTEGER PRIMARY KEY AUTOINCREMENT"
+
+@compiles(PrimaryKeyConstraint, "sqlite")
+def _partition_primary_key(constraint, compiler, **kw):
+    # La PK ya quedó en la columna `id`.
+    if any(_is_partition_id(column) for column in constraint.columns):
+        return None
+    return compiler.visit_primary_key_constraint(constraint, **kw)
+
+def create_tables(connection, *models) -> None:
+    """Crea las tablas de `models` (para `run_sync` o una conexión síncrona)."""
+    Base.metadata.create_all(connection, tables=[model.__table__ for model in models])
@@ -0,0 +1,125 @@
+import unittest
+from datetime import datetime
+
+try:
+    import aiosqlite  # noqa: F401
+except ImportError:  # pragma: no cover
+    aiosqlite = None
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.schema import CreateIndex
+
+from insurance_models.database import analytics
+from insurance_models.database.models import Job, JobResult, LlmResult, User, json_field
+
+from tests.sqlite_schema import create_tables
+
+def consolidated(premium, vehicle=None, insurers=()):
+    return {
+        "file_count": 1, "failed_file_ids": [], "policy_holder": None, "vehicle_info": vehicle,
+        "insurer_names": sorted(insurers), "min_annual_premium_uf": premium, "plans": [],
+    }
+
+KIA = {"make": "Kia", "model": "Rio", "year": 2020}
+RESULTS = {
+    1: consolidated(12.5, KIA, ["Mapfre"]),
+    2: consolidated(9.0, KIA, ["SURA", "Mapfre"]),
+    3: consolidated(30.0, {"make": "Kia", "model": "Rio", "year": 2018}),
+    4: consolidated(None, {"make": "Mazda", "model": "3", "year": 2020}),
+    5: consolidated(15.0),
+    6: None,  # consolidado en R2
+}
+
+
+class TestPostgresSql(unittest.TestCase):
+    def test_insurer_filter_matches_gin_index(self):
+        dialect = postgresql.dialect()
+        (index,) = [i for i in JobResult.__table__.indexes if i.name == "ix_job_results_insurer_names"]
+        ddl = str(CreateIndex(index).compile(dialect=dialect))
+        expression = str(json_field(JobResult.consolidated_data, "insurer_names").compile(dialect=dialect))
+        self.assertIn(f"USING gin (({expression.replace('job_results.', '')}) jsonb_path_ops)", ddl)
+        query = str(select(JobResult.job_id).where(analytics._insurer_filter(["Mapfre"])).compile(dialect=dialect))
+        self.assertIn(f"({expression}) @>", query)
+
+    def test_add_projections_sql(self):
+        statements = analytics.add_projections_sql()
+        self.assertIn(
+            "ALTER TABLE \"job_results\" ADD COLUMN IF NOT EXISTS vehicle_year INTEGER GENERATED ALWAYS AS "
+            "(CAST(consolidated_data -> 'vehicle_info' ->> 'year' AS INTEGER)) STORED",
+            statements,
+        )
+        self.assertEqual(sum(s.startswith("CREATE INDEX IF NOT EXISTS") for s in statements),
+                         len(analytics.PROJECTION_INDEXES))
+
+
+@unittest.skipIf(aiosqlite is None, "aiosqlite not installed")
+class TestAnalyticsQueries(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        self.sessions = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(create_tables, User, Job, JobResult, LlmResult)
+            await conn.execute(insert(User), [{"id": "u1", "email": "a@x.cl"}])
+            await conn.execute(insert(Job), [{"id": job_id, "user_id": "u1"} for job_id in RESULTS])
+            await conn.execute(insert(JobResult), [
+                {"job_id": job_id, "consolidated_data": data} for job_id, data in RESULTS.items()
+            ])
+            await conn.execute(insert(LlmResult), [
+                {"job_file_id": i, "raw_llm_data": data, "created_at": datetime(2025, 1, 1)}
+                for i, data in enumerate([{"document_type": "COTIZACION"}] * 3 + [{"document_type": "POLIZA"}, {}])
+            ])
+        self.session = self.sessions()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+    async def plan(self, query) -> str:
+        sql = query.compile(self.engine, compile_kwargs={"literal_binds": True})
+        rows = await self.session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+        return " | ".join(row[-1] for row in rows)
+
+    async def test_cheapest_jobs(self):
+        rows = await analytics.cheapest_jobs(self.session, limit=3)
+        self.assertEqual([(job_id, float(premium)) for job_id, premium in rows], [(2, 9.0), (1, 12.5), (5, 15.0)])
+        self.assertEqual([row.job_id for row in await analytics.cheapest_jobs(self.session, max_premium_uf=10)], [2])
+
+    async def test_vehicle_queries(self):
+        self.assertEqual(await analytics.jobs_by_vehicle(self.session, "Kia", "Rio", 2020), [1, 2])
+        self.assertEqual(await analytics.jobs_by_vehicle(self.session, "Kia"), [1, 2, 3])
+        self.assertEqual(await analytics.vehicle_counts(self.session), [
+            ("Kia", "Rio", 2020, 2), ("Kia", "Rio", 2018, 1), ("Mazda", "3", 2020, 1),
+        ])
+        self.assertEqual(await analytics.vehicle_counts(self.session, make="Mazda"),
+                         [analytics.VehicleCount("Mazda", "3", 2020, 1)])
+
+    async def test_document_type_counts(self):
+        self.assertEqual(await analytics.document_type_counts(self.session),
+                         [("COTIZACION", 3), ("POLIZA", 1), (None, 1)])
+
+    async def test_queries_use_the_projection_indexes(self):
+        # SQLite no usa como "covering" un índice sobre columnas generadas;
+        # Postgres sí (index-only scan, ver benchmarks/bench_analytics.py).
+        plan = await self.plan(select(JobResult.job_id).where(
+            JobResult.vehicle_make == "Kia", JobResult.vehicle_model == "Rio"))
+        self.assertIn("INDEX ix_job_results_vehicle", plan)
+        plan = await self.plan(select(JobResult.job_id, JobResult.min_annual_premium_uf)
+                               .where(JobResult.min_annual_premium_uf <= 10)
+                               .order_by(JobResult.min_annual_premium_uf))
+        self.assertIn("INDEX ix_job_results_min_premium", plan)
+
+    async def test_containment_queries_require_postgres(self):
+        with self.assertRaises(ValueError):
+            await analytics.jobs_with_insurer(self.session, "Mapfre")
+        with self.assertRaises(ValueError):
+            await analytics.cheapest_by_insurer(self.session)
+
+    async def test_limit_is_checked(self):
+        with self.assertRaises(ValueError):
+            await analytics.cheapest_jobs(self.session, limit=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import asyncio
+import itertools
+import json
+import random
+import unittest
+from datetime import datetime
+
+try:
+    import aiosqlite  # noqa: F401
+except ImportError:  # pragma: no cover
+    aiosqlite = None
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover
+    fakeredis = None
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from insurance_models.database.assembly import IncrementalAssembler, assemble_full
+from insurance_models.database.models import Job, JobFile, JobResult, LlmResult, User
+from insurance_models.schemas import InsuranceExtractionOutput, consolidate_job, post_process_many
+from insurance_models.schemas.consolidation import empty_assembly_state, merge_file
+
+from tests.sqlite_schema import create_tables
+
+def random_document(rng: random.Random) -> dict:
+    if rng.random() < 0.15:
+        return {"error": "Documento ilegible", "policy_analyses": []}
+    return {
+        "policy_holder": rng.choice([None, {"insured_name": f"Cliente {rng.randint(1, 9)}"}]),
+        "vehicle_info": rng.choice([None, {"make": "Kia", "model": "Rio", "year": rng.randint(2015, 2024)}]),
+        "policy_analyses": [
+            {
+                "insurer_name": rng.choice(["hdi seguros", "Mapfre", "SURA", None]),
+                "plan_name": rng.choice(["Full", "Solo RC", None]),
+                "deductible_premiums": [
+                    {"deductible_original_str": rng.choice(["UF 3", "UF 5", "0"]),
+                     "annual_premium_original_str": rng.choice([f"UF {rng.randint(8, 40)},5", "S/I", "0"])}
+                    for _ in range(rng.randint(0, 3))
+                ],
+            }
+            for _ in range(rng.randint(0, 4))
+        ],
+    }
+
+def raw_documents(seed: int, count: int):
+    rng = random.Random(seed)
+    return [(file_id, random_document(rng)) for file_id in rng.sample(range(1, 1000), count)]
+
+def documents(seed: int, count: int):
+    raw = raw_documents(seed, count)
+    outputs = post_process_many([InsuranceExtractionOutput.model_validate(doc) for _, doc in raw])
+    return [(file_id, output) for (file_id, _), output in zip(raw, outputs)]
+
+
+class TestMergeEquivalence(unittest.TestCase):
+    def test_any_order_matches_full_assembly(self):
+        for seed in range(20):
+            docs = documents(seed, 4)
+            expected = consolidate_job(docs)
+            for order in itertools.permutations(docs):
+                state = empty_assembly_state()
+                for file_id, output in order:
+                    # Ida y vuelta por JSON, como cuando el estado vive en Redis.
+                    state = json.loads(json.dumps(merge_file(state, file_id, output)))
+                self.assertEqual(state["result"], expected, f"seed {seed}")
+
+    def test_remerge_is_idempotent_and_replaces(self):
+        docs = documents(99, 3)
+        state = empty_assembly_state()
+        for file_id, output in docs + docs:
+            merge_file(state, file_id, output)
+        self.assertEqual(state["result"], consolidate_job(docs))
+
+        replacement = documents(100, 1)[0][1]
+        merge_file(state, docs[0][0], replacement)
+        self.assertEqual(state["result"], consolidate_job([(docs[0][0], replacement)] + docs[1:]))
+
+    def test_empty_state_matches_empty_job(self):
+        self.assertEqual(empty_assembly_state()["result"], consolidate_job([]))
+
+
+@unittest.skipIf(aiosqlite is None or fakeredis is None, "aiosqlite or fakeredis not installed")
+class TestIncrementalAssembler(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        self.sessions = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.docs = documents(7, 5)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(create_tables, User, Job, JobFile, JobResult, LlmResult)
+            await conn.execute(insert(User), [{"id": "u1", "email": "a@x.cl"}])
+            await conn.execute(insert(Job), [{"id": 1, "user_id": "u1"}])
+            await conn.execute(insert(JobFile), [
+                {"id": file_id, "job_id": 1, "filename": "a.pdf", "r2_object_key": "k"} for file_id, _ in self.docs
+            ])
+            await conn.execute(insert(LlmResult), [
+                {"job_file_id": file_id, "raw_llm_data": doc, "created_at": datetime(2024, 1, 1)}
+                for file_id, doc in raw_documents(7, 5)
+            ])
+        self.redis = fakeredis.FakeAsyncRedis()
+        self.assembler = IncrementalAssembler(self.redis)
+
+    async def asyncTearDown(self):
+        await self.redis.aclose()
+        await self.engine.dispose()
+
+    async def stored_result(self):
+        async with self.sessions() as session:
+            return (await session.execute(select(JobResult.consolidated_data))).scalar_one()
+
+    async def test_concurrent_merges_match_full_assembly(self):
+        await asyncio.gather(*(self.assembler.merge(1, file_id, output) for file_id, output in self.docs))
+        expected = consolidate_job(self.docs)
+        self.assertEqual(await self.assembler.partial(1), expected)
+
+        async with self.sessions() as session:
+            self.assertEqual(await assemble_full(session, 1), expected)
+            self.assertEqual(await self.assembler.finalize(session, 1, expected_files=5), expected)
+            await session.commit()
+        await self.assembler.discard(1)
+        self.assertEqual(await self.stored_result(), expected)
+        self.assertIsNone(await self.assembler.partial(1))
+
+    async def test_finalize_rebuilds_incomplete_state(self):
+        await self.assembler.merge(1, *self.docs[0])
+        async with self.sessions() as session:
+            result = await self.assembler.finalize(session, 1, expected_files=5)
+            await session.commit()
+        self.assertEqual(result, consolidate_job(self.docs))
+        self.assertEqual(await self.stored_result(), result)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+try:
+    import aiosqlite  # noqa: F401
+except ImportError:  # pragma: no cover
+    aiosqlite = None
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from insurance_models.database.backfill import (
+    BackfillRunner, BackfillTask, ConsolidationTask, FileCheckpoint, OcrTextHashTask, diff_json,
+)
+from insurance_models.database.models import Job, JobFile, JobResult, LlmResult, OcrResult, User
+from insurance_models.schemas import ConsolidatedJob, InsuranceExtractionOutput, consolidate_job, post_process_many
+
+from tests.sqlite_schema import create_tables
+
+JOBS = 12
+
+def document(n: int) -> dict:
+    return {
+        "policy_holder": {"insured_name": f"Cliente {n}", "insured_rut": "1-9"},
+        "vehicle_info": {"make": "Toyota", "model": "Yaris", "year": 2020},
+        "policy_analyses": [
+            {"insurer_name": "hdi seguros", "plan_name": "Full", "deductible_premiums": [
+                {"deductible_original_str": "UF 3", "annual_premium_original_str": f"UF {20 + n},5"},
+                {"deductible_original_str": "UF 3", "annual_premium_original_str": "UF 99"},
+            ]},
+            {"insurer_name": "Mapfre", "plan_name": "Plan Elemental (RC)", "deductible_premiums": [
+                {"deductible_original_str": "0", "annual_premium_original_str": f"{10 + n}"},
+            ]},
+        ],
+    }
+
+
+class TestConsolidation(unittest.TestCase):
+    def test_order_and_duplicates_do_not_matter(self):
+        outputs = post_process_many([InsuranceExtractionOutput.model_validate(document(n)) for n in range(3)])
+        pairs = list(zip([30, 10, 20], outputs))
+        expected = consolidate_job(pairs)
+        self.assertEqual(consolidate_job(reversed(pairs)), expected)
+        self.assertEqual(consolidate_job(pairs + pairs[:1]), expected)
+        self.assertEqual(expected["policy_holder"]["insured_name"], "Cliente 1")
+        self.assertEqual(expected["insurer_names"], ["HDI", "MAPFRE"])
+        self.assertEqual(expected["min_annual_premium_uf"], 10.0)
+
+    def test_layout_matches_the_schema(self):
+        outputs = post_process_many([InsuranceExtractionOutput.model_validate(document(n)) for n in range(2)])
+        consolidated = consolidate_job(zip([1, 2], outputs))
+        self.assertEqual(ConsolidatedJob.model_validate(consolidated).model_dump(mode="json"), consolidated)
+
+    def test_tasks_must_be_complete(self):
+        with self.assertRaises(TypeError):
+            BackfillTask()
+        with self.assertRaises(TypeError):
+            ConsolidationTask()  # sin layout por defecto
+
+    def test_diff_json(self):
+        self.assertEqual(diff_json({"a": [1, 2], "b": 1}, {"a": [1, 3], "c": 1}),
+                         [("$.a[1]", 2, 3), ("$.b", 1, None), ("$.c", None, 1)])
+        self.assertEqual(diff_json({"a": 1}, {"a": 1}), [])
+
+
+@unittest.skipIf(aiosqlite is None, "aiosqlite not installed")
+class TestBackfill(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(self.tmp.name, 'backfill.db')}")
+        self.sessions = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(create_tables, User, Job, JobFile, JobResult, OcrResult, LlmResult)
+            await conn.execute(insert(User), [{"id": "u1", "email": "a@x.cl"}])
+            await conn.execute(insert(Job), [{"id": j, "user_id": "u1"} for j in range(1, JOBS + 1)])
+            files = [{"id": j * 10 + k, "job_id": j, "filename": "a.pdf", "r2_object_key": "k"}
+                     for j in range(1, JOBS + 1) for k in range(2)]
+            await conn.execute(insert(JobFile), files)
+            old, new = datetime(2024, 1, 1), datetime(2024, 2, 1)
+            await conn.execute(insert(LlmResult), [
+                {"job_file_id": f["id"], "raw_llm_data": document(f["id"]), "created_at": new} for f in files
+            ] + [
+                # Una salida anterior del mismo archivo: debe ganar la más nueva.
+                {"job_file_id": 10, "raw_llm_data": {"error": "viejo", "policy_analyses": []}, "created_at": old},
+            ])
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+        self.tmp.cleanup()
+
+    async def consolidated(self):
+        async with self.sessions() as session:
+            rows = await session.execute(select(JobResult.job_id, JobResult.consolidated_data))
+            return dict(rows.all())
+
+    def expected(self, job_id: int) -> dict:
+        ids = [job_id * 10, job_id * 10 + 1]
+        outputs = post_process_many([InsuranceExtractionOutput.model_validate(document(i)) for i in ids])
+        return consolidate_job(zip(ids, outputs))
+
+    async def test_rebuilds_every_job_and_skips_unchanged(self):
+        runner = BackfillRunner(ConsolidationTask(consolidate_job), self.sessions, workers=0, chunk_size=5, batch_size=2)
+        report = await runner.run()
+        self.assertEqual((report.chunks, report.processed, report.written), (3, JOBS, JOBS))
+        results = await self.consolidated()
+        self.assertEqual(results, {j: self.expected(j) for j in range(1, JOBS + 1)})
+        self.assertEqual(results[1]["failed_file_ids"], [])
+
+        report = await runner.run()
+        self.assertEqual((report.unchanged, report.written), (JOBS, 0))
+
+    async def test_process_pool_matches_inline(self):
+        runner = BackfillRunner(ConsolidationTask(consolidate_job), self.sessions, workers=2, chunk_size=4, batch_size=2)
+        report = await runner.run()
+        self.assertEqual(report.written, JOBS)
+        self.assertEqual(await self.consolidated(), {j: self.expected(j) for j in range(1, JOBS + 1)})
+
+    async def test_dry_run_reports_diffs_without_writing(self):
+        async with self.sessions() as session:
+            stale = self.expected(3)
+            stale["min_annual_premium_uf"] = 1.0
+            session.add(JobResult(job_id=3, consolidated_data=stale))
+            await session.commit()
+        report = await BackfillRunner(ConsolidationTask(consolidate_job), self.sessions, workers=0, dry_run=True).run(2, 3)
+        self.assertEqual(report.written, 0)
+        diffs = {diff.id: diff.changes for diff in report.diffs}
+        self.assertEqual(diffs[3], [("$.min_annual_premium_uf", 1.0, 40.0)])
+        self.assertEqual(diffs[2][0][:2], ("$", None))
+        self.assertEqual(await self.consolidated(), {3: stale})
+
+    async def test_resumes_from_checkpoint(self):
+        checkpoint = FileCheckpoint(os.path.join(self.tmp.name, "checkpoint.json"))
+
+        class Interrupted(ConsolidationTask):
+            async def write(self, session, outcomes):
+                if outcomes and outcomes[0][0] > 5:
+                    raise RuntimeError("interrumpido")
+                return await super().write(session, outcomes)
+
+        runner = BackfillRunner(Interrupted(consolidate_job), self.sessions, workers=0, chunk_size=5, checkpoint=checkpoint)
+        with self.assertRaises(RuntimeError):
+            await runner.run()
+        self.assertEqual(checkpoint.load("consolidation")["next_id"], 6)
+        self.assertEqual(set(await self.consolidated()), {1, 2, 3, 4, 5})
+
+        report = await BackfillRunner(ConsolidationTask(consolidate_job), self.sessions, workers=0, chunk_size=5,
+                                      checkpoint=checkpoint).run()
+        self.assertTrue(report.resumed)
+        self.assertEqual((report.start_id, report.processed), (6, JOBS - 5))
+        self.assertEqual(len(await self.consolidated()), JOBS)
+        # Los contadores del checkpoint suman ambas corridas.
+        stats = checkpoint.load("consolidation")["stats"]
+        self.assertEqual((stats["chunks"], stats["processed"], stats["written"]), (3, JOBS, JOBS))
+
+        checkpoint.clear("consolidation")
+        self.assertIsNone(checkpoint.load("consolidation"))
+        self.assertFalse([name for name in os.listdir(self.tmp.name) if name.endswith(".tmp")])
+
+    async def test_ocr_text_hashes(self):
+        async with self.sessions() as session:
+            session.add_all([
+                OcrResult(job_file_id=10, text_content="Prima UF 20", created_at=datetime(2024, 1, 1)),
+                OcrResult(job_file_id=11, text_blob_key="blobs/ocr/x", text_blob_sha256="ab" * 32),
+            ])
+            await session.commit()
+        report = await BackfillRunner(OcrTextHashTask(), self.sessions, workers=0).run()
+        self.assertEqual(report.written, 2)
+        async with self.sessions() as session:
+            hashes = (await session.execute(select(OcrResult.text_sha256).order_by(OcrResult.id))).scalars().all()
+        self.assertEqual(hashes, [hashlib.sha256(b"Prima UF 20").hexdigest(), "ab" * 32])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+import os
+import threading
+import unittest
+from unittest import mock
+
+try:
+    from moto.server import ThreadedMotoServer
+except ImportError:  # pragma: no cover
+    ThreadedMotoServer = None
+
+from insurance_models.database.models import JobResult, LlmResult, OcrResult
+from insurance_models.r2 import blob_store
+from insurance_models.r2.blob_store import BlobCache, BlobStore, should_offload
+from insurance_models.r2.client import R2Client
+
+
+class TestBlobCache(unittest.TestCase):
+    def test_evicts_least_recently_used_by_bytes(self):
+        cache = BlobCache(max_bytes=10)
+        cache.put("a", b"1234")
+        cache.put("b", b"1234")
+        cache.get("a")
+        cache.put("c", b"1234")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), b"1234")
+        self.assertEqual(cache.current_bytes, 8)
+
+    def test_skips_blobs_larger_than_the_cache(self):
+        cache = BlobCache(max_bytes=4)
+        cache.put("a", b"12345")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.current_bytes, 0)
+
+
+class TestOffloadSettings(unittest.TestCase):
+    def test_inline_by_default(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertFalse(should_offload(10 * 1024 * 1024))
+
+    def test_threshold_in_r2_mode(self):
+        env = {"BLOB_STORAGE_MODE": "r2", "BLOB_MIN_OFFLOAD_BYTES": "100"}
+        with mock.patch.dict(os.environ, env, clear=True):
+            self.assertFalse(should_offload(99))
+            self.assertTrue(should_offload(100))
+
+    def test_unknown_mode(self):
+        with mock.patch.dict(os.environ, {"BLOB_STORAGE_MODE": "s3"}, clear=True):
+            with self.assertRaises(ValueError):
+                should_offload(1)
+
+    def test_models_keep_small_payloads_inline(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            ocr = OcrResult(job_file_id=1)
+            ocr.set_text("texto")
+            self.assertEqual(ocr.text_content, "texto")
+            self.assertIsNone(ocr.text_blob_key)
+            self.assertEqual(ocr.text, "texto")
+
+
+@unittest.skipIf(ThreadedMotoServer is None, "moto[server] is not installed")
+class TestBlobStore(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+        cls.server.start()
+        host, port = cls.server.get_host_and_port()
+        cls.env = {
+            "R2_ACCESS_KEY_ID": "test",
+            "R2_SECRET_ACCESS_KEY": "test",
+            "R2_BUCKET_NAME": "insurance-test",
+            "R2_ENDPOINT_URL": f"http://{host}:{port}",
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        with mock.patch.dict(os.environ, self.env):
+            client = R2Client()
+        client.s3_client.create_bucket(Bucket="insurance-test")
+        self.s3 = client.s3_client
+        self.store = BlobStore(client)
+
+    def uncached_store(self) -> BlobStore:
+        return BlobStore(self.store.client)
+
+    def test_round_trip_is_compressed_and_content_addressed(self):
+        text = "Prima anual UF 12,5 deducible 5 UF. " * 2000
+        ref = self.store.put_text(text, "ocr")
+        self.assertEqual(ref.size, len(text.encode()))
+        self.assertTrue(ref.key.startswith(f"blobs/ocr/{ref.sha256[:2]}/{ref.sha256}."))
+        stored = self.s3.head_object(Bucket="insurance-test", Key=ref.key)["ContentLength"]
+        self.assertLess(stored, ref.size / 10)
+        self.assertEqual(self.uncached_store().get_text(ref.key, ref.sha256), text)
+
+    def test_same_content_is_uploaded_once(self):
+        with mock.patch.object(self.s3, "put_object", wraps=self.s3.put_object) as put_object:
+            first = self.store.put(b"x" * 5000, "llm")
+            second = self.store.put(b"x" * 5000, "llm")
+        self.assertEqual(first, second)
+        self.assertEqual(put_object.call_count, 1)
+
+    def test_reads_are_served_from_the_cache(self):
+        ref = self.store.put_json({"a": 1}, "result")
+        store = self.uncached_store()
+        with mock.patch.object(self.s3, "get_object", wraps=self.s3.get_object) as get_object:
+            self.assertEqual(store.get_json(ref.key), {"a": 1})
+            self.assertEqual(store.get_json(ref.key), {"a": 1})
+        self.assertEqual(get_object.call_count, 1)
+        self.assertEqual(store.cache.hits, 1)
+
+    def test_hash_mismatch_is_rejected(self):
+        ref = self.store.put(b"contenido", "ocr")
+        with self.assertRaises(ValueError):
+            self.uncached_store().get(ref.key, sha256="0" * 64)
+
+    def test_zlib_fallback_without_zstandard(self):
+        with mock.patch.object(blob_store, "zstandard", None), \
+                mock.patch.object(blob_store, "_warned_zlib_fallback", False), \
+                mock.patch.dict(os.environ, {"BLOB_CODEC": ""}):
+            with self.assertLogs(blob_store.logger, "WARNING"):
+                store = BlobStore(self.store.client)
+            with self.assertNoLogs(blob_store.logger, "WARNING"):
+                BlobStore(self.store.client)
+            ref = store.put(b"sin zstd " * 100, "ocr")
+            self.assertTrue(ref.key.endswith(".zz"))
+            self.assertEqual(BlobStore(self.store.client).get(ref.key), b"sin zstd " * 100)
+            with mock.patch.dict(os.environ, {"BLOB_CODEC": "zstd"}), self.assertRaises(ImportError):
+                BlobStore(self.store.client)
+
+    def test_codec_is_configurable(self):
+        with mock.patch.dict(os.environ, {"BLOB_CODEC": "zlib"}):
+            ref = BlobStore(self.store.client).put(b"zlib " * 100, "ocr")
+        self.assertTrue(ref.key.endswith(".zz"))
+        with mock.patch.dict(os.environ, {"BLOB_CODEC": "lz4"}), self.assertRaises(ValueError):
+            BlobStore(self.store.client)
+
+    def test_existing_blobs_are_not_compressed_again(self):
+        self.store.put(b"y" * 5000, "llm")
+        with mock.patch.object(blob_store, "_compress", wraps=blob_store._compress) as compress:
+            self.store.put(b"y" * 5000, "llm")
+        compress.assert_not_called()
+
+    async def test_models_offload_and_load_lazily(self):
+        env = {"BLOB_STORAGE_MODE": "r2", "BLOB_MIN_OFFLOAD_BYTES": "1024"}
+        raw = {"policy_analyses": [{"plan_name": f"Plan {i}"} for i in range(200)]}
+        with mock.patch.dict(os.environ, env):
+            llm = LlmResult(job_file_id=1)
+            await llm.store_raw_data(raw, store=self.store)
+            result = JobResult(job_id=1)
+            await result.store_consolidated({"ok": True}, store=self.store)
+            ocr = OcrResult(job_file_id=1)
+            ocr.set_text("texto " * 1000, store=self.store)
+        self.assertIsNone(llm.raw_llm_data)
+        self.assertEqual(llm.raw_blob_size, len(blob_store.json.dumps(raw, separators=(",", ":"))))
+        self.assertEqual(await llm.load_raw_data(self.uncached_store()), raw)
+        # Bajo el umbral queda inline aunque el modo sea "r2".
+        self.assertEqual(result.consolidated_data, {"ok": True})
+        self.assertIsNone(result.consolidated_blob_key)
+        self.assertEqual(await result.load_consolidated(), {"ok": True})
+
+        self.assertIsNotNone(ocr.text_blob_key)
+        self.assertEqual(await ocr.load_text(self.uncached_store()), "texto " * 1000)
+        # El acceso síncrono no descarga: bloquearía el event loop.
+        with mock.patch.object(self.s3, "get_object") as get_object:
+            for read in (lambda: ocr.text, lambda: llm.raw_data):
+                with self.assertRaises(ValueError):
+                    read()
+        get_object.assert_not_called()
+
+    async def test_async_store_uploads_outside_the_event_loop(self):
+        env = {"BLOB_STORAGE_MODE": "r2", "BLOB_MIN_OFFLOAD_BYTES": "1"}
+        put, threads = self.store.put, []
+
+        def recording_put(data, kind):
+            threads.append(threading.get_ident())
+            return put(data, kind)
+
+        with mock.patch.dict(os.environ, env), mock.patch.object(self.store, "put", recording_put):
+            ocr = OcrResult(job_file_id=1)
+            await ocr.store_text("texto", store=self.store)
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.get_ident())
+        self.assertIsNone(ocr.text_content)
+        self.assertEqual(ocr.text_sha256, ocr.text_blob_sha256)
+
+if __name__ == '__main__':
+    unittest.main()
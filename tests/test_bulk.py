@@ -0,0 +1,120 @@
+import asyncio
+import unittest
+
+try:
+    import aiosqlite  # noqa: F401
+except ImportError:  # pragma: no cover
+    aiosqlite = None
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from insurance_models.database.bulk import InsurerCache, write_extractions
+from insurance_models.database.models import (
+    DeductiblePremium, InsurancePlan, Insurer, Job, NewVehicleReplacementCoverage,
+    PolicyHolder, ReplacementCarCoverage, User, Vehicle, WorkshopCoverage,
+)
+from insurance_models.schemas import InsuranceExtractionOutput, post_process_many
+
+from tests.sqlite_schema import create_tables
+
+MODELS = (
+    User, Job, Insurer, PolicyHolder, Vehicle, InsurancePlan, DeductiblePremium,
+    WorkshopCoverage, ReplacementCarCoverage, NewVehicleReplacementCoverage,
+)
+
+DOCUMENT = {
+    "policy_holder": {"insured_name": "Juan Pérez", "insured_rut": "1-9"},
+    "vehicle_info": {"make": "Kia", "model": "Rio", "year": 2021},
+    "policy_analyses": [
+        {
+            "insurer_name": "HDI Seguros",
+            "plan_name": "Full",
+            "replacement_car_info": {"has_coverage": True, "days_limit_str": "15"},
+            "deductible_premiums": [
+                {"deductible_original_str": "UF 5", "annual_premium_original_str": "UF 20,5"},
+                {"deductible_original_str": "UF 10", "annual_premium_original_str": "UF 18"},
+            ],
+        },
+        {
+            "insurer_name": "Mapfre",
+            "plan_name": "Plan Elemental",
+            "deductible_premiums": [{"deductible_original_str": "0", "annual_premium_original_str": "9"}],
+        },
+    ],
+}
+
+
+@unittest.skipIf(aiosqlite is None, "aiosqlite not installed")
+class TestWriteExtractions(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        self.sessions = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+
+        async def setup():
+            async with self.engine.begin() as conn:
+                await conn.run_sync(create_tables, *MODELS)
+            async with self.sessions() as session:
+                session.add(User(id="u1", email="a@x.cl"))
+                session.add_all([Job(id=1, user_id="u1"), Job(id=2, user_id="u1")])
+                session.add(Insurer(name="HDI"))
+                await session.commit()
+        asyncio.run(setup())
+
+    def tearDown(self):
+        asyncio.run(self.engine.dispose())
+
+    def run_in_session(self, fn):
+        async def _run():
+            async with self.sessions() as session:
+                result = await fn(session)
+                await session.commit()
+                return result
+        return asyncio.run(_run())
+
+    def test_batch_maps_every_table(self):
+        outputs = post_process_many([InsuranceExtractionOutput.model_validate(DOCUMENT) for _ in range(2)])
+        errored = InsuranceExtractionOutput(error="sin datos", policy_analyses=[])
+        cache = InsurerCache()
+        counts = self.run_in_session(
+            lambda s: write_extractions(s, [(1, outputs[0]), (2, outputs[1]), (2, errored)], insurer_cache=cache)
+        )
+        self.assertEqual(counts["insurance_plans"], 4)
+        self.assertEqual(counts["deductible_premiums"], 6)
+        # El plan RC-only pierde taller y reemplazo de vehículo nuevo en el post-proceso.
+        self.assertEqual(counts["workshop_coverages"], 2)
+        self.assertEqual(counts["new_vehicle_replacement_coverages"], 2)
+        self.assertEqual(len(cache), 2)
+
+        async def check(session):
+            plans = (await session.execute(
+                select(InsurancePlan.job_id, InsurancePlan.plan_name, Insurer.name)
+                .join(Insurer).order_by(InsurancePlan.id)
+            )).all()
+            self.assertEqual([tuple(p) for p in plans], [
+                (1, "Full", "HDI"), (1, "Plan Elemental", "MAPFRE"),
+                (2, "Full", "HDI"), (2, "Plan Elemental", "MAPFRE"),
+            ])
+            self.assertEqual((await session.execute(select(func.count()).select_from(Insurer))).scalar_one(), 2)
+            premium = (await session.execute(
+                select(DeductiblePremium).where(DeductiblePremium.deductible_uf == "UF 5").limit(1)
+            )).scalar_one()
+            self.assertEqual((premium.annual_premium_uf, float(premium.parsed_premium)), ("UF 20,5", 20.5))
+            car = (await session.execute(select(ReplacementCarCoverage).limit(1))).scalar_one()
+            self.assertEqual((car.has_coverage, car.days_limit), (True, "15"))
+        self.run_in_session(check)
+
+    def test_failed_write_forgets_new_insurers(self):
+        cache = InsurerCache()
+        output = post_process_many([InsuranceExtractionOutput.model_validate(DOCUMENT)])[0]
+
+        async def failing(session):
+            await session.run_sync(lambda s: s.connection().exec_driver_sql("DROP TABLE vehicles"))
+            with self.assertRaises(Exception):
+                await write_extractions(session, [(1, output)], insurer_cache=cache)
+        self.run_in_session(failing)
+        self.assertEqual(len(cache), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover
+    fakeredis = None
+
+from insurance_models.database import schemas
+from insurance_models.redis.codec import (
+    BINARY_CODEC, HEADER_SIZE, MessageRegistry, decode_message, encode_message,
+)
+from insurance_models.redis.queues import (
+    ASSEMBLY_QUEUE, AssemblyQueueMessage, LlmQueueMessage, OcrQueueMessage,
+)
+from insurance_models.redis.reliable_queue import ReliableQueue
+
+
+class TestBinaryCodec(unittest.TestCase):
+    def test_round_trip_for_all_queue_messages(self):
+        for message in (OcrQueueMessage(job_file_id=1), LlmQueueMessage(job_file_id=2**40), AssemblyQueueMessage(job_id=3)):
+            data = encode_message(message, enqueued_at=1000.0)
+            self.assertEqual(len(data), HEADER_SIZE + 8)
+            envelope = decode_message(memoryview(data))
+            self.assertEqual(envelope.message, message)
+            self.assertEqual(envelope.enqueued_at, 1000.0)
+            self.assertEqual(envelope.queue_latency(now=1002.5), 2.5)
+
+    def test_tags_distinguish_identical_layouts(self):
+        data = encode_message(OcrQueueMessage(job_file_id=1))
+        with self.assertRaises(ValueError):
+            BINARY_CODEC.decode(data, LlmQueueMessage)
+
+    def test_json_fallback_and_legacy_messages(self):
+        registry = MessageRegistry()
+        registry.register(9, OcrQueueMessage)
+        envelope = decode_message(encode_message(OcrQueueMessage(job_file_id=4), registry=registry), registry=registry)
+        self.assertEqual(envelope.message.job_file_id, 4)
+        self.assertEqual(BINARY_CODEC.decode(b'{"job_file_id": 5}', OcrQueueMessage).message.job_file_id, 5)
+
+    def test_truncated_payload_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            decode_message(encode_message(OcrQueueMessage(job_file_id=1))[:-1])
+
+    def test_database_schemas_reexport_canonical_models(self):
+        self.assertIs(schemas.OcrQueueMessage, OcrQueueMessage)
+        self.assertIs(schemas.AssemblyQueueMessage, AssemblyQueueMessage)
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TestBinaryQueue(unittest.IsolatedAsyncioTestCase):
+    async def test_reliable_queue_on_bytes_client(self):
+        client = fakeredis.FakeAsyncRedis(decode_responses=False)
+        queue = ReliableQueue.for_queue(client, ASSEMBLY_QUEUE, codec=BINARY_CODEC)
+        await queue.enqueue_many([AssemblyQueueMessage(job_id=1), AssemblyQueueMessage(job_id=2)])
+        deliveries = await queue.claim(2)
+        self.assertEqual([d.message.job_id for d in deliveries], [1, 2])
+        self.assertIsNotNone(deliveries[0].enqueued_at)
+        await queue.ack_many(deliveries)
+        self.assertEqual(await queue.depth(), (0, 0))
+        await client.aclose()
+
+
+if __name__ == '__main__':
+    unittest.main()
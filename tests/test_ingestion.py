@@ -0,0 +1,86 @@
+import json
+import unittest
+
+from pydantic import ValidationError
+
+from insurance_models.schemas import InsuranceExtractionOutput, validate_extraction_json, validate_many
+from insurance_models.schemas.ingestion import validate_extraction_array
+from insurance_models.schemas.llm_schemas import (
+    NewVehicleReplacementInfo, RCPlanAnalysis, ReplacementCarCoverage, SmartDeductibleInfo, WorkshopDetail,
+)
+
+PLAN = {
+    "insurer_name": "HDI Seguros",
+    "plan_name": "Full",
+    "replacement_car_info": {"has_coverage": None, "days_limit_str": "15"},
+    "smart_deductible_info": {"has_coverage": True},
+    "deductible_premiums": [{"deductible_original_str": "UF 5", "annual_premium_original_str": "UF 20"}],
+}
+DOCUMENT = {"document_type": "cotizacion", "policy_analyses": [PLAN]}
+
+
+class TestCoverageFlag(unittest.TestCase):
+    def test_null_becomes_false(self):
+        for model in (SmartDeductibleInfo, NewVehicleReplacementInfo, ReplacementCarCoverage):
+            self.assertIs(model(has_coverage=None).has_coverage, False)
+            self.assertIs(model.model_validate_json('{"has_coverage": null}').has_coverage, False)
+            self.assertIs(model.model_validate_json('{"has_coverage": true}').has_coverage, True)
+            self.assertIs(model().has_coverage, False)
+
+    def test_invalid_value_still_fails(self):
+        with self.assertRaises(ValidationError):
+            SmartDeductibleInfo(has_coverage="quizás")
+        with self.assertRaises(ValidationError):
+            SmartDeductibleInfo(has_coverage=2)
+
+    def test_omitted_blocks_are_independent_defaults(self):
+        first, second = RCPlanAnalysis(), RCPlanAnalysis.model_validate_json("{}")
+        self.assertIsInstance(first.replacement_car_info, ReplacementCarCoverage)
+        self.assertIs(first.smart_deductible_info.has_coverage, False)
+        self.assertEqual(first, second)
+        first.replacement_car_info.has_coverage = True
+        self.assertIs(second.replacement_car_info.has_coverage, False)
+        self.assertNotIn("workshop_info", first.model_fields_set)
+        # Sin validación (model_construct) los bloques siguen siendo modelos.
+        self.assertIsInstance(RCPlanAnalysis.model_construct().workshop_info, WorkshopDetail)
+
+
+class TestIngestion(unittest.TestCase):
+    def test_json_path_matches_dict_path(self):
+        raw = json.dumps(DOCUMENT)
+        self.assertEqual(
+            validate_extraction_json(raw).model_dump(),
+            InsuranceExtractionOutput.model_validate(DOCUMENT).model_dump(),
+        )
+        self.assertEqual(validate_extraction_json(raw.encode()), validate_extraction_json(raw))
+
+    def test_validate_array(self):
+        outputs = validate_extraction_array(json.dumps([DOCUMENT, DOCUMENT]))
+        self.assertEqual(len(outputs), 2)
+        self.assertFalse(outputs[0].policy_analyses[0].replacement_car_info.has_coverage)
+
+    def test_validate_many_mixed_inputs(self):
+        outputs = validate_many([json.dumps(DOCUMENT), json.dumps(DOCUMENT).encode(), DOCUMENT])
+        self.assertEqual(len({o.model_dump_json() for o in outputs}), 1)
+
+    def test_validate_many_errors(self):
+        payloads = [json.dumps(DOCUMENT), '{"document_type": "x"}', "{not json"]
+        with self.assertRaises(ValidationError):
+            validate_many(payloads)
+        outputs = validate_many(payloads, on_error="mark")
+        self.assertIsNone(outputs[0].error)
+        self.assertTrue(outputs[1].error and outputs[2].error)
+        self.assertIn("first at policy_analyses: Field required", outputs[1].error)
+        self.assertEqual(outputs[1].policy_analyses, [])
+        with self.assertRaises(ValueError):
+            validate_many(payloads, on_error="ignore")
+
+    def test_validate_many_post_process(self):
+        output = validate_many([json.dumps(DOCUMENT)], post_process=True)[0]
+        plan = output.policy_analyses[0]
+        self.assertEqual(plan.insurer_name, "HDI")
+        self.assertEqual(plan.deductible_premiums[0].annual_premium_uf, 20.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import unittest
+from unittest import mock
+
+from insurance_models.utils.lazy import LazyProvider
+
+
+class TestLazyProvider(unittest.TestCase):
+    def test_builds_once_across_threads(self):
+        calls = []
+        provider = LazyProvider(lambda: calls.append(1) or object())
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(provider.get())) for _ in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+
+    def test_reset_returns_previous_instance(self):
+        provider = LazyProvider(object)
+        first = provider.get()
+        self.assertIs(provider.reset(), first)
+        self.assertFalse(provider.is_initialized)
+        self.assertIsNot(provider.get(), first)
+
+
+class TestImportHasNoSideEffects(unittest.TestCase):
+    def test_client_modules_import_without_env(self):
+        env = {k: v for k, v in os.environ.items()
+               if k not in ("DATABASE_URL", "REDIS_URL") and not k.startswith("R2_")}
+        with mock.patch.dict(os.environ, env, clear=True):
+            for name in ("insurance_models.redis.client", "insurance_models.r2.client"):
+                module = importlib.reload(importlib.import_module(name))
+                self.assertIsNotNone(module)
+
+    def test_r2_modules_do_not_load_botocore(self):
+        code = ("import sys, insurance_models.r2.client, insurance_models.r2.async_client; "
+                "print(sorted(m for m in sys.modules if m.startswith(('boto3', 'botocore'))))")
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out.strip(), "[]")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import re
+import unittest
+
+try:
+    from hypothesis import given, strategies as st
+except ImportError:  # pragma: no cover
+    given = None
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from insurance_models.schemas.llm_schemas import parse_uf_value_from_string
+from insurance_models.utils.parsing import (
+    _parse_uf_uncached, clear_parse_cache, parse_uf_value, parse_uf_values,
+)
+
+
+def legacy_parse_uf_value(value_str):
+    """Implementación anterior de `utils.parsing.parse_uf_value`, usada como oráculo."""
+    if value_str is None:
+        return None
+    text = str(value_str).strip().lower()
+    if any(term in text for term in ["sin deducible", "sin copago", "gratis", "no aplica", "n/a", "s/d"]):
+        return 0.0
+    match = re.search(r'([\d.,]+)', text)
+    if not match:
+        return None
+    num_part = match.group(1)
+    if ',' in num_part and '.' in num_part:
+        cleaned = num_part.replace('.', '').replace(',', '.')
+    elif ',' in num_part:
+        cleaned = num_part.replace(',', '.')
+    elif '.' in num_part:
+        parts = num_part.split('.')
+        if len(parts) > 2 or (len(parts) == 2 and len(parts[1]) == 3 and len(num_part) > 4):
+            cleaned = num_part.replace('.', '')
+        else:
+            cleaned = num_part
+    else:
+        cleaned = num_part
+    try:
+        return float(cleaned)
+    except (ValueError, TypeError):
+        return None
+
+
+EXAMPLES = {
+    "UF 5": 5.0,
+    "UF 5,5": 5.5,
+    "1.234,56": 1234.56,
+    "1.234.567": 1234567.0,
+    "12.345": 12345.0,
+    "0.500": 500.0,
+    "3.5": 3.5,
+    "Sin deducible": 0.0,
+    "SD": 0.0,
+    "s/d": 0.0,
+    "0": 0.0,
+    "USD 10": 10.0,
+    "No informado": None,
+    "": None,
+    None: None,
+}
+
+if given is not None:
+    uf_strings = st.one_of(
+        st.none(),
+        st.text(alphabet="0123456789.,", max_size=12),
+        st.builds(
+            lambda prefix, number, suffix: f"{prefix}{number}{suffix}",
+            st.sampled_from(["", "UF ", "uf", "$ ", "USD ", "Prima: ", " "]),
+            st.text(alphabet="0123456789.,", min_size=1, max_size=10),
+            st.sampled_from(["", " anual", " UF", " (neto)", "\n"]),
+        ),
+        st.sampled_from(["Sin Deducible", "sin copago", "Gratis", "No Aplica", "N/A", "S/D", "sd", "SD 5"]),
+        st.text(max_size=20),
+    )
+
+
+class TestParseUfValue(unittest.TestCase):
+    def setUp(self):
+        clear_parse_cache()
+
+    def test_examples(self):
+        for raw, expected in EXAMPLES.items():
+            with self.subTest(raw=raw):
+                self.assertEqual(parse_uf_value(raw), expected)
+
+    def test_llm_schema_helper_is_the_canonical_parser(self):
+        self.assertIs(parse_uf_value_from_string, parse_uf_value)
+
+    def test_batch_returns_list(self):
+        raws = list(EXAMPLES)
+        self.assertEqual(parse_uf_values(raws), [EXAMPLES[r] for r in raws])
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_batch_as_array(self):
+        values, mask = parse_uf_values(["UF 5", None, "x", "1,5"], as_array=True)
+        self.assertEqual(values.dtype, np.float64)
+        self.assertEqual(mask.tolist(), [False, True, True, False])
+        self.assertEqual(values[~mask].tolist(), [5.0, 1.5])
+
+    if given is not None:
+        @given(uf_strings)
+        def test_matches_legacy_parser_outside_sd_token(self, raw):
+            # La única regla nueva: "sd" como palabra completa equivale a cero.
+            if raw is not None and re.search(r"\bsd\b", raw.strip().lower()):
+                self.assertEqual(parse_uf_value(raw), 0.0)
+            else:
+                self.assertEqual(parse_uf_value(raw), legacy_parse_uf_value(raw))
+
+        @given(st.lists(uf_strings, max_size=30))
+        def test_batch_matches_scalar(self, raws):
+            self.assertEqual(parse_uf_values(raws), [parse_uf_value(r) for r in raws])
+
+        @given(uf_strings.filter(lambda v: v is not None))
+        def test_memo_matches_uncached(self, raw):
+            self.assertEqual(parse_uf_value(raw), _parse_uf_uncached(raw))
+            self.assertEqual(parse_uf_value(raw), _parse_uf_uncached(raw))
+
+
+if __name__ == '__main__':
+    unittest.main()
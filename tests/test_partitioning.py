@@ -0,0 +1,203 @@
+import unittest
+from datetime import date, datetime
+
+from sqlalchemy import BigInteger, Column, DateTime, MetaData, Table, create_engine, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.schema import CreateTable
+
+from insurance_models.database.models import Job, JobFile, LlmResult, OcrResult, ProcessingLog, User
+from insurance_models.database.partitioning import (
+    PartitionPolicy, add_months, convert_to_partitioned_sql, expired_partitions,
+    maintain_partitions, parse_partition_name, partition_name, planned_months,
+)
+
+from tests.sqlite_schema import create_tables
+
+
+class FakeResult:
+    def __init__(self, rows=(), scalar=None):
+        self._rows, self._scalar = list(rows), scalar
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def scalar(self):
+        return self._scalar
+
+
+class RecordingConnection:
+    """Conexión mínima: responde al catálogo de particiones y guarda el SQL ejecutado."""
+
+    def __init__(self, partitions=None, oldest=None, columns=None, default_rows=()):
+        self.partitions = partitions or {}
+        self.oldest = oldest
+        self.columns = columns or {}
+        self.default_rows = set(default_rows)  # (tabla DEFAULT, mes ISO) con filas
+        self.executed = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        if "pg_inherits" in sql:
+            return FakeResult([(name,) for name in self.partitions.get(params["table"], [])])
+        if "information_schema.columns" in sql:
+            return FakeResult([(name,) for name in self.columns.get(params["table"], [])])
+        if "min(created_at)" in sql:
+            return FakeResult(scalar=self.oldest)
+        if sql.startswith("SELECT EXISTS"):
+            return FakeResult(scalar=any(f'"{table}"' in sql and f">= '{month}'" in sql
+                                         for table, month in self.default_rows))
+        self.executed.append(sql)
+        return FakeResult()
+
+
+class TestPartitionNames(unittest.TestCase):
+    def test_months_and_names(self):
+        self.assertEqual(add_months(date(2024, 11, 1), 3), date(2025, 2, 1))
+        self.assertEqual(add_months(date(2024, 1, 1), -1), date(2023, 12, 1))
+        self.assertEqual(partition_name("llm_results", date(2024, 5, 1)), "llm_results_p202405")
+        self.assertEqual(parse_partition_name("processing_logs_p202405"), ("processing_logs", date(2024, 5, 1)))
+        self.assertIsNone(parse_partition_name("processing_logs_default"))
+
+    def test_planned_and_expired(self):
+        policy = PartitionPolicy(table="processing_logs", premake=2, retention_months=3)
+        self.assertEqual(planned_months(policy, date(2024, 12, 15)),
+                         [date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1)])
+        existing = ["processing_logs_p202408", "processing_logs_p202409", "processing_logs_default", "ocr_results_p202401"]
+        self.assertEqual(expired_partitions(policy, existing, date(2024, 12, 15)), ["processing_logs_p202408"])
+        self.assertEqual(expired_partitions(PartitionPolicy(table="processing_logs"), existing, date(2024, 12, 15)), [])
+
+
+class TestModels(unittest.TestCase):
+    def test_partitioned_ddl(self):
+        for model in (ProcessingLog, OcrResult, LlmResult):
+            ddl = str(CreateTable(model.__table__).compile(dialect=postgresql.dialect()))
+            self.assertIn("PARTITION BY RANGE (created_at)", ddl)
+            self.assertIn("PRIMARY KEY (id, created_at)", ddl)
+            # En SQLite (tests/sqlite_schema.py) `id` queda como la única PK.
+            ddl = str(CreateTable(model.__table__).compile(dialect=sqlite.dialect()))
+            self.assertIn("id INTEGER PRIMARY KEY AUTOINCREMENT", ddl)
+
+    def test_one_result_per_file_and_instant(self):
+        for model in (OcrResult, LlmResult):
+            ddl = str(CreateTable(model.__table__).compile(dialect=postgresql.dialect()))
+            self.assertIn("UNIQUE (job_file_id, created_at)", ddl)
+        self.assertNotIn("created_at", [c.name for i in ProcessingLog.__table__.indexes for c in i.columns])
+
+    def test_latest_result_relationship(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            create_tables(conn, User, Job, JobFile, OcrResult)
+        with Session(engine) as session:
+            session.add_all([User(id="u1", email="a@x.cl"), Job(id=1, user_id="u1")])
+            first, second = (JobFile(id=i, job_id=1, filename="a.pdf", r2_object_key="k") for i in (1, 2))
+            first.ocr_history += [OcrResult(id=1, text_content="v1", created_at=datetime(2025, 1, 1)),
+                                  OcrResult(id=2, text_content="v2", created_at=datetime(2025, 2, 1))]
+            session.add_all([first, second])
+            session.commit()
+        with Session(engine) as session:
+            files = session.scalars(select(JobFile).options(selectinload(JobFile.ocr_results)).order_by(JobFile.id))
+            self.assertEqual([f.ocr_results and f.ocr_results.text_content for f in files], ["v2", None])
+            self.assertEqual([r.id for r in session.get(JobFile, 1).ocr_history], [1, 2])
+
+    def test_assigning_the_old_name_appends_to_history(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            create_tables(conn, User, Job, JobFile, LlmResult)
+        with Session(engine) as session:
+            session.add_all([User(id="u1", email="a@x.cl"), Job(id=1, user_id="u1")])
+            file = JobFile(id=1, job_id=1, filename="a.pdf", r2_object_key="k")
+            file.llm_result = LlmResult(raw_llm_data={"v": 1}, created_at=datetime(2025, 1, 1))
+            session.add(file)
+            session.commit()
+            second = LlmResult(raw_llm_data={"v": 2}, created_at=datetime(2025, 2, 1))
+            file.llm_result = second
+            self.assertIs(file.llm_result, second)
+            session.commit()
+            with self.assertRaises(ValueError):
+                file.llm_result = None
+        with Session(engine) as session:
+            file = session.get(JobFile, 1)
+            self.assertEqual(file.llm_result.raw_llm_data, {"v": 2})
+            self.assertEqual([r.raw_llm_data["v"] for r in file.llm_history], [1, 2])
+
+
+class TestMaintenance(unittest.TestCase):
+    def test_creates_missing_and_applies_retention(self):
+        conn = RecordingConnection({"processing_logs": ["processing_logs_p202409", "processing_logs_p202501"],
+                                    "ocr_results": ["ocr_results_p202301", "ocr_results_default"]})
+        policies = [
+            PartitionPolicy(table="processing_logs", premake=1, retention_months=3),
+            PartitionPolicy(table="ocr_results", premake=1, retention_months=12, retention_action="detach"),
+        ]
+        report = maintain_partitions(conn, policies, today=date(2025, 1, 10))
+        self.assertEqual(report.created, [
+            "processing_logs_p202502", "processing_logs_default", "ocr_results_p202501", "ocr_results_p202502",
+        ])
+        self.assertEqual(report.dropped, ["processing_logs_p202409"])
+        self.assertEqual(report.detached, ["ocr_results_p202301"])
+        self.assertIn(
+            "CREATE TABLE IF NOT EXISTS \"processing_logs_p202502\" PARTITION OF \"processing_logs\" "
+            "FOR VALUES FROM ('2025-02-01') TO ('2025-03-01')",
+            conn.executed,
+        )
+        self.assertIn('ALTER TABLE "ocr_results" DETACH PARTITION "ocr_results_p202301"', conn.executed)
+
+    def test_dry_run_executes_nothing(self):
+        conn = RecordingConnection()
+        report = maintain_partitions(conn, [PartitionPolicy(table="llm_results", premake=1)],
+                                     today=date(2025, 1, 1), dry_run=True)
+        self.assertEqual(len(report.statements), 3)
+        self.assertEqual(conn.executed, [])
+
+    def test_rows_in_default_move_to_the_new_partition(self):
+        conn = RecordingConnection({"llm_results": ["llm_results_p202501", "llm_results_default"]},
+                                   columns={"llm_results": ["id", "job_file_id", "raw_llm_data", "created_at"]},
+                                   default_rows=[("llm_results_default", "2025-02-01")])
+        report = maintain_partitions(conn, [PartitionPolicy(table="llm_results", premake=2)], today=date(2025, 1, 10))
+        self.assertEqual(report.created, ["llm_results_p202502", "llm_results_p202503"])
+        moved, delete, create, insert = conn.executed[:4]
+        self.assertTrue(moved.startswith('CREATE TEMPORARY TABLE "llm_results_p202502_moved" ON COMMIT DROP AS '
+                                         'SELECT "id", "job_file_id", "raw_llm_data", "created_at" '
+                                         'FROM "llm_results_default"'))
+        self.assertEqual(delete, 'DELETE FROM "llm_results_default" '
+                                 "WHERE created_at >= '2025-02-01' AND created_at < '2025-03-01'")
+        self.assertIn('PARTITION OF "llm_results"', create)
+        self.assertTrue(insert.startswith('INSERT INTO "llm_results" ("id", "job_file_id",'))
+        # Sin filas en la DEFAULT para marzo: solo se crea la partición.
+        self.assertEqual(len(conn.executed), 5)
+
+    def test_convert_sql_copies_only_existing_columns(self):
+        # La tabla del esquema original: sin las columnas que agregaron los modelos después.
+        conn = RecordingConnection(oldest=datetime(2024, 10, 20),
+                                   columns={"llm_results": ["id", "job_file_id", "raw_llm_data", "created_at"]})
+        statements = convert_to_partitioned_sql(conn, "llm_results", premake=1, today=date(2025, 1, 5))
+        (insert,) = [s for s in statements if s.startswith('INSERT INTO "llm_results"')]
+        self.assertEqual(insert, 'INSERT INTO "llm_results" ("id", "job_file_id", "raw_llm_data", "created_at") '
+                                 'SELECT "id", "job_file_id", "raw_llm_data", '
+                                 "COALESCE(\"created_at\", timezone('utc', now())) FROM \"llm_results_old\"")
+
+        # Con la definición congelada en la revisión, el DDL no depende de los modelos.
+        frozen = Table("llm_results", MetaData(),
+                       Column("id", BigInteger, primary_key=True), Column("job_file_id", BigInteger, nullable=False),
+                       Column("raw_llm_data", JSONB), Column("created_at", DateTime, primary_key=True),
+                       postgresql_partition_by="RANGE (created_at)")
+        statements = convert_to_partitioned_sql(conn, "llm_results", premake=1, today=date(2025, 1, 5), table=frozen)
+        (create,) = [s for s in statements if s.startswith("CREATE TABLE llm_results")]
+        self.assertNotIn("prompt_version", create)
+
+    def test_convert_sql_covers_existing_data(self):
+        conn = RecordingConnection(oldest=datetime(2024, 10, 20),
+                                   columns={"llm_results": [c.name for c in LlmResult.__table__.columns]})
+        statements = convert_to_partitioned_sql(conn, "llm_results", premake=1, today=date(2025, 1, 5))
+        self.assertEqual(statements[0], 'ALTER TABLE "llm_results" RENAME TO "llm_results_old"')
+        created = [s for s in statements if "PARTITION OF" in s]
+        self.assertEqual(len(created), 6)  # 2024-10 .. 2025-02 + DEFAULT
+        (insert,) = [s for s in statements if s.startswith('INSERT INTO "llm_results"')]
+        self.assertNotIn("document_type", insert)  # columna generada
+        self.assertEqual(statements[-1], 'DROP TABLE "llm_results_old"')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import unittest
+from unittest import mock
+
+try:
+    import aiosqlite  # noqa: F401
+except ImportError:  # pragma: no cover
+    aiosqlite = None
+
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from insurance_models.database.pool import InstrumentedAsyncQueuePool, PoolMetrics, PoolSettings
+
+
+class TestPoolSettings(unittest.TestCase):
+    def test_presets_and_overrides(self):
+        settings = PoolSettings.for_service("worker", pool_size=2)
+        self.assertEqual(settings.pool_size, 2)
+        self.assertEqual(settings.max_overflow, 4)
+        with self.assertRaises(ValueError):
+            PoolSettings.for_service("unknown")
+
+    def test_from_env(self):
+        env = {"DB_POOL_PROFILE": "api", "DB_POOL_MAX_OVERFLOW": "3", "DB_POOL_SERVER_SIDE_PREPARED_STATEMENTS": "false"}
+        with mock.patch.dict(os.environ, env):
+            settings = PoolSettings.from_env()
+        self.assertEqual(settings.pool_size, 10)
+        self.assertEqual(settings.max_overflow, 3)
+        kwargs = settings.engine_kwargs()
+        self.assertEqual(kwargs["connect_args"], {"statement_cache_size": 0, "prepared_statement_cache_size": 0})
+
+
+class TestPoolMetrics(unittest.TestCase):
+    def test_checkout_accounting(self):
+        metrics = PoolMetrics()
+        observed = []
+        metrics.add_checkout_hook(observed.append)
+        metrics._start_wait()
+        metrics._start_wait()
+        self.assertEqual(metrics.waiting, 2)
+        metrics._end_wait(0.5, outcome="ok")
+        metrics._end_wait(1.0, outcome="timeout")
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["checkouts"], 1)
+        self.assertEqual(snapshot["checkout_timeouts"], 1)
+        self.assertEqual(snapshot["waiting"], 0)
+        self.assertEqual(snapshot["waiting_max"], 2)
+        self.assertEqual(observed, [0.5])
+
+
+@unittest.skipIf(aiosqlite is None, "aiosqlite not installed")
+class TestInstrumentedPool(unittest.IsolatedAsyncioTestCase):
+    async def test_only_checkouts_on_an_exhausted_pool_wait(self):
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=InstrumentedAsyncQueuePool,
+                                     pool_size=1, max_overflow=0, pool_timeout=0.05)
+        metrics = engine.pool.metrics
+        try:
+            async with engine.connect():
+                self.assertEqual(metrics.waiting_max, 0)
+                with self.assertRaises(exc.TimeoutError):
+                    async with engine.connect():
+                        pass
+            async with engine.connect():
+                pass
+        finally:
+            await engine.dispose()
+        snapshot = metrics.snapshot()
+        self.assertEqual((snapshot["checkouts"], snapshot["checkout_timeouts"]), (2, 1))
+        self.assertEqual((snapshot["waiting"], snapshot["waiting_max"]), (0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
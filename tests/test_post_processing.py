@@ -0,0 +1,110 @@
+import copy
+import unittest
+
+try:
+    from hypothesis import given, settings, strategies as st
+except ImportError:  # pragma: no cover
+    given = None
+
+from insurance_models.schemas import InsuranceExtractionOutput, post_process_many
+from insurance_models.schemas.post_processing import ASSIGNED_MODELS
+
+
+def snapshot(output: InsuranceExtractionOutput):
+    """Estado comparable del documento, incluyendo los campos excluidos del dump y los campos asignados."""
+    return (
+        output.model_dump(),
+        [
+            (plan.model_fields_set, [
+                (dp.deductible_uf, dp.annual_premium_uf, dp.model_fields_set) for dp in plan.deductible_premiums
+            ])
+            for plan in output.policy_analyses
+        ],
+    )
+
+
+def post_process_each(outputs):
+    for output in outputs:
+        output.post_process_data()
+    return outputs
+
+
+DOCUMENT = {
+    "document_type": "cotizacion",
+    "vehicle_info": {"make": "Toyota", "model": "Yaris", "year": 2022},
+    "policy_analyses": [
+        {
+            "insurer_name": "HDI Seguros",
+            "plan_name": "Full Cobertura",
+            "deductible_premiums": [
+                {"deductible_original_str": "UF 5", "annual_premium_original_str": "UF 20,5"},
+                {"deductible_original_str": "5", "annual_premium_original_str": "UF 19"},
+                {"deductible_original_str": "Sin deducible", "annual_premium_original_str": "0"},
+                {"deductible_original_str": "UF 0", "annual_premium_original_str": "25"},
+                {"deductible_original_str": "UF 10", "annual_premium_original_str": None},
+            ],
+        },
+        {
+            "insurer_name": "Mapfre",
+            "plan_name": "Plan Elemental (RC)",
+            "replacement_car_info": {"has_coverage": True},
+            "deductible_premiums": [{"deductible_original_str": "3", "annual_premium_original_str": "9,9"}],
+        },
+    ],
+}
+
+if given is not None:
+    uf_text = st.one_of(
+        st.none(),
+        st.sampled_from(["UF 5", "5", "UF 10", "0", "Sin deducible", "S/D", "12,5", "1.234,5", "n/d", "UF 3"]),
+    )
+    premium = st.fixed_dictionaries({
+        "deductible_original_str": uf_text,
+        "annual_premium_original_str": uf_text,
+    })
+    plan = st.fixed_dictionaries({
+        "insurer_name": st.one_of(st.none(), st.sampled_from(["HDI Seguros", "reale", "Zurich", "BCI SEGUROS", ""])),
+        "plan_name": st.one_of(st.none(), st.sampled_from(["Full", "Solo RC", "Plan Basic", "Premium (rc)", "Todo riesgo"])),
+        "replacement_car_info": st.one_of(st.none(), st.fixed_dictionaries({"has_coverage": st.booleans()})),
+        "deductible_premiums": st.lists(premium, max_size=6),
+    })
+    document = st.fixed_dictionaries({
+        "error": st.one_of(st.none(), st.just("parse error")),
+        "policy_analyses": st.lists(plan, max_size=4),
+    })
+
+
+class TestPostProcessMany(unittest.TestCase):
+    def test_matches_per_document_method(self):
+        docs = [InsuranceExtractionOutput.model_validate(DOCUMENT) for _ in range(3)]
+        expected = post_process_each(copy.deepcopy(docs))
+        actual = post_process_many(docs)
+        self.assertEqual([snapshot(d) for d in actual], [snapshot(d) for d in expected])
+
+    def test_assigned_models_accept_direct_writes(self):
+        for model in ASSIGNED_MODELS:
+            self.assertFalse(model.model_config.get("validate_assignment"), model)
+            self.assertFalse(model.model_config.get("frozen"), model)
+
+    def test_cheapest_premium_and_rc_cleanup(self):
+        output = post_process_many([InsuranceExtractionOutput.model_validate(DOCUMENT)])[0]
+        hdi, mapfre = output.policy_analyses
+        self.assertEqual(hdi.insurer_name, "HDI")
+        # Igual que `post_process_data`, una prima 0.0 pierde contra cualquier prima positiva.
+        self.assertEqual([(dp.deductible_uf, dp.annual_premium_uf) for dp in hdi.deductible_premiums],
+                         [(5.0, 19.0), (0.0, 25.0)])
+        self.assertIsNone(mapfre.workshop_info)
+        self.assertFalse(mapfre.replacement_car_info.has_coverage)
+
+    if given is not None:
+        @settings(max_examples=200, deadline=None)
+        @given(st.lists(document, max_size=5))
+        def test_equivalence_property(self, documents):
+            docs = [InsuranceExtractionOutput.model_validate(d) for d in documents]
+            expected = post_process_each(copy.deepcopy(docs))
+            actual = post_process_many(docs)
+            self.assertEqual([snapshot(d) for d in actual], [snapshot(d) for d in expected])
+
+
+if __name__ == '__main__':
+    unittest.main()
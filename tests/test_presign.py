@@ -0,0 +1,61 @@
+import os
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+from insurance_models.r2.client import R2Client
+from insurance_models.r2.presign import PresignedUrlCache
+
+R2_ENV = {
+    "R2_ACCESS_KEY_ID": "AKIDEXAMPLE",
+    "R2_SECRET_ACCESS_KEY": "wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY",
+    "R2_BUCKET_NAME": "insurance-files",
+    "R2_ENDPOINT_URL": "https://account.r2.cloudflarestorage.com",
+}
+
+FIXED_NOW = datetime(2026, 3, 1, 12, 30, 45, tzinfo=timezone.utc)
+
+
+class TestSigV4Presigner(unittest.TestCase):
+    def setUp(self):
+        with mock.patch.dict(os.environ, R2_ENV):
+            self.client = R2Client()
+
+    def test_matches_botocore(self):
+        keys = ["jobs/1/cotizacion.pdf", "jobs/1/póliza final (1)+v2.pdf", "a~b/c_d-e.f"]
+        for op, method in (("get_object", "GET"), ("put_object", "PUT")):
+            for key in keys:
+                with mock.patch("botocore.auth.get_current_datetime", return_value=FIXED_NOW.replace(tzinfo=None)):
+                    expected = self.client.s3_client.generate_presigned_url(
+                        op, Params={"Bucket": "insurance-files", "Key": key}, ExpiresIn=900
+                    )
+                actual = self.client.presigner.presign(key, method, 900, now=FIXED_NOW)
+                self.assertEqual(actual, expected)
+
+    def test_batch_uses_cache(self):
+        first = self.client.generate_presigned_urls(["a.pdf", "b.pdf"], "put_object", 600)
+        second = self.client.generate_presigned_urls(["a.pdf", "b.pdf"], "put_object", 600)
+        self.assertEqual(first, second)
+        self.assertEqual(self.client.presigned_url_cache.hits, 2)
+        with self.assertRaises(ValueError):
+            self.client.generate_presigned_urls(["a.pdf"], "list_objects", 600)
+
+
+class TestPresignedUrlCache(unittest.TestCase):
+    def test_reuses_only_with_enough_validity_left(self):
+        cache = PresignedUrlCache(min_remaining_fraction=0.5)
+        cache.put("GET", "k", 100, "url", signed_at=1000.0)
+        self.assertEqual(cache.get("GET", "k", 100, now=1040.0), "url")
+        self.assertIsNone(cache.get("GET", "k", 100, now=1060.0))
+        self.assertIsNone(cache.get("PUT", "k", 100, now=1000.0))
+
+    def test_evicts_least_recently_used(self):
+        cache = PresignedUrlCache(max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.put("GET", key, 100, key, signed_at=0.0)
+        self.assertIsNone(cache.get("GET", "a", 100, now=0.0))
+        self.assertEqual(cache.get("GET", "c", 100, now=0.0), "c")
+
+
+if __name__ == '__main__':
+    unittest.main()
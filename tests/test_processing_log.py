@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import threading
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+try:
+    import aiosqlite  # noqa: F401
+except ImportError:  # pragma: no cover
+    aiosqlite = None
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from insurance_models.database.models import Job, LogLevel, ProcessingLog, User
+from insurance_models.utils.logging import DatabaseLogSink, ProcessingLogHandler
+
+from tests.sqlite_schema import create_tables
+
+
+class ListSink:
+    def __init__(self, block: threading.Event = None):
+        self.batches = []
+        self.block = block
+
+    async def write(self, rows):
+        if self.block is not None:
+            self.block.wait()
+        self.batches.append(rows)
+
+    async def close(self):
+        pass
+
+
+class FailingSink:
+    async def write(self, rows):
+        raise RuntimeError("db down")
+
+    async def close(self):
+        pass
+
+
+def make_logger(handler):
+    logger = logging.getLogger(f"test-processing-log-{id(handler)}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    return logger
+
+
+class TestProcessingLogHandler(unittest.TestCase):
+    def test_batches_and_flush_on_close(self):
+        sink = ListSink()
+        handler = ProcessingLogHandler("ocr", sink=sink, batch_size=10, capacity=100, flush_interval=0.05)
+        logger = make_logger(handler)
+        logger.info("sin job")
+        for i in range(25):
+            logger.warning("pagina %d", i, extra={"job_id": 7})
+        handler.close()
+        rows = [row for batch in sink.batches for row in batch]
+        self.assertEqual(len(rows), 25)
+        self.assertTrue(all(len(batch) <= 10 for batch in sink.batches))
+        self.assertEqual(rows[3]["message"], "pagina 3")
+        self.assertEqual((rows[0]["job_id"], rows[0]["service_name"], rows[0]["level"]), (7, "ocr", "WARNING"))
+        self.assertEqual(handler.stats()["written"], 25)
+        # Tras cerrar, los registros se ignoran.
+        logger.info("tarde", extra={"job_id": 7})
+        self.assertEqual(handler.stats()["enqueued"], 25)
+
+    def test_drop_when_full(self):
+        release = threading.Event()
+        sink = ListSink(block=release)
+        handler = ProcessingLogHandler("llm", sink=sink, batch_size=1, capacity=5, flush_interval=0.01)
+        logger = make_logger(handler)
+        for i in range(50):
+            logger.info("m%d", i, extra={"job_id": 1})
+        stats = handler.stats()
+        self.assertGreater(stats["dropped"], 0)
+        self.assertEqual(stats["enqueued"] + stats["dropped"], 50)
+        release.set()
+        handler.close()
+        self.assertEqual(handler.stats()["written"], stats["enqueued"])
+
+    def test_sampling_spares_warnings(self):
+        release = threading.Event()
+        handler = ProcessingLogHandler("api", sink=ListSink(block=release), batch_size=1, capacity=20, overflow="sample")
+        logger = make_logger(handler)
+        for i in range(200):
+            logger.info("info %d", i, extra={"job_id": 1})
+        self.assertGreater(handler.sampled_out, 0)
+        self.assertEqual(handler.dropped, 0)
+        release.set()
+        handler.close()
+
+    def test_write_errors_go_through_handle_error(self):
+        handler = ProcessingLogHandler("ocr", sink=FailingSink(), flush_interval=0.01)
+        with mock.patch.object(handler, "handleError") as handle_error:
+            make_logger(handler).info("x", extra={"job_id": 1})
+            self.assertTrue(handler.flush())
+        (record,), _ = handle_error.call_args
+        self.assertEqual(record.getMessage(), "ProcessingLogHandler failed to write 1 records")
+        self.assertEqual(handler.stats()["failed"], 1)
+        handler.close()
+
+    def test_counters_from_many_threads(self):
+        sink = ListSink()
+        handler = ProcessingLogHandler("api", sink=sink, batch_size=50, capacity=100, flush_interval=0.01)
+        logger = make_logger(handler)
+
+        def produce():
+            for i in range(500):
+                logger.info("m %d", i, extra={"job_id": 1})
+        threads = [threading.Thread(target=produce) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        handler.close()
+        stats = handler.stats()
+        self.assertEqual(stats["enqueued"] + stats["dropped"], 2000)
+        self.assertEqual(stats["written"], stats["enqueued"])
+        self.assertEqual(sum(map(len, sink.batches)), stats["written"])
+        created_at = sink.batches[0][0]["created_at"]
+        self.assertIsNone(created_at.tzinfo)
+        self.assertLess(abs((datetime.now(timezone.utc).replace(tzinfo=None) - created_at).total_seconds()), 60)
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            ProcessingLogHandler("x", sink=ListSink(), overflow="ignore")
+
+
+@unittest.skipIf(aiosqlite is None, "aiosqlite not installed")
+class TestDatabaseLogSink(unittest.TestCase):
+    def test_writes_rows(self):
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+
+        async def setup():
+            async with engine.begin() as conn:
+                await conn.run_sync(create_tables, ProcessingLog)
+        asyncio.run(setup())
+
+        # El engine se usa desde el hilo del handler: se crea allí mismo en el primer write.
+        handler = ProcessingLogHandler("assembly", sink=DatabaseLogSink(lambda: engine), flush_interval=0.01)
+        logger = make_logger(handler)
+        logger.error("falló", extra={"job_id": 3})
+        logger.info("ok", extra={"job_id": 3})
+        self.assertTrue(handler.flush())
+
+        async def rows():
+            async with engine.connect() as conn:
+                result = await conn.execute(select(ProcessingLog.level, ProcessingLog.message).order_by(ProcessingLog.id))
+                return result.all()
+        self.assertEqual([tuple(r) for r in asyncio.run(rows())], [(LogLevel.ERROR, "falló"), (LogLevel.INFO, "ok")])
+        handler.close()
+
+    def test_rows_of_missing_jobs_do_not_sink_the_batch(self):
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def enforce_foreign_keys(dbapi_connection, _):
+            dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+        async def setup():
+            async with engine.begin() as conn:
+                await conn.run_sync(create_tables, User, Job, ProcessingLog)
+                await conn.execute(insert(User), [{"id": "u1", "email": "a@x.cl"}])
+                await conn.execute(insert(Job), [{"id": 3, "user_id": "u1"}])
+        asyncio.run(setup())
+
+        handler = ProcessingLogHandler("assembly", sink=DatabaseLogSink(lambda: engine), flush_interval=0.01)
+        logger = make_logger(handler)
+        with mock.patch.object(handler, "handleError") as handle_error:
+            for job_id in (3, 99, 3):
+                logger.info("job %d", job_id, extra={"job_id": job_id})
+            self.assertTrue(handler.flush())
+        (record,), _ = handle_error.call_args
+        self.assertEqual(record.getMessage(), "ProcessingLogHandler failed to write 1 records")
+        self.assertEqual((handler.stats()["written"], handler.stats()["failed"]), (2, 1))
+
+        async def job_ids():
+            async with engine.connect() as conn:
+                return list((await conn.execute(select(ProcessingLog.job_id))).scalars())
+        self.assertEqual(asyncio.run(job_ids()), [3, 3])
+        handler.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
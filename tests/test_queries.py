@@ -0,0 +1,130 @@
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+
+try:
+    import aiosqlite  # noqa: F401
+except ImportError:  # pragma: no cover
+    aiosqlite = None
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from insurance_models.database.models import Base, Job, JobStatus, User
+from insurance_models.database.queries import (
+    CountCache, count_user_jobs, decode_cursor, encode_cursor, fetch_dashboard_page,
+    fetch_dashboard_page_json, fetch_paginated_dashboard_json, require_job_created_at_sql,
+)
+from insurance_models.database.schemas import JobDashboardItem, PaginatedJobDashboardResponse
+
+
+class TestCursor(unittest.TestCase):
+    def test_roundtrip(self):
+        created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+        self.assertEqual(decode_cursor(encode_cursor(created_at, 42)), (created_at, 42))
+        with self.assertRaises(ValueError):
+            decode_cursor("not-a-cursor")
+
+    def test_created_at_is_required(self):
+        self.assertFalse(Job.__table__.c.created_at.nullable)
+        statements = require_job_created_at_sql()
+        self.assertTrue(statements[0].startswith("UPDATE jobs SET created_at"))
+        self.assertEqual(statements[-1], "ALTER TABLE jobs ALTER COLUMN created_at SET NOT NULL")
+
+
+@unittest.skipIf(aiosqlite is None, "aiosqlite not installed")
+class TestDashboardPages(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        self.sessions = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        base = datetime(2024, 1, 1)
+
+        async def seed():
+            async with self.engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all, tables=[User.__table__, Job.__table__])
+            async with self.sessions() as session:
+                session.add_all([User(id="u1", email="a@x.cl"), User(id="u2", email="b@x.cl")])
+                # Varios trabajos comparten created_at para ejercitar el desempate por id.
+                session.add_all([
+                    Job(id=i, user_id="u1", created_at=base + timedelta(minutes=i // 3),
+                        status=JobStatus.COMPLETED if i % 2 else JobStatus.FAILED)
+                    for i in range(1, 26)
+                ])
+                session.add(Job(id=100, user_id="u2", created_at=base))
+                await session.commit()
+        asyncio.run(seed())
+
+    def tearDown(self):
+        asyncio.run(self.engine.dispose())
+
+    def run_in_session(self, fn):
+        async def _run():
+            async with self.sessions() as session:
+                return await fn(session)
+        return asyncio.run(_run())
+
+    def test_pages_cover_all_jobs_in_order(self):
+        async def walk(session):
+            ids, cursor = [], None
+            while True:
+                page = await fetch_dashboard_page(session, "u1", limit=7, cursor=cursor)
+                ids.extend(job.id for job in page.jobs)
+                if not page.has_more:
+                    self.assertIsNone(page.next_cursor)
+                    return ids
+                cursor = page.next_cursor
+        self.assertEqual(self.run_in_session(walk), list(range(25, 0, -1)))
+
+    def test_status_filter_and_total(self):
+        page = self.run_in_session(lambda s: fetch_dashboard_page(
+            s, "u1", limit=100, status=JobStatus.FAILED, include_total=True
+        ))
+        self.assertEqual([job.id for job in page.jobs], list(range(24, 0, -2)))
+        self.assertEqual((page.total_jobs, page.total_is_estimate), (12, False))
+
+    def test_count_cap_and_cache(self):
+        cache = CountCache(ttl=60)
+        self.assertEqual(self.run_in_session(lambda s: count_user_jobs(s, "u1", cap=10, cache=cache)), (10, True))
+        self.assertEqual(self.run_in_session(lambda s: count_user_jobs(s, "u1", cap=None, cache=cache)), (25, False))
+        self.assertEqual(cache.get(("u1", None, None)), (25, False))
+        cache.invalidate("u1")
+        self.assertIsNone(cache.get(("u1", None, None)))
+
+    def test_json_matches_the_response_models(self):
+        async def both(session):
+            page = await fetch_dashboard_page(session, "u1", limit=7, include_total=True)
+            raw = await fetch_dashboard_page_json(session, "u1", limit=7, include_total=True)
+            return page, raw
+        page, raw = self.run_in_session(both)
+        self.assertEqual(raw, page.model_dump_json().encode())
+
+    def test_paginated_json(self):
+        raw = self.run_in_session(lambda s: fetch_paginated_dashboard_json(s, "u1", page=4, limit=7))
+        async def jobs(session):
+            return (await fetch_dashboard_page(session, "u1", limit=100)).jobs[21:]
+        expected = PaginatedJobDashboardResponse(
+            jobs=[JobDashboardItem.model_validate(job) for job in self.run_in_session(jobs)],
+            total_jobs=25, total_pages=4, current_page=4, limit=7,
+        )
+        self.assertEqual(raw, expected.model_dump_json().encode())
+
+    def test_rows_inserted_outside_the_orm_get_created_at(self):
+        async def insert_and_walk(session):
+            # Sin `created_at`: lo pone el default de servidor (hora actual, la más reciente).
+            await session.execute(insert(Job.__table__).values(id=200, user_id="u1"))
+            ids, cursor = [], None
+            while True:
+                page = await fetch_dashboard_page(session, "u1", limit=10, cursor=cursor)
+                ids.extend(job.id for job in page.jobs)
+                if not page.has_more:
+                    return ids
+                cursor = page.next_cursor
+        self.assertEqual(self.run_in_session(insert_and_walk), [200] + list(range(25, 0, -1)))
+
+    def test_invalid_limit(self):
+        with self.assertRaises(ValueError):
+            self.run_in_session(lambda s: fetch_dashboard_page(s, "u1", limit=0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import io
+import os
+import unittest
+from unittest import mock
+
+try:
+    from moto.server import ThreadedMotoServer
+except ImportError:  # pragma: no cover
+    ThreadedMotoServer = None
+
+from insurance_models.r2.async_client import AsyncR2Client
+from insurance_models.r2.client import R2Client
+
+
+@unittest.skipIf(ThreadedMotoServer is None, "moto[server] is not installed")
+class TestAsyncR2Client(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+        cls.server.start()
+        host, port = cls.server.get_host_and_port()
+        cls.env = {
+            "R2_ACCESS_KEY_ID": "test",
+            "R2_SECRET_ACCESS_KEY": "test",
+            "R2_BUCKET_NAME": "insurance-test",
+            "R2_ENDPOINT_URL": f"http://{host}:{port}",
+            "R2_MAX_POOL_CONNECTIONS": "4",
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        with mock.patch.dict(os.environ, self.env):
+            self.client = AsyncR2Client(R2Client())
+        self.client.client.s3_client.create_bucket(Bucket="insurance-test")
+
+    def tearDown(self):
+        self.client.close()
+
+    async def test_object_round_trip(self):
+        await self.client.put_object("jobs/1/a.pdf", b"%PDF-1.7", content_type="application/pdf")
+        self.assertEqual(await self.client.get_object("jobs/1/a.pdf"), b"%PDF-1.7")
+        head = await self.client.head_object("jobs/1/a.pdf")
+        self.assertEqual(head["ContentLength"], 8)
+        self.assertIsNone(await self.client.head_object("jobs/1/missing.pdf"))
+
+    async def test_delete_objects(self):
+        for i in range(3):
+            await self.client.put_object(f"jobs/2/{i}.pdf", b"x")
+        self.assertEqual(await self.client.delete_objects(f"jobs/2/{i}.pdf" for i in range(3)), [])
+        self.assertIsNone(await self.client.head_object("jobs/2/0.pdf"))
+
+    async def test_presigned_urls_and_pool_size(self):
+        url = await self.client.generate_presigned_download_url("jobs/1/a.pdf", expiration=60)
+        self.assertIn("X-Amz-Signature", url)
+        self.assertEqual(self.client.client.s3_client.meta.config.max_pool_connections, 4)
+        self.assertEqual(self.client._executor._max_workers, 4)
+
+    async def test_multipart_upload_and_streaming_downloads(self):
+        payload = os.urandom(11 * 1024 * 1024)
+        await self.client.upload_file("jobs/3/big.pdf", io.BytesIO(payload), content_type="application/pdf")
+        head = await self.client.head_object("jobs/3/big.pdf")
+        self.assertIn("-", head["ETag"])  # ETag de multipart: "<md5>-<partes>"
+
+        spool = await self.client.download_spooled("jobs/3/big.pdf", max_memory=1024 * 1024)
+        with spool:
+            self.assertTrue(spool._rolled)
+            self.assertEqual(spool.read(), payload)
+
+        buffer = bytearray(len(payload))
+        self.assertEqual(await self.client.download_into("jobs/3/big.pdf", buffer), len(payload))
+        self.assertEqual(bytes(buffer), payload)
+
+        chunk = b"".join(self.client.client.iter_object_chunks("jobs/3/big.pdf", byte_range=(10, 19)))
+        self.assertEqual(chunk, payload[10:20])
+
+
+if __name__ == '__main__':
+    unittest.main()
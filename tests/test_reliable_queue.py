@@ -0,0 +1,76 @@
+import asyncio
+import unittest
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover
+    fakeredis = None
+
+from insurance_models.redis.queues import OCR_QUEUE, OCR_PROCESSING_QUEUE, OcrQueueMessage
+from insurance_models.redis.reliable_queue import ReliableQueue
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TestReliableQueue(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        self.queue = ReliableQueue.for_queue(self.client, OCR_QUEUE, visibility_timeout=60)
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_batch_enqueue_and_claim_is_fifo(self):
+        await self.queue.enqueue_many(OcrQueueMessage(job_file_id=i) for i in range(5))
+        deliveries = await self.queue.claim(3)
+        self.assertEqual([d.message.job_file_id for d in deliveries], [0, 1, 2])
+        self.assertEqual(await self.queue.depth(), (2, 3))
+
+    async def test_ack_removes_from_processing(self):
+        await self.queue.enqueue_many([OcrQueueMessage(job_file_id=1), OcrQueueMessage(job_file_id=2)])
+        deliveries = await self.queue.claim(2)
+        await self.queue.ack_many(deliveries)
+        self.assertEqual(await self.queue.depth(), (0, 0))
+        self.assertEqual(await self.client.zcard(self.queue.deadlines_key), 0)
+
+    async def test_nack_requeues_at_front(self):
+        await self.queue.enqueue_many(OcrQueueMessage(job_file_id=i) for i in range(3))
+        first = (await self.queue.claim(1))[0]
+        self.assertTrue(await self.queue.nack(first))
+        again = await self.queue.claim(1)
+        self.assertEqual(again[0].message.job_file_id, 0)
+
+    async def test_nack_without_requeue_goes_to_dead_letter(self):
+        await self.queue.enqueue(OcrQueueMessage(job_file_id=7))
+        delivery = (await self.queue.claim(1))[0]
+        await self.queue.nack(delivery, requeue=False)
+        self.assertEqual(await self.client.lrange(self.queue.dead_letter_queue_name, 0, -1), [delivery.raw])
+
+    async def test_reaper_requeues_expired_messages(self):
+        queue = ReliableQueue(self.client, OCR_QUEUE, OCR_PROCESSING_QUEUE, OcrQueueMessage, visibility_timeout=0)
+        await queue.enqueue(OcrQueueMessage(job_file_id=9))
+        await queue.claim(1)
+        await asyncio.sleep(0.01)
+        self.assertEqual(await queue.requeue_stale(), 1)
+        self.assertEqual(await queue.depth(), (1, 0))
+
+    async def test_reaper_finds_orphans_behind_newer_claims(self):
+        queue = ReliableQueue(self.client, OCR_QUEUE, OCR_PROCESSING_QUEUE, OcrQueueMessage, visibility_timeout=0)
+        orphan = queue.encode(OcrQueueMessage(job_file_id=1))
+        await self.client.lpush(OCR_PROCESSING_QUEUE, orphan)  # el consumidor murió antes del ZADD
+        await self.queue.enqueue_many(OcrQueueMessage(job_file_id=i) for i in range(2, 6))
+        await self.queue.claim(4)
+        self.assertEqual(await queue.requeue_stale(limit=2), 0)
+        await asyncio.sleep(0.01)
+        self.assertEqual(await queue.requeue_stale(limit=2), 1)
+        self.assertEqual(await self.client.lrange(OCR_QUEUE, 0, -1), [orphan])
+
+    async def test_blocking_claim_registers_deadline(self):
+        await self.queue.enqueue(OcrQueueMessage(job_file_id=3))
+        deliveries = await self.queue.claim(2, block_timeout=0.1)
+        self.assertEqual(len(deliveries), 1)
+        self.assertIsNotNone(await self.client.zscore(self.queue.deadlines_key, deliveries[0].raw))
+        self.assertEqual(await self.queue.claim(1, block_timeout=0.1), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
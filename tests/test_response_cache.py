@@ -0,0 +1,112 @@
+import asyncio
+import unittest
+
+try:
+    import aiosqlite  # noqa: F401
+except ImportError:  # pragma: no cover
+    aiosqlite = None
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover
+    fakeredis = None
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from insurance_models.database.models import Job, JobResult, JobStatus, User
+from insurance_models.database.response_cache import (
+    ResponseCache, install_invalidation_hooks, wait_for_invalidations,
+)
+
+from tests.sqlite_schema import create_tables
+
+
+@unittest.skipIf(aiosqlite is None or fakeredis is None, "aiosqlite or fakeredis not installed")
+class TestResponseCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        self.sessions = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.queries = 0
+
+        @event.listens_for(self.engine.sync_engine, "before_cursor_execute")
+        def count(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith("SELECT"):
+                self.queries += 1
+
+        async with self.engine.begin() as conn:
+            await conn.run_sync(create_tables, User, Job, JobResult)
+        async with self.sessions() as session:
+            session.add(User(id="u1", email="a@x.cl"))
+            session.add(Job(id=1, user_id="u1", status=JobStatus.OCR_IN_PROGRESS))
+            await session.commit()
+
+        self.redis = fakeredis.FakeAsyncRedis()
+        self.cache = ResponseCache(self.redis, lock_wait=0.5)
+        self.remove_hooks = install_invalidation_hooks(self.cache)
+
+    async def asyncTearDown(self):
+        self.remove_hooks()
+        await self.redis.aclose()
+        await self.engine.dispose()
+
+    async def test_polls_are_served_from_redis(self):
+        async with self.sessions() as session:
+            first = await self.cache.job_detail(session, 1, user_id="u1")
+            queries = self.queries
+            second = await self.cache.job_detail(session, 1, user_id="u1")
+        self.assertEqual(first, second)
+        self.assertEqual(first.status, JobStatus.OCR_IN_PROGRESS)
+        self.assertEqual(self.queries, queries)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    async def test_owner_is_checked_on_hits(self):
+        async with self.sessions() as session:
+            self.assertIsNotNone(await self.cache.job_detail_json(session, 1, user_id="u1"))
+            self.assertIsNone(await self.cache.job_detail_json(session, 1, user_id="u2"))
+            self.assertIsNone(await self.cache.job_detail_json(session, 99))
+
+    async def test_status_change_and_result_write_invalidate(self):
+        async with self.sessions() as session:
+            await self.cache.job_detail(session, 1)
+            await self.cache.dashboard_page(session, "u1")
+            job = await session.get(Job, 1)
+            job.status = JobStatus.COMPLETED
+            session.add(JobResult(job_id=1, consolidated_data={"plans": 3}))
+            await session.commit()
+        await wait_for_invalidations()
+
+        async with self.sessions() as session:
+            detail = await self.cache.job_detail(session, 1)
+            page = await self.cache.dashboard_page(session, "u1")
+        self.assertEqual(detail.status, JobStatus.COMPLETED)
+        self.assertEqual(detail.result, {"plans": 3})
+        self.assertEqual(page.jobs[0].status, JobStatus.COMPLETED)
+
+    async def test_concurrent_misses_load_once(self):
+        async def poll():
+            async with self.sessions() as session:
+                return await self.cache.job_detail_json(session, 1)
+
+        # Dos cachés con el mismo Redis simulan dos procesos de la API.
+        other = ResponseCache(self.redis, lock_wait=0.5)
+
+        async def poll_other():
+            async with self.sessions() as session:
+                return await other.job_detail_json(session, 1)
+
+        results = await asyncio.gather(*[poll() for _ in range(10)], *[poll_other() for _ in range(10)])
+        self.assertEqual(len(set(results)), 1)
+        self.assertLessEqual(self.queries, 2)
+
+    async def test_stale_load_is_not_written_after_invalidation(self):
+        async def slow_load():
+            await self.cache.invalidate_job(1)
+            return b"u1\n{}", 60
+
+        await self.cache._read_through(self.cache.job_key(1), None, slow_load)
+        self.assertIsNone(await self.redis.get(self.cache.job_key(1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import asyncio
+import unittest
+from unittest import mock
+
+try:
+    import aiosqlite  # noqa: F401
+except ImportError:  # pragma: no cover
+    aiosqlite = None
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover
+    fakeredis = None
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from insurance_models.database.models import JobFile, LlmResult, OcrResult
+from insurance_models.database import result_cache
+from insurance_models.database.result_cache import ResultCache, ocr_cache_key, sha256_hex
+
+from tests.sqlite_schema import create_tables
+
+PDF_HASH = sha256_hex(b"%PDF-1.7 cotizacion")
+
+
+@unittest.skipIf(aiosqlite is None or fakeredis is None, "aiosqlite or fakeredis not installed")
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        self.sessions = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+        async def create():
+            async with self.engine.begin() as conn:
+                await conn.run_sync(create_tables, OcrResult, LlmResult)
+        asyncio.run(create())
+
+    def tearDown(self):
+        asyncio.run(self.redis.aclose())
+        asyncio.run(self.engine.dispose())
+
+    async def process(self, cache: ResultCache, job_file_id: int):
+        """Flujo de un worker: reusa OCR y LLM si puede, si no los calcula y los publica."""
+        job_file = JobFile(id=job_file_id, content_sha256=PDF_HASH)
+        async with self.sessions() as session:
+            ocr = await cache.reuse_ocr(session, job_file, ocr_version="ocr-1")
+            if ocr is None:
+                ocr = OcrResult(job_file_id=job_file_id, content_sha256=PDF_HASH, ocr_version="ocr-1")
+                ocr.set_text("Prima anual UF 20")
+                session.add(ocr)
+            llm = await cache.reuse_llm(session, ocr, prompt_version="p1", model_version="m1")
+            if llm is None:
+                llm = LlmResult(job_file_id=job_file_id, text_sha256=ocr.text_sha256,
+                                prompt_version="p1", model_version="m1")
+                llm.set_raw_data({"policy_analyses": []})
+                session.add(llm)
+            await session.commit()
+        await cache.remember_ocr(ocr)
+        await cache.remember_llm(llm)
+        return ocr, llm
+
+    def test_second_copy_reuses_both_stages(self):
+        cache = ResultCache(self.redis)
+        asyncio.run(self.process(cache, 1))
+        ocr, llm = asyncio.run(self.process(cache, 2))
+        self.assertEqual((ocr.job_file_id, ocr.text_content), (2, "Prima anual UF 20"))
+        self.assertEqual(llm.raw_llm_data, {"policy_analyses": []})
+        stats = asyncio.run(cache.shared_stats())
+        self.assertEqual(stats["ocr:miss"], 1)
+        self.assertEqual(stats["ocr:hit_redis"], 1)
+        self.assertEqual(stats["llm:hit_rate"], 0.5)
+
+    def test_falls_back_to_postgres_and_refills_redis(self):
+        cache = ResultCache(self.redis)
+        asyncio.run(self.process(cache, 1))
+        asyncio.run(self.redis.flushall())
+        asyncio.run(self.process(cache, 2))
+        self.assertEqual(cache.stats.counts["ocr:hit_db"], 1)
+        self.assertIsNotNone(asyncio.run(self.redis.get(ocr_cache_key(PDF_HASH, "ocr-1"))))
+
+    def test_counters_ride_along_with_get_and_set(self):
+        cache = ResultCache(self.redis)
+        asyncio.run(self.process(cache, 1))
+        with mock.patch.object(self.redis, "pipeline", wraps=self.redis.pipeline) as pipeline, \
+                mock.patch.object(self.redis, "hincrby") as hincrby:
+            asyncio.run(self.process(cache, 2))
+        # Un GET por etapa más los dos SET de `remember_*`: ningún round trip solo para contar.
+        self.assertEqual(pipeline.call_count, 4)
+        hincrby.assert_not_called()
+        stats = asyncio.run(cache.shared_stats())
+        self.assertEqual((stats["ocr:miss"], stats["ocr:hit_redis"]), (1, 1))
+
+    def test_failed_counters_are_logged_and_retried(self):
+        cache = ResultCache(self.redis)
+        with mock.patch.object(self.redis, "pipeline", side_effect=ConnectionError("down")), \
+                self.assertLogs(result_cache.logger, "WARNING") as logs:
+            asyncio.run(self.process(cache, 1))
+        self.assertIn("Redis GET failed", logs.output[0])
+        stats = asyncio.run(cache.shared_stats())
+        self.assertEqual((stats["ocr:miss"], stats["llm:miss"]), (1, 1))
+
+    def test_version_change_is_a_miss(self):
+        cache = ResultCache()
+        asyncio.run(self.process(cache, 1))
+
+        async def lookup():
+            async with self.sessions() as session:
+                return await cache.lookup_llm(session, sha256_hex("Prima anual UF 20".encode()), "p2", "m1")
+        self.assertIsNone(asyncio.run(lookup()))
+        self.assertEqual(cache.stats.hit_rate("llm"), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
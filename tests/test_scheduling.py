@@ -0,0 +1,159 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover
+    fakeredis = None
+
+from redis.crc import key_slot
+
+from insurance_models.redis.queues import (
+    BATCH_PRIORITY, INTERACTIVE_PRIORITY, LLM_QUEUE, OCR_QUEUE, OcrQueueMessage, get_llm_max_concurrency,
+)
+from insurance_models.redis.scheduling import ConcurrencyLimiter, FairQueue
+
+
+class TestSettings(unittest.TestCase):
+    def test_llm_concurrency_from_env(self):
+        with mock.patch.dict(os.environ, {"LLM_MAX_CONCURRENCY": "4"}):
+            self.assertEqual(get_llm_max_concurrency(), 4)
+        with mock.patch.dict(os.environ, {"LLM_MAX_CONCURRENCY": "0"}):
+            with self.assertRaises(ValueError):
+                get_llm_max_concurrency()
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TestFairQueue(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        self.queue = FairQueue.for_queue(self.client, OCR_QUEUE)
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def claim_ids(self, n: int):
+        deliveries = []
+        for _ in range(n):
+            deliveries += await self.queue.claim(1)
+        return [d.message.job_file_id for d in deliveries]
+
+    async def test_tenants_take_turns(self):
+        await self.queue.enqueue_many([OcrQueueMessage(job_file_id=i) for i in range(100)], tenant="big")
+        await self.queue.enqueue_many([OcrQueueMessage(job_file_id=i) for i in range(1000, 1003)], tenant="small")
+        self.assertEqual(await self.claim_ids(6), [0, 1000, 1, 1001, 2, 1002])
+        self.assertEqual(await self.queue.depth(), (97, 6))
+
+    async def test_tenant_weights(self):
+        await self.queue.set_tenant_weight("gold", 2)
+        await self.queue.set_tenant_weight("bronze", 0.5)
+        await self.queue.enqueue_many([OcrQueueMessage(job_file_id=i) for i in range(10)], tenant="gold")
+        await self.queue.enqueue_many([OcrQueueMessage(job_file_id=i) for i in range(100, 110)], tenant="bronze")
+        ids = await self.claim_ids(10)
+        self.assertEqual(sum(1 for i in ids if i < 100), 8)
+
+    async def test_batch_gets_one_turn_in_nine(self):
+        await self.queue.enqueue_many([OcrQueueMessage(job_file_id=i) for i in range(100)],
+                                      tenant="backfill", priority=BATCH_PRIORITY)
+        await self.queue.enqueue_many([OcrQueueMessage(job_file_id=i) for i in range(1000, 1100)],
+                                      tenant="u1", priority=INTERACTIVE_PRIORITY)
+        ids = [d.message.job_file_id for d in await self.queue.claim(27)]
+        self.assertEqual(sum(1 for i in ids if i < 100), 3)
+        # Cuando se acaban los interactivos, el batch se lleva todos los turnos.
+        ids = [d.message.job_file_id for d in await self.queue.claim(200)]
+        self.assertEqual(len(ids), 173)
+        self.assertTrue(all(i < 100 for i in ids[-80:]))
+
+    async def test_unknown_priority(self):
+        with self.assertRaises(ValueError):
+            await self.queue.enqueue(OcrQueueMessage(job_file_id=1), priority="urgent")
+
+    async def test_keys_share_a_cluster_slot(self):
+        queue = self.queue
+        keys = [queue.processing_queue_name, queue.deadlines_key, queue.origin_key, queue.credits_key,
+                queue.deficits_key, queue.weights_key, queue.dead_letter_queue_name]
+        keys += queue._class_keys(BATCH_PRIORITY, "user-1") + queue._class_keys(INTERACTIVE_PRIORITY, "a:b")
+        self.assertEqual({key_slot(key.encode()) for key in keys}, {key_slot(b"{ocr_queue}")})
+        with self.assertRaises(ValueError):
+            FairQueue.for_queue(self.client, OCR_QUEUE, dead_letter_queue_name="ocr_queue:dead")
+
+    async def test_nack_and_reaper_return_to_the_tenant(self):
+        await self.queue.enqueue(OcrQueueMessage(job_file_id=1), tenant="a", priority=BATCH_PRIORITY)
+        await self.queue.enqueue(OcrQueueMessage(job_file_id=2), tenant="a", priority=BATCH_PRIORITY)
+        (first,) = await self.queue.claim(1)
+        self.assertTrue(await self.queue.nack(first))
+        self.assertEqual(await self.queue.pending(BATCH_PRIORITY, "a"), 2)
+        self.assertEqual(await self.claim_ids(1), [1])
+
+        queue = FairQueue.for_queue(self.client, OCR_QUEUE, visibility_timeout=0)
+        (stale,) = await queue.claim(1)
+        self.assertEqual(await queue.requeue_stale(), 1)
+        self.assertEqual(await queue.pending(BATCH_PRIORITY, "a"), 1)
+        (again,) = await queue.claim(1)
+        self.assertEqual(again.message.job_file_id, stale.message.job_file_id)
+        await queue.ack(again)
+        self.assertEqual(await self.client.hlen(queue.origin_key), 1)
+
+    async def test_reaper_finds_orphans_behind_newer_claims(self):
+        queue = FairQueue.for_queue(self.client, OCR_QUEUE, visibility_timeout=0)
+        orphan = queue.encode(OcrQueueMessage(job_file_id=1))
+        await self.client.lpush(queue.processing_queue_name, orphan)  # el consumidor murió antes del ZADD
+        await self.client.hset(queue.origin_key, orphan, f"{BATCH_PRIORITY}\na")
+        await self.queue.enqueue_many([OcrQueueMessage(job_file_id=i) for i in range(2, 6)], tenant="b")
+        await self.queue.claim(4)
+        self.assertEqual(await queue.requeue_stale(limit=2), 0)
+        await asyncio.sleep(0.01)
+        self.assertEqual(await queue.requeue_stale(limit=2), 1)
+        self.assertEqual(await queue.pending(BATCH_PRIORITY, "a"), 1)
+
+    async def test_blocking_claim_waits_for_a_message(self):
+        async def produce():
+            await asyncio.sleep(0.1)
+            await self.queue.enqueue(OcrQueueMessage(job_file_id=7), tenant="a")
+
+        producer = asyncio.create_task(produce())
+        deliveries = await self.queue.claim(1, block_timeout=2)
+        await producer
+        self.assertEqual([d.message.job_file_id for d in deliveries], [7])
+        self.assertEqual(await self.queue.claim(1, block_timeout=0.1), [])
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TestConcurrencyLimiter(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_caps_in_flight_calls_across_limiters(self):
+        limiters = [ConcurrencyLimiter(self.client, LLM_QUEUE, limit=3, poll_interval=0.01) for _ in range(2)]
+        running = peak = 0
+
+        async def call(limiter):
+            nonlocal running, peak
+            async with limiter.lease():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.02)
+                running -= 1
+
+        await asyncio.gather(*(call(limiters[i % 2]) for i in range(12)))
+        self.assertEqual(peak, 3)
+        self.assertEqual(await limiters[0].in_flight(), 0)
+
+    async def test_expired_leases_free_their_slot(self):
+        limiter = ConcurrencyLimiter(self.client, "llm", limit=1, lease_timeout=0.05)
+        self.assertIsNotNone(await limiter.try_acquire())
+        self.assertIsNone(await limiter.try_acquire())
+        with self.assertRaises(TimeoutError):
+            await limiter.acquire(timeout=0.01)
+        await asyncio.sleep(0.06)
+        lease = await limiter.acquire(timeout=1)
+        self.assertTrue(await limiter.extend(lease))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+import asyncio
+import unittest
+from datetime import datetime
+
+try:
+    import aiosqlite  # noqa: F401
+except ImportError:  # pragma: no cover
+    aiosqlite = None
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover
+    fakeredis = None
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from insurance_models.database.models import Job, JobFile, JobStatus, User
+from insurance_models.database.state_machine import (
+    FILE_TRANSITIONS, JOB_TRANSITIONS, CompletionTracker, JobStatusEvent, TransitionError,
+    allowed_sources, listen_transitions, notify_transition, transition_file, transition_job,
+)
+from insurance_models.redis.queues import ASSEMBLY_QUEUE, STREAM_TRANSPORT
+from insurance_models.redis.transport import open_queue
+
+from tests.sqlite_schema import create_tables
+
+
+class TestTransitions(unittest.TestCase):
+    def test_tables_are_closed(self):
+        self.assertEqual(set(JOB_TRANSITIONS), set(JobStatus))
+        for transitions in (JOB_TRANSITIONS, FILE_TRANSITIONS):
+            for targets in transitions.values():
+                self.assertLessEqual(targets, set(transitions))
+
+    def test_allowed_sources(self):
+        self.assertIn(JobStatus.ASSEMBLY_FAILED, allowed_sources(JobStatus.ASSEMBLING))
+        self.assertEqual(allowed_sources(JobStatus.COMPLETED), {JobStatus.ASSEMBLING})
+
+
+@unittest.skipIf(aiosqlite is None, "aiosqlite not installed")
+class TestConditionalUpdates(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        self.sessions = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(create_tables, User, Job, JobFile)
+        async with self.sessions() as session:
+            session.add(User(id="u1", email="a@x.cl"))
+            session.add(Job(id=1, user_id="u1", status=JobStatus.LLM_PROCESSING))
+            session.add(JobFile(id=10, job_id=1, filename="a.pdf", r2_object_key="k", status=JobStatus.OCR_IN_PROGRESS))
+            await session.commit()
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def status(self, model, id_):
+        async with self.sessions() as session:
+            return (await session.execute(select(model.status).where(model.id == id_))).scalar_one()
+
+    async def test_only_one_concurrent_transition_wins(self):
+        async def attempt():
+            async with self.sessions() as session:
+                event = await transition_job(session, 1, JobStatus.ASSEMBLING)
+                await session.commit()
+                return event
+
+        events = await asyncio.gather(*[attempt() for _ in range(5)])
+        winners = [event for event in events if event is not None]
+        self.assertEqual(len(winners), 1)
+        self.assertEqual((winners[0].user_id, winners[0].status), ("u1", JobStatus.ASSEMBLING))
+        self.assertEqual(await self.status(Job, 1), JobStatus.ASSEMBLING)
+
+    async def test_illegal_transitions(self):
+        async with self.sessions() as session:
+            with self.assertRaises(TransitionError):
+                await transition_job(session, 1, JobStatus.COMPLETED, expected=JobStatus.LLM_PROCESSING)
+            # Legal en general, pero no desde el estado actual: no se aplica.
+            self.assertIsNone(await transition_job(session, 1, JobStatus.COMPLETED))
+
+    async def test_file_transition_returns_job(self):
+        async with self.sessions() as session:
+            change = await transition_file(session, 10, JobStatus.OCR_COMPLETED, expected=JobStatus.OCR_IN_PROGRESS)
+            await session.commit()
+        self.assertEqual((change.job_id, change.previous), (1, JobStatus.OCR_IN_PROGRESS))
+        self.assertEqual(await self.status(JobFile, 10), JobStatus.OCR_COMPLETED)
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TestCompletionTracker(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_assembly_is_enqueued_exactly_once(self):
+        tracker = CompletionTracker(self.client)
+        await tracker.start(1, 3)
+        results = await asyncio.gather(
+            tracker.file_finished(1, 10),
+            tracker.file_finished(1, 11, failed=True),
+            tracker.file_finished(1, 10),  # mensaje reprocesado
+            tracker.file_finished(1, 12),
+            tracker.file_finished(1, 12),
+        )
+        self.assertEqual(results.count(True), 1)
+        queue = open_queue(self.client, ASSEMBLY_QUEUE)
+        deliveries = await queue.claim(10)
+        self.assertEqual([d.message.job_id for d in deliveries], [1])
+        self.assertEqual(await tracker.progress(1), {"total": 3, "done": 2, "failed": 1, "enqueued": 1})
+
+    async def test_stream_transport(self):
+        queue = open_queue(self.client, ASSEMBLY_QUEUE, transport=STREAM_TRANSPORT)
+        tracker = CompletionTracker(self.client, assembly_queue=queue)
+        await tracker.start(2, 1)
+        self.assertTrue(await tracker.file_finished(2, 20))
+        deliveries = await queue.claim(10)
+        self.assertEqual([d.message.job_id for d in deliveries], [2])
+
+    async def test_missing_counter_does_not_enqueue(self):
+        tracker = CompletionTracker(self.client)
+        self.assertFalse(await tracker.file_finished(3, 30))
+        self.assertEqual(await self.client.llen(ASSEMBLY_QUEUE), 0)
+
+    @unittest.skipIf(aiosqlite is None, "aiosqlite not installed")
+    async def test_rebuilt_counter_still_enqueues(self):
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(create_tables, User, Job, JobFile)
+        async with sessions() as session:
+            session.add_all([
+                User(id="u1", email="a@x.cl"), Job(id=4, user_id="u1", status=JobStatus.LLM_PROCESSING),
+                JobFile(id=40, job_id=4, filename="a.pdf", r2_object_key="k", status=JobStatus.LLM_COMPLETED),
+                JobFile(id=41, job_id=4, filename="b.pdf", r2_object_key="k", status=JobStatus.LLM_PROCESSING),
+            ])
+            await session.commit()
+        tracker = CompletionTracker(self.client)
+        try:
+            # Sin contador en Redis; el worker ya movió su archivo en la misma sesión.
+            async with sessions() as session:
+                await transition_file(session, 41, JobStatus.LLM_COMPLETED)
+                self.assertTrue(await tracker.file_finished(4, 41, session=session))
+                await session.commit()
+        finally:
+            await engine.dispose()
+        self.assertEqual(await self.client.llen(ASSEMBLY_QUEUE), 1)
+        self.assertEqual(await tracker.progress(4), {"total": 2, "done": 2, "failed": 0, "enqueued": 1})
+        self.assertFalse(await tracker.file_finished(4, 41))
+
+    @unittest.skipIf(aiosqlite is None, "aiosqlite not installed")
+    async def test_concurrent_rebuilds_enqueue_once(self):
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(create_tables, User, Job, JobFile)
+        async with sessions() as session:
+            session.add_all([
+                User(id="u1", email="a@x.cl"), Job(id=5, user_id="u1", status=JobStatus.LLM_PROCESSING),
+                *(JobFile(id=i, job_id=5, filename="a.pdf", r2_object_key="k", status=JobStatus.LLM_COMPLETED)
+                  for i in (50, 51)),
+            ])
+            await session.commit()
+        tracker = CompletionTracker(self.client)
+        mark, stale = tracker._mark, {51}
+
+        async def mark_after_counter_expired(job_id, job_file_id, failed):
+            # El worker de 51 encontró el contador vacío antes de que el de 50 lo reconstruyera.
+            if job_file_id in stale:
+                stale.discard(job_file_id)
+                return -1
+            return await mark(job_id, job_file_id, failed)
+
+        tracker._mark = mark_after_counter_expired
+        try:
+            async with sessions() as first, sessions() as second:
+                self.assertTrue(await tracker.file_finished(5, 50, session=first))
+                self.assertFalse(await tracker.file_finished(5, 51, session=second))
+                # Dos reconstrucciones a la vez: solo una escribe.
+                await self.client.delete(tracker.progress_key(5))
+                rebuilt = await asyncio.gather(tracker.rebuild(first, 5, pending_file_id=50),
+                                               tracker.rebuild(second, 5, pending_file_id=51))
+                self.assertEqual(sorted(rebuilt), [False, True])
+        finally:
+            await engine.dispose()
+        self.assertEqual(await self.client.llen(ASSEMBLY_QUEUE), 1)
+
+    async def test_pubsub_notification(self):
+        received = []
+
+        async def listen():
+            async for event in listen_transitions(self.client, user_id="u1"):
+                received.append(event)
+                return
+
+        listener = asyncio.create_task(listen())
+        await asyncio.sleep(0.05)
+        event = JobStatusEvent(job_id=1, user_id="u1", status=JobStatus.COMPLETED, at=datetime(2024, 1, 1))
+        await notify_transition(self.client, event)
+        await asyncio.wait_for(listener, 1)
+        self.assertEqual(received, [event])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover
+    fakeredis = None
+
+from insurance_models.redis.queues import LLM_QUEUE, LlmQueueMessage
+from insurance_models.redis.reliable_queue import ReliableQueue
+from insurance_models.redis.streams import StreamQueue
+from insurance_models.redis.transport import migrate_list_to_stream, open_queue
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TestStreamQueue(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    def make_queue(self, consumer="c1", group="workers", **kwargs):
+        return StreamQueue.for_queue(self.client, LLM_QUEUE, consumer=consumer, group=group, **kwargs)
+
+    async def test_enqueue_claim_ack(self):
+        queue = self.make_queue()
+        await queue.enqueue_many(LlmQueueMessage(job_file_id=i) for i in range(4))
+        deliveries = await queue.claim(3)
+        self.assertEqual([d.message.job_file_id for d in deliveries], [0, 1, 2])
+        self.assertTrue(all(d.delivery_count == 1 for d in deliveries))
+        await queue.ack_many(deliveries)
+        self.assertEqual(await queue.depth(), (1, 0))
+
+    async def test_groups_fan_out(self):
+        first, second = self.make_queue(group="ocr-a"), self.make_queue(group="audit")
+        await first.ensure_group()
+        await second.ensure_group()
+        await first.enqueue(LlmQueueMessage(job_file_id=5))
+        self.assertEqual(len(await first.claim(1)), 1)
+        self.assertEqual(len(await second.claim(1)), 1)
+
+    async def test_stale_messages_are_reclaimed_with_delivery_count(self):
+        crashed = self.make_queue(consumer="crashed", visibility_timeout=0)
+        survivor = self.make_queue(consumer="survivor", visibility_timeout=0)
+        await crashed.enqueue(LlmQueueMessage(job_file_id=1))
+        await crashed.claim(1)
+        await asyncio.sleep(0.01)
+        reclaimed = await survivor.claim(1)
+        self.assertEqual(reclaimed[0].message.job_file_id, 1)
+        self.assertEqual(reclaimed[0].delivery_count, 2)
+
+    async def test_claim_and_reaper_share_the_delivery_budget(self):
+        async def deliver_until_dead(reap: bool) -> int:
+            queue = self.make_queue(group=f"budget-{reap}", visibility_timeout=0, max_deliveries=2)
+            await queue.ensure_group()
+            await queue.enqueue(LlmQueueMessage(job_file_id=1))
+            deliveries = 0
+            for _ in range(5):
+                await asyncio.sleep(0.002)
+                if reap and await queue.requeue_stale():
+                    break
+                claimed = await queue.claim(1)
+                if not claimed:
+                    break
+                deliveries = claimed[0].delivery_count
+            return deliveries
+
+        # Con max_deliveries=2 el mensaje se entrega exactamente 2 veces por cualquiera de los dos caminos.
+        self.assertEqual(await deliver_until_dead(reap=False), 2)
+        self.assertEqual(await deliver_until_dead(reap=True), 2)
+        self.assertEqual(await self.client.llen(f"{LLM_QUEUE}:dead"), 2)
+
+    async def test_nack_requeues(self):
+        queue = self.make_queue()
+        await queue.enqueue(LlmQueueMessage(job_file_id=8))
+        delivery = (await queue.claim(1))[0]
+        await queue.nack(delivery)
+        again = await queue.claim(1)
+        self.assertEqual(again[0].message.job_file_id, 8)
+        self.assertNotEqual(again[0].id, delivery.id)
+
+    async def test_nack_keeps_the_delivery_budget(self):
+        queue = self.make_queue(max_deliveries=3)
+        await queue.enqueue(LlmQueueMessage(job_file_id=8))
+        counts = []
+        for _ in range(5):
+            claimed = await queue.claim(1)
+            if not claimed:
+                break
+            counts.append(claimed[0].delivery_count)
+            await queue.nack(claimed[0])
+        self.assertEqual(counts, [1, 2, 3])
+        self.assertEqual(await self.client.llen(f"{LLM_QUEUE}:dead"), 1)
+
+    async def test_delivery_counts_ignore_other_pending_entries(self):
+        crashed, survivor = self.make_queue(consumer="crashed"), self.make_queue(consumer="survivor")
+        await crashed.enqueue(LlmQueueMessage(job_file_id=1))
+        (first,) = await crashed.claim(1)
+        # Entre las dos reclamadas quedan 150 pendientes del mismo consumidor.
+        await survivor.enqueue_many(LlmQueueMessage(job_file_id=i) for i in range(150))
+        await survivor.claim(150)
+        await crashed.enqueue(LlmQueueMessage(job_file_id=2))
+        (last,) = await crashed.claim(1)
+        await self.client.xclaim(crashed.stream_name, crashed.group, "survivor", 0, [first.id, last.id])
+        self.assertEqual(await survivor._delivery_counts([first.id, last.id]), {first.id: 2, last.id: 2})
+
+    async def test_transport_selection_and_list_migration(self):
+        with mock.patch.dict(os.environ, {"QUEUE_TRANSPORT_LLM_QUEUE": "stream"}):
+            self.assertIsInstance(open_queue(self.client, LLM_QUEUE), StreamQueue)
+        list_queue = open_queue(self.client, LLM_QUEUE)
+        self.assertIsInstance(list_queue, ReliableQueue)
+        await list_queue.enqueue_many(LlmQueueMessage(job_file_id=i) for i in range(3))
+        self.assertEqual(await migrate_list_to_stream(self.client, LLM_QUEUE, batch_size=2), 3)
+        deliveries = await self.make_queue().claim(10)
+        self.assertEqual([d.message.job_file_id for d in deliveries], [0, 1, 2])
+        self.assertEqual(await list_queue.depth(), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+import os
+import threading
+import unittest
+from unittest import mock
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover
+    fakeredis = None
+
+try:
+    from moto.server import ThreadedMotoServer
+except ImportError:  # pragma: no cover
+    ThreadedMotoServer = None
+
+from insurance_models.r2.client import R2Client
+from insurance_models.redis.codec import (
+    BINARY_CODEC, JSON_CODEC, TRACED_ENVELOPE_VERSION, BinaryCodec, decode_message, encode_message,
+)
+from insurance_models.redis.queues import LLM_QUEUE, OCR_QUEUE, LlmQueueMessage, OcrQueueMessage
+from insurance_models.redis.reliable_queue import ReliableQueue
+from insurance_models.utils.tracing import (
+    QUEUE_WAIT_SECONDS, R2_CALL_SECONDS, REGISTRY, STAGE_DURATION_SECONDS, Histogram,
+    InMemorySpanExporter, SpanContext, Tracer, get_tracer, instrument_r2_client, set_tracer,
+    stage_span, trace_stage,
+)
+
+
+class TracingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.exporter = InMemorySpanExporter()
+        self.previous = get_tracer()
+        set_tracer(Tracer([self.exporter]))
+        REGISTRY.clear()
+
+    def tearDown(self):
+        set_tracer(self.previous)
+
+
+class TestSpanContext(unittest.TestCase):
+    def test_traceparent_round_trip(self):
+        value = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+        context = SpanContext.from_traceparent(value)
+        self.assertEqual(context.traceparent, value)
+        self.assertEqual(SpanContext.from_bytes(*context.to_bytes()), context)
+
+    def test_invalid_traceparent(self):
+        for value in (None, "", "00-xyz-00f067aa0ba902b7-01", f"00-{'0' * 32}-00f067aa0ba902b7-01"):
+            self.assertIsNone(SpanContext.from_traceparent(value))
+
+
+class TestPropagation(TracingTestCase):
+    def test_traced_envelope_carries_the_active_trace(self):
+        traced = BinaryCodec(envelope_version=TRACED_ENVELOPE_VERSION)
+        with get_tracer().span("producer") as producer:
+            data = traced.encode(OcrQueueMessage(job_file_id=1))
+        # Cualquier codec binario lee v2, también el que escribe v1.
+        envelope = BINARY_CODEC.decode(data, OcrQueueMessage)
+        self.assertEqual(envelope.trace_context, producer.context.traceparent)
+        self.assertEqual(envelope.message.trace_context, producer.context.traceparent)
+        envelope = decode_message(encode_message(OcrQueueMessage(job_file_id=1), envelope_version=2))
+        self.assertIsNone(envelope.message.trace_context)
+
+    def test_v1_is_written_by_default(self):
+        with get_tracer().span("producer"):
+            data = BINARY_CODEC.encode(OcrQueueMessage(job_file_id=2))
+        self.assertEqual(data[2], 1)
+        envelope = BINARY_CODEC.decode(data, OcrQueueMessage)
+        self.assertEqual((envelope.message.job_file_id, envelope.trace_context), (2, None))
+        self.assertIsNotNone(envelope.enqueued_at)
+
+    def test_json_codec_fills_envelope_fields(self):
+        self.assertNotIn("trace_context", JSON_CODEC.encode(OcrQueueMessage(job_file_id=1)))
+        with get_tracer().span("producer") as producer:
+            raw = JSON_CODEC.encode(OcrQueueMessage(job_file_id=1))
+        envelope = JSON_CODEC.decode(raw, OcrQueueMessage)
+        self.assertEqual(envelope.trace_context, producer.context.traceparent)
+        self.assertIsNotNone(envelope.enqueued_at)
+        # Los mensajes de productores anteriores siguen siendo válidos.
+        self.assertIsNone(JSON_CODEC.decode('{"job_file_id": 1}', OcrQueueMessage).enqueued_at)
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TestPipelineTrace(TracingTestCase, unittest.IsolatedAsyncioTestCase):
+    async def test_stages_share_one_trace(self):
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        ocr = ReliableQueue.for_queue(client, OCR_QUEUE)
+        llm = ReliableQueue.for_queue(client, LLM_QUEUE)
+
+        with get_tracer().span("api.upload") as root:
+            await ocr.enqueue(OcrQueueMessage(job_file_id=1))
+
+        @trace_stage("ocr")
+        async def handle_ocr(delivery):
+            await llm.enqueue(LlmQueueMessage(job_file_id=delivery.message.job_file_id))
+
+        (delivery,) = await ocr.claim(1)
+        await handle_ocr(delivery)
+        (delivery,) = await llm.claim(1)
+        with self.assertRaises(RuntimeError):
+            with stage_span("llm", delivery=delivery, queue=LLM_QUEUE):
+                raise RuntimeError("modelo no disponible")
+        await client.aclose()
+
+        spans = {span.name: span for span in self.exporter.get_finished_spans()}
+        self.assertEqual({span.context.trace_id for span in spans.values()}, {root.context.trace_id})
+        self.assertEqual(spans["stage ocr"].parent_span_id, root.context.span_id)
+        self.assertEqual(spans["stage llm"].parent_span_id, spans["stage ocr"].context.span_id)
+        self.assertEqual(spans["stage llm"].status, "ERROR")
+        self.assertEqual(QUEUE_WAIT_SECONDS.count(queue=LLM_QUEUE), 1)
+        self.assertEqual(STAGE_DURATION_SECONDS.count(stage="llm", outcome="error"), 1)
+        self.assertEqual(STAGE_DURATION_SECONDS.count(stage="ocr", outcome="ok"), 1)
+
+
+class TestHistogram(unittest.TestCase):
+    def test_quantiles_interpolate_within_buckets(self):
+        histogram = Histogram("latency_seconds", "Latency.", ("stage",), buckets=(1.0, 2.0, 4.0))
+        for value in (0.5, 1.5, 1.5, 3.0):
+            histogram.observe(value, stage="ocr")
+        self.assertEqual(histogram.quantile(0.5, stage="ocr"), 1.5)
+        self.assertEqual(histogram.quantile(1.0, stage="ocr"), 4.0)
+        self.assertIsNone(histogram.quantile(0.5, stage="llm"))
+        with self.assertRaises(ValueError):
+            histogram.observe(1.0)
+
+    def test_reads_wait_for_writers(self):
+        histogram = Histogram("latency_seconds", "Latency.", ("stage",), buckets=(1.0, 2.0))
+        histogram.observe(0.5, stage="ocr")
+        reads = {}
+        readers = [
+            threading.Thread(target=lambda: reads.update(count=histogram.count(stage="ocr"))),
+            threading.Thread(target=lambda: reads.update(p50=histogram.quantile(0.5, stage="ocr"))),
+            threading.Thread(target=lambda: reads.update(all=histogram.percentiles((0.5,)))),
+        ]
+        # Mientras un `observe` tiene el lock, ninguna lectura ve la serie a medio actualizar.
+        with histogram._lock:
+            for reader in readers:
+                reader.start()
+            for reader in readers:
+                reader.join(0.05)
+            self.assertEqual(reads, {})
+        for reader in readers:
+            reader.join()
+        self.assertEqual(reads, {"count": 1, "p50": 0.5, "all": {("ocr",): {"p50": 0.5}}})
+
+    def test_prometheus_text(self):
+        histogram = Histogram("latency_seconds", "Latency.", ("stage",), buckets=(1.0,))
+        histogram.observe(0.5, stage="ocr")
+        histogram.observe(3.0, stage="ocr")
+        self.assertEqual(histogram.render(), [
+            "# HELP latency_seconds Latency.",
+            "# TYPE latency_seconds histogram",
+            'latency_seconds_bucket{stage="ocr",le="1.0"} 1',
+            'latency_seconds_bucket{stage="ocr",le="+Inf"} 2',
+            'latency_seconds_sum{stage="ocr"} 3.5',
+            'latency_seconds_count{stage="ocr"} 2',
+        ])
+
+
+@unittest.skipIf(ThreadedMotoServer is None, "moto[server] is not installed")
+class TestR2Instrumentation(TracingTestCase):
+    def test_calls_are_timed(self):
+        server = ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+        server.start()
+        self.addCleanup(server.stop)
+        host, port = server.get_host_and_port()
+        env = {
+            "R2_ACCESS_KEY_ID": "test",
+            "R2_SECRET_ACCESS_KEY": "test",
+            "R2_BUCKET_NAME": "insurance-test",
+            "R2_ENDPOINT_URL": f"http://{host}:{port}",
+        }
+        with mock.patch.dict(os.environ, env):
+            client = R2Client()
+        instrument_r2_client(client)
+        instrument_r2_client(client)
+        client.s3_client.create_bucket(Bucket="insurance-test")
+        with self.assertRaises(Exception):
+            client.s3_client.head_object(Bucket="insurance-test", Key="no-existe")
+
+        self.assertEqual(R2_CALL_SECONDS.count(operation="CreateBucket", outcome="ok"), 1)
+        self.assertEqual(R2_CALL_SECONDS.count(operation="HeadObject", outcome="error"), 1)
+        self.assertEqual([span.name for span in self.exporter.get_finished_spans()],
+                         ["r2.CreateBucket", "r2.HeadObject"])
+
+
+if __name__ == '__main__':
+    unittest.main()